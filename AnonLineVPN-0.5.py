@@ -1,43 +1,102 @@
+# Трассировка запуска импортируется первой: с нее начинается отсчет
+from anonline.startup_trace import STARTUP_TRACE_ENV, TRACER
+
+TRACER.start("imports")
 import os
 import sys
-import json
 import uuid
-import subprocess
-import winreg
-import socket
-import urllib.parse
-import ctypes
 import re
 import time
 import threading
-import platform
+TRACER.start("PyQt5")
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5 import QtGui
+TRACER.stop("PyQt5")
 import signal
-from datetime import datetime
+TRACER.start("anonline")
+from anonline.geosite_cache import open_geosite
+from anonline.geosite_subset import XRAY_ASSET_ENV, prepare_asset_dir, subset_is_current
+from anonline.health import TUNNEL_TARGETS, HealthProbeEngine, Socks5Probe
+from anonline.journal import NetworkJournal
+from anonline.log_pipeline import FRAME_INTERVAL_MS, LogBuffer
+from anonline.network_setup import NetworkSetup, is_admin, relaunch_as_admin
+from anonline.race import LatencyRacer
+from anonline.settings_store import LEGACY_KEY, LEGACY_SETTINGS, NewerSchemaError, SettingsStore
+from anonline.steps import FAILED, OK, SKIPPED, Step, run_steps
+from anonline.subscription import SubscriptionStats, parse_subscription
+from anonline.vless import parse_vless_url, split_keys
+from anonline.xray_config import ConfigError, ConfigOptions, build_config, write_config
+from anonline.xray_log import XrayLogStats
+from anonline.xray_process import XrayLogReader, XraySupervisor, port_accepting
+from anonline.xray_stats import METRICS_INBOUND_TAG, STATS_PORT, StatsPoller, format_rate
+TRACER.stop("anonline")
+TRACER.stop("imports")
+
+# Каталог с урезанным geosite.dat для Xray
+XRAY_ASSET_DIR = "xray_assets"
+# Сообщения о неудаче необязательных шагов подключения
+CONNECT_STEP_WARNINGS = {
+    "ipv6": "не удалось отключить IPv6",
+    "webrtc": "не удалось заблокировать WebRTC",
+    "firewall": "не удалось создать правила брандмауэра",
+    "dns": "не удалось настроить DNS, возможны утечки",
+    "time": "не удалось скрыть системное время",
+}
+# Консоль хранит только последние строки, старые вытесняются
+CONSOLE_MAX_LINES = 5000
+# Журнал изменений сети: по нему откатываются настройки после сбоя
+JOURNAL_FILE = "network_journal.jsonl"
 
 
 class VlessVPNApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.xray_process = None
+        self.xray = None
         self.is_connected = False
-        self.saved_proxy = None
         self.local_port = 10808
-        # Сохраненные настройки времени
-        self.original_time_zone = None
-        self.original_time_format = None
-        self.time_server = "time.nist.gov"  # Сервер для синхронизации времени
+        # Изменения системы (прокси, DNS, IPv6, hosts, брандмауэр, время) с журналом для отката
+        self.journal = NetworkJournal(JOURNAL_FILE)
+        self.network = NetworkSetup(self.journal, log=self.log, local_port=self.local_port)
+        self.network.interfaces.start_watcher()
+        # Настройки в каталоге пользователя, запись на диск - фоновым потоком
+        self.settings = SettingsStore(legacy_dir=os.getcwd())
+        self.settings_loaded = False
+        # Счетчики трафика Xray (metrics на loopback-порту)
+        self.stats_enabled = True
+        self.stats_port = STATS_PORT
 
         # Убираем стандартную рамку окна
         self.setWindowFlag(Qt.FramelessWindowHint)
         self.setAttribute(Qt.WA_TranslucentBackground)
 
-        self.initUI()
-        self.load_settings()
-        self.check_admin()
+        self.xray_asset_dir = None
+        self.xray_config = None
+        self.awaiting_first_probe = False
+        # Замеры задержки серверов кэшируются на 5 минут
+        self.racer = LatencyRacer(concurrency=8, timeout=3.0, ttl=300.0)
+        self.race_thread = None
+        # Логи Xray копятся в буфере и выводятся в консоль пачками раз в кадр
+        self.log_thread = None
+        self.xray_stats = None
+        # Сообщения из рабочих потоков (шаги подключения) идут в консоль через сигнал
+        self.log_bridge = LogBridge()
+        self.log_bridge.message_signal.connect(self.log)
+        self.xray_log = LogBuffer(capacity=2000, rate=300.0, burst=600)
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.setInterval(FRAME_INTERVAL_MS)
+        self.log_flush_timer.timeout.connect(self.flush_xray_log)
+
+        with TRACER.span("initUI"):
+            self.initUI()
+        with TRACER.span("load_settings"):
+            self.load_settings()
+        with TRACER.span("check_admin"):
+            self.check_admin()
+        with TRACER.span("recover_stale_journal"):
+            self.recover_stale_journal()
         # Обработка Ctrl+C в консоли
         signal.signal(signal.SIGINT, self.signal_handler)
         # Обработка системных событий закрытия
@@ -47,8 +106,18 @@ class VlessVPNApp(QMainWindow):
         if event.type() == QEvent.Close:
             self.closeEvent(event)
             return True
+        if event.type() == QEvent.Paint and not TRACER.finished:
+            # Дочерние виджеты рисуются после окна: запуск завершен, когда кадр выведен целиком
+            QTimer.singleShot(0, self.on_first_paint)
         return super().eventFilter(obj, event)
 
+    def on_first_paint(self):
+        """Фиксирует время до первой отрисовки окна"""
+        if TRACER.finished:
+            return
+        TRACER.finish()
+        self.log(f"Окно отрисовано через {TRACER.total:.0f} мс после запуска")
+
     def signal_handler(self, signum, frame):
         """Обработка Ctrl+C и других сигналов"""
         self.restore_network_settings()
@@ -70,6 +139,7 @@ class VlessVPNApp(QMainWindow):
         self.setCentralWidget(self.main_widget)
 
         # Стиль приложения
+        TRACER.start("stylesheet")
         self.setStyleSheet("""
             #mainWidget {
                 background-color: #0d1117;
@@ -97,7 +167,7 @@ class VlessVPNApp(QMainWindow):
                 padding: 5px;
                 selection-background-color: #1c6ea4;
             }
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #0d1117;
                 color: #58a6ff;
                 border: 1px solid #30363d;
@@ -150,6 +220,7 @@ class VlessVPNApp(QMainWindow):
                 background-color: #8B0000;
             }
         """)
+        TRACER.stop("stylesheet")
 
         # Главный лейаут
         main_layout = QVBoxLayout(self.main_widget)
@@ -217,9 +288,13 @@ class VlessVPNApp(QMainWindow):
         # Группа консоли
         console_group = QGroupBox("Консоль вывода")
         console_layout = QVBoxLayout()
-        self.console = QTextEdit()
+        self.console = QPlainTextEdit()
         self.console.setReadOnly(True)
+        self.console.setUndoRedoEnabled(False)
+        self.console.setMaximumBlockCount(CONSOLE_MAX_LINES)
         console_layout.addWidget(self.console)
+        self.traffic_label = QLabel("")
+        console_layout.addWidget(self.traffic_label)
         console_group.setLayout(console_layout)
 
         content_layout.addWidget(settings_group)
@@ -254,6 +329,12 @@ class VlessVPNApp(QMainWindow):
         anonymity_layout.addLayout(options_layout)
         anonymity_group.setLayout(anonymity_layout)
 
+        # Изменения сохраняются сразу: хранилище соберет их в одну запись файла
+        for checkbox in (self.max_anonymity_cb, self.disable_ipv6_cb, self.block_webrtc_cb,
+                         self.firewall_killswitch_cb, self.use_local_dns_cb, self.hide_system_time_cb):
+            checkbox.toggled.connect(self.on_setting_changed)
+        self.key_input.editingFinished.connect(self.on_setting_changed)
+
         # Добавляем группу настроек анонимности в основной интерфейс
         content_layout.addWidget(anonymity_group)
         content_layout.addWidget(settings_group)
@@ -263,13 +344,31 @@ class VlessVPNApp(QMainWindow):
         main_layout.addWidget(title_bar)
         main_layout.addWidget(content_widget)
 
-        # Таймер для проверки соединения
-        self.connection_timer = QTimer(self)
-        self.connection_timer.timeout.connect(self.check_connection)
-        self.connection_timer.start(5000)
+        # Проверка соединения через SOCKS-вход Xray в фоновом потоке,
+        # результаты приходят сигналом
+        self.health_bridge = HealthProbeBridge()
+        self.health_bridge.results_signal.connect(self.on_health_results)
+        self.health_engine = HealthProbeEngine(
+            targets=TUNNEL_TARGETS,
+            interval=5.0,
+            timeout=3.0,
+            on_results=self.health_bridge.results_signal.emit,
+            probe=Socks5Probe("127.0.0.1", self.local_port)
+        )
+
+        # Опрос счетчиков трафика Xray раз в секунду в фоновом потоке
+        self.stats_bridge = StatsBridge()
+        self.stats_bridge.sample_signal.connect(self.on_traffic_sample)
+        self.stats_poller = StatsPoller(
+            port=self.stats_port,
+            interval=1.0,
+            history=300,
+            on_sample=self.stats_bridge.sample_signal.emit
+        )
 
         # Неоновая тень
-        self.set_neon_effect()
+        with TRACER.span("set_neon_effect"):
+            self.set_neon_effect()
 
         self.log("Приложение инициализировано. Готово к подключению.")
 
@@ -299,11 +398,26 @@ class VlessVPNApp(QMainWindow):
         self.main_widget.setGraphicsEffect(self.shadow)
 
     def log(self, message):
-        """Выводит сообщение в консоль"""
+        """Выводит сообщение в консоль (из любого потока)"""
+        if threading.current_thread() is not threading.main_thread():
+            self.log_bridge.message_signal.emit(message)
+            return
+        self.log_lines([message])
+
+    def log_lines(self, messages):
+        """Выводит пачку сообщений в консоль одним добавлением"""
         timestamp = QDateTime.currentDateTime().toString("hh:mm:ss")
-        self.console.append(f"[{timestamp}] {message}")
+        self.console.appendPlainText("\n".join(f"[{timestamp}] {message}" for message in messages))
         self.console.ensureCursorVisible()
 
+    def flush_xray_log(self):
+        """Переносит накопленные строки лога Xray в консоль (по таймеру)"""
+        lines = self.xray_log.drain()
+        if lines:
+            self.log_lines(lines)
+        elif self.log_thread is None or not self.log_thread.is_alive():
+            self.log_flush_timer.stop()
+
     def mousePressEvent(self, event):
         """Позволяет перемещать окно за заголовок"""
         if event.button() == Qt.LeftButton:
@@ -317,34 +431,51 @@ class VlessVPNApp(QMainWindow):
             event.accept()
 
     def load_settings(self):
-        """Загружает сохраненные настройки"""
+        """Загружает сохраненные настройки (при первом запуске - из файлов прежних версий)"""
         try:
-            if os.path.exists("vless_settings.json"):
-                with open("vless_settings.json", "r", encoding="utf-8") as f:
-                    settings = json.load(f)
-                    self.key_input.setText(settings.get("key", ""))
-
-                    # Загружаем состояние чекбоксов
-                    self.max_anonymity_cb.setChecked(settings.get("max_anonymity", True))
-                    self.disable_ipv6_cb.setChecked(settings.get("disable_ipv6", True))
-                    self.block_webrtc_cb.setChecked(settings.get("block_webrtc", True))
-                    self.firewall_killswitch_cb.setChecked(settings.get("firewall_killswitch", True))
-                    self.use_local_dns_cb.setChecked(settings.get("use_local_dns", True))
-                    self.hide_system_time_cb.setChecked(settings.get("hide_system_time", True))
-
-                    # Активируем состояние зависимых чекбоксов
-                    self.toggle_anonymity_options(
-                        2 if self.max_anonymity_cb.isChecked() else 0
-                    )
-
-            self.load_saved_key()
+            settings = self.settings.load()
+            if self.settings.migrated:
+                self.log(f"Настройки перенесены из {LEGACY_SETTINGS} и {LEGACY_KEY} в {self.settings.path}")
+        except NewerSchemaError as e:
+            self.log(f"Ошибка загрузки настроек: {str(e)}. Файл не изменяется, "
+                     f"изменения настроек в этом запуске не сохранятся")
+            settings = self.settings.snapshot()
         except Exception as e:
             self.log(f"Ошибка загрузки настроек: {str(e)}")
+            settings = self.settings.snapshot()
+
+        try:
+            self.key_input.setText(settings["key"])
+
+            # Загружаем состояние чекбоксов
+            self.max_anonymity_cb.setChecked(settings["max_anonymity"])
+            self.disable_ipv6_cb.setChecked(settings["disable_ipv6"])
+            self.block_webrtc_cb.setChecked(settings["block_webrtc"])
+            self.firewall_killswitch_cb.setChecked(settings["firewall_killswitch"])
+            self.use_local_dns_cb.setChecked(settings["use_local_dns"])
+            self.hide_system_time_cb.setChecked(settings["hide_system_time"])
+            self.console.setMaximumBlockCount(max(100, int(settings["console_max_lines"])))
+            self.stats_enabled = settings["xray_stats"]
+
+            # Активируем состояние зависимых чекбоксов
+            self.toggle_anonymity_options(
+                2 if self.max_anonymity_cb.isChecked() else 0
+            )
+            if settings["key"]:
+                self.log("Ключ загружен из сохранения")
+        except Exception as e:
+            self.log(f"Ошибка загрузки настроек: {str(e)}")
+        self.settings_loaded = True
+
+    def on_setting_changed(self, *args):
+        """Сохраняет настройки при изменении в окне (но не пока они загружаются)"""
+        if self.settings_loaded:
+            self.save_settings()
 
     def save_settings(self):
-        """Сохраняет текущие настройки"""
+        """Сохраняет текущие настройки (файл запишется в фоне)"""
         try:
-            settings = {
+            self.settings.update({
                 "key": self.key_input.text().strip(),
                 "max_anonymity": self.max_anonymity_cb.isChecked(),
                 "disable_ipv6": self.disable_ipv6_cb.isChecked(),
@@ -352,628 +483,122 @@ class VlessVPNApp(QMainWindow):
                 "firewall_killswitch": self.firewall_killswitch_cb.isChecked(),
                 "use_local_dns": self.use_local_dns_cb.isChecked(),
                 "hide_system_time": self.hide_system_time_cb.isChecked(),
-            }
-
-            with open("vless_settings.json", "w", encoding="utf-8") as f:
-                json.dump(settings, f, indent=2)
-
+                "console_max_lines": self.console.maximumBlockCount(),
+                "xray_stats": self.stats_enabled,
+            })
             return True
         except Exception as e:
             self.log(f"Ошибка сохранения настроек: {str(e)}")
             return False
 
-    def hide_system_time(self):
-        """Скрывает реальное системное время (устанавливает UTC, сохраняет текущее)"""
-        try:
-            # 1. Сохраняем текущий часовой пояс
-            self.original_time_zone = subprocess.check_output(
-                ['tzutil', '/g'],
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                text=True
-            ).strip()
-
-            # 2. Сохраняем текущую дату и время
-            self.original_datetime = datetime.now()
-
-            # 3. Устанавливаем UTC
-            subprocess.run(
-                ['tzutil', '/s', 'UTC'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            # 4. Отключаем авто-синхронизацию
-            subprocess.run(
-                ['w32tm', '/config', '/syncfromflags:manual', '/update'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            # 5. Принудительная синхронизация с сервером
-            subprocess.run(
-                ['w32tm', '/resync', '/computer:' + self.time_server, '/nowait'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            self.log("Системное время скрыто (установлен UTC и синхронизировано с сервером)")
-            return True
-        except Exception as e:
-            self.log(f"Ошибка скрытия времени: {str(e)}")
-            return False
-
-    def restore_system_time(self):
-        """Восстанавливает исходный часовой пояс и дату/время"""
-        try:
-            # 1. Возвращаем часовой пояс
-            if self.original_time_zone:
-                subprocess.run(
-                    ['tzutil', '/s', self.original_time_zone],
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-                self.log(f"Часовой пояс восстановлен: {self.original_time_zone}")
-
-            # 2. Устанавливаем обратно дату и время
-            if hasattr(self, 'original_datetime'):
-                dt = self.original_datetime
-                datetime_str = dt.strftime("%m-%d-%Y %H:%M:%S")
-
-                subprocess.run(
-                    ['powershell', '-Command', f'Set-Date -Date "{datetime_str}"'],
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-
-                self.log(f"Дата и время восстановлены: {datetime_str}")
-            else:
-                self.log("Предупреждение: сохранённое время не найдено")
-
-            # 3. Возвращаем автоматическую синхронизацию
-            subprocess.run(
-                ['w32tm', '/config', '/syncfromflags:domhier', '/update'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            subprocess.run(
-                ['w32tm', '/resync'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            return True
-        except Exception as e:
-            self.log(f"Ошибка восстановления времени: {str(e)}")
-            return False
-
-
-    def load_saved_key(self):
-        """Загружает сохраненный ключ из файла с UTF-8"""
-        try:
-            if os.path.exists("vless_key.txt"):
-                with open("vless_key.txt", "r", encoding="utf-8") as f:
-                    key = f.read().strip()
-                    if key.startswith("vless://"):
-                        self.key_input.setText(key)
-                        self.log("Ключ загружен из сохранения")
-        except Exception as e:
-            self.log(f"Ошибка загрузки ключа: {str(e)}")
-
-    def save_key(self):
-        """Сохраняет ключ в файл с UTF-8"""
-        key = self.key_input.text().strip()
-        if key.startswith("vless://"):
-            try:
-                with open("vless_key.txt", "w", encoding="utf-8") as f:
-                    f.write(key)
-                return True
-            except Exception as e:
-                self.log(f"Ошибка сохранения ключа: {str(e)}")
-                return False
-        return False
-
     def parse_vless_url(self, url):
         """Парсит VLESS-ссылку"""
         try:
-            parsed = urllib.parse.urlparse(url)
-            if parsed.scheme != "vless":
-                return None
-
-            # Извлечение основных параметров
-            netloc = parsed.netloc.split('@')
-            if len(netloc) < 2:
-                return None
-
-            uuid = netloc[0]
-            server_port = netloc[1].split(':')
-            server = server_port[0]
-            port = int(server_port[1]) if len(server_port) > 1 else 443
-
-            query = urllib.parse.parse_qs(parsed.query)
-
-            return {
-                "uuid": uuid,
-                "server": server,
-                "port": port,
-                "type": query.get('type', ['tcp'])[0],
-                "security": query.get('security', ['reality'])[0],
-                "fp": query.get('fp', ['chrome'])[0],
-                "pbk": query.get('pbk', [''])[0],
-                "sni": query.get('sni', [''])[0],
-                "flow": query.get('flow', [''])[0],
-                "sid": query.get('sid', [''])[0],
-                "spx": query.get('spx', ['/'])[0],
-                "fragment": parsed.fragment
-            }
+            return parse_vless_url(url)
         except Exception as e:
             self.log(f"Ошибка парсинга URL: {str(e)}")
             return None
 
-    def generate_xray_config(self, params):
-        """Генерирует конфиг для Xray с максимальными настройками анонимности"""
-        config = {
-            "log": {
-                "loglevel": "warning"
-            },
-            "inbounds": [
-                {
-                    "port": self.local_port,
-                    "protocol": "socks",
-                    "settings": {
-                        "auth": "noauth",
-                        "udp": True,
-                        "ip": "127.0.0.1"
-                    },
-                    "sniffing": {
-                        "enabled": True,
-                        "destOverride": ["http", "tls", "fakedns"],
-                        "routeOnly": True
-                    }
-                },
-                {
-                    "port": 53,
-                    "protocol": "dokodemo-door",
-                    "settings": {
-                        "address": "1.1.1.1",
-                        "port": 53,
-                        "network": "tcp,udp"
-                    },
-                    "tag": "dns-inbound"
-                }
-            ],
-            "outbounds": [
-                {
-                    "protocol": "vless",
-                    "settings": {
-                        "vnext": [
-                            {
-                                "address": params["server"],
-                                "port": params["port"],
-                                "users": [
-                                    {
-                                        "id": params["uuid"],
-                                        "flow": params["flow"],
-                                        "encryption": "none"
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    "streamSettings": {
-                        "network": params["type"],
-                        "security": params["security"],
-                        "realitySettings": {
-                            "serverName": params["sni"],
-                            "publicKey": params["pbk"],
-                            "fingerprint": params["fp"],
-                            "shortId": params["sid"],
-                            "spiderX": params["spx"]
-                        }
-                    },
-                    "tag": "proxy"
-                },
-                {
-                    "protocol": "freedom",
-                    "settings": {
-                        "domainStrategy": "UseIPv4"
-                    },
-                    "tag": "direct"
-                },
-                {
-                    "protocol": "blackhole",
-                    "tag": "block"
-                }
-            ],
-            "routing": {
-                "domainStrategy": "IPOnDemand",
-                "rules": [
-                    {
-                        "type": "field",
-                        "inboundTag": ["dns-inbound"],
-                        "outboundTag": "proxy"
-                    },
-                    {
-                        "type": "field",
-                        "ip": ["geoip:private"],
-                        "outboundTag": "direct"
-                    },
-                    {
-                        "type": "field",
-                        "ip": ["geoip:cn"],
-                        "outboundTag": "direct"
-                    },
-                    {
-                        "type": "field",
-                        "protocol": ["bittorrent"],
-                        "outboundTag": "block"
-                    },
-                    # Блокировка IPv6
-                    {
-                        "type": "field",
-                        "ip": ["::/0"],
-                        "outboundTag": "block"
-                    },
-                    # Блокировка STUN (WebRTC)
-                    {
-                        "type": "field",
-                        "port": "3478,3479,5349,5350,5351,19302,19305,19307-19309",
-                        "outboundTag": "block"
-                    },
-                    {
-                        "type": "field",
-                        "port": "0-65535",
-                        "outboundTag": "proxy"
-                    }
-                ]
-            },
-            "dns": {
-                "servers": [
-                    "1.1.1.1",
-                    "8.8.8.8",
-                    {
-                        "address": "1.1.1.1",
-                        "domains": ["geosite:geolocation-!cn"]
-                    },
-                    {
-                        "address": "223.5.5.5",
-                        "domains": ["geosite:cn"]
-                    },
-                    "localhost"
-                ],
-                "queryStrategy": "UseIPv4"
-            }
-        }
-
-        with open("config.json", "w") as f:
-            json.dump(config, f, indent=2)
-
-        return os.path.abspath("config.json")
-
-    def disable_ipv6(self):
-        """Отключает IPv6 для всех интерфейсов"""
+    def parse_subscription(self, text):
+        """Разбирает base64-подписку, возвращает список параметров или None, если это не подписка"""
         try:
-            # Для Windows 10/11
-            if platform.system() == "Windows":
-                # Отключаем IPv6 для всех интерфейсов
-                subprocess.run(
-                    ['netsh', 'interface', 'ipv6', 'set', 'global', 'state=disabled'],
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-                self.log("IPv6 полностью отключен в системе")
-
-            return True
-        except Exception as e:
-            self.log(f"Ошибка отключения IPv6: {str(e)}")
-            return False
-
-    def enable_ipv6(self):
-        """Включает IPv6 обратно"""
-        try:
-            if platform.system() == "Windows":
-                subprocess.run(
-                    ['netsh', 'interface', 'ipv6', 'set', 'global', 'state=enabled'],
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-                self.log("IPv6 включен обратно")
-
-            return True
-        except Exception as e:
-            self.log(f"Ошибка включения IPv6: {str(e)}")
-            return False
-
-    def block_webrtc(self):
-        """Блокирует WebRTC на уровне системы и браузера"""
-        try:
-            # Добавляем блокировку в файл hosts
-            hosts_path = r"C:\Windows\System32\drivers\etc\hosts"
-            webrtc_blocks = [
-                "\n# Блокировка WebRTC",
-                "0.0.0.0 stun.l.google.com",
-                "0.0.0.0 stun1.l.google.com",
-                "0.0.0.0 stun2.l.google.com",
-                "0.0.0.0 stun3.l.google.com",
-                "0.0.0.0 stun4.l.google.com",
-                "0.0.0.0 stun.services.mozilla.com",
-                "0.0.0.0 global.stun.twilio.com"
-            ]
-
-            with open(hosts_path, "a", encoding="utf-8") as f:
-                f.write("\n".join(webrtc_blocks))
-
-            self.log("WebRTC серверы заблокированы через hosts файл")
-            return True
-        except Exception as e:
-            self.log(f"Ошибка блокировки WebRTC: {str(e)}")
-            return False
-
-    def unblock_webrtc(self):
-        """Восстанавливает файл hosts"""
-        try:
-            hosts_path = r"C:\Windows\System32\drivers\etc\hosts"
-            with open(hosts_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-
-            # Удаляем наши блокировки
-            new_lines = [line for line in lines if "stun" not in line and "WebRTC" not in line]
-
-            with open(hosts_path, "w", encoding="utf-8") as f:
-                f.writelines(new_lines)
-
-            self.log("WebRTC блокировки удалены")
-            return True
-        except Exception as e:
-            self.log(f"Ошибка восстановления hosts: {str(e)}")
-            return False
-
-    def create_firewall_rules(self):
-        """Создает правила брандмауэра для полной изоляции"""
-        try:
-            # Блокируем все исходящие соединения, кроме VPN
-            subprocess.run(
-                ['netsh', 'advfirewall', 'firewall', 'add', 'rule',
-                 'name="VPN Kill Switch"', 'dir=out', 'action=block', 'enable=yes'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            # Разрешаем только наш VPN
-            subprocess.run(
-                ['netsh', 'advfirewall', 'firewall', 'add', 'rule',
-                 'name="Allow Xray"', 'dir=out', 'action=allow', 'program="' + os.path.abspath("xray.exe") + '"',
-                 'enable=yes'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            self.log("Создан kill-switch в брандмауэре")
-            return True
-        except Exception as e:
-            self.log(f"Ошибка создания правил брандмауэра: {str(e)}")
-            return False
+            stats = SubscriptionStats()
+            links = parse_subscription(text, stats)
+        except ValueError:
+            return None
+        self.log(
+            f"Подписка: {stats.parsed} серверов, дубликатов {stats.duplicates}, "
+            f"с ошибками {stats.invalid}"
+        )
+        return [link.to_params() for link in links]
+
+    def config_options(self):
+        """Параметры конфига Xray из флажков анонимности"""
+        return ConfigOptions(
+            local_port=self.local_port,
+            # DNS-вход нужен только когда системный DNS направлен на 127.0.0.1
+            dns_port=53 if self.use_local_dns_cb.isChecked() else None,
+            block_ipv6=self.disable_ipv6_cb.isChecked(),
+            block_stun=self.block_webrtc_cb.isChecked(),
+            stats_port=self.stats_port if self.stats_enabled else None,
+        )
 
-    def remove_firewall_rules(self):
-        """Удаляет правила брандмауэра"""
-        try:
-            subprocess.run(
-                ['netsh', 'advfirewall', 'firewall', 'delete', 'rule',
-                 'name="VPN Kill Switch"', 'dir=out'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            subprocess.run(
-                ['netsh', 'advfirewall', 'firewall', 'delete', 'rule',
-                 'name="Allow Xray"', 'dir=out'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            self.log("Правила брандмауэра удалены")
-            return True
-        except Exception as e:
-            self.log(f"Ошибка удаления правил брандмауэра: {str(e)}")
-            return False
+    def generate_xray_config(self, params):
+        """Генерирует конфиг для Xray с максимальными настройками анонимности.
 
-    def set_dns(self):
-        """Устанавливает DNS-серверы для предотвращения утечек"""
+        Возвращает (словарь конфига, WrittenConfig) или None, если конфиг не прошел проверку.
+        """
+        config = build_config(params, self.config_options())
         try:
-            # Получаем имя активного интерфейса
-            result = subprocess.run(
-                ['netsh', 'interface', 'show', 'interface'],
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='ignore',
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            interfaces = result.stdout.split('\n')
-            active_interface = "Ethernet"  # значение по умолчанию
-            for line in interfaces:
-                if "Connected" in line and "Loopback" not in line:
-                    parts = line.split()
-                    if len(parts) > 3:
-                        active_interface = parts[-1]
-                        break
-
-            # Устанавливаем DNS на 127.0.0.1
-            subprocess.run(
-                ['netsh', 'interface', 'ipv4', 'set', 'dnsservers',
-                 f'name="{active_interface}"', 'source=static', 'address=127.0.0.1', 'register=primary'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            self.log("DNS настроены на 127.0.0.1 для предотвращения утечек")
-            return True
-        except Exception as e:
-            self.log(f"Ошибка настройки DNS: {str(e)}")
-            return False
+            written = write_config(config, "config.json")
+        except ConfigError as e:
+            for problem in e.problems:
+                self.log(f"Ошибка конфига: {problem}")
+            return None
+        return config, written
 
-    def restore_dns(self):
-        """Восстанавливает DNS-настройки"""
+    def prepare_xray_assets(self, config):
+        """Собирает каталог ресурсов Xray с geosite.dat только из нужных конфигу категорий"""
         try:
-            # Получаем имя активного интерфейса
-            result = subprocess.run(
-                ['netsh', 'interface', 'show', 'interface'],
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='ignore',
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            interfaces = result.stdout.split('\n')
-            active_interface = "Ethernet"  # значение по умолчанию
-            for line in interfaces:
-                if "Connected" in line and "Loopback" not in line:
-                    parts = line.split()
-                    if len(parts) > 3:
-                        active_interface = parts[-1]
-                        break
-
-            # Восстанавливаем автоматическое получение DNS
-            subprocess.run(
-                ['netsh', 'interface', 'ipv4', 'set', 'dnsservers',
-                 f'name="{active_interface}"', 'source=dhcp'],
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            self.log("DNS настройки восстановлены")
-            return True
+            if not os.path.exists("geosite.dat"):
+                return None
+            # Те же категории и тот же исходный geosite.dat: урезанный файл уже подходит
+            if subset_is_current(config, "geosite.dat", XRAY_ASSET_DIR):
+                return os.path.abspath(XRAY_ASSET_DIR)
+            # Индекс категорий берется из кэша рядом с geosite.dat. Файл открыт только на время
+            # сборки: на Windows открытое отображение не дало бы заменить geosite.dat обновлением
+            start = time.perf_counter()
+            result = open_geosite("geosite.dat")
+            with result.geosite as geosite:
+                codes = prepare_asset_dir(config, "geosite.dat", XRAY_ASSET_DIR, geosite=geosite)
+            elapsed = (time.perf_counter() - start) * 1000
+            size = os.path.getsize(os.path.join(XRAY_ASSET_DIR, "geosite.dat"))
+            source = "индекс из кэша" if result.cache_hit else "с построением кэша"
+            self.log(f"geosite.dat для Xray урезан до {len(codes)} категорий ({size // 1024} КБ, "
+                     f"{source}, {elapsed:.0f} мс)")
+            return os.path.abspath(XRAY_ASSET_DIR)
         except Exception as e:
-            self.log(f"Ошибка восстановления DNS: {str(e)}")
-            return False
+            self.log(f"Не удалось урезать geosite.dat, используется полный файл: {str(e)}")
+            return None
 
-    def save_network_settings(self):
-        """Сохраняет текущие сетевые настройки"""
+    def recover_stale_journal(self):
+        """Откатывает изменения, оставшиеся в журнале после сбоя прошлого запуска"""
         try:
-            # Сохраняем настройки прокси
-            reg = winreg.ConnectRegistry(None, winreg.HKEY_CURRENT_USER)
-            key_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
-            try:
-                key = winreg.OpenKey(reg, key_path, 0, winreg.KEY_READ)
-            except:
-                self.saved_proxy = {"enabled": 0, "server": "", "override": ""}
-                return True
-
-            try:
-                enabled, _ = winreg.QueryValueEx(key, "ProxyEnable")
-            except:
-                enabled = 0
-
-            try:
-                server, _ = winreg.QueryValueEx(key, "ProxyServer")
-            except:
-                server = ""
-
-            try:
-                override, _ = winreg.QueryValueEx(key, "ProxyOverride")
-            except:
-                override = ""
-
-            winreg.CloseKey(key)
-
-            self.saved_proxy = {
-                "enabled": enabled,
-                "server": server,
-                "override": override
-            }
-
-            self.log("Сетевые настройки сохранены")
-            return True
+            pending = self.journal.pending()
+            if not pending:
+                self.journal.clear()
+                return
+            self.log(f"Найдены несохраненные изменения сети после сбоя: {', '.join(pending)}. Откатываем...")
+            report = self.journal.rollback(self.network.undo_handlers(), on_step=self.on_restore_step)
+            if report.failed():
+                self.log("Не все изменения удалось откатить, попытка повторится при отключении")
+            else:
+                self.log(f"Настройки сети после сбоя восстановлены за {report.elapsed * 1000:.0f} мс")
         except Exception as e:
-            self.log(f"Ошибка сохранения настроек: {str(e)}")
-            return False
-
-    def set_proxy(self):
-        """Устанавливает прокси-настройки"""
-        try:
-            reg = winreg.ConnectRegistry(None, winreg.HKEY_CURRENT_USER)
-            key = winreg.OpenKey(reg, r"Software\Microsoft\Windows\CurrentVersion\Internet Settings",
-                                 0, winreg.KEY_WRITE)
-
-            # Включаем прокси
-            winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 1)
-
-            # Устанавливаем SOCKS прокси
-            proxy_str = f"socks=127.0.0.1:{self.local_port}"
-            winreg.SetValueEx(key, "ProxyServer", 0, winreg.REG_SZ, proxy_str)
+            self.log(f"Ошибка восстановления по журналу: {str(e)}")
 
-            # Локальные адреса без прокси
-            winreg.SetValueEx(key, "ProxyOverride", 0, winreg.REG_SZ, "<local>")
-
-            winreg.CloseKey(key)
-
-            # Применяем изменения
-            subprocess.call(["netsh", "winhttp", "import", "proxy", "source=ie"])
-            self.log(f"Прокси настроен: SOCKS 127.0.0.1:{self.local_port}")
-            return True
-        except Exception as e:
-            self.log(f"Ошибка настройки прокси: {str(e)}")
-            return False
+    def on_restore_step(self, result):
+        """Сообщает в консоль о неудачном откате шага"""
+        if result.status != OK:
+            self.log(f"Откат {result.name}: {result.status} {result.error}".rstrip())
 
     def restore_network_settings(self):
-        """Восстанавливает все настройки с улучшенной обработкой ошибок"""
+        """Откатывает изменения из журнала и завершает Xray"""
         try:
             restore_success = True
 
-            if self.is_connected:
-                # Восстановление прокси
-                if self.saved_proxy:
-                    try:
-                        reg = winreg.ConnectRegistry(None, winreg.HKEY_CURRENT_USER)
-                        key = winreg.OpenKey(
-                            reg,
-                            r"Software\Microsoft\Windows\CurrentVersion\Internet Settings",
-                            0,
-                            winreg.KEY_WRITE
-                        )
-
-                        winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, self.saved_proxy["enabled"])
-                        winreg.SetValueEx(key, "ProxyServer", 0, winreg.REG_SZ, self.saved_proxy["server"])
-                        winreg.SetValueEx(key, "ProxyOverride", 0, winreg.REG_SZ, self.saved_proxy["override"])
-
-                        winreg.CloseKey(key)
-
-                        # Применяем изменения
-                        subprocess.call(["netsh", "winhttp", "import", "proxy", "source=ie"])
-                        self.log("Настройки прокси восстановлены")
-                    except Exception as e:
-                        self.log(f"Ошибка восстановления прокси: {str(e)}")
-                        restore_success = False
-
-                # Восстановление DNS (если использовали локальный DNS)
-                if self.use_local_dns_cb.isChecked():
-                    try:
-                        self.restore_dns()
-                    except Exception as e:
-                        self.log(f"Ошибка восстановления DNS: {str(e)}")
-                        restore_success = False
-
-                # Включение IPv6 обратно (если отключали)
-                if self.disable_ipv6_cb.isChecked():
-                    try:
-                        self.enable_ipv6()
-                    except Exception as e:
-                        self.log(f"Ошибка включения IPv6: {str(e)}")
-                        restore_success = False
-
-                # Разблокировка WebRTC (если блокировали)
-                if self.block_webrtc_cb.isChecked():
-                    try:
-                        self.unblock_webrtc()
-                    except Exception as e:
-                        self.log(f"Ошибка разблокировки WebRTC: {str(e)}")
-                        restore_success = False
-
-                # Удаление firewall kill-switch (если создавали)
-                if self.firewall_killswitch_cb.isChecked():
-                    try:
-                        self.remove_firewall_rules()
-                    except Exception as e:
-                        self.log(f"Ошибка удаления правил брандмауэра: {str(e)}")
-                        restore_success = False
-
-                # Восстановление времени (если изменяли)
-                if self.hide_system_time_cb.isChecked():
-                    try:
-                        self.restore_system_time()
-                    except Exception as e:
-                        self.log(f"Ошибка восстановления времени: {str(e)}")
-                        restore_success = False
+            # Откатываются только изменения, действительно примененные при подключении
+            if self.journal.pending():
+                report = self.journal.rollback(self.network.undo_handlers(), on_step=self.on_restore_step)
+                self.log(f"Откат настроек: {report.summary()}")
+                if report.failed() or report.aborted:
+                    restore_success = False
 
+            if self.is_connected:
                 # Завершение Xray
                 try:
-                    self.kill_xray_processes()
-                    self.xray_process = None
+                    self.health_engine.stop()
+                    self.stop_xray()
                     self.is_connected = False
                     self.connect_btn.setText("Подключиться")
                     self.connect_btn.setStyleSheet("")
@@ -1008,111 +633,167 @@ class VlessVPNApp(QMainWindow):
         else:
             event.accept()
 
-    def start_xray(self, config_path):
-        """Запускает Xray с выбранными настройками анонимности"""
+    def start_connection(self, config_path):
+        """Запускает Xray и применяет настройки анонимности.
+
+        Шаги выполняются по графу зависимостей: независимые (IPv6, WebRTC,
+        брандмауэр, время, запуск Xray) идут параллельно, DNS и прокси - после
+        готовности Xray. Если Xray или прокси не удалось настроить, выполненные
+        шаги откатываются; Xray, не дождавшийся готовности, тоже останавливается.
+        """
         try:
             xray_path = "xray.exe"
             if not os.path.exists(xray_path):
                 self.log("Ошибка: xray.exe не найден в папке приложения")
                 return False
 
-            # Закрываем предыдущие экземпляры Xray
-            self.kill_xray_processes()
-
-            # Отключаем IPv6 (если выбрано)
+            # Закрываем предыдущий экземпляр Xray, запущенный приложением
+            self.stop_xray()
+            if port_accepting(self.local_port):
+                self.log(f"Предупреждение: порт {self.local_port} уже занят другим процессом")
+
+            # Урезанный geosite.dat подключаем через каталог ресурсов
+            env = None
+            if self.xray_asset_dir:
+                env = dict(os.environ)
+                env[XRAY_ASSET_ENV] = self.xray_asset_dir
+            self.xray = XraySupervisor([xray_path, "run", "-c", config_path], env=env)
+            self.xray_stats = XrayLogStats(window=300.0)
+            self.log_flush_timer.start()
+
+            # Каждый шаг записывает исходные значения в журнал, откат идет по нему
+            self.journal.begin()
+            network = self.network
+            undo = network.undo_change
+            steps = [
+                Step("xray", self.launch_xray, self.stop_xray, required=True),
+                Step("proxy", network.set_proxy, lambda: undo("proxy"), after=("xray",), required=True),
+            ]
             if self.disable_ipv6_cb.isChecked():
-                if not self.disable_ipv6():
-                    self.log("Предупреждение: не удалось отключить IPv6")
-
-            # Блокируем WebRTC (если выбрано)
+                steps.append(Step("ipv6", network.disable_ipv6, lambda: undo("ipv6")))
             if self.block_webrtc_cb.isChecked():
-                if not self.block_webrtc():
-                    self.log("Предупреждение: не удалось заблокировать WebRTC")
-
-            # Создаем firewall kill-switch (если выбрано)
+                steps.append(Step("webrtc", network.block_webrtc, lambda: undo("webrtc")))
             if self.firewall_killswitch_cb.isChecked():
-                if not self.create_firewall_rules():
-                    self.log("Предупреждение: не удалось создать правила брандмауэра")
-
-            # Запускаем Xray
-            self.xray_process = subprocess.Popen(
-                [xray_path, "run", "-c", config_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            # Поток для чтения вывода Xray
-            self.log_thread = XrayLogThread(self.xray_process.stdout)
-            self.log_thread.log_signal.connect(self.log)
-            self.log_thread.start()
-
-            # Даем Xray время на запуск
-            QTimer.singleShot(100, lambda: self.log("Xray запущен с выбранными настройками анонимности"))
-
-
-            # Настраиваем DNS (если выбрано)
+                steps.append(Step("firewall", network.create_firewall_rules, lambda: undo("firewall")))
+            # Локальный DNS работает только когда Xray слушает порт 53
             if self.use_local_dns_cb.isChecked():
-                if not self.set_dns():
-                    self.log("Предупреждение: не удалось настроить DNS, возможны утечки")
-
-            # Скрываем системное время (если выбрано)
+                steps.append(Step("dns", network.set_dns, lambda: undo("dns"), after=("xray",)))
             if self.hide_system_time_cb.isChecked():
-                if not self.hide_system_time():
-                    self.log("Предупреждение: не удалось скрыть системное время")
+                steps.append(Step("time", network.hide_system_time, lambda: undo("time")))
 
-            return True
+            report = run_steps(steps, max_workers=len(steps), on_step=self.on_connect_step)
+            self.log(f"Шаги подключения: {report.summary()}")
+            return report.ok
         except Exception as e:
             self.log(f"Ошибка запуска Xray: {str(e)}")
-
-            # В случае ошибки пытаемся восстановить настройки
-            self.restore_network_settings()
+            self.stop_xray()
             return False
 
-    def kill_xray_processes(self):
-        """Завершает все процессы xray.exe"""
+    def launch_xray(self):
+        """Шаг подключения: запуск Xray и ожидание готовности (в рабочем потоке)"""
+        ports = tuple(inbound["port"] for inbound in self.xray_config["inbounds"]
+                      if inbound.get("tag") != METRICS_INBOUND_TAG)
+        self.xray_process = self.xray.start(ports)
+
+        # Поток для чтения вывода Xray, он же сообщает о готовности
+        self.log_thread = XrayLogReader(self.xray_process.stdout, self.xray_log, self.xray.gate, self.xray_stats)
+        self.log_thread.start()
+
+        # Ждем, пока откроются SOCKS и DNS inbound или Xray сообщит о запуске
+        ready, info = self.xray.wait_ready(ports, timeout=5.0)
+        if not ready:
+            raise RuntimeError(f"Xray не готов к работе: {info}")
+        self.log(f"Xray запущен с выбранными настройками анонимности "
+                 f"(готов за {info * 1000:.0f} мс, по событию: {self.xray.gate.source})")
+        if self.stats_enabled:
+            self.stats_poller.start()
+        return True
+
+    def on_connect_step(self, result):
+        """Сообщает в консоль о завершении шага подключения"""
+        if result.status == OK:
+            return
+        if result.status == FAILED and result.name in CONNECT_STEP_WARNINGS:
+            self.log(f"Предупреждение: {CONNECT_STEP_WARNINGS[result.name]} ({result.error})")
+        elif result.status == FAILED:
+            self.log(f"Ошибка шага {result.name}: {result.error}")
+        elif result.status == SKIPPED:
+            self.log(f"Шаг {result.name} пропущен: {result.error}")
+        else:
+            self.log(f"Шаг {result.name} отменен {result.error}".rstrip())
+
+    def stop_xray(self):
+        """Завершает процесс Xray, запущенный приложением (чужие xray.exe не трогает)"""
         try:
-            subprocess.run(
-                ['taskkill', '/F', '/IM', 'xray.exe'],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            time.sleep(1)
-            self.log("Процессы Xray завершены")
+            if self.stats_poller.running:
+                self.stats_poller.stop()
+                sample = self.stats_poller.latest()
+                if sample is not None:
+                    up, down = sample.totals.get(("outbound", "proxy"), (0, 0))
+                    self.log(f"Через proxy передано {up // 1024} КБ, получено {down // 1024} КБ")
+                self.traffic_label.setText("")
+            if self.xray is not None:
+                code = self.xray.stop(timeout=3.0)
+                self.xray = None
+                self.xray_process = None
+                if code is not None:
+                    self.log(f"Процесс Xray завершен (код {code})")
+                if self.xray_stats is not None:
+                    self.log(f"Подключения через Xray за последние минуты: {self.xray_stats.summary()}")
+                    self.xray_stats = None
         except Exception as e:
             self.log(f"Ошибка завершения Xray: {str(e)}")
 
     def check_admin(self):
         """Проверяет права администратора"""
-        try:
-            if not ctypes.windll.shell32.IsUserAnAdmin():
-                self.log("ТРЕБУЮТСЯ ПРАВА АДМИНИСТРАТОРА!")
-                self.log("Перезапустите приложение от имени администратора")
-        except:
-            pass
+        if not is_admin():
+            self.log("ТРЕБУЮТСЯ ПРАВА АДМИНИСТРАТОРА!")
+            self.log("Перезапустите приложение от имени администратора")
 
     def check_connection(self):
-        """Проверяет активное подключение"""
+        """Запускает проверку подключения в фоне, результат придет в on_health_results"""
         if self.is_connected:
-            try:
-                # Создаем временный сокет для проверки
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.settimeout(3)
-                s.connect(("www.google.com", 80))
-                s.close()
-                self.connect_btn.setStyleSheet("background-color: #006400; color: white;")
-                return True
-            except:
-                self.connect_btn.setStyleSheet("background-color: #8B0000; color: red;")
-                self.log("Нет интернет-соединения")
-                return False
+            if self.health_engine.running:
+                self.health_engine.probe_now()
+            else:
+                self.health_engine.start()
         else:
+            self.health_engine.stop()
             self.connect_btn.setStyleSheet("")
-            return False
+
+    def on_health_results(self, results):
+        """Обрабатывает результаты фоновой проверки соединения"""
+        if not self.is_connected:
+            return
+        ok = any(result.ok for result in results)
+        first = self.awaiting_first_probe
+        self.awaiting_first_probe = False
+        if ok:
+            self.connect_btn.setStyleSheet("background-color: #006400; color: white;")
+            if first:
+                self.log("VPN подключен! Ваш IP изменен.")
+                for result in results:
+                    if result.ok and result.handshake is not None:
+                        self.log(
+                            f"{result.target} через туннель: рукопожатие SOCKS {result.handshake * 1000:.0f} мс, "
+                            f"CONNECT {result.connect * 1000:.0f} мс, первый байт {result.ttfb * 1000:.0f} мс"
+                        )
+        else:
+            self.connect_btn.setStyleSheet("background-color: #8B0000; color: red;")
+            if first:
+                self.log("VPN подключен, но интернет недоступен. Проверьте ключ.")
+            else:
+                self.log("Нет интернет-соединения")
+
+    def on_traffic_sample(self, sample):
+        """Показывает текущую скорость по outbound (пришло из потока опроса)"""
+        if not self.stats_poller.running:
+            return
+        parts = []
+        for (kind, tag), (up, down) in sorted(sample.rates.items()):
+            if kind == "outbound" and (up or down or tag == "proxy"):
+                parts.append(f"{tag}: ↑ {format_rate(up)} ↓ {format_rate(down)}")
+        self.traffic_label.setText("   ".join(parts))
 
     def toggle_connection(self):
         """Переключает состояние подключения"""
@@ -1124,7 +805,6 @@ class VlessVPNApp(QMainWindow):
     def connect(self):
         """Устанавливает соединение"""
         self.log("Сохраняем настройки...")
-        QApplication.processEvents()  # Это позволяет не блокировать GUI
         if not self.save_settings():
             self.log("Ошибка: Не удалось сохранить настройки")
             return
@@ -1132,48 +812,83 @@ class VlessVPNApp(QMainWindow):
 
 
         self.log("Парсим VLESS URL...")
-        vless_url = self.key_input.text().strip()
-        if not vless_url.startswith("vless://"):
-            self.log("Ошибка: Неверный формат VLESS-ключа")
-            return
+        text = self.key_input.text().strip()
+        keys = split_keys(text)
+        if keys:
+            params_list = [params for params in map(self.parse_vless_url, keys) if params]
+        else:
+            params_list = self.parse_subscription(text)
+            if params_list is None:
+                self.log("Ошибка: Неверный формат VLESS-ключа")
+                return
 
-        self.log("Генерируем конфиг...")
-        params = self.parse_vless_url(vless_url)
-        if not params:
+        if not params_list:
             self.log("Ошибка: Не удалось разобрать VLESS-ключ")
             return
 
+        if len(params_list) == 1:
+            self.connect_to(params_list[0])
+            return
+
+        # Несколько ключей: замеряем серверы в фоне и подключаемся к самому быстрому
+        self.log(f"Выбираем самый быстрый из {len(params_list)} серверов...")
+        self.connect_btn.setEnabled(False)
+        self.race_thread = ServerRaceThread(self.racer, params_list)
+        self.race_thread.finished_signal.connect(self.on_race_finished)
+        self.race_thread.start()
+
+    def on_race_finished(self, results):
+        """Получает результаты гонки серверов и подключается к лучшему"""
+        self.connect_btn.setEnabled(True)
+        self.race_thread = None
+        for result, params in results:
+            if result.ok:
+                source = " (из кэша)" if result.cached else ""
+                self.log(
+                    f"{params['server']}:{params['port']} - TCP {result.tcp * 1000:.0f} мс, "
+                    f"TLS {result.tls * 1000:.0f} мс{source}"
+                )
+            else:
+                self.log(f"{params['server']}:{params['port']} - недоступен: {result.error}")
+
+        if not results or not results[0][0].ok:
+            self.log("Ошибка: Ни один сервер не ответил")
+            return
+        self.connect_to(results[0][1])
+
+    def connect_to(self, params):
+        """Подключается к серверу с разобранными параметрами ключа"""
+        self.log(f"Генерируем конфиг для {params['server']}:{params['port']}...")
+
         # Сохраняем текущие настройки сети
-        if not self.save_network_settings():
+        if not self.network.save_network_settings():
             self.log("Ошибка: Не удалось сохранить сетевые настройки")
             return
 
         # Генерируем конфиг для Xray
-        config_path = self.generate_xray_config(params)
-        self.log(f"Конфиг сгенерирован: {config_path}")
-
-        self.log("Запускаем Xray...")
-        # Запускаем Xray
-        if not self.start_xray(config_path):
-            self.log("Ошибка: Не удалось запустить Xray")
-            self.restore_network_settings()
+        generated = self.generate_xray_config(params)
+        if generated is None:
             return
+        self.xray_config, written = generated
+        config_path = written.path
+        if written.written:
+            self.log(f"Конфиг сгенерирован: {config_path}")
+        else:
+            self.log(f"Конфиг не изменился, файл не перезаписан: {config_path}")
+        self.xray_asset_dir = self.prepare_xray_assets(self.xray_config)
 
-        self.log("Настраиваем прокси...")
-        # Настраиваем прокси
-        if not self.set_proxy():
-            self.log("Ошибка: Не удалось настроить прокси")
-            self.restore_network_settings()
+        self.log("Запускаем Xray и настраиваем систему...")
+        # Запускаем Xray, настраиваем прокси и анонимность; при неудаче шаги уже откатаны
+        if not self.start_connection(config_path):
+            self.log("Ошибка: Не удалось запустить Xray или настроить прокси")
             return
 
         self.is_connected = True
         self.connect_btn.setText("Отключить")
 
-        # Проверяем соединение
-        if self.check_connection():
-            self.log("VPN подключен! Ваш IP изменен.")
-        else:
-            self.log("VPN подключен, но интернет недоступен. Проверьте ключ.")
+        # Проверяем соединение (в фоне, окно не блокируется)
+        self.awaiting_first_probe = True
+        self.check_connection()
 
     def disconnect(self):
         """Разрывает соединение"""
@@ -1199,44 +914,67 @@ class VlessVPNApp(QMainWindow):
 
 
 
-class XrayLogThread(QThread):
-    """Поток для чтения логов Xray"""
-    log_signal = pyqtSignal(str)
+class ServerRaceThread(QThread):
+    """Поток для замера задержки нескольких серверов"""
+    finished_signal = pyqtSignal(object)
 
-    def __init__(self, stdout):
+    def __init__(self, racer, params_list):
         super().__init__()
-        self.stdout = stdout
+        self.racer = racer
+        self.params_list = params_list
 
     def run(self):
-        while True:
-            line = self.stdout.readline()
-            if not line:
-                break
-            self.log_signal.emit(line.strip())
+        try:
+            results = self.racer.race_sync(self.params_list)
+        except Exception:
+            results = []
+        self.finished_signal.emit(results)
 
 
-if __name__ == "__main__":
-    def is_admin():
-        try:
-            return ctypes.windll.shell32.IsUserAnAdmin()
-        except:
-            return False
+class HealthProbeBridge(QObject):
+    """Переправляет результаты HealthProbeEngine из фонового потока в поток GUI"""
+    results_signal = pyqtSignal(object)
 
 
-    if not is_admin():
+class LogBridge(QObject):
+    """Переправляет сообщения для консоли из рабочих потоков в поток GUI"""
+    message_signal = pyqtSignal(str)
+
+
+class StatsBridge(QObject):
+    """Переправляет замеры StatsPoller из фонового потока в поток GUI"""
+    sample_signal = pyqtSignal(object)
+
+
+if __name__ == "__main__":
+    with TRACER.span("is_admin"):
+        admin = is_admin()
+    # UAC есть только в Windows; на других системах окно запускается как есть (offscreen-замеры)
+    if not admin and sys.platform == "win32":
         # Запуск с правами администратора
-        ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, " ".join(sys.argv), None, None, 1)
+        relaunch_as_admin()
         sys.exit(0)
 
-    app = QApplication(sys.argv)
+    if os.environ.get(STARTUP_TRACE_ENV):
+        TRACER.on_finish(lambda: TRACER.dump(os.environ[STARTUP_TRACE_ENV]))
+
+    with TRACER.span("QApplication"):
+        app = QApplication(sys.argv)
 
-    # Установка стиля для приложения
-    app.setStyle("Fusion")
-    palette = QtGui.QPalette()
-    palette.setColor(QtGui.QPalette.Window, QColor(13, 17, 23))
-    palette.setColor(QtGui.QPalette.WindowText, QColor(200, 200, 200))
-    app.setPalette(palette)
+        # Установка стиля для приложения
+        app.setStyle("Fusion")
+        palette = QtGui.QPalette()
+        palette.setColor(QtGui.QPalette.Window, QColor(13, 17, 23))
+        palette.setColor(QtGui.QPalette.WindowText, QColor(200, 200, 200))
+        app.setPalette(palette)
 
-    window = VlessVPNApp()
+    with TRACER.span("VlessVPNApp"):
+        window = VlessVPNApp()
+    # Фаза закрывается в on_first_paint
+    TRACER.start("first paint")
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    exit_code = app.exec_()
+    # Дописываем изменения настроек, которые фоновый поток еще не успел сохранить
+    if not window.settings.close():
+        print(f"Не удалось сохранить настройки: {window.settings.last_error}", file=sys.stderr)
+    sys.exit(exit_code)
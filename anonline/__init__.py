@@ -0,0 +1,45 @@
+"""Вспомогательные модули AnonLine VPN, не зависящие от PyQt5.
+
+Основные имена доступны прямо из пакета (from anonline import
+parse_vless_url), но модуль с именем импортируется только при первом
+обращении: import anonline не тянет asyncio, subprocess и прочее, что
+нужно лишь части функций. Платформенные модули (winreg, ctypes)
+импортируются внутри функций, которым они нужны.
+"""
+
+import importlib
+
+# имя -> модуль пакета, в котором оно определено
+_EXPORTS = {
+    "parse_vless_url": "vless",
+    "split_keys": "vless",
+    "parse_subscription": "subscription",
+    "ConfigOptions": "xray_config",
+    "ConfigError": "xray_config",
+    "build_config": "xray_config",
+    "validate_config": "xray_config",
+    "write_config": "xray_config",
+    "XraySupervisor": "xray_process",
+    "CommandRunner": "commands",
+    "NetworkJournal": "journal",
+    "NetworkSetup": "network_setup",
+    "HostsBlock": "hosts",
+    "InterfaceInventory": "interfaces",
+    "run_steps": "steps",
+    "Step": "steps",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,223 @@
+"""Запуск системных команд (netsh, tzutil, w32tm, powershell) через один слой.
+
+CommandRunner замеряет время каждой команды и умеет объединять команды
+netsh в один процесс: внутри блока with runner.batch() вызовы netsh()
+копятся и в конце выполняются одним "netsh -f script". Команды, вывод
+которых нужен сразу (capture=True), выполняются немедленно. Если скрипт
+завершился с ошибкой, а хотя бы одна команда пакета вызвана с check=True,
+в конце блока поднимается BatchError с выводом netsh.
+
+Бэкенд выполняет процессы: SubprocessBackend - настоящий subprocess,
+FakeBackend - запись команд и модель задержек для проверок без Windows.
+"""
+
+import locale
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+# Консольные утилиты пишут в кодовой странице OEM (cp866 на русской Windows)
+OUTPUT_ENCODING = "oem" if sys.platform == "win32" else "utf-8"
+
+# argv - команда процесса, commands - сколько команд netsh в нем выполнено
+CommandResult = namedtuple("CommandResult", ["argv", "returncode", "stdout", "elapsed", "commands"])
+
+
+class BatchError(subprocess.CalledProcessError):
+    """Скрипт netsh -f завершился с ошибкой; commands - строки скрипта"""
+
+    def __init__(self, returncode, commands, output=None):
+        super().__init__(returncode, ["netsh", "-f"], output)
+        self.commands = commands
+
+    def __str__(self):
+        details = f": {self.output.strip()}" if self.output and self.output.strip() else ""
+        return f"netsh -f (команд {len(self.commands)}) завершился с кодом {self.returncode}{details}"
+
+
+class SubprocessBackend:
+    """Запуск процессов без консольного окна"""
+
+    def spawn(self, argv, capture=False):
+        """Возвращает (код завершения, вывод или None)"""
+        completed = subprocess.run(
+            argv,
+            stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding=OUTPUT_ENCODING,
+            errors="replace",
+            creationflags=CREATE_NO_WINDOW
+        )
+        return completed.returncode, completed.stdout if capture else None
+
+
+# Слово строки скрипта netsh: значения в кавычках могут содержать пробелы
+_SCRIPT_WORD_RE = re.compile(r'(?:[^\s"]|"[^"]*")+')
+
+
+class FakeBackend:
+    """Запоминает команды и выдерживает время по модели задержек.
+
+    latency: {имя программы: секунды на запуск процесса}, per_command -
+    добавка за каждую строку скрипта netsh -f. outputs: {кортеж начала
+    argv: вывод} для команд с capture. failures: {кортеж начала argv:
+    код завершения}; строка скрипта сверяется как argv ["netsh", *строка],
+    скрипт останавливается на первой неудачной строке. executed - все
+    выполненные команды netsh по одной, в том числе из скриптов.
+    """
+
+    def __init__(self, latency=None, per_command=0.0, outputs=None, default_latency=0.0, failures=None):
+        self.latency = dict(latency or {})
+        self.per_command = per_command
+        self.outputs = dict(outputs or {})
+        self.failures = dict(failures or {})
+        self.default_latency = default_latency
+        self.calls = []
+        self.scripts = []
+        self.executed = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _lookup(table, argv, default):
+        for prefix, value in table.items():
+            if tuple(argv[:len(prefix)]) == tuple(prefix):
+                return value
+        return default
+
+    def spawn(self, argv, capture=False):
+        delay = self.latency.get(argv[0], self.default_latency)
+        returncode = 0
+        if len(argv) > 2 and argv[1] == "-f":
+            with open(argv[2], encoding=script_encoding()) as f:
+                lines = [line.rstrip("\n") for line in f if line.strip()]
+            executed = []
+            for line in lines:
+                executed.append(["netsh", *_SCRIPT_WORD_RE.findall(line)])
+                returncode = self._lookup(self.failures, executed[-1], 0)
+                if returncode:
+                    break
+            with self._lock:
+                self.scripts.append(lines)
+                self.executed.extend(executed)
+            delay += self.per_command * len(executed)
+        else:
+            returncode = self._lookup(self.failures, argv, 0)
+            delay += self.per_command
+            if argv[0] == "netsh":
+                with self._lock:
+                    self.executed.append(list(argv))
+        with self._lock:
+            self.calls.append(list(argv))
+        time.sleep(delay)
+        output = None
+        if capture:
+            output = self._lookup(self.outputs, argv, "")
+            if returncode and not output:
+                output = f"Ошибка: код {returncode}"
+        return returncode, output
+
+
+def script_encoding():
+    # netsh читает скрипт в кодировке ANSI системы (cp1251 на русской Windows)
+    return locale.getpreferredencoding(False)
+
+
+def script_line(args):
+    """Строка скрипта netsh из аргументов командной строки"""
+    return " ".join(args)
+
+
+class CommandRunner:
+    """Выполняет команды с замером времени и пакетированием netsh"""
+
+    def __init__(self, backend=None, batch_netsh=True, history=200):
+        self.backend = backend or SubprocessBackend()
+        self.batch_netsh = batch_netsh
+        self.timings = deque(maxlen=history)
+        self.spawns = 0
+        self._lock = threading.Lock()
+        # Пакет у каждого потока свой: шаги подключения идут параллельно
+        self._local = threading.local()
+
+    def run(self, argv, capture=False, check=False, commands=1):
+        """Запускает процесс; check=True - CalledProcessError при ненулевом коде"""
+        start = time.perf_counter()
+        returncode, stdout = self.backend.spawn(list(argv), capture)
+        result = CommandResult(list(argv), returncode, stdout, time.perf_counter() - start, commands)
+        with self._lock:
+            self.spawns += 1
+            self.timings.append(result)
+        if check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, argv, stdout)
+        return result
+
+    def netsh(self, *args, capture=False, check=False):
+        """Команда netsh; внутри batch() без capture откладывается до конца блока (возвращает None)"""
+        pending = getattr(self._local, "pending", None)
+        if pending is not None and not capture:
+            pending.append((list(args), check))
+            return None
+        return self.run(["netsh", *args], capture=capture, check=check)
+
+    @contextmanager
+    def batch(self):
+        """Копит команды netsh этого потока и выполняет их в конце блока.
+
+        Вложенные блоки присоединяются к внешнему. Если блок прерван
+        исключением, накопленные команды все равно выполняются (часть
+        изменений уже могла быть сделана), но их ошибки не заслоняют
+        исходное исключение.
+        """
+        if getattr(self._local, "pending", None) is not None:
+            yield
+            return
+        self._local.pending = []
+        try:
+            yield
+        finally:
+            pending = self._local.pending
+            self._local.pending = None
+            results = self.flush(pending)
+        for result in results:
+            if result.returncode != 0:
+                checked = [args for args, check in pending if check]
+                if result.commands > 1 and checked:
+                    raise BatchError(result.returncode, [script_line(args) for args, _ in pending], result.stdout)
+                if result.commands == 1 and result.argv[1:] in checked:
+                    raise subprocess.CalledProcessError(result.returncode, result.argv, result.stdout)
+
+    def flush(self, commands):
+        """Выполняет команды netsh [(аргументы, check)]: одним скриптом или по одной"""
+        if not commands:
+            return []
+        if not self.batch_netsh or len(commands) == 1:
+            return [self.run(["netsh", *args]) for args, _ in commands]
+        lines = [script_line(args) for args, _ in commands]
+        try:
+            script = "\n".join(lines).encode(script_encoding())
+        except UnicodeEncodeError:
+            # Имя интерфейса не представимо в кодировке скрипта
+            return [self.run(["netsh", *args]) for args, _ in commands]
+        fd, path = tempfile.mkstemp(prefix="anonline-netsh-", suffix=".txt")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(script + b"\n")
+            # Вывод нужен для сообщения об ошибке скрипта
+            return [self.run(["netsh", "-f", path], capture=True, commands=len(commands))]
+        finally:
+            os.unlink(path)
+
+    def summary(self):
+        """Число процессов и суммарное время команд"""
+        timings = list(self.timings)
+        total = sum(result.elapsed for result in timings)
+        commands = sum(result.commands for result in timings)
+        return f"процессов {self.spawns}, команд {commands}, {total * 1000:.0f} мс"
@@ -0,0 +1,433 @@
+"""Скомпилированный матчер доменов для категорий geosite.
+
+Правила разбиты на уровни по типу Domain:
+  - domain/full - суффиксное дерево по меткам домена в обратном порядке,
+    узел дерева адресуется самим суффиксом ('com', 'google.com') в плоской
+    таблице, поэтому дерево без перестройки грузится из кэша;
+  - plain (keyword) - автомат Ахо-Корасик;
+  - regex - выражения с обязательным литералом проверяются только при
+    наличии литерала в хосте (отбор тем же автоматом), остальные объединены
+    в одно регулярное выражение на тег.
+
+Каждому тегу (например, 'geosite:cn') соответствует бит маски, результат
+сопоставления - кортеж тегов в порядке их добавления, так что первый тег
+в ответе - самый приоритетный.
+"""
+
+import re
+from array import array
+from collections import deque
+
+from .geosite import DOMAIN_DOMAIN, DOMAIN_FULL, DOMAIN_PLAIN, DOMAIN_REGEX
+
+# Экранированные символы, которые в regex означают сами себя
+_LITERAL_ESCAPES = set(".-/\\+*?()[]{}^$|")
+_MIN_LITERAL = 3
+
+
+def normalize_host(host):
+    """Приводит имя хоста к виду, в котором хранятся правила"""
+    return host.strip().rstrip(".").lower()
+
+
+def required_literal(source):
+    """Самая длинная подстрока, обязательная для совпадения с регулярным выражением.
+
+    Учитываются только литералы верхнего уровня, выражения с '|' на верхнем
+    уровне не разбираются. Возвращает None, если такой подстроки не найдено.
+    """
+    best = ""
+    run = []
+    depth = 0
+    i = 0
+    n = len(source)
+    while i < n:
+        ch = source[i]
+        if ch == "\\" and i + 1 < n:
+            nxt = source[i + 1]
+            i += 2
+            if nxt in _LITERAL_ESCAPES and depth == 0:
+                run.append(nxt)
+                continue
+        elif ch == "[":
+            i += 1
+            if i < n and source[i] == "]":
+                i += 1
+            while i < n and source[i] != "]":
+                i += 2 if source[i] == "\\" else 1
+            i += 1
+        elif ch in "?*{":
+            # Предыдущий символ может отсутствовать
+            if run:
+                run.pop()
+            if ch == "{":
+                while i < n and source[i] != "}":
+                    i += 1
+            i += 1
+        elif ch == "|":
+            if depth == 0:
+                return None
+            i += 1
+        elif ch in "().^$+":
+            depth += ch == "("
+            depth -= ch == ")"
+            i += 1
+        else:
+            i += 1
+            if depth == 0:
+                run.append(ch.lower())
+                continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    if len(run) > len(best):
+        best = "".join(run)
+    return best if len(best) >= _MIN_LITERAL else None
+
+
+class _AhoCorasick:
+    """Автомат Ахо-Корасик для поиска подстрок (keyword-правила)"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [0]
+
+    def add(self, word, mask):
+        state = 0
+        for ch in word:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(0)
+            state = nxt
+        self.out[state] |= mask
+
+    def build(self):
+        goto, fail, out = self.goto, self.fail, self.out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+    def search(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        mask = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            mask |= out[state]
+        return mask
+
+
+class _LazySearch:
+    """Откладывает компиляцию регулярного выражения до первого использования"""
+
+    __slots__ = ("source", "_search")
+
+    def __init__(self, source):
+        self.source = source
+        self._search = None
+
+    def __call__(self, text):
+        if self._search is None:
+            self._search = re.compile(self.source).search
+        return self._search(text)
+
+
+def _ac_to_tables(ac):
+    src = array("I")
+    chars = array("I")
+    dst = array("I")
+    for state, edges in enumerate(ac.goto):
+        for ch, nxt in edges.items():
+            src.append(state)
+            chars.append(ord(ch))
+            dst.append(nxt)
+    # Маски выходов могут быть шире 64 бит, поэтому хранятся таблицей в hex
+    masks = {0: 0}
+    out_ids = array("I", (masks.setdefault(mask, len(masks)) for mask in ac.out))
+    return {"fail": array("I", ac.fail), "out": out_ids, "masks": [format(mask, "x") for mask in masks],
+            "src": src, "chars": chars, "dst": dst}
+
+
+def _ac_from_tables(tables):
+    ac = _AhoCorasick()
+    ac.fail = list(tables["fail"])
+    masks = [int(mask, 16) for mask in tables["masks"]]
+    ac.out = [masks[i] for i in tables["out"]]
+    goto = [{} for _ in ac.fail]
+    for state, ch, nxt in zip(tables["src"], tables["chars"], tables["dst"]):
+        goto[state][chr(ch)] = nxt
+    ac.goto = goto
+    return ac
+
+
+class DomainMatcher:
+    """Матчер имен хостов по набору тегов с правилами geosite"""
+
+    def __init__(self):
+        self.tags = []
+        self._tag_bits = {}
+        # Суффиксное дерево: суффикс -> номер узла, маски узлов в списках
+        self._suffix_nodes = {}
+        self._domain_masks = []
+        self._full_masks = []
+        self._keywords = _AhoCorasick()
+        self._has_keywords = False
+        self._regex_sources = {}
+        self._regexes = []
+        self._regex_literals = _AhoCorasick()
+        self._literal_regexes = []
+        self._regex_table_sources = ([], [])
+        self.invalid_regexes = []
+        self._mask_cache = {0: ()}
+        self._compiled = False
+
+    def _tag_mask(self, tag):
+        bit = self._tag_bits.get(tag)
+        if bit is None:
+            bit = 1 << len(self.tags)
+            self._tag_bits[tag] = bit
+            self.tags.append(tag)
+        return bit
+
+    def add(self, domain_type, value, tag):
+        """Добавляет одно правило для тега"""
+        mask = self._tag_mask(tag)
+        self._compiled = False
+        if domain_type == DOMAIN_REGEX:
+            self._regex_sources.setdefault(mask, []).append(value)
+            return
+        value = normalize_host(value)
+        if domain_type == DOMAIN_PLAIN:
+            self._keywords.add(value, mask)
+            self._has_keywords = True
+        elif domain_type in (DOMAIN_DOMAIN, DOMAIN_FULL):
+            nodes = self._suffix_nodes
+            pos = len(value)
+            while pos >= 0:
+                pos = value.rfind(".", 0, pos)
+                suffix = value[pos + 1:]
+                node = nodes.get(suffix)
+                if node is None:
+                    node = nodes[suffix] = len(self._domain_masks)
+                    self._domain_masks.append(0)
+                    self._full_masks.append(0)
+            if domain_type == DOMAIN_DOMAIN:
+                self._domain_masks[node] |= mask
+            else:
+                self._full_masks[node] |= mask
+        else:
+            raise ValueError(f"Неизвестный тип домена: {domain_type}")
+
+    def add_domains(self, domains, tag):
+        """Добавляет записи Domain из GeoSiteFile под одним тегом"""
+        self._tag_mask(tag)
+        for domain in domains:
+            self.add(domain.type, domain.value, tag)
+
+    def add_geosite(self, geosite, refs):
+        """Добавляет категории geosite, тег - сама ссылка ('geosite:cn@ads')"""
+        for ref in refs:
+            self.add_domains(geosite.load_ref(ref), ref)
+
+    def compile(self):
+        """Строит автомат и объединенные регулярные выражения"""
+        if self._has_keywords:
+            self._keywords.build()
+        self._regexes = []
+        self._regex_literals = _AhoCorasick()
+        self._literal_regexes = []
+        self._regex_table_sources = ([], [])
+        self.invalid_regexes = []
+        for mask, sources in self._regex_sources.items():
+            rest = []
+            for source in sources:
+                try:
+                    compiled = re.compile(source)
+                except re.error:
+                    # Синтаксис RE2 (Go) не всегда совместим с модулем re
+                    self.invalid_regexes.append(source)
+                    continue
+                literal = required_literal(source)
+                if literal is None:
+                    rest.append(source)
+                else:
+                    # Выражение проверяется, только если в хосте есть его литерал
+                    bit = 1 << len(self._literal_regexes)
+                    self._regex_literals.add(literal, bit)
+                    self._literal_regexes.append((compiled.search, mask))
+                    self._regex_table_sources[0].append(source)
+            if rest:
+                combined = "|".join(f"(?:{source})" for source in rest)
+                self._regexes.append((re.compile(combined).search, mask))
+                self._regex_table_sources[1].append(combined)
+        self._regex_literals.build()
+        self._compiled = True
+        return self
+
+    def match_mask(self, host):
+        """Битовая маска тегов, под которые попадает хост"""
+        if not self._compiled:
+            self.compile()
+        host = normalize_host(host)
+        mask = 0
+
+        # Спуск по дереву от последней метки: 'com' -> 'google.com' -> ...
+        nodes = self._suffix_nodes
+        pos = len(host)
+        while pos >= 0:
+            pos = host.rfind(".", 0, pos)
+            node = nodes.get(host[pos + 1:])
+            if node is None:
+                break
+            mask |= self._domain_masks[node]
+            if pos < 0:
+                mask |= self._full_masks[node]
+
+        if self._has_keywords:
+            mask |= self._keywords.search(host)
+
+        if self._literal_regexes:
+            candidates = self._regex_literals.search(host)
+            index = 0
+            while candidates:
+                if candidates & 1:
+                    search, tag_mask = self._literal_regexes[index]
+                    if not mask & tag_mask and search(host):
+                        mask |= tag_mask
+                candidates >>= 1
+                index += 1
+
+        for search, tag_mask in self._regexes:
+            if not mask & tag_mask and search(host):
+                mask |= tag_mask
+        return mask
+
+    def tags_for_mask(self, mask):
+        """Переводит маску в кортеж тегов в порядке приоритета"""
+        tags = self._mask_cache.get(mask)
+        if tags is None:
+            tags = tuple(tag for i, tag in enumerate(self.tags) if mask >> i & 1)
+            self._mask_cache[mask] = tags
+        return tags
+
+    def match(self, host):
+        """Кортеж тегов, под которые попадает хост"""
+        return self.tags_for_mask(self.match_mask(host))
+
+    def match_first(self, host):
+        """Самый приоритетный тег для хоста или None"""
+        tags = self.match(host)
+        return tags[0] if tags else None
+
+    def match_batch(self, hosts):
+        """Сопоставляет список хостов, повторяющиеся хосты считаются один раз"""
+        if not self._compiled:
+            self.compile()
+        match_mask = self.match_mask
+        tags_for_mask = self.tags_for_mask
+        seen = {}
+        result = []
+        append = result.append
+        for host in hosts:
+            tags = seen.get(host)
+            if tags is None:
+                tags = tags_for_mask(match_mask(host))
+                seen[host] = tags
+            append(tags)
+        return result
+
+    def to_tables(self):
+        """Плоские таблицы скомпилированного матчера для бинарного кэша.
+
+        Возвращает словарь: имя -> array или список строк. Маски хранятся
+        в 64-битных числах, поэтому тегов должно быть не больше 64.
+        """
+        if not self._compiled:
+            self.compile()
+        if len(self.tags) > 64:
+            raise ValueError("Слишком много тегов для кэша (больше 64)")
+
+        tables = {
+            "tags": list(self.tags),
+            "trie_suffixes": list(self._suffix_nodes),
+            "trie_domain": array("Q", self._domain_masks),
+            "trie_full": array("Q", self._full_masks),
+            "invalid_regexes": list(self.invalid_regexes),
+            "literal_regex_sources": list(self._regex_table_sources[0]),
+            "literal_regex_masks": array("Q", (mask for _, mask in self._literal_regexes)),
+            "regex_sources": list(self._regex_table_sources[1]),
+            "regex_masks": array("Q", (mask for _, mask in self._regexes)),
+        }
+        for prefix, ac in (("kw_", self._keywords), ("lit_", self._regex_literals)):
+            for name, value in _ac_to_tables(ac).items():
+                tables[prefix + name] = value
+        return tables
+
+    @classmethod
+    def from_tables(cls, tables):
+        """Восстанавливает матчер из таблиц to_tables без повторной компиляции"""
+        matcher = cls()
+        for tag in tables["tags"]:
+            matcher._tag_mask(tag)
+
+        suffixes = tables["trie_suffixes"]
+        matcher._suffix_nodes = dict(zip(suffixes, range(len(suffixes))))
+        matcher._domain_masks = tables["trie_domain"].tolist()
+        matcher._full_masks = tables["trie_full"].tolist()
+
+        matcher._keywords = _ac_from_tables({k[3:]: v for k, v in tables.items() if k.startswith("kw_")})
+        matcher._has_keywords = len(matcher._keywords.goto) > 1
+        matcher._regex_literals = _ac_from_tables({k[4:]: v for k, v in tables.items() if k.startswith("lit_")})
+
+        # Регулярные выражения компилируются при первом обращении
+        matcher._literal_regexes = [
+            (_LazySearch(source), mask)
+            for source, mask in zip(tables["literal_regex_sources"], tables["literal_regex_masks"])
+        ]
+        matcher._regexes = [
+            (_LazySearch(source), mask)
+            for source, mask in zip(tables["regex_sources"], tables["regex_masks"])
+        ]
+        matcher._regex_table_sources = (list(tables["literal_regex_sources"]), list(tables["regex_sources"]))
+        for search, mask in matcher._literal_regexes + matcher._regexes:
+            matcher._regex_sources.setdefault(mask, []).append(search.source)
+        matcher.invalid_regexes = list(tables["invalid_regexes"])
+        matcher._compiled = True
+        return matcher
+
+
+def naive_match(domains, host):
+    """Линейный перебор правил - эталон для проверки и бенчмарка"""
+    host = normalize_host(host)
+    for domain in domains:
+        value = domain.value.lower()
+        if domain.type == DOMAIN_FULL:
+            if host == value:
+                return True
+        elif domain.type == DOMAIN_DOMAIN:
+            if host == value or host.endswith("." + value):
+                return True
+        elif domain.type == DOMAIN_PLAIN:
+            if value in host:
+                return True
+        elif domain.type == DOMAIN_REGEX:
+            try:
+                if re.search(domain.value, host):
+                    return True
+            except re.error:
+                pass
+    return False
@@ -0,0 +1,322 @@
+"""Чтение geoip.dat (protobuf GeoIPList) и поиск адреса в списках CIDR.
+
+Файл отображается в память, при открытии строится только индекс
+категорий (код страны -> смещения). При первом обращении CIDR категории
+переводятся в отсортированные непересекающиеся интервалы [start, end]:
+соседние и вложенные сети сливаются. IPv4 хранится в array('I'), IPv6 -
+в списках int (128-битного типа у array нет). Проверка адреса - двоичный
+поиск по началам интервалов. Для больших списков IPv4 границы поиска
+заранее сужены по старшим 16 битам адреса (таблица на 65536 корзин), так
+что bisect сравнивает лишь несколько интервалов. contains_many разбирает и ищет
+адреса пачкой через map/bisect без цикла на Python.
+"""
+
+import mmap
+import os
+import socket
+import sys
+from array import array
+from bisect import bisect_right
+from functools import partial
+from itertools import accumulate, repeat
+from operator import le, not_, rshift
+
+from .protobuf import ProtobufError, WIRE_BYTES, encode_key, encode_varint, iter_fields, read_varint
+
+_V4_MAPPED = 0xFFFF << 32
+_BUCKET_SHIFT = 16
+# Меньше интервалов - bisect и без корзин делает лишь несколько сравнений
+_BUCKET_MIN_RANGES = 64
+_pton4 = partial(socket.inet_pton, socket.AF_INET)
+
+
+def normalize_code(code):
+    """Приводит 'geoip:cn' / 'cn' к коду категории 'CN'"""
+    if code.lower().startswith("geoip:"):
+        code = code[6:]
+    return code.lstrip("!").strip().upper()
+
+
+def parse_address(address):
+    """(4 или 6, адрес числом) для строки, ipaddress-объекта или упакованных байтов.
+
+    IPv4 внутри IPv6 (::ffff:a.b.c.d) считается IPv4, как в Xray.
+    """
+    if isinstance(address, str):
+        try:
+            if ":" in address:
+                value = int.from_bytes(socket.inet_pton(socket.AF_INET6, address.split("%", 1)[0]), "big")
+            else:
+                return 4, int.from_bytes(_pton4(address), "big")
+        except OSError:
+            raise ValueError(f"Неверный IP-адрес: {address!r}")
+    elif isinstance(address, (bytes, bytearray)):
+        if len(address) == 4:
+            return 4, int.from_bytes(address, "big")
+        if len(address) != 16:
+            raise ValueError(f"Неверная длина IP-адреса: {len(address)} байт")
+        value = int.from_bytes(address, "big")
+    else:
+        if address.version == 4:
+            return 4, int(address)
+        value = int(address)
+    if value >> 32 == 0xFFFF:
+        return 4, value - _V4_MAPPED
+    return 6, value
+
+
+def _merge(intervals):
+    # Сливает пересекающиеся и соседние интервалы, результат отсортирован
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if ends and start <= ends[-1] + 1:
+            if end > ends[-1]:
+                ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class IPRangeSet:
+    """Множество адресов как отсортированные интервалы для IPv4 и IPv6.
+
+    inverse=True - множество всех адресов, кроме перечисленных
+    (reverse_match в geoip.dat, '!' в ссылке geoip:!cn).
+    """
+
+    __slots__ = ("v4_starts", "v4_ends", "v6_starts", "v6_ends", "inverse", "_v4_lookup", "_v6_lookup",
+                 "_v4_lo", "_v4_hi")
+
+    def __init__(self, v4=(), v6=(), inverse=False):
+        """v4/v6 - пары (начало, конец включительно) в любом порядке"""
+        starts, ends = _merge(v4)
+        self.v4_starts = array("I", starts)
+        self.v4_ends = array("I", ends)
+        self.v6_starts, self.v6_ends = _merge(v6)
+        self.inverse = inverse
+        # Для пакетного поиска: конец интервала по индексу bisect_right, -1 - "левее всех"
+        self._v4_lookup = [-1] + ends
+        self._v6_lookup = [-1] + self.v6_ends
+        # Интервалы, начинающиеся в корзине b (старшие 16 бит), - starts[_v4_lo[b]:_v4_hi[b]]
+        self._v4_lo = self._v4_hi = None
+        if len(starts) >= _BUCKET_MIN_RANGES:
+            counts = [0] * (1 << (32 - _BUCKET_SHIFT))
+            for start in starts:
+                counts[start >> _BUCKET_SHIFT] += 1
+            self._v4_hi = array("I", accumulate(counts))
+            self._v4_lo = array("I", [0])
+            self._v4_lo.extend(self._v4_hi[:-1])
+
+    @classmethod
+    def from_cidrs(cls, cidrs, inverse=False):
+        """Из пар (упакованный адрес 4/16 байт, длина префикса), как в geoip.dat"""
+        v4, v6 = [], []
+        for ip, prefix in cidrs:
+            if len(ip) == 4:
+                bits, target = 32, v4
+            elif len(ip) == 16:
+                bits, target = 128, v6
+            else:
+                raise ValueError(f"Неверная длина адреса CIDR: {len(ip)} байт")
+            prefix = min(prefix, bits)
+            host_bits = bits - prefix
+            start = int.from_bytes(ip, "big") >> host_bits << host_bits
+            target.append((start, start | ((1 << host_bits) - 1)))
+        return cls(v4, v6, inverse)
+
+    def negated(self):
+        """То же множество с обратным смыслом; интервалы не копируются"""
+        other = IPRangeSet.__new__(IPRangeSet)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        other.inverse = not self.inverse
+        return other
+
+    def __len__(self):
+        """Число интервалов после слияния"""
+        return len(self.v4_starts) + len(self.v6_starts)
+
+    def __contains__(self, address):
+        version, value = parse_address(address)
+        return self.contains_int(value, version)
+
+    def contains_int(self, value, version=4):
+        if version == 4:
+            if self._v4_lo is None:
+                index = bisect_right(self.v4_starts, value)
+            else:
+                bucket = value >> _BUCKET_SHIFT
+                index = bisect_right(self.v4_starts, value, self._v4_lo[bucket], self._v4_hi[bucket])
+            found = index > 0 and value <= self.v4_ends[index - 1]
+        else:
+            index = bisect_right(self.v6_starts, value)
+            found = index > 0 and value <= self.v6_ends[index - 1]
+        return found != self.inverse
+
+    def contains_ints(self, values, version=4):
+        """Список bool для последовательности адресов-чисел одного семейства"""
+        if not isinstance(values, (list, tuple, array)):
+            values = list(values)
+        # Конец интервала, в который мог бы попасть адрес, и сравнение с ним - без цикла на Python
+        if version == 4 and self._v4_lo is not None:
+            buckets = list(map(rshift, values, repeat(_BUCKET_SHIFT)))
+            indexes = map(bisect_right, repeat(self.v4_starts), values,
+                          map(self._v4_lo.__getitem__, buckets), map(self._v4_hi.__getitem__, buckets))
+            ends = map(self._v4_lookup.__getitem__, indexes)
+        elif version == 4:
+            ends = map(self._v4_lookup.__getitem__, map(partial(bisect_right, self.v4_starts), values))
+        else:
+            ends = map(self._v6_lookup.__getitem__, map(partial(bisect_right, self.v6_starts), values))
+        hits = map(le, values, ends)
+        return list(map(not_, hits) if self.inverse else hits)
+
+    def contains_many(self, addresses):
+        """Список bool для последовательности адресов (строки, ipaddress-объекты)"""
+        addresses = addresses if isinstance(addresses, (list, tuple)) else list(addresses)
+        try:
+            # Все адреса IPv4 в виде строк: один проход inet_pton и разбор одним массивом
+            values = array("I")
+            values.frombytes(b"".join(map(_pton4, addresses)))
+        except (OSError, TypeError):
+            values = None
+        if values is not None:
+            if sys.byteorder == "little":
+                values.byteswap()
+            return self.contains_ints(values, 4)
+        return [self.contains_int(value, version) for version, value in map(parse_address, addresses)]
+
+
+def _decode_cidr(buf, start, end):
+    ip = b""
+    prefix = 0
+    for field_no, wire_type, val in iter_fields(buf, start, end):
+        if field_no == 1 and wire_type == WIRE_BYTES:
+            ip = bytes(buf[val[0]:val[1]])
+        elif field_no == 2 and wire_type != WIRE_BYTES:
+            prefix = val
+    return ip, prefix
+
+
+class GeoIPFile:
+    """Ленивый читатель geoip.dat с индексом категорий по смещениям"""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._file = open(self.path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap)
+            else:
+                self._mmap = None
+                self._view = memoryview(b"")
+            self._index = self._build_index()
+        except Exception:
+            self.close()
+            raise
+        self._cache = {}
+
+    def _build_index(self):
+        """Один проход по записям GeoIP: код страны -> (начало, конец)"""
+        buf = self._view
+        end = len(buf)
+        index = {}
+        pos = 0
+        while pos < end:
+            tag, pos = read_varint(buf, pos)
+            if tag & 7 != WIRE_BYTES:
+                raise ProtobufError(f"Неожиданный тег {tag} на верхнем уровне")
+            length, pos = read_varint(buf, pos)
+            entry_end = pos + length
+            if entry_end > end:
+                raise ProtobufError("Запись GeoIP выходит за конец файла")
+            if tag >> 3 == 1:
+                for field_no, wire_type, val in iter_fields(buf, pos, entry_end):
+                    if field_no == 1 and wire_type == WIRE_BYTES:
+                        index[bytes(buf[val[0]:val[1]]).decode("utf-8").upper()] = (pos, entry_end)
+                        break
+            pos = entry_end
+        return index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Освобождает отображение файла"""
+        view = getattr(self, "_view", None)
+        if view is not None:
+            view.release()
+            self._view = None
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, code):
+        return normalize_code(code) in self._index
+
+    def categories(self):
+        """Список кодов стран в порядке следования в файле"""
+        return list(self._index)
+
+    def iter_cidrs(self, code):
+        """Пары (упакованный адрес, префикс) категории без кэширования"""
+        try:
+            start, end = self._index[normalize_code(code)]
+        except KeyError:
+            raise KeyError(f"Категория geoip не найдена: {code}")
+        buf = self._view
+        for field_no, wire_type, val in iter_fields(buf, start, end):
+            if field_no == 2 and wire_type == WIRE_BYTES:
+                yield _decode_cidr(buf, val[0], val[1])
+
+    def _reverse_match(self, code):
+        start, end = self._index[normalize_code(code)]
+        for field_no, wire_type, val in iter_fields(self._view, start, end):
+            if field_no == 3 and wire_type != WIRE_BYTES:
+                return bool(val)
+        return False
+
+    def load(self, code):
+        """IPRangeSet категории, построенный один раз"""
+        code = normalize_code(code)
+        ranges = self._cache.get(code)
+        if ranges is None:
+            ranges = IPRangeSet.from_cidrs(self.iter_cidrs(code), inverse=self._reverse_match(code))
+            self._cache[code] = ranges
+        return ranges
+
+    def load_ref(self, ref):
+        """IPRangeSet по ссылке из правила: 'geoip:cn' или с отрицанием 'geoip:!cn'"""
+        ranges = self.load(ref)
+        body = ref[6:] if ref.lower().startswith("geoip:") else ref
+        return ranges.negated() if body.strip().startswith("!") else ranges
+
+
+def build_geoip(entries):
+    """Байты GeoIPList для {код страны: [CIDR-строка, ...]} (для тестовых и урезанных файлов)"""
+    import ipaddress
+
+    parts = []
+    for code, cidrs in entries.items():
+        code_bytes = code.upper().encode("utf-8")
+        message = [encode_key(1, WIRE_BYTES), encode_varint(len(code_bytes)), code_bytes]
+        for cidr in cidrs:
+            network = ipaddress.ip_network(cidr, strict=False)
+            packed = network.network_address.packed
+            body = (encode_key(1, WIRE_BYTES) + encode_varint(len(packed)) + packed
+                    + encode_key(2, 0) + encode_varint(network.prefixlen))
+            message += [encode_key(2, WIRE_BYTES), encode_varint(len(body)), body]
+        message = b"".join(message)
+        parts.append(encode_key(1, WIRE_BYTES) + encode_varint(len(message)) + message)
+    return b"".join(parts)
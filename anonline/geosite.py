@@ -0,0 +1,225 @@
+"""Потоковое чтение geosite.dat (protobuf GeoSiteList) без полного декодирования.
+
+Файл отображается в память (mmap), при открытии читаются только заголовки
+верхнего уровня и коды стран - так строится индекс категорий. Домены
+категории декодируются только при первом обращении к ней.
+"""
+
+import hashlib
+import mmap
+import os
+from collections import namedtuple
+
+from .protobuf import ProtobufError, WIRE_BYTES, iter_fields, read_varint
+
+# Типы доменов из routercommon.proto (Domain.Type)
+DOMAIN_PLAIN = 0    # подстрока (keyword)
+DOMAIN_REGEX = 1    # регулярное выражение
+DOMAIN_DOMAIN = 2   # домен и все поддомены
+DOMAIN_FULL = 3     # точное совпадение
+
+DOMAIN_TYPE_NAMES = {
+    DOMAIN_PLAIN: "keyword",
+    DOMAIN_REGEX: "regexp",
+    DOMAIN_DOMAIN: "domain",
+    DOMAIN_FULL: "full",
+}
+
+# Запись домена: тип, значение и кортеж атрибутов (ключ, значение)
+Domain = namedtuple("Domain", ["type", "value", "attributes"])
+
+# Расположение категории внутри файла: границы сообщения GeoSite
+CategorySpan = namedtuple("CategorySpan", ["start", "end"])
+
+
+def normalize_code(code):
+    """Приводит 'geosite:cn' / 'cn' к коду категории 'CN'"""
+    if code.lower().startswith("geosite:"):
+        code = code[8:]
+    return code.split("@", 1)[0].strip().upper()
+
+
+def split_geosite_ref(ref):
+    """Разбирает ссылку 'geosite:cn@ads@!cn' в ('CN', [('ads', True), ('cn', False)])"""
+    if ref.lower().startswith("geosite:"):
+        ref = ref[8:]
+    parts = ref.split("@")
+    attrs = []
+    for attr in parts[1:]:
+        attr = attr.strip()
+        if not attr:
+            continue
+        if attr.startswith("!"):
+            attrs.append((attr[1:].lower(), False))
+        else:
+            attrs.append((attr.lower(), True))
+    return parts[0].strip().upper(), attrs
+
+
+def filter_by_attributes(domains, attrs):
+    """Оставляет домены, подходящие под фильтр атрибутов из split_geosite_ref"""
+    if not attrs:
+        return list(domains)
+    result = []
+    for domain in domains:
+        keys = {key.lower() for key, _ in domain.attributes}
+        if all((key in keys) == wanted for key, wanted in attrs):
+            result.append(domain)
+    return result
+
+
+def _decode_attribute(buf, start, end):
+    key = ""
+    value = True
+    for field_no, wire_type, val in iter_fields(buf, start, end):
+        if field_no == 1 and wire_type == WIRE_BYTES:
+            key = bytes(buf[val[0]:val[1]]).decode("utf-8")
+        elif field_no == 2:
+            value = bool(val)
+        elif field_no == 3:
+            value = val
+    return key, value
+
+
+def _decode_domain(buf, start, end):
+    domain_type = DOMAIN_PLAIN
+    value = ""
+    attributes = ()
+    for field_no, wire_type, val in iter_fields(buf, start, end):
+        if field_no == 1 and wire_type != WIRE_BYTES:
+            domain_type = val
+        elif field_no == 2 and wire_type == WIRE_BYTES:
+            value = bytes(buf[val[0]:val[1]]).decode("utf-8")
+        elif field_no == 3 and wire_type == WIRE_BYTES:
+            attributes += (_decode_attribute(buf, val[0], val[1]),)
+    return Domain(domain_type, value, attributes)
+
+
+class GeoSiteFile:
+    """Ленивый читатель geosite.dat с индексом категорий по смещениям"""
+
+    def __init__(self, path, index=None):
+        """index - готовый индекс категорий (например, из кэша), иначе строится по файлу"""
+        self.path = os.path.abspath(path)
+        self._file = open(self.path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap)
+            else:
+                self._mmap = None
+                self._view = memoryview(b"")
+            self._index = dict(index) if index is not None else self._build_index()
+        except Exception:
+            self.close()
+            raise
+        self._cache = {}
+
+    def _build_index(self):
+        """Один проход по заголовкам верхнего уровня: код категории -> смещения"""
+        buf = self._view
+        end = len(buf)
+        index = {}
+        pos = 0
+        while pos < end:
+            tag, pos = read_varint(buf, pos)
+            if tag & 7 != WIRE_BYTES:
+                raise ProtobufError(f"Неожиданный тег {tag} на верхнем уровне")
+            length, pos = read_varint(buf, pos)
+            entry_end = pos + length
+            if entry_end > end:
+                raise ProtobufError("Запись GeoSite выходит за конец файла")
+            if tag >> 3 == 1:
+                code = self._read_code(buf, pos, entry_end)
+                if code is not None:
+                    index[code.upper()] = CategorySpan(pos, entry_end)
+            pos = entry_end
+        return index
+
+    @staticmethod
+    def _read_code(buf, start, end):
+        # country_code обычно идет первым полем, остальные поля лишь пропускаются
+        pos = start
+        while pos < end:
+            tag, pos = read_varint(buf, pos)
+            wire_type = tag & 7
+            if wire_type == WIRE_BYTES:
+                length, pos = read_varint(buf, pos)
+                if tag >> 3 == 1:
+                    return bytes(buf[pos:pos + length]).decode("utf-8")
+                pos += length
+            else:
+                _, pos = read_varint(buf, pos)
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Освобождает отображение файла"""
+        view = getattr(self, "_view", None)
+        if view is not None:
+            view.release()
+            self._view = None
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, code):
+        return normalize_code(code) in self._index
+
+    def index(self):
+        """Копия индекса: код категории -> CategorySpan"""
+        return dict(self._index)
+
+    def sha256(self):
+        """SHA-256 содержимого файла, считается прямо по отображению"""
+        return hashlib.sha256(self._view).digest()
+
+    def categories(self):
+        """Список кодов категорий в порядке следования в файле"""
+        return list(self._index)
+
+    def span(self, code):
+        """Границы сообщения GeoSite категории внутри файла"""
+        try:
+            return self._index[normalize_code(code)]
+        except KeyError:
+            raise KeyError(f"Категория geosite не найдена: {code}")
+
+    def raw(self, code):
+        """Байты сообщения GeoSite категории без копирования (memoryview)"""
+        span = self.span(code)
+        return self._view[span.start:span.end]
+
+    def iter_domains(self, code):
+        """Декодирует домены категории по одному, без кэширования"""
+        span = self.span(code)
+        buf = self._view
+        for field_no, wire_type, val in iter_fields(buf, span.start, span.end):
+            if field_no == 2 and wire_type == WIRE_BYTES:
+                yield _decode_domain(buf, val[0], val[1])
+
+    def load(self, code):
+        """Возвращает список доменов категории, декодированный один раз"""
+        code = normalize_code(code)
+        domains = self._cache.get(code)
+        if domains is None:
+            domains = list(self.iter_domains(code))
+            self._cache[code] = domains
+        return domains
+
+    def load_ref(self, ref):
+        """Загружает домены по ссылке вида 'geosite:cn@ads' с учетом атрибутов"""
+        code, attrs = split_geosite_ref(ref)
+        return filter_by_attributes(self.load(code), attrs)
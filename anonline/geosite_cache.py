@@ -0,0 +1,230 @@
+"""Бинарный кэш индекса geosite.dat и таблиц DomainMatcher.
+
+Формат - плоские массивы фиксированного размера и таблицы строк, без pickle:
+файл читается через mmap, массивы берутся из отображения без копирования.
+Кэш привязан к размеру, mtime и SHA-256 исходного файла: если совпадают
+размер и mtime, хэш не пересчитывается; если изменился только mtime,
+сверяется хэш содержимого.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+from .domain_matcher import DomainMatcher
+from .geosite import CategorySpan, GeoSiteFile
+
+CACHE_MAGIC = b"ALGEOSC\0"
+CACHE_VERSION = 1
+
+# magic, версия, порядок байт, размер, mtime_ns, sha256, число секций
+_HEADER = struct.Struct("<8sHBxxxxxQq32sIxxxx")
+# имя секции, тип ('s' - строки, иначе typecode array), длина в байтах
+_SECTION = struct.Struct("<24scxxxxxxxQ")
+
+_BYTEORDER = {"little": 1, "big": 2}[sys.byteorder]
+
+# Результат open_geosite: файл, матчер (или None) и признак попадания в кэш
+CachedGeoSite = namedtuple("CachedGeoSite", ["geosite", "matcher", "cache_hit"])
+
+
+class CacheError(ValueError):
+    """Кэш поврежден, устарел или записан другой версией"""
+
+
+def default_cache_path(geosite_path):
+    """Путь к кэшу рядом с geosite.dat"""
+    return geosite_path + ".cache"
+
+
+def _pad(length):
+    return (-length) % 8
+
+
+def _encode_strings(items):
+    for item in items:
+        if "\0" in item:
+            raise ValueError(f"Строка с нулевым символом не может быть сохранена: {item!r}")
+    return "".join(item + "\0" for item in items).encode("utf-8")
+
+
+def write_cache(cache_path, source_stat, source_hash, sections):
+    """Записывает секции в кэш атомарно (временный файл + os.replace)"""
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, _BYTEORDER, source_stat.st_size,
+                             source_stat.st_mtime_ns, source_hash, len(sections)))
+        for name, value in sections.items():
+            if isinstance(value, array):
+                kind = value.typecode
+                payload = value.tobytes()
+            else:
+                kind = "s"
+                payload = _encode_strings(value)
+            f.write(_SECTION.pack(name.encode("ascii"), kind.encode("ascii"), len(payload)))
+            f.write(payload)
+            f.write(b"\0" * _pad(len(payload)))
+    os.replace(tmp_path, cache_path)
+
+
+class CacheReader:
+    """Отображение файла кэша в память с доступом к секциям по имени"""
+
+    def __init__(self, cache_path):
+        with open(cache_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._exported = []
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        if len(self._view) < _HEADER.size:
+            raise CacheError("Файл кэша слишком короткий")
+        (magic, version, byteorder, self.source_size, self.source_mtime_ns,
+         self.source_hash, count) = _HEADER.unpack_from(self._view, 0)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or byteorder != _BYTEORDER:
+            raise CacheError("Неподдерживаемый формат кэша")
+        self.sections = {}
+        pos = _HEADER.size
+        for _ in range(count):
+            raw_name, kind, length = _SECTION.unpack_from(self._view, pos)
+            pos += _SECTION.size
+            if pos + length > len(self._view):
+                raise CacheError("Секция кэша выходит за конец файла")
+            self.sections[raw_name.rstrip(b"\0").decode("ascii")] = (kind.decode("ascii"), pos, length)
+            pos += length + _pad(length)
+
+    def get(self, name):
+        """Массив (memoryview без копирования) или список строк секции"""
+        try:
+            kind, pos, length = self.sections[name]
+        except KeyError:
+            raise CacheError(f"В кэше нет секции {name}")
+        view = self._view[pos:pos + length]
+        if kind == "s":
+            data = bytes(view).decode("utf-8")
+            view.release()
+            return data.split("\0")[:-1]
+        view = view.cast(kind)
+        self._exported.append(view)
+        return view
+
+    def tables(self, prefix):
+        """Все секции с данным префиксом, префикс из имен убирается"""
+        return {name[len(prefix):]: self.get(name) for name in self.sections if name.startswith(prefix)}
+
+    def close(self):
+        for view in self._exported:
+            view.release()
+        self._exported = []
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _index_sections(geosite):
+    index = geosite.index()
+    return {
+        "index_codes": list(index),
+        "index_start": array("Q", (span.start for span in index.values())),
+        "index_end": array("Q", (span.end for span in index.values())),
+    }
+
+
+def _build(geosite_path, cache_path, refs, source_stat):
+    geosite = GeoSiteFile(geosite_path)
+    try:
+        sections = _index_sections(geosite)
+        matcher = None
+        sections["refs"] = list(refs)
+        if refs:
+            matcher = DomainMatcher()
+            matcher.add_geosite(geosite, refs)
+            for name, value in matcher.to_tables().items():
+                sections["m_" + name] = value
+        try:
+            write_cache(cache_path, source_stat, geosite.sha256(), sections)
+        except OSError:
+            # Кэш - лишь ускорение, без него приложение работает как раньше
+            pass
+    except Exception:
+        geosite.close()
+        raise
+    return CachedGeoSite(geosite, matcher, False)
+
+
+def _load(reader, geosite_path, refs):
+    if reader.get("refs") != list(refs):
+        raise CacheError("Кэш построен для другого набора категорий")
+    starts = reader.get("index_start")
+    ends = reader.get("index_end")
+    index = {code: CategorySpan(start, end)
+             for code, start, end in zip(reader.get("index_codes"), starts, ends)}
+    matcher = DomainMatcher.from_tables(reader.tables("m_")) if refs else None
+    return CachedGeoSite(GeoSiteFile(geosite_path, index=index), matcher, True)
+
+
+def _touch_header(cache_path, reader, source_stat):
+    """Переписывает в заголовке только mtime, содержимое кэша остается прежним"""
+    header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, _BYTEORDER, source_stat.st_size,
+                          source_stat.st_mtime_ns, reader.source_hash, len(reader.sections))
+    try:
+        with open(cache_path, "r+b") as f:
+            f.write(header)
+    except OSError:
+        pass
+
+
+def open_geosite(geosite_path, refs=(), cache_path=None):
+    """Открывает geosite.dat с индексом и матчером для refs, используя кэш.
+
+    При отсутствии или устаревании кэша файл разбирается заново,
+    а кэш перезаписывается.
+    """
+    geosite_path = os.path.abspath(geosite_path)
+    cache_path = cache_path or default_cache_path(geosite_path)
+    refs = tuple(refs)
+    source_stat = os.stat(geosite_path)
+
+    try:
+        reader = CacheReader(cache_path)
+    except (OSError, ValueError):
+        return _build(geosite_path, cache_path, refs, source_stat)
+
+    result = None
+    try:
+        if reader.source_size != source_stat.st_size:
+            raise CacheError("Размер geosite.dat изменился")
+        mtime_changed = reader.source_mtime_ns != source_stat.st_mtime_ns
+        if mtime_changed:
+            # mtime поменялся (копирование, распаковка) - сверяем содержимое
+            with GeoSiteFile(geosite_path, index={}) as geosite:
+                if geosite.sha256() != reader.source_hash:
+                    raise CacheError("Содержимое geosite.dat изменилось")
+        result = _load(reader, geosite_path, refs)
+    except (CacheError, KeyError, ValueError, TypeError):
+        pass
+    finally:
+        reader.close()
+
+    if result is None:
+        return _build(geosite_path, cache_path, refs, source_stat)
+    if mtime_changed:
+        _touch_header(cache_path, reader, source_stat)
+    return result
@@ -0,0 +1,134 @@
+"""Урезанный geosite.dat только с категориями, на которые ссылается конфиг Xray.
+
+Сообщения GeoSite копируются из исходного файла байт в байт, заново
+кодируется лишь внешняя обертка GeoSiteList (тег поля и длина).
+Рядом с урезанным файлом хранится ключ сборки: список категорий, путь,
+размер и mtime исходного geosite.dat. Пока ключ совпадает, файл не
+пересобирается; обновленный geosite.dat при том же конфиге меняет ключ.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from .geosite import GeoSiteFile, normalize_code
+from .protobuf import WIRE_BYTES, encode_key, encode_varint
+
+# Переменная окружения, в которой Xray ищет каталог с geosite.dat/geoip.dat
+XRAY_ASSET_ENV = "XRAY_LOCATION_ASSET"
+
+# Остальные файлы данных, которые Xray может искать в том же каталоге
+COMPANION_ASSETS = ("geoip.dat",)
+
+# Ключ сборки урезанного файла в каталоге ресурсов
+SUBSET_STAMP = "geosite.dat.source"
+
+_ENTRY_KEY = encode_key(1, WIRE_BYTES)
+
+
+def collect_geosite_refs(config):
+    """Собирает коды категорий из всех строк 'geosite:...' в конфиге"""
+    codes = set()
+    stack = [config]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, str) and item.lower().startswith("geosite:"):
+            codes.add(normalize_code(item))
+    return sorted(codes)
+
+
+def build_subset(geosite, codes):
+    """Возвращает байты GeoSiteList только с указанными категориями"""
+    missing = [code for code in codes if code not in geosite]
+    if missing:
+        raise KeyError(f"Категории не найдены в {geosite.path}: {', '.join(missing)}")
+    parts = []
+    for code in codes:
+        raw = geosite.raw(code)
+        try:
+            parts.append(_ENTRY_KEY + encode_varint(len(raw)) + raw.tobytes())
+        finally:
+            raw.release()
+    return b"".join(parts)
+
+
+def _write_if_changed(path, data):
+    """Записывает файл атомарно, если содержимое отличается. Возвращает True при записи"""
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, "rb") as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                return False
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _link_or_copy(src, dst):
+    if os.path.exists(dst):
+        if os.path.getsize(dst) == os.path.getsize(src) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _subset_key(codes, geosite_path):
+    stat = os.stat(geosite_path)
+    return {"codes": codes, "source": os.path.abspath(geosite_path), "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_stamp(asset_dir):
+    try:
+        with open(os.path.join(asset_dir, SUBSET_STAMP), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def subset_is_current(config, geosite_path, asset_dir):
+    """Собран ли урезанный geosite.dat в asset_dir из тех же категорий и того же исходного файла"""
+    if not os.path.exists(os.path.join(asset_dir, "geosite.dat")):
+        return False
+    return _read_stamp(asset_dir) == _subset_key(collect_geosite_refs(config), geosite_path)
+
+
+def prepare_asset_dir(config, geosite_path, asset_dir, geosite=None):
+    """Готовит каталог ресурсов Xray с урезанным geosite.dat.
+
+    Файл пересобирается, только если изменились категории конфига или
+    размер/mtime исходного geosite.dat. geosite - уже открытый GeoSiteFile
+    того же файла (например, с индексом из кэша); без него файл открывается
+    заново. Файлы из COMPANION_ASSETS, лежащие рядом с geosite_path,
+    переносятся в asset_dir жесткой ссылкой (или копией). Возвращает список
+    включенных категорий.
+    """
+    codes = collect_geosite_refs(config)
+    os.makedirs(asset_dir, exist_ok=True)
+    key = _subset_key(codes, geosite_path)
+    subset_path = os.path.join(asset_dir, "geosite.dat")
+    if not os.path.exists(subset_path) or _read_stamp(asset_dir) != key:
+        if geosite is not None:
+            data = build_subset(geosite, codes)
+        else:
+            with GeoSiteFile(geosite_path) as geosite:
+                data = build_subset(geosite, codes)
+        _write_if_changed(subset_path, data)
+        # Ключ пишется после файла: при сбое между ними файл соберется заново
+        _write_if_changed(os.path.join(asset_dir, SUBSET_STAMP), json.dumps(key).encode("utf-8"))
+
+    source_dir = os.path.dirname(os.path.abspath(geosite_path))
+    for name in COMPANION_ASSETS:
+        src = os.path.join(source_dir, name)
+        if os.path.exists(src):
+            _link_or_copy(src, os.path.join(asset_dir, name))
+    return codes
@@ -0,0 +1,225 @@
+"""Фоновая проверка соединения: цикл asyncio в отдельном потоке.
+
+Проверки всех целей идут параллельно, результаты отдаются через
+колбэк on_results, который вызывается из фонового потока - GUI должен
+переправить их в свой поток (в Qt - через сигнал).
+"""
+
+import asyncio
+import threading
+import time
+from collections import namedtuple
+
+from .socks5 import open_socks5_connection
+
+# Цели по умолчанию: сайт (с DNS-запросом) и IP без DNS
+DEFAULT_TARGETS = [("www.google.com", 80), ("1.1.1.1", 443)]
+# Цели для проверки через туннель: обычный HTTP на порту 80
+TUNNEL_TARGETS = [("www.google.com", 80), ("cp.cloudflare.com", 80)]
+
+# Результат одной проверки; latency в секундах или None при ошибке.
+# Для проверок через SOCKS дополнительно заполняются этапы: рукопожатие
+# SOCKS, команда CONNECT и время до первого байта ответа (ttfb);
+# reused - запрос ушел по уже открытому keep-alive соединению.
+ProbeResult = namedtuple(
+    "ProbeResult",
+    ["target", "ok", "latency", "error", "timestamp", "handshake", "connect", "ttfb", "reused"],
+    defaults=(None, None, None, False)
+)
+
+
+async def tcp_probe(host, port, timeout):
+    """Проверяет TCP-подключение к host:port"""
+    target = f"{host}:{port}"
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        return ProbeResult(target, False, None, "таймаут", time.time())
+    except OSError as e:
+        return ProbeResult(target, False, None, str(e) or type(e).__name__, time.time())
+    latency = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return ProbeResult(target, True, latency, "", time.time())
+
+
+class Socks5Probe:
+    """Проверка через SOCKS-вход Xray: HEAD-запрос по HTTP внутри туннеля.
+
+    Соединение после ответа сохраняется и следующая проверка той же цели
+    идет по нему (HTTP keep-alive), без нового рукопожатия SOCKS.
+    Ответа по сохраненному соединению ждем не дольше reuse_timeout:
+    простаивавшее соединение могли закрыть без уведомления, и оно не
+    должно съедать время, отведенное на новое подключение.
+    """
+
+    def __init__(self, proxy_host, proxy_port, path="/", reuse_timeout=0.5):
+        self.proxy_host = proxy_host
+        self.proxy_port = proxy_port
+        self.path = path
+        self.reuse_timeout = reuse_timeout
+        self._connections = {}
+
+    async def __call__(self, host, port, timeout):
+        target = f"{host}:{port}"
+        start = time.perf_counter()
+        deadline = start + timeout
+
+        conn = self._connections.pop(target, None)
+        if conn is not None:
+            try:
+                ttfb = await asyncio.wait_for(self._request(conn, host, target),
+                                              min(timeout, self.reuse_timeout))
+                return ProbeResult(target, True, time.perf_counter() - start, "", time.time(),
+                                   ttfb=ttfb, reused=True)
+            except (OSError, EOFError, asyncio.TimeoutError, asyncio.LimitOverrunError, ValueError):
+                # Прокси или сервер закрыли простаивавшее соединение - открываем новое
+                conn[1].close()
+
+        try:
+            reader, writer, timings = await asyncio.wait_for(
+                open_socks5_connection(self.proxy_host, self.proxy_port, host, port),
+                max(deadline - time.perf_counter(), 0)
+            )
+        except asyncio.TimeoutError:
+            return ProbeResult(target, False, None, "таймаут подключения к SOCKS", time.time())
+        except (OSError, EOFError) as e:
+            return ProbeResult(target, False, None, str(e) or type(e).__name__, time.time())
+
+        try:
+            ttfb = await asyncio.wait_for(self._request((reader, writer), host, target),
+                                          max(deadline - time.perf_counter(), 0))
+        except asyncio.TimeoutError:
+            writer.close()
+            return ProbeResult(target, False, None, "таймаут ответа через туннель", time.time(),
+                               handshake=timings.handshake, connect=timings.connect)
+        except (OSError, EOFError, asyncio.LimitOverrunError, ValueError) as e:
+            writer.close()
+            return ProbeResult(target, False, None, str(e) or type(e).__name__, time.time(),
+                               handshake=timings.handshake, connect=timings.connect)
+        return ProbeResult(target, True, time.perf_counter() - start, "", time.time(),
+                           handshake=timings.handshake, connect=timings.connect, ttfb=ttfb)
+
+    async def _request(self, conn, host, target):
+        """Отправляет HEAD и читает заголовки ответа, возвращает время до первого байта"""
+        reader, writer = conn
+        writer.write(
+            f"HEAD {self.path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"User-Agent: Mozilla/5.0\r\nConnection: keep-alive\r\n\r\n".encode("ascii")
+        )
+        await writer.drain()
+        sent = time.perf_counter()
+        first = await reader.readexactly(1)
+        ttfb = time.perf_counter() - sent
+        head = first + await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        if not lines[0].startswith("HTTP/"):
+            raise ValueError(f"Неверный ответ HTTP: {lines[0][:40]}")
+        keep_alive = not lines[0].startswith("HTTP/1.0")
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "connection":
+                keep_alive = value.strip().lower() == "keep-alive"
+        if keep_alive:
+            self._connections[target] = conn
+        else:
+            writer.close()
+        return ttfb
+
+    async def aclose(self):
+        """Закрывает сохраненные соединения"""
+        connections, self._connections = self._connections, {}
+        for _, writer in connections.values():
+            writer.close()
+
+
+class HealthProbeEngine:
+    """Периодически проверяет цели в собственном потоке с циклом asyncio.
+
+    probe - корутина (host, port, timeout) -> ProbeResult, по умолчанию
+    tcp_probe. on_results(results) вызывается после каждого цикла проверок.
+    """
+
+    def __init__(self, targets=None, interval=5.0, timeout=3.0, on_results=None, probe=None):
+        self.targets = list(targets or DEFAULT_TARGETS)
+        self.interval = interval
+        self.timeout = timeout
+        self.on_results = on_results
+        self.probe = probe or tcp_probe
+        self._loop = None
+        self._thread = None
+        self._task = None
+        self._wake = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Запускает фоновый поток, не дожидаясь первой проверки"""
+        if self.running:
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="health-probe", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._task = loop.create_task(self._main())
+        ready.set()
+        try:
+            loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            close = getattr(self.probe, "aclose", None)
+            if close is not None:
+                loop.run_until_complete(close())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+            self._loop = None
+
+    async def _main(self):
+        while True:
+            results = await self.probe_all()
+            if self.on_results is not None:
+                self.on_results(results)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def probe_all(self):
+        """Один цикл: все цели параллельно"""
+        return await asyncio.gather(*(self.probe(host, port, self.timeout) for host, port in self.targets))
+
+    def probe_now(self):
+        """Просит выполнить проверку немедленно, не дожидаясь интервала"""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wake.set)
+
+    def stop(self, timeout=1.0):
+        """Отменяет текущие проверки и останавливает поток.
+
+        Не ждет дольше timeout: поток демонический и не мешает выходу.
+        """
+        loop = self._loop
+        if loop is not None and self._task is not None:
+            try:
+                loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:
+                # Цикл уже закрыт
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
@@ -0,0 +1,171 @@
+"""Блок записей приложения в файле hosts между строками-маркерами.
+
+Файл читается один раз как байты, маркеры и старые записи ищутся
+поиском подстроки; построчно файл разбирается, только если в нем
+остались старые записи. Если блок уже такой, как
+нужно, файл не переписывается. Запись идет во временный файл рядом с
+hosts и заменяет его через os.replace: при сбое hosts остается целым.
+
+Записи, которые прежние версии дописывали без маркеров (заголовок
+"# Блокировка WebRTC" и строки stun), удаляются только при точном
+совпадении строки - чужие записи с "stun" в имени не трогаются. Если
+маркер конца блока потерян, блоком считаются только записи сразу за
+маркером начала.
+"""
+
+import os
+import shutil
+import tempfile
+
+HOSTS_PATH = os.path.join(os.environ.get("SystemRoot", r"C:\Windows"), "System32", "drivers", "etc", "hosts")
+
+WEBRTC_HOSTS = [
+    "stun.l.google.com",
+    "stun1.l.google.com",
+    "stun2.l.google.com",
+    "stun3.l.google.com",
+    "stun4.l.google.com",
+    "stun.services.mozilla.com",
+    "global.stun.twilio.com",
+]
+
+# Что дописывали версии до 0.5 (block_webrtc без маркеров)
+LEGACY_WEBRTC_LINES = ["# Блокировка WebRTC"] + [f"0.0.0.0 {host}" for host in WEBRTC_HOSTS]
+
+
+class HostsBlock:
+    """Именованный блок в hosts: apply() ставит записи, remove() убирает"""
+
+    def __init__(self, name, path=HOSTS_PATH, legacy=()):
+        self.path = path
+        self.begin = f"# BEGIN AnonLine {name}".encode("ascii")
+        self.end = f"# END AnonLine {name}".encode("ascii")
+        self.legacy = {line.encode("utf-8") for line in legacy}
+        self.writes = 0
+
+    def _read(self):
+        try:
+            with open(self.path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
+    @staticmethod
+    def _newline(data):
+        return b"\r\n" if b"\r\n" in data[:65536] or (not data and os.name == "nt") else b"\n"
+
+    def _render(self, hosts, newline, address="0.0.0.0"):
+        lines = [self.begin] + [f"{address} {host}".encode("ascii") for host in hosts] + [self.end]
+        return newline.join(lines) + newline
+
+    def _find(self, data):
+        """(начало, конец) блока вместе с переводом строки после маркера конца, или None"""
+        start = data.find(self.begin)
+        while start > 0 and data[start - 1:start] not in (b"\n", b""):
+            start = data.find(self.begin, start + 1)
+        if start < 0:
+            return None
+        end = data.find(self.end, start)
+        if end < 0:
+            # Маркер конца потерян: блок - маркер начала и записи сразу за ним
+            return start, self._entries_end(data, start)
+        end += len(self.end)
+        if data.startswith(b"\r\n", end):
+            end += 2
+        elif data.startswith(b"\n", end):
+            end += 1
+        return start, end
+
+    @staticmethod
+    def _entries_end(data, start):
+        """Конец строк "адрес хост" с одним адресом после строки start (строки пользователя дальше не берутся)"""
+        pos = data.find(b"\n", start)
+        address = None
+        while pos >= 0:
+            line_start = pos + 1
+            pos = data.find(b"\n", line_start)
+            words = data[line_start:len(data) if pos < 0 else pos].split()
+            if len(words) != 2 or words[0].startswith(b"#") or words[0] != (address or words[0]):
+                return line_start
+            address = words[0]
+        return len(data)
+
+    def _strip_legacy(self, data):
+        if not self.legacy or not any(line in data for line in self.legacy):
+            return data
+        lines = data.split(b"\n")
+        kept = [line for line in lines if line.rstrip(b"\r") not in self.legacy]
+        return b"\n".join(kept)
+
+    def read_block(self):
+        """Записи блока (строки между маркерами) или None, если блока нет"""
+        data = self._read()
+        span = self._find(data)
+        if span is None:
+            return None
+        body = data[span[0]:span[1]].splitlines()[1:]
+        return [line.decode("utf-8", "replace") for line in body if line != self.end]
+
+    def apply(self, hosts, address="0.0.0.0"):
+        """Ставит блок с записями "address host"; False - блок уже был таким"""
+        data = self._read()
+        newline = self._newline(data)
+        block = self._render(hosts, newline, address)
+        span = self._find(data)
+        # Старые записи убираются при первой установке блока, повторно их не ищем
+        if span is not None and data[span[0]:span[1]] == block:
+            return False
+        if span is not None:
+            head, tail = data[:span[0]], data[span[1]:]
+        else:
+            head, tail = data, b""
+        head, tail = self._strip_legacy(head), self._strip_legacy(tail)
+        if head and not head.endswith(b"\n"):
+            head += newline
+        self._write(head + block + tail)
+        return True
+
+    def remove(self):
+        """Убирает блок и старые записи; False - убирать было нечего"""
+        data = self._read()
+        span = self._find(data)
+        if span is None and not self._has_legacy(data, None):
+            return False
+        if span is not None:
+            data = data[:span[0]] + data[span[1]:]
+        self._write(self._strip_legacy(data))
+        return True
+
+    def _has_legacy(self, data, span):
+        # Поиск до и после блока без копирования данных
+        ranges = [(0, len(data))] if span is None else [(0, span[0]), (span[1], len(data))]
+        for line in self.legacy:
+            for start, end in ranges:
+                pos = data.find(line, start, end)
+                while pos >= 0:
+                    line_end = pos + len(line)
+                    if (pos == 0 or data[pos - 1] == 10) and data[line_end:line_end + 1] in (b"", b"\n", b"\r"):
+                        return True
+                    pos = data.find(line, pos + 1, end)
+        return False
+
+    def _write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".hosts-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, tmp_path)
+            try:
+                os.replace(tmp_path, self.path)
+            except PermissionError:
+                # hosts открыт без FILE_SHARE_DELETE (антивирус) - перезаписываем на месте
+                with open(self.path, "wb") as f:
+                    f.write(data)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        self.writes += 1
@@ -0,0 +1,203 @@
+"""Список сетевых интерфейсов из "netsh interface show interface" с кэшем.
+
+Разбор не зависит от языка Windows: колонки определяются по заголовку
+(колонки разделены двумя и более пробелами), поэтому имена с пробелами
+("Беспроводная сеть", "vEthernet (Default Switch)") читаются целиком.
+Состояния "подключен"/"отключен" берутся из таблицы известных переводов.
+
+Так же, по словам из таблиц, читаются исходные DNS-серверы интерфейса
+("netsh interface ipv4 show dnsservers") и состояние IPv6 ("netsh
+interface ipv6 show global") - их записывают в журнал перед изменением.
+
+InterfaceInventory запрашивает netsh один раз и хранит результат до
+истечения ttl или до уведомления Windows об изменении адресов
+(NotifyAddrChange в фоновом потоке).
+"""
+
+import ipaddress
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_INTERFACE = "Ethernet"
+DEFAULT_TTL = 30.0
+
+# admin_enabled/connected - None, если слово не распознано
+Interface = namedtuple("Interface", ["name", "admin_enabled", "connected", "type"])
+
+# Значения колонок в известных локализациях (в нижнем регистре)
+ENABLED_WORDS = {"enabled", "разрешен", "включен", "aktiviert", "activé", "habilitado", "abilitato", "włączony"}
+DISABLED_WORDS = {"disabled", "запрещен", "отключен", "deaktiviert", "désactivé", "deshabilitado", "disabilitato",
+                  "wyłączony"}
+CONNECTED_WORDS = {"connected", "подключен", "verbunden", "connecté", "conectado", "connesso", "połączony"}
+DISCONNECTED_WORDS = {"disconnected", "отключен", "getrennt", "déconnecté", "desconectado", "disconnesso",
+                      "rozłączony"}
+# Интерфейсы, через которые не идет внешний трафик
+LOOPBACK_WORDS = ("loopback", "замыкание на себя", "внутренний", "internal", "intern", "interne", "interno")
+
+# Подписи строки "состояние" в выводе "show global"
+STATE_WORDS = ("state", "состояние", "zustand", "état", "estado", "stato", "stan")
+
+_COLUMN_RE = re.compile(r"(?:^|(?<=\s\s))(\S)")
+
+
+def _state(value, yes, no):
+    value = value.strip().lower()
+    if value in yes:
+        return True
+    if value in no:
+        return False
+    return None
+
+
+def _columns(header):
+    starts = [match.start(1) for match in _COLUMN_RE.finditer(header)]
+    return starts if len(starts) == 4 else None
+
+
+def _split(line, starts):
+    if starts is not None and len(line) > starts[3] and all(line[start - 1] == " " for start in starts[1:]):
+        fields = [line[a:b].strip() for a, b in zip(starts, starts[1:] + [len(line)])]
+        if all(fields):
+            return fields
+    # Строка не совпала с заголовком: первые три значения - по одному слову
+    fields = line.split(None, 3)
+    return fields if len(fields) == 4 else None
+
+
+def parse_show_interface(text):
+    """Разбирает вывод "netsh interface show interface" в список Interface"""
+    lines = text.replace("\r", "").split("\n")
+    starts = None
+    body = lines
+    for index, line in enumerate(lines):
+        if line.strip() and set(line.strip()) == {"-"}:
+            header = lines[index - 1] if index else ""
+            starts = _columns(header.rstrip())
+            body = lines[index + 1:]
+            break
+    interfaces = []
+    for line in body:
+        line = line.rstrip()
+        if not line.strip():
+            continue
+        fields = _split(line, starts)
+        if fields is None:
+            continue
+        admin, state, kind, name = fields
+        admin_enabled = _state(admin, ENABLED_WORDS, DISABLED_WORDS)
+        connected = _state(state, CONNECTED_WORDS, DISCONNECTED_WORDS)
+        if admin_enabled is None and connected is None and starts is None:
+            # Строка заголовка без разделителя или посторонний текст
+            continue
+        interfaces.append(Interface(name, admin_enabled, connected, kind))
+    return interfaces
+
+
+def _ipv4(word):
+    try:
+        return str(ipaddress.IPv4Address(word))
+    except ValueError:
+        return None
+
+
+def parse_dns_servers(text):
+    """Разбирает вывод "netsh interface ipv4 show dnsservers": (источник, серверы).
+
+    Источник - "dhcp", если в подписи списка есть DHCP, иначе "static";
+    серверы - адреса IPv4 из первой строки списка и строк продолжения.
+    None, если списка DNS-серверов в выводе нет.
+    """
+    lines = text.replace("\r", "").split("\n")
+    for index, line in enumerate(lines):
+        label, colon, value = line.partition(":")
+        if not colon or "dns" not in label.lower():
+            continue
+        source = "dhcp" if "dhcp" in label.lower() else "static"
+        servers = [address for address in map(_ipv4, value.split()) if address]
+        for extra in lines[index + 1:]:
+            # Продолжение списка - строка из одного адреса
+            address = _ipv4(extra.strip())
+            if address is None:
+                break
+            servers.append(address)
+        return source, servers
+    return None
+
+
+def parse_ipv6_state(text):
+    """Состояние из вывода "netsh interface ipv6 show global": "enabled", "disabled" или None"""
+    for line in text.replace("\r", "").split("\n"):
+        label, colon, value = line.partition(":")
+        if colon and label.strip().lower().startswith(STATE_WORDS):
+            state = _state(value, ENABLED_WORDS, DISABLED_WORDS)
+            if state is not None:
+                return "enabled" if state else "disabled"
+    return None
+
+
+def is_loopback(interface):
+    kind = interface.type.lower()
+    return any(word in kind for word in LOOPBACK_WORDS) or "loopback" in interface.name.lower()
+
+
+def pick_active(interfaces, default=DEFAULT_INTERFACE):
+    """Первый подключенный интерфейс, не являющийся петлевым/внутренним"""
+    for interface in interfaces:
+        if interface.connected and not is_loopback(interface):
+            return interface.name
+    return default
+
+
+class InterfaceInventory:
+    """Кэш списка интерфейсов поверх CommandRunner.
+
+    Безопасен для вызова из нескольких потоков: параллельные запросы при
+    пустом кэше ждут один вызов netsh.
+    """
+
+    def __init__(self, runner, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.runner = runner
+        self.ttl = ttl
+        self.clock = clock
+        self.refreshes = 0
+        self._interfaces = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def invalidate(self):
+        """Сбрасывает кэш: следующий запрос снова вызовет netsh"""
+        with self._lock:
+            self._interfaces = None
+
+    def interfaces(self, refresh=False):
+        with self._lock:
+            if refresh or self._interfaces is None or self.clock() >= self._expires:
+                result = self.runner.netsh("interface", "show", "interface", capture=True)
+                self._interfaces = parse_show_interface(result.stdout or "")
+                self._expires = self.clock() + self.ttl
+                self.refreshes += 1
+            return list(self._interfaces)
+
+    def active(self, default=DEFAULT_INTERFACE):
+        """Имя активного интерфейса или default, если подходящего нет"""
+        return pick_active(self.interfaces(), default)
+
+    def start_watcher(self):
+        """Сбрасывает кэш при изменении IP-адресов (только Windows)"""
+        if sys.platform != "win32" or self._watcher is not None:
+            return False
+        self._watcher = threading.Thread(target=self._watch, name="interface-watcher", daemon=True)
+        self._watcher.start()
+        return True
+
+    def _watch(self):
+        import ctypes
+
+        notify = ctypes.windll.iphlpapi.NotifyAddrChange
+        # Без OVERLAPPED вызов блокируется до изменения адресов любого интерфейса
+        while notify(None, None) == 0:
+            self.invalidate()
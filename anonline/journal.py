@@ -0,0 +1,155 @@
+"""Журнал изменений сетевых настроек для отката после сбоя.
+
+Перед каждым изменением системы (прокси, DNS, IPv6, hosts, брандмауэр,
+время) в файл дописывается строка JSON с исходными значениями, и запись
+сбрасывается на диск (fsync). После успешного отката шага дописывается
+отметка "undo". Если приложение упало, при следующем запуске журнал
+не пуст и изменения откатываются по нему.
+
+Откат выполняется в обратном порядке зависимостей: шаг, записанный с
+after=("xray",), откатывается раньше шага "xray"; независимые шаги
+откатываются параллельно (через run_steps).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from .steps import Step, run_steps
+
+# data - исходные значения (словарь, сериализуемый в JSON)
+JournalEntry = namedtuple("JournalEntry", ["step", "data", "after", "timestamp"])
+
+
+def _fsync_dir(path):
+    # Запись о новом файле в каталоге (на Windows каталог так не открыть)
+    if sys.platform == "win32":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class NetworkJournal:
+    """Файл журнала: одна запись JSON на строку, только дописывание"""
+
+    def __init__(self, path):
+        self.path = path
+        self.appends = 0
+        self._lock = threading.Lock()
+        self._tail_checked = False
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            created = not os.path.exists(self.path)
+            if not created and not self._tail_checked and not self._ends_with_newline():
+                # Последняя строка оборвана сбоем - новая запись не должна к ней прилипнуть
+                line = "\n" + line
+            self._tail_checked = True
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if created:
+                _fsync_dir(self.path)
+            self.appends += 1
+
+    def _records(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().split("\n")
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Строка оборвана сбоем посреди записи
+                continue
+        return records
+
+    def begin(self):
+        """Отмечает начало подключения; невыполненные откаты прошлых сессий сохраняются"""
+        self._append({"op": "begin", "pid": os.getpid(), "time": time.time()})
+
+    def record(self, step, data=None, after=()):
+        """Записывает исходные значения до изменения системы"""
+        self._append({"op": "apply", "step": step, "data": data or {}, "after": list(after), "time": time.time()})
+
+    def mark_undone(self, step):
+        self._append({"op": "undo", "step": step, "time": time.time()})
+
+    def pending(self):
+        """{шаг: JournalEntry} изменений без отката, в порядке применения.
+
+        Если шаг применялся повторно без отката, остаются значения первой
+        записи - это исходное состояние системы.
+        """
+        entries = {}
+        for record in self._records():
+            step = record.get("step")
+            if record.get("op") == "apply" and step not in entries:
+                entries[step] = JournalEntry(step, record.get("data") or {}, tuple(record.get("after") or ()),
+                                             record.get("time"))
+            elif record.get("op") == "undo":
+                entries.pop(step, None)
+        return entries
+
+    def clear(self):
+        with self._lock:
+            self._tail_checked = False
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def undo(self, step, handler):
+        """Откатывает один шаг: handler(data) -> False при неудаче"""
+        entry = self.pending().get(step)
+        if entry is None:
+            return True
+        if handler(entry.data) is False:
+            return False
+        self.mark_undone(step)
+        return True
+
+    def rollback(self, handlers, max_workers=None, on_step=None):
+        """Откатывает все записанные изменения, возвращает StepReport.
+
+        handlers: {шаг: handler(data)}. Журнал удаляется, если откатить
+        удалось все; иначе невыполненные записи остаются до следующей попытки.
+        """
+        entries = self.pending()
+        steps = []
+        for name, entry in entries.items():
+            # Откат шага ждет откатов шагов, которые от него зависели
+            after = tuple(other.step for other in entries.values() if name in other.after)
+            steps.append(Step(name, self._undo_step(name, handlers.get(name)), after=after))
+        report = run_steps(steps, max_workers=max_workers or max(1, len(steps)), on_step=on_step)
+        if not self.pending():
+            self.clear()
+        return report
+
+    def _undo_step(self, step, handler):
+        def run():
+            if handler is None:
+                raise RuntimeError(f"неизвестный шаг журнала {step!r}")
+            return self.undo(step, handler)
+        return run
@@ -0,0 +1,84 @@
+"""Пакетная передача логов Xray в консоль.
+
+Поток чтения stdout складывает строки в кольцевой буфер, поток GUI
+забирает их по таймеру раз в кадр и добавляет в консоль одним вызовом.
+Если строки идут быстрее заданного темпа, лишние отбрасываются, а в
+консоль попадает сводка с числом пропущенных строк по уровням.
+Предупреждения и ошибки ограничителем темпа не отбрасываются.
+"""
+
+import re
+import threading
+import time
+from collections import Counter, deque
+
+# Период сброса буфера в консоль (~30 кадров в секунду)
+FRAME_INTERVAL_MS = 33
+
+_LEVEL_RE = re.compile(r"\[(Debug|Info|Warning|Error)\]")
+_IMPORTANT_RE = re.compile(r"\[(?:Warning|Error)\]|Failed|panic")
+
+
+class LogBuffer:
+    """Потокобезопасный кольцевой буфер строк с ограничением темпа.
+
+    rate - строк в секунду в среднем, burst - допустимый всплеск
+    (token bucket). При переполнении буфера вытесняются старые строки.
+    """
+
+    def __init__(self, capacity=2000, rate=300.0, burst=600):
+        self.capacity = capacity
+        self.rate = rate
+        self.burst = burst
+        self._lines = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._dropped = Counter()
+        self.received = 0
+        self.dropped_total = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    def push(self, line):
+        """Добавляет строку; возвращает False, если строка отброшена"""
+        line = line.strip()
+        now = time.monotonic()
+        with self._lock:
+            self.received += 1
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+            elif not _IMPORTANT_RE.search(line):
+                self._drop(line)
+                return False
+            if len(self._lines) == self.capacity:
+                self._drop(self._lines[0])
+            self._lines.append(line)
+        return True
+
+    def _drop(self, line):
+        match = _LEVEL_RE.search(line)
+        self._dropped[match.group(1) if match else "прочие"] += 1
+        self.dropped_total += 1
+
+    def drain(self):
+        """Забирает накопленные строки; в конце - сводка об отброшенных, если они были"""
+        with self._lock:
+            if not self._lines and not self._dropped:
+                return []
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped = self._dropped
+            self._dropped = Counter()
+        if dropped:
+            lines.append(summarize_dropped(dropped))
+        return lines
+
+
+def summarize_dropped(dropped):
+    """Строка-сводка по счетчику отброшенных строк {уровень: число}"""
+    details = ", ".join(f"{level}: {count}" for level, count in dropped.most_common())
+    return f"... пропущено строк лога Xray: {sum(dropped.values())} ({details})"
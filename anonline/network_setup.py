@@ -0,0 +1,311 @@
+"""Изменения настроек Windows на время подключения и их откат.
+
+NetworkSetup не зависит от PyQt5: системные вызовы идут через бэкенды
+(CommandRunner для netsh/tzutil/w32tm, реестр, HostsBlock), исходные
+значения каждого изменения записываются в NetworkJournal. Сообщения
+передаются функции log - в GUI это консоль окна, в скриптах print.
+
+ctypes и winreg импортируются только при вызове, поэтому модуль
+загружается и на других системах (с FakeBackend/FakeRegistry).
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from .commands import CommandRunner
+from .hosts import LEGACY_WEBRTC_LINES, WEBRTC_HOSTS, HostsBlock
+from .interfaces import InterfaceInventory, parse_dns_servers, parse_ipv6_state
+from .registry import ProxySettings, WinRegistry, read_proxy, write_proxy
+
+TIME_SERVER = "time.nist.gov"
+
+
+def is_admin():
+    """Запущен ли процесс с правами администратора (вне Windows - False)"""
+    try:
+        import ctypes
+
+        return bool(ctypes.windll.shell32.IsUserAnAdmin())
+    except Exception:
+        return False
+
+
+def relaunch_as_admin(argv=None):
+    """Запрашивает UAC и запускает тот же скрипт от имени администратора"""
+    import ctypes
+
+    argv = sys.argv if argv is None else argv
+    ctypes.windll.shell32.ShellExecuteW(None, "runas", sys.executable, " ".join(argv), None, None, 1)
+
+
+class NetworkSetup:
+    """Прокси, DNS, IPv6, hosts, брандмауэр и время: применение и откат по журналу.
+
+    Методы возвращают True/False и сами пишут в log, как шаги run_steps.
+    """
+
+    def __init__(self, journal, commands=None, registry=None, hosts=None, interfaces=None, log=print,
+                 local_port=10808, time_server=TIME_SERVER, xray_path="xray.exe"):
+        self.journal = journal
+        self.commands = commands or CommandRunner()
+        self.registry = registry or WinRegistry()
+        self.hosts = hosts or HostsBlock("WebRTC", legacy=LEGACY_WEBRTC_LINES)
+        self.interfaces = interfaces or InterfaceInventory(self.commands)
+        self.log = log
+        self.local_port = local_port
+        self.time_server = time_server
+        self.xray_path = xray_path
+        self.saved_proxy = None
+        self.dns_interface = None
+        # Сохраненные настройки времени
+        self.original_time_zone = None
+        self.original_datetime = None
+
+    def save_network_settings(self):
+        """Сохраняет текущие сетевые настройки"""
+        try:
+            # Сохраняем настройки прокси
+            self.saved_proxy = read_proxy(self.registry)
+            self.log("Сетевые настройки сохранены")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка сохранения настроек: {str(e)}")
+            return False
+
+    def set_proxy(self):
+        """Устанавливает прокси-настройки"""
+        try:
+            # Исходные значения попадают в журнал до изменения реестра
+            self.journal.record("proxy", self.saved_proxy._asdict(), after=("xray",))
+
+            # Включаем SOCKS прокси, локальные адреса без прокси
+            write_proxy(self.registry, ProxySettings(1, f"socks=127.0.0.1:{self.local_port}", "<local>"))
+
+            # Применяем изменения
+            self.commands.netsh("winhttp", "import", "proxy", "source=ie")
+            self.log(f"Прокси настроен: SOCKS 127.0.0.1:{self.local_port}")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка настройки прокси: {str(e)}")
+            return False
+
+    def restore_proxy(self, saved=None):
+        """Возвращает сохраненные настройки прокси"""
+        try:
+            write_proxy(self.registry, saved or self.saved_proxy)
+
+            # Применяем изменения
+            self.commands.netsh("winhttp", "import", "proxy", "source=ie")
+            self.log("Настройки прокси восстановлены")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка восстановления прокси: {str(e)}")
+            return False
+
+    def ipv6_state(self):
+        """Текущее состояние IPv6 ("enabled"/"disabled") или None, если не распознано"""
+        result = self.commands.netsh('interface', 'ipv6', 'show', 'global', capture=True)
+        return parse_ipv6_state(result.stdout or "")
+
+    def disable_ipv6(self):
+        """Отключает IPv6 для всех интерфейсов"""
+        try:
+            # Исходное состояние: уже отключенный IPv6 при откате не включается
+            self.journal.record("ipv6", {"state": self.ipv6_state()})
+            self.commands.netsh('interface', 'ipv6', 'set', 'global', 'state=disabled')
+            self.log("IPv6 полностью отключен в системе")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка отключения IPv6: {str(e)}")
+            return False
+
+    def enable_ipv6(self, state=None):
+        """Возвращает IPv6 в исходное состояние (если оно неизвестно - включает)"""
+        try:
+            state = state or "enabled"
+            self.commands.netsh('interface', 'ipv6', 'set', 'global', f'state={state}')
+            self.log("IPv6 включен обратно" if state == "enabled" else "IPv6 оставлен отключенным, как до подключения")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка включения IPv6: {str(e)}")
+            return False
+
+    def block_webrtc(self):
+        """Блокирует WebRTC на уровне системы и браузера"""
+        try:
+            self.journal.record("webrtc")
+            # Блок записей в файле hosts между маркерами
+            if self.hosts.apply(WEBRTC_HOSTS):
+                self.log("WebRTC серверы заблокированы через hosts файл")
+            else:
+                self.log("WebRTC серверы уже заблокированы в hosts файле")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка блокировки WebRTC: {str(e)}")
+            return False
+
+    def unblock_webrtc(self):
+        """Восстанавливает файл hosts"""
+        try:
+            # Удаляем только свой блок (и записи прежних версий), остальной hosts не меняется
+            if self.hosts.remove():
+                self.log("WebRTC блокировки удалены")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка восстановления hosts: {str(e)}")
+            return False
+
+    def create_firewall_rules(self):
+        """Создает правила брандмауэра для полной изоляции"""
+        try:
+            self.journal.record("firewall")
+            with self.commands.batch():
+                # Блокируем все исходящие соединения, кроме VPN
+                self.commands.netsh('advfirewall', 'firewall', 'add', 'rule',
+                                    'name="VPN Kill Switch"', 'dir=out', 'action=block', 'enable=yes', check=True)
+
+                # Разрешаем только наш VPN
+                self.commands.netsh('advfirewall', 'firewall', 'add', 'rule',
+                                    'name="Allow Xray"', 'dir=out', 'action=allow',
+                                    'program="' + os.path.abspath(self.xray_path) + '"', 'enable=yes', check=True)
+
+            self.log("Создан kill-switch в брандмауэре")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка создания правил брандмауэра: {str(e)}")
+            return False
+
+    def remove_firewall_rules(self):
+        """Удаляет правила брандмауэра"""
+        try:
+            with self.commands.batch():
+                self.commands.netsh('advfirewall', 'firewall', 'delete', 'rule', 'name="VPN Kill Switch"', 'dir=out')
+                self.commands.netsh('advfirewall', 'firewall', 'delete', 'rule', 'name="Allow Xray"', 'dir=out')
+            self.log("Правила брандмауэра удалены")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка удаления правил брандмауэра: {str(e)}")
+            return False
+
+    def dns_servers(self, interface):
+        """Исходные DNS интерфейса: ("dhcp"/"static", [адреса]) или None, если вывод не распознан"""
+        result = self.commands.netsh('interface', 'ipv4', 'show', 'dnsservers', f'name="{interface}"', capture=True)
+        return parse_dns_servers(result.stdout or "")
+
+    def set_dns(self):
+        """Устанавливает DNS-серверы для предотвращения утечек"""
+        try:
+            active_interface = self.interfaces.active()
+            self.dns_interface = active_interface
+            # Исходные серверы и их источник (DHCP или заданы вручную) - до изменения
+            source, servers = self.dns_servers(active_interface) or (None, [])
+            self.journal.record("dns", {"interface": active_interface, "source": source, "servers": servers},
+                                after=("xray",))
+
+            # Устанавливаем DNS на 127.0.0.1
+            self.commands.netsh('interface', 'ipv4', 'set', 'dnsservers',
+                                f'name="{active_interface}"', 'source=static', 'address=127.0.0.1',
+                                'register=primary')
+
+            self.log("DNS настроены на 127.0.0.1 для предотвращения утечек")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка настройки DNS: {str(e)}")
+            return False
+
+    def restore_dns(self, interface=None, source=None, servers=()):
+        """Восстанавливает DNS-настройки (без записанных исходных - получение по DHCP)"""
+        try:
+            # Интерфейс, на котором DNS меняли при подключении
+            active_interface = interface or self.dns_interface or self.interfaces.active()
+            self.dns_interface = None
+            name = f'name="{active_interface}"'
+
+            if source == "static":
+                # Заданные вручную серверы возвращаются в прежнем порядке
+                with self.commands.batch():
+                    first = servers[0] if servers else "none"
+                    self.commands.netsh('interface', 'ipv4', 'set', 'dnsservers', name, 'source=static',
+                                        f'address={first}', 'register=primary')
+                    for index, server in enumerate(servers[1:], start=2):
+                        self.commands.netsh('interface', 'ipv4', 'add', 'dnsservers', name, f'address={server}',
+                                            f'index={index}')
+            else:
+                # Восстанавливаем автоматическое получение DNS
+                self.commands.netsh('interface', 'ipv4', 'set', 'dnsservers', name, 'source=dhcp')
+
+            self.log("DNS настройки восстановлены")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка восстановления DNS: {str(e)}")
+            return False
+
+    def hide_system_time(self):
+        """Скрывает реальное системное время (устанавливает UTC, сохраняет текущее)"""
+        try:
+            # 1. Сохраняем текущий часовой пояс
+            self.original_time_zone = self.commands.run(['tzutil', '/g'], capture=True, check=True).stdout.strip()
+            self.journal.record("time", {"time_zone": self.original_time_zone})
+
+            # 2. Сохраняем текущую дату и время
+            self.original_datetime = datetime.now()
+
+            # 3. Устанавливаем UTC
+            self.commands.run(['tzutil', '/s', 'UTC'])
+
+            # 4. Отключаем авто-синхронизацию
+            self.commands.run(['w32tm', '/config', '/syncfromflags:manual', '/update'])
+
+            # 5. Принудительная синхронизация с сервером
+            self.commands.run(['w32tm', '/resync', '/computer:' + self.time_server, '/nowait'])
+
+            self.log("Системное время скрыто (установлен UTC и синхронизировано с сервером)")
+            return True
+        except Exception as e:
+            self.log(f"Ошибка скрытия времени: {str(e)}")
+            return False
+
+    def restore_system_time(self, time_zone=None):
+        """Восстанавливает исходный часовой пояс и дату/время"""
+        try:
+            # 1. Возвращаем часовой пояс
+            time_zone = time_zone or self.original_time_zone
+            if time_zone:
+                self.commands.run(['tzutil', '/s', time_zone])
+                self.log(f"Часовой пояс восстановлен: {time_zone}")
+
+            # 2. Устанавливаем обратно дату и время
+            if self.original_datetime is not None:
+                dt = self.original_datetime
+                datetime_str = dt.strftime("%m-%d-%Y %H:%M:%S")
+
+                self.commands.run(['powershell', '-Command', f'Set-Date -Date "{datetime_str}"'])
+
+                self.log(f"Дата и время восстановлены: {datetime_str}")
+            else:
+                self.log("Предупреждение: сохранённое время не найдено")
+
+            # 3. Возвращаем автоматическую синхронизацию
+            self.commands.run(['w32tm', '/config', '/syncfromflags:domhier', '/update'])
+            self.commands.run(['w32tm', '/resync'])
+
+            return True
+        except Exception as e:
+            self.log(f"Ошибка восстановления времени: {str(e)}")
+            return False
+
+    def undo_handlers(self):
+        """Откат шагов журнала: {шаг: функция(исходные значения)}"""
+        return {
+            "proxy": lambda data: self.restore_proxy(ProxySettings(**data)),
+            "dns": lambda data: self.restore_dns(data.get("interface"), data.get("source"), data.get("servers") or ()),
+            "ipv6": lambda data: self.enable_ipv6(data.get("state")),
+            "webrtc": lambda data: self.unblock_webrtc(),
+            "firewall": lambda data: self.remove_firewall_rules(),
+            "time": lambda data: self.restore_system_time(data.get("time_zone")),
+        }
+
+    def undo_change(self, step):
+        """Откат одного шага по журналу (при неудачном подключении)"""
+        return self.journal.undo(step, self.undo_handlers()[step])
@@ -0,0 +1,91 @@
+"""Минимальный разбор и запись protobuf (varint + length-delimited) без зависимостей"""
+
+# Типы полей protobuf (wire type)
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_BYTES = 2
+WIRE_FIXED32 = 5
+
+
+class ProtobufError(ValueError):
+    """Поврежденные или неподдерживаемые данные protobuf"""
+
+
+def read_varint(buf, pos):
+    """Читает varint из buf начиная с pos, возвращает (значение, новая позиция)"""
+    result = 0
+    shift = 0
+    while True:
+        try:
+            b = buf[pos]
+        except IndexError:
+            raise ProtobufError("Неожиданный конец данных в varint")
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ProtobufError("Слишком длинный varint")
+
+
+def skip_field(buf, pos, wire_type):
+    """Пропускает значение поля, возвращает позицию за ним"""
+    if wire_type == WIRE_VARINT:
+        _, pos = read_varint(buf, pos)
+        return pos
+    if wire_type == WIRE_BYTES:
+        length, pos = read_varint(buf, pos)
+        return pos + length
+    if wire_type == WIRE_FIXED64:
+        return pos + 8
+    if wire_type == WIRE_FIXED32:
+        return pos + 4
+    raise ProtobufError(f"Неподдерживаемый wire type: {wire_type}")
+
+
+def iter_fields(buf, start, end):
+    """Перебирает поля сообщения в buf[start:end].
+
+    Для length-delimited полей значение - пара (начало, конец) внутри buf,
+    сами байты не копируются. Для varint - число.
+    """
+    pos = start
+    while pos < end:
+        tag, pos = read_varint(buf, pos)
+        field_no = tag >> 3
+        wire_type = tag & 7
+        if wire_type == WIRE_BYTES:
+            length, pos = read_varint(buf, pos)
+            value_end = pos + length
+            if value_end > end:
+                raise ProtobufError("Поле выходит за границы сообщения")
+            yield field_no, wire_type, (pos, value_end)
+            pos = value_end
+        elif wire_type == WIRE_VARINT:
+            value, pos = read_varint(buf, pos)
+            yield field_no, wire_type, value
+        else:
+            value_start = pos
+            pos = skip_field(buf, pos, wire_type)
+            yield field_no, wire_type, (value_start, pos)
+
+
+def encode_varint(value):
+    """Кодирует неотрицательное число в varint"""
+    if value < 0:
+        value &= (1 << 64) - 1
+    out = bytearray()
+    while True:
+        b = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def encode_key(field_no, wire_type):
+    """Кодирует тег поля"""
+    return encode_varint((field_no << 3) | wire_type)
@@ -0,0 +1,136 @@
+"""Гонка серверов: параллельный замер TCP и TLS/Reality рукопожатия.
+
+Для каждого сервера замеряется установка TCP-соединения и TLS-рукопожатие
+с SNI из ключа (Reality-сервер для непрошедших аутентификацию клиентов
+ведет себя как обычный TLS-сайт). Число одновременных замеров ограничено,
+результаты кэшируются с TTL, чтобы переподключение не запускало гонку заново.
+"""
+
+import asyncio
+import ssl
+import time
+from collections import namedtuple
+
+# Результат замера: время этапов в секундах, total - сумма для сравнения
+RaceResult = namedtuple("RaceResult", ["server", "port", "ok", "tcp", "tls", "total", "error", "cached"])
+
+TLS_SECURITIES = ("tls", "reality")
+
+
+def _tls_context():
+    # Сертификат не проверяется: нас интересует только время рукопожатия
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def measure_server(server, port, sni="", security="reality", timeout=3.0, ssl_context=None):
+    """Замеряет TCP connect и (для tls/reality) TLS-рукопожатие до server:port"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(server, port), timeout)
+    except asyncio.TimeoutError:
+        return RaceResult(server, port, False, None, None, None, "таймаут TCP", False)
+    except OSError as e:
+        return RaceResult(server, port, False, None, None, None, str(e) or type(e).__name__, False)
+    tcp = time.perf_counter() - start
+
+    tls = 0.0
+    transport = writer.transport
+    try:
+        if security in TLS_SECURITIES:
+            tls_start = time.perf_counter()
+            remaining = max(timeout - tcp, 0.001)
+            transport = await asyncio.wait_for(
+                loop.start_tls(transport, transport.get_protocol(), ssl_context or _tls_context(),
+                               server_hostname=sni or server),
+                remaining
+            )
+            tls = time.perf_counter() - tls_start
+    except asyncio.TimeoutError:
+        return RaceResult(server, port, False, tcp, None, None, "таймаут TLS", False)
+    except (OSError, ssl.SSLError, ConnectionError) as e:
+        return RaceResult(server, port, False, tcp, None, None, str(e) or type(e).__name__, False)
+    finally:
+        transport.close()
+    return RaceResult(server, port, True, tcp, tls, tcp + tls, "", False)
+
+
+class LatencyRacer:
+    """Выбирает самый быстрый сервер из списка параметров parse_vless_url"""
+
+    def __init__(self, concurrency=8, timeout=3.0, ttl=300.0, measure=None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.ttl = ttl
+        self.measure = measure or measure_server
+        self._cache = {}
+
+    @staticmethod
+    def cache_key(params):
+        return params["server"], params["port"], params.get("sni", ""), params.get("security", "")
+
+    def cached(self, params, now=None):
+        """Результат из кэша, если он не старше ttl"""
+        entry = self._cache.get(self.cache_key(params))
+        if entry is None:
+            return None
+        stamp, result = entry
+        if (now or time.monotonic()) - stamp > self.ttl:
+            return None
+        return result._replace(cached=True)
+
+    def invalidate(self, params=None):
+        """Сбрасывает кэш для сервера или целиком"""
+        if params is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(self.cache_key(params), None)
+
+    async def race(self, params_list):
+        """Замеряет все серверы, возвращает [(RaceResult, params)] от быстрого к медленному.
+
+        Серверы с ошибкой идут в конце списка.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        now = time.monotonic()
+        pending = {}
+
+        async def run(key, params):
+            async with semaphore:
+                result = await self.measure(params["server"], params["port"], params.get("sni", ""),
+                                            params.get("security", "reality"), self.timeout)
+            self._cache[key] = (time.monotonic(), result)
+            return result
+
+        results = []
+        for params in params_list:
+            result = self.cached(params, now)
+            if result is not None:
+                results.append((result, params))
+                continue
+            # Одинаковые серверы в списке замеряются один раз
+            key = self.cache_key(params)
+            if key not in pending:
+                pending[key] = asyncio.ensure_future(run(key, params))
+            results.append((pending[key], params))
+
+        if pending:
+            await asyncio.gather(*pending.values())
+        results = [(item.result() if isinstance(item, asyncio.Future) else item, params)
+                   for item, params in results]
+        results.sort(key=lambda pair: (not pair[0].ok, pair[0].total if pair[0].ok else 0))
+        return results
+
+    async def best(self, params_list):
+        """Параметры самого быстрого доступного сервера и его результат, либо (None, None)"""
+        results = await self.race(params_list)
+        if results and results[0][0].ok:
+            return results[0][1], results[0][0]
+        return None, None
+
+    def race_sync(self, params_list):
+        """Синхронная обертка для вызова из рабочего потока"""
+        return asyncio.run(self.race(params_list))
@@ -0,0 +1,76 @@
+"""Настройки прокси Windows в реестре (HKCU\\...\\Internet Settings).
+
+WinRegistry импортирует winreg при первом обращении, поэтому модуль
+загружается и на других системах. FakeRegistry хранит значения в
+словаре - для проверок и бенчмарков без Windows.
+"""
+
+from collections import namedtuple
+
+INTERNET_SETTINGS = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+
+# Значения совпадают с winreg.REG_SZ и winreg.REG_DWORD
+REG_SZ = 1
+REG_DWORD = 4
+
+ProxySettings = namedtuple("ProxySettings", ["enabled", "server", "override"])
+PROXY_VALUES = ("ProxyEnable", "ProxyServer", "ProxyOverride")
+
+
+class WinRegistry:
+    """Значения в HKEY_CURRENT_USER"""
+
+    def read(self, path, names):
+        """{имя: значение} для существующих значений; пустой словарь, если ключа нет"""
+        import winreg
+
+        try:
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, path, 0, winreg.KEY_READ)
+        except OSError:
+            return {}
+        values = {}
+        with key:
+            for name in names:
+                try:
+                    values[name] = winreg.QueryValueEx(key, name)[0]
+                except OSError:
+                    pass
+        return values
+
+    def write(self, path, values):
+        """values: {имя: (тип, значение)}"""
+        import winreg
+
+        with winreg.CreateKeyEx(winreg.HKEY_CURRENT_USER, path, 0, winreg.KEY_WRITE) as key:
+            for name, (kind, value) in values.items():
+                winreg.SetValueEx(key, name, 0, kind, value)
+
+
+class FakeRegistry:
+    """Реестр в памяти: {(путь, имя): (тип, значение)}"""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.writes = 0
+
+    def read(self, path, names):
+        return {name: self.values[path, name][1] for name in names if (path, name) in self.values}
+
+    def write(self, path, values):
+        for name, item in values.items():
+            self.values[path, name] = item
+        self.writes += 1
+
+
+def read_proxy(registry):
+    """Текущие настройки прокси; отсутствующие значения - как при выключенном прокси"""
+    values = registry.read(INTERNET_SETTINGS, PROXY_VALUES)
+    return ProxySettings(values.get("ProxyEnable", 0), values.get("ProxyServer", ""), values.get("ProxyOverride", ""))
+
+
+def write_proxy(registry, settings):
+    registry.write(INTERNET_SETTINGS, {
+        "ProxyEnable": (REG_DWORD, int(settings.enabled)),
+        "ProxyServer": (REG_SZ, settings.server),
+        "ProxyOverride": (REG_SZ, settings.override),
+    })
@@ -0,0 +1,456 @@
+"""Офлайн-симулятор маршрутизации Xray: какое правило и выход получит соединение.
+
+Правила routing.rules проверяются по порядку, как в Xray: правило
+срабатывает, если выполнены все его условия (внутри одного условия
+достаточно любого значения), выигрывает первое сработавшее, без
+совпадений соединение уходит в первый выход конфига.
+
+Для пакетов соединений (route_many) каждое поле правил компилируется в
+индекс "значение -> битовая маска правил, чье условие на это поле
+выполнено" (бит i - правило i; правило без условия на поле входит во все
+маски). Маски полей соединения объединяются AND, первое правило - младший
+установленный бит. Порты - таблица на 65536 масок, IP и домены
+вычисляются один раз на уникальное значение (IPRangeSet, DomainMatcher).
+
+Поддерживаются условия inboundTag, network, protocol, port, ip (CIDR,
+geoip:, geoip:!) и domain (geosite:, domain:, full:, regexp:, keyword: и
+строка без префикса). domainStrategy IPOnDemand/IPIfNonMatch учитывается,
+если передана функция resolve(domain) -> IP.
+
+Запуск: python -m anonline.routing_sim config.json flows.csv [--geoip geoip.dat] [--geosite geosite.dat]
+"""
+
+import ipaddress
+import json
+import os
+import sys
+from collections import Counter, namedtuple
+from itertools import repeat
+from operator import and_, itemgetter, or_
+
+from .domain_matcher import DomainMatcher
+from .geoip import GeoIPFile, IPRangeSet, parse_address
+from .geosite import DOMAIN_DOMAIN, DOMAIN_FULL, DOMAIN_PLAIN, DOMAIN_REGEX, GeoSiteFile
+from .xray_config import ConfigError
+
+# Соединение: домен (после sniffing), IP назначения, порт, tcp/udp, протокол sniffing, тег входа;
+# network и protocol - строчными буквами, как их называет Xray
+Flow = namedtuple("Flow", ["domain", "ip", "port", "network", "protocol", "inbound_tag"],
+                  defaults=(None, None, 443, "tcp", None, None))
+
+# Результат: номер правила (None - правило не найдено, выход по умолчанию) и тег выхода
+Route = namedtuple("Route", ["rule", "outbound"])
+
+SUPPORTED_FIELDS = ("inboundTag", "network", "protocol", "port", "ip", "domain")
+_IGNORED_FIELDS = ("type", "outboundTag", "balancerTag", "ruleTag")
+_DOMAIN_PREFIXES = {"domain:": DOMAIN_DOMAIN, "full:": DOMAIN_FULL, "regexp:": DOMAIN_REGEX,
+                    "keyword:": DOMAIN_PLAIN}
+_NETWORKS = ("tcp", "udp")
+_PORTS = 65536
+
+
+def parse_ports(value):
+    """Диапазоны портов правила: 443, "53,443,1000-2000" -> [(53, 53), (443, 443), (1000, 2000)]"""
+    if isinstance(value, int):
+        return [(value, value)]
+    ranges = []
+    for part in str(value).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        low = int(low)
+        high = int(high) if high else low
+        if not 0 <= low <= high < _PORTS:
+            raise ValueError(f"неверный диапазон портов: {part}")
+        ranges.append((low, high))
+    return ranges
+
+
+def _as_list(value):
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return list(value)
+
+
+class _Rule:
+    """Разобранное правило: множества значений по полям (None - условия нет)"""
+
+    __slots__ = ("index", "outbound", "inbound_tags", "networks", "protocols", "ports", "ip_sets", "domains",
+                 "source")
+
+    def __init__(self, index, rule, geoip, geosite):
+        self.index = index
+        self.source = rule
+        self.outbound = rule.get("outboundTag") or rule.get("balancerTag")
+        unsupported = [field for field in rule if field not in SUPPORTED_FIELDS and field not in _IGNORED_FIELDS]
+        if unsupported:
+            raise ConfigError([f"правило {index}: условия {', '.join(unsupported)} симулятор не поддерживает"])
+        self.inbound_tags = set(_as_list(rule["inboundTag"])) if "inboundTag" in rule else None
+        self.networks = {net.lower() for net in _as_list(rule["network"])} if "network" in rule else None
+        self.protocols = {proto.lower() for proto in _as_list(rule["protocol"])} if "protocol" in rule else None
+        self.ports = None
+        if "port" in rule:
+            try:
+                self.ports = parse_ports(rule["port"])
+            except ValueError as e:
+                raise ConfigError([f"правило {index}: {e}"])
+        self.ip_sets = _ip_sets(index, _as_list(rule["ip"]), geoip) if "ip" in rule else None
+        self.domains = _domain_entries(index, _as_list(rule["domain"]), geosite) if "domain" in rule else None
+
+    def matches_ip(self, ip):
+        if ip is None:
+            return False
+        version, value = parse_address(ip)
+        return any(ranges.contains_int(value, version) for ranges in self.ip_sets)
+
+    def describe(self):
+        parts = []
+        for field in SUPPORTED_FIELDS:
+            if field in self.source:
+                value = self.source[field]
+                value = ",".join(map(str, value)) if isinstance(value, list) else str(value)
+                parts.append(f"{field}={value if len(value) <= 40 else value[:37] + '...'}")
+        return " ".join(parts)
+
+
+def _ip_sets(index, entries, geoip):
+    # Сети и положительные geoip сливаются в одно множество, geoip:! остаются отдельными
+    v4, v6 = [], []
+    sets = []
+    for entry in entries:
+        if entry.lower().startswith("geoip:"):
+            if geoip is None:
+                raise ConfigError([f"правило {index}: для {entry} нужен geoip.dat"])
+            try:
+                ranges = geoip.load_ref(entry)
+            except KeyError as e:
+                raise ConfigError([f"правило {index}: {e.args[0]}"])
+            if ranges.inverse:
+                sets.append(ranges)
+                continue
+            v4.extend(zip(ranges.v4_starts, ranges.v4_ends))
+            v6.extend(zip(ranges.v6_starts, ranges.v6_ends))
+            continue
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            raise ConfigError([f"правило {index}: неверный IP или CIDR {entry!r}"])
+        start, end = int(network.network_address), int(network.broadcast_address)
+        (v4 if network.version == 4 else v6).append((start, end))
+    if v4 or v6 or not sets:
+        sets.insert(0, IPRangeSet(v4, v6))
+    return sets
+
+
+def _domain_entries(index, entries, geosite):
+    # Пары (тип домена, значение) и ссылки geosite
+    result = []
+    for entry in entries:
+        lowered = entry.lower()
+        if lowered.startswith("geosite:"):
+            if geosite is None:
+                raise ConfigError([f"правило {index}: для {entry} нужен geosite.dat"])
+            if entry not in geosite:
+                raise ConfigError([f"правило {index}: категория geosite не найдена: {entry}"])
+            result.append(("geosite", entry))
+            continue
+        for prefix, domain_type in _DOMAIN_PREFIXES.items():
+            if lowered.startswith(prefix):
+                result.append((domain_type, entry[len(prefix):]))
+                break
+        else:
+            if ":" in entry:
+                raise ConfigError([f"правило {index}: неподдерживаемый вид домена {entry!r}"])
+            # Строка без префикса в Xray - подстрока
+            result.append((DOMAIN_PLAIN, entry))
+    return result
+
+
+class _MaskTable(dict):
+    """Словарь масок, досчитывающий отсутствующий ключ через compute"""
+
+    def __init__(self, compute):
+        super().__init__()
+        self.compute = compute
+
+    def __missing__(self, key):
+        mask = self[key] = self.compute(key)
+        return mask
+
+
+class RoutingSimulator:
+    """Маршрутизация соединений по routing.rules конфига Xray.
+
+    geoip/geosite - открытые GeoIPFile/GeoSiteFile (нужны, если правила
+    ссылаются на geoip:/geosite:). resolve(domain) -> IP или None
+    используется при domainStrategy IPOnDemand и IPIfNonMatch.
+    """
+
+    def __init__(self, config, geoip=None, geosite=None, resolve=None):
+        routing = config.get("routing", {})
+        self.domain_strategy = routing.get("domainStrategy", "AsIs")
+        self.resolve = resolve
+        outbounds = config.get("outbounds", [])
+        self.default_outbound = outbounds[0].get("tag") if outbounds else None
+        self.rules = [_Rule(index, rule, geoip, geosite) for index, rule in enumerate(routing.get("rules", []))]
+        self.hits = Counter()
+        self._routes = [Route(rule.index, rule.outbound) for rule in self.rules]
+        self._default_route = Route(None, self.default_outbound)
+        self._resolved = {}
+        self._compile(geosite)
+
+    def _compile(self, geosite):
+        rules = self.rules
+        self._all = (1 << len(rules)) - 1
+
+        def index_values(attribute, keys):
+            # Маска для каждого значения поля и маска для значения, которого нет в правилах
+            anything = 0
+            table = {}
+            for rule in rules:
+                values = getattr(rule, attribute)
+                bit = 1 << rule.index
+                if values is None:
+                    anything |= bit
+                    continue
+                for value in values:
+                    table[value] = table.get(value, 0) | bit
+            keys = set(keys) | set(table)
+            return {key: table.get(key, 0) | anything for key in keys}, anything
+
+        self._inbound_index, self._inbound_other = index_values("inbound_tags", ())
+        self._network_index, self._network_other = index_values("networks", _NETWORKS)
+        self._protocol_index, self._protocol_other = index_values("protocols", ())
+        # Входящий тег, сеть и протокол принимают считаные значения: маска их сочетания
+        # считается при первой встрече, дальше это один поиск в словаре вместо трех
+        self._header_masks = _MaskTable(self._header_mask)
+
+        # Порты: маска на каждый порт; между соседними границами диапазонов маска одна
+        port_ranges = [(1 << rule.index, rule.ports or [(0, _PORTS - 1)]) for rule in rules]
+        points = sorted({0, _PORTS}.union(*({low, high + 1} for _, ranges in port_ranges for low, high in ranges)))
+        port_masks = [0] * _PORTS
+        for start, end in zip(points, points[1:]):
+            mask = 0
+            for bit, ranges in port_ranges:
+                if any(low <= start <= high for low, high in ranges):
+                    mask |= bit
+            port_masks[start:end] = [mask] * (end - start)
+        self._port_masks = port_masks
+
+        self._ip_rules = [rule for rule in rules if rule.ip_sets is not None]
+        self._ip_other = self._all & ~sum(1 << rule.index for rule in self._ip_rules)
+
+        domain_rules = [rule for rule in rules if rule.domains is not None]
+        self._domain_other = self._all & ~sum(1 << rule.index for rule in domain_rules)
+        self._matcher = None
+        self._domain_rule_masks = {}
+        if domain_rules:
+            matcher = DomainMatcher()
+            for rule in domain_rules:
+                # Тег заводится и для правила без единого домена (пустая категория)
+                matcher.add_domains((), rule.index)
+                for domain_type, value in rule.domains:
+                    if domain_type == "geosite":
+                        matcher.add_domains(geosite.load_ref(value), rule.index)
+                    else:
+                        matcher.add(domain_type, value, rule.index)
+            self._matcher = matcher.compile()
+
+    # --- одно соединение: прямой перебор правил ---
+
+    def _rule_matches(self, rule, flow, ip):
+        if rule.inbound_tags is not None and flow.inbound_tag not in rule.inbound_tags:
+            return False
+        if rule.networks is not None and flow.network not in rule.networks:
+            return False
+        if rule.protocols is not None and flow.protocol not in rule.protocols:
+            return False
+        if rule.ports is not None and not any(low <= flow.port <= high for low, high in rule.ports):
+            return False
+        if rule.domains is not None:
+            if not flow.domain or not self._rule_mask_for_domain(flow.domain) >> rule.index & 1:
+                return False
+        if rule.ip_sets is not None and not rule.matches_ip(ip):
+            return False
+        return True
+
+    def route(self, flow, count=True):
+        """Route для одного соединения (правила перебираются по порядку)"""
+        ip = flow.ip
+        if ip is None and self.domain_strategy == "IPOnDemand":
+            ip = self._resolve(flow.domain)
+        route = self._first_match(flow, ip)
+        if route is None and flow.ip is None and self.domain_strategy == "IPIfNonMatch":
+            ip = self._resolve(flow.domain)
+            if ip is not None:
+                route = self._first_match(flow, ip)
+        route = route or self._default_route
+        if count:
+            self.hits[route.rule] += 1
+        return route
+
+    def _first_match(self, flow, ip):
+        for rule in self.rules:
+            if self._rule_matches(rule, flow, ip):
+                return self._routes[rule.index]
+        return None
+
+    def _rule_mask_for_domain(self, domain):
+        # Биты матчера - теги в порядке добавления, а не номера правил: перевод в маску правил
+        mask = self._domain_rule_masks.get(domain)
+        if mask is None:
+            mask = 0
+            for rule_index in self._matcher.tags_for_mask(self._matcher.match_mask(domain)):
+                mask |= 1 << rule_index
+            self._domain_rule_masks[domain] = mask
+        return mask
+
+    def _resolve(self, domain):
+        if not domain or self.resolve is None:
+            return None
+        if domain not in self._resolved:
+            self._resolved[domain] = self.resolve(domain)
+        return self._resolved[domain]
+
+    # --- пакет соединений: индексы полей и маски ---
+
+    def _ip_masks(self, ips):
+        # Маска ip-условий для каждого уникального адреса, затем отображение на соединения
+        unique = dict.fromkeys(ips, self._ip_other)
+        unique.pop(None, None)
+        # Строки IPv4 проверяются пачкой, остальные адреса разбираются один раз
+        v4 = [ip for ip in unique if ":" not in ip]
+        other = [ip for ip in unique if ":" in ip]
+        parsed = list(map(parse_address, other))
+        v4_masks = [self._ip_other] * len(v4)
+        other_masks = [self._ip_other] * len(other)
+        for rule in self._ip_rules:
+            bit_for = (0, 1 << rule.index)
+            for ranges in rule.ip_sets:
+                if v4:
+                    v4_masks = list(map(or_, v4_masks, map(bit_for.__getitem__, ranges.contains_many(v4))))
+                if other:
+                    hits = [ranges.contains_int(value, version) for version, value in parsed]
+                    other_masks = list(map(or_, other_masks, map(bit_for.__getitem__, hits)))
+        unique.update(zip(v4, v4_masks))
+        unique.update(zip(other, other_masks))
+        unique[None] = self._ip_other
+        return map(unique.__getitem__, ips)
+
+    def _domain_masks(self, domains):
+        if self._matcher is None:
+            return repeat(self._domain_other, len(domains))
+        table = {None: self._domain_other, "": self._domain_other}
+        for domain in dict.fromkeys(domains):
+            if domain not in table:
+                table[domain] = self._domain_other | self._rule_mask_for_domain(domain)
+        return map(table.__getitem__, domains)
+
+    def _header_mask(self, key):
+        inbound_tag, network, protocol = key
+        return (self._inbound_index.get(inbound_tag, self._inbound_other)
+                & self._network_index.get(network, self._network_other)
+                & self._protocol_index.get(protocol, self._protocol_other))
+
+    def _masks(self, flows, ips):
+        # Столбцы по отдельности: zip(*flows) на миллионе соединений в разы медленнее
+        domains, ports, networks, protocols, inbound_tags = (
+            list(map(itemgetter(Flow._fields.index(name)), flows))
+            for name in ("domain", "port", "network", "protocol", "inbound_tag"))
+        masks = map(self._port_masks.__getitem__, ports)
+        masks = map(and_, masks, map(self._header_masks.__getitem__, zip(inbound_tags, networks, protocols)))
+        masks = map(and_, masks, self._domain_masks(domains))
+        return list(map(and_, masks, self._ip_masks(ips)))
+
+    def route_many(self, flows, count=True):
+        """Список Route для пачки соединений; hits пополняется номерами правил"""
+        flows = flows if isinstance(flows, list) else list(flows)
+        if not flows:
+            return []
+        ips = list(map(itemgetter(Flow._fields.index("ip")), flows))
+        if self.domain_strategy == "IPOnDemand" and self.resolve is not None:
+            ips = [ip if ip is not None else self._resolve(flow.domain) for ip, flow in zip(ips, flows)]
+        masks = self._masks(flows, ips)
+        if self.domain_strategy == "IPIfNonMatch" and self.resolve is not None:
+            retry = [i for i, mask in enumerate(masks) if not mask and ips[i] is None and flows[i].domain]
+            if retry:
+                retry_ips = [self._resolve(flows[i].domain) for i in retry]
+                for i, mask in zip(retry, self._masks([flows[i] for i in retry], retry_ips)):
+                    masks[i] = mask
+        # Различных масок немного: первое правило (младший бит) считается один раз на маску
+        mask_counts = Counter(masks)
+        routes = {mask: self._routes[(mask & -mask).bit_length() - 1] if mask else self._default_route
+                  for mask in mask_counts}
+        if count:
+            for mask, hits in mask_counts.items():
+                self.hits[routes[mask].rule] += hits
+        return list(map(routes.__getitem__, masks))
+
+    def hit_report(self):
+        """Строки отчета: число соединений по каждому правилу в порядке правил"""
+        lines = []
+        for rule in self.rules:
+            lines.append(f"{rule.index:>3}  {self.hits.get(rule.index, 0):>10}  -> {rule.outbound:<8} "
+                         f"{rule.describe()}")
+        lines.append(f"  -  {self.hits.get(None, 0):>10}  -> {self.default_outbound} (нет совпадений)")
+        return lines
+
+
+def read_flows(path):
+    """Соединения из CSV с заголовком (domain,ip,port,network,protocol,inbound_tag) или JSON Lines"""
+    flows = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            import csv
+
+            rows = csv.DictReader(f)
+        for row in rows:
+            values = {name: (row.get(name) or None) for name in Flow._fields}
+            values["port"] = int(values["port"] or 0)
+            values["network"] = values["network"] or "tcp"
+            flows.append(Flow(**values))
+    return flows
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m anonline.routing_sim",
+                                     description="Куда Xray направит соединения по правилам конфига")
+    parser.add_argument("config", help="config.json Xray")
+    parser.add_argument("flows", help="CSV (domain,ip,port,network,protocol,inbound_tag) или .jsonl")
+    parser.add_argument("--geoip", default="geoip.dat", help="geoip.dat для правил geoip:")
+    parser.add_argument("--geosite", default="geosite.dat", help="geosite.dat для правил geosite:")
+    parser.add_argument("--summary", action="store_true", help="только число попаданий по правилам")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    geoip = GeoIPFile(args.geoip) if os.path.exists(args.geoip) else None
+    geosite = GeoSiteFile(args.geosite) if os.path.exists(args.geosite) else None
+    try:
+        simulator = RoutingSimulator(config, geoip=geoip, geosite=geosite)
+        flows = read_flows(args.flows)
+        routes = simulator.route_many(flows)
+    except ConfigError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    finally:
+        for reader in (geoip, geosite):
+            if reader is not None:
+                reader.close()
+    if not args.summary:
+        for flow, route in zip(flows, routes):
+            target = flow.domain or flow.ip
+            rule = "-" if route.rule is None else route.rule
+            inbound = f" [{flow.inbound_tag}]" if flow.inbound_tag else ""
+            print(f"{flow.network}:{target}:{flow.port}{inbound} -> {route.outbound} (правило {rule})")
+    print("\n".join(simulator.hit_report()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
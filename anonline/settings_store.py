@@ -0,0 +1,256 @@
+"""Единое хранилище настроек с версией схемы и отложенной записью.
+
+Все настройки (включая ключ) лежат в одном JSON-файле
+{"version": N, "settings": {...}} в каталоге настроек пользователя, а не
+в текущем каталоге. При первом запуске они переносятся из файлов
+прежних версий: vless_settings.json (плоский словарь, схема 1) и
+vless_key.txt (ключ из него важнее ключа в vless_settings.json, как при
+прежней загрузке). Старые файлы не удаляются.
+
+set()/update() только меняют словарь в памяти и будят фоновый поток
+записи: он ждет delay секунд, собирая все изменения за это время, и
+записывает файл один раз. Запись атомарная (временный файл, fsync,
+os.replace), поэтому при сбое на диске остается либо старый, либо новый
+файл целиком. Если запись не удалась, поток не повторяет ее по кругу:
+изменения остаются pending, ошибка - в last_error, следующая попытка -
+после следующего update() или в close(). close() дописывает накопленное
+и останавливает поток.
+
+Неразбираемый файл откладывается в сторону (.bad). Файл более новой
+схемы не трогается: хранилище переходит в режим только чтения, чтобы
+старая версия программы не затерла настройки новой.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+
+SCHEMA_VERSION = 2
+SETTINGS_NAME = "settings.json"
+LEGACY_SETTINGS = "vless_settings.json"
+LEGACY_KEY = "vless_key.txt"
+
+DEFAULTS = {
+    "key": "",
+    "max_anonymity": True,
+    "disable_ipv6": True,
+    "block_webrtc": True,
+    "firewall_killswitch": True,
+    "use_local_dns": True,
+    "hide_system_time": True,
+    "console_max_lines": 5000,
+    "xray_stats": True,
+}
+
+
+def settings_dir():
+    """Каталог настроек пользователя: %APPDATA%\\AnonLine или ~/.config/anonline"""
+    if sys.platform == "win32" and os.environ.get("APPDATA"):
+        return os.path.join(os.environ["APPDATA"], "AnonLine")
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "anonline")
+
+
+class NewerSchemaError(ValueError):
+    """Файл настроек записан более новой версией программы"""
+
+
+def _from_v1(data):
+    # Схема 1 - плоский словарь vless_settings.json
+    return {"version": 2, "settings": dict(data)}
+
+
+# Версия -> функция, переводящая документ на следующую версию
+MIGRATIONS = {1: _from_v1}
+
+
+def migrate(data):
+    """Поднимает документ до SCHEMA_VERSION; документ без поля version считается схемой 1"""
+    version = data.get("version", 1) if "settings" in data else 1
+    if version > SCHEMA_VERSION:
+        raise NewerSchemaError(f"настройки записаны более новой версией (схема {version})")
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version = data["version"]
+    return data
+
+
+def read_legacy(directory):
+    """Настройки из vless_settings.json и vless_key.txt (None, если файлов нет)"""
+    settings_path = os.path.join(directory, LEGACY_SETTINGS)
+    key_path = os.path.join(directory, LEGACY_KEY)
+    found = False
+    data = {}
+    if os.path.exists(settings_path):
+        with open(settings_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        found = True
+    if os.path.exists(key_path):
+        with open(key_path, "r", encoding="utf-8") as f:
+            key = f.read().strip()
+        if key.startswith("vless://"):
+            data["key"] = key
+        found = True
+    return migrate(data) if found else None
+
+
+def write_atomic(path, data):
+    """Записывает байты через временный файл и os.replace"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".settings-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class SettingsStore:
+    """Настройки в памяти с фоновой записью на диск.
+
+    path=None - settings.json в settings_dir(); legacy_dir - каталог, в
+    котором искать файлы прежних версий (None - не переносить).
+    delay - сколько секунд собирать изменения перед записью.
+    """
+
+    def __init__(self, path=None, legacy_dir=None, delay=0.5, defaults=DEFAULTS):
+        self.path = path or os.path.join(settings_dir(), SETTINGS_NAME)
+        self.legacy_dir = legacy_dir
+        self.delay = delay
+        self.defaults = dict(defaults)
+        self.migrated = False
+        self.read_only = False
+        self.writes = 0
+        self.bytes_written = 0
+        self.last_error = ""
+        self._values = dict(defaults)
+        self._version = 0
+        self._saved_version = 0
+        # Версия, которую записать не удалось: фоновый поток ждет новых изменений
+        self._failed_version = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closing = False
+
+    def load(self):
+        """Читает файл (или переносит настройки прежних версий); возвращает словарь настроек"""
+        data = None
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                try:
+                    document = json.load(f)
+                except ValueError:
+                    document = None
+            if not isinstance(document, dict) or not isinstance(document.get("settings", {}), dict):
+                # Файл не перезаписывается настройками по умолчанию, а откладывается в сторону
+                os.replace(self.path, self.path + ".bad")
+                raise ValueError(f"файл настроек поврежден и отложен в {self.path}.bad")
+            try:
+                data = migrate(document)
+            except NewerSchemaError:
+                # Файл остается как есть, изменения в этом запуске на диск не пишутся
+                self.read_only = True
+                raise
+        elif self.legacy_dir is not None:
+            data = read_legacy(self.legacy_dir)
+            self.migrated = data is not None
+        with self._lock:
+            self._values = dict(self.defaults)
+            if data is not None:
+                self._values.update(data["settings"])
+        if self.migrated:
+            self.flush()
+        return self.snapshot()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def get(self, name, default=None):
+        with self._lock:
+            return self._values.get(name, default)
+
+    def __getitem__(self, name):
+        with self._lock:
+            return self._values[name]
+
+    def set(self, name, value):
+        return self.update({name: value})
+
+    def update(self, values):
+        """Меняет настройки; запись на диск откладывается. True - что-то изменилось"""
+        with self._lock:
+            changed = {name: value for name, value in values.items() if self._values.get(name) != value}
+            if not changed:
+                return False
+            self._values.update(changed)
+            self._version += 1
+            if self._thread is None and not self._closing and not self.read_only:
+                self._thread = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+                self._thread.start()
+            self._changed.notify()
+        return True
+
+    @property
+    def pending(self):
+        """Есть ли изменения, еще не записанные на диск"""
+        with self._lock:
+            return self._version != self._saved_version
+
+    def _run(self):
+        with self._lock:
+            while not self._closing:
+                if self._version in (self._saved_version, self._failed_version):
+                    self._changed.wait()
+                    continue
+                # Окно сбора изменений: новые set() за это время попадут в ту же запись
+                self._changed.wait_for(lambda: self._closing, self.delay)
+                self._lock.release()
+                try:
+                    self.flush()
+                finally:
+                    self._lock.acquire()
+
+    def flush(self):
+        """Записывает накопленные изменения сейчас; False - записать не удалось"""
+        if self.read_only:
+            self.last_error = "файл настроек записан более новой версией и не изменяется"
+            return False
+        with self._write_lock:
+            with self._lock:
+                if self._version == self._saved_version and os.path.exists(self.path):
+                    return True
+                version = self._version
+                document = {"version": SCHEMA_VERSION, "settings": dict(self._values)}
+            data = json.dumps(document, ensure_ascii=False, indent=2).encode("utf-8")
+            try:
+                write_atomic(self.path, data)
+            except OSError as e:
+                with self._lock:
+                    self._failed_version = version
+                self.last_error = str(e)
+                return False
+            with self._lock:
+                self._saved_version = version
+            self.writes += 1
+            self.bytes_written += len(data)
+            return True
+
+    def close(self, timeout=2.0):
+        """Останавливает фоновый поток и записывает оставшиеся изменения"""
+        with self._lock:
+            self._closing = True
+            self._changed.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.flush() if self.pending else True
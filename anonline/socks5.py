@@ -0,0 +1,106 @@
+"""Минимальный асинхронный клиент SOCKS5 (без аутентификации, только CONNECT).
+
+Имя хоста передается прокси как есть (ATYP=3), поэтому DNS-запрос
+выполняет Xray на своей стороне, а не локальная система.
+"""
+
+import asyncio
+import ipaddress
+import struct
+import time
+from collections import namedtuple
+
+SOCKS_VERSION = 5
+AUTH_NONE = 0
+CMD_CONNECT = 1
+ATYP_IPV4 = 1
+ATYP_DOMAIN = 3
+ATYP_IPV6 = 4
+
+REPLY_MESSAGES = {
+    1: "общий сбой SOCKS-сервера",
+    2: "соединение запрещено правилами",
+    3: "сеть недоступна",
+    4: "хост недоступен",
+    5: "в соединении отказано",
+    6: "истек TTL",
+    7: "команда не поддерживается",
+    8: "тип адреса не поддерживается",
+}
+
+# Время этапов подключения в секундах
+Socks5Timings = namedtuple("Socks5Timings", ["tcp", "handshake", "connect"])
+
+
+class Socks5Error(ConnectionError):
+    """Ошибка протокола SOCKS5 или отказ прокси"""
+
+
+def encode_address(host, port):
+    """Кодирует адрес назначения: ATYP + адрес + порт"""
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        raw = host.encode("idna")
+        if len(raw) > 255:
+            raise Socks5Error(f"Слишком длинное имя хоста: {host}")
+        return bytes([ATYP_DOMAIN, len(raw)]) + raw + struct.pack("!H", port)
+    atyp = ATYP_IPV4 if ip.version == 4 else ATYP_IPV6
+    return bytes([atyp]) + ip.packed + struct.pack("!H", port)
+
+
+async def _read_bound_address(reader):
+    atyp = (await reader.readexactly(1))[0]
+    if atyp == ATYP_IPV4:
+        await reader.readexactly(4 + 2)
+    elif atyp == ATYP_IPV6:
+        await reader.readexactly(16 + 2)
+    elif atyp == ATYP_DOMAIN:
+        length = (await reader.readexactly(1))[0]
+        await reader.readexactly(length + 2)
+    else:
+        raise Socks5Error(f"Неизвестный тип адреса в ответе: {atyp}")
+
+
+async def socks5_handshake(reader, writer):
+    """Приветствие: предлагаем только метод без аутентификации"""
+    writer.write(bytes([SOCKS_VERSION, 1, AUTH_NONE]))
+    await writer.drain()
+    version, method = await reader.readexactly(2)
+    if version != SOCKS_VERSION:
+        raise Socks5Error(f"Неверная версия SOCKS в ответе: {version}")
+    if method != AUTH_NONE:
+        raise Socks5Error("Прокси требует аутентификацию")
+
+
+async def socks5_connect(reader, writer, host, port):
+    """Команда CONNECT к host:port через уже поприветствованный прокси"""
+    writer.write(bytes([SOCKS_VERSION, CMD_CONNECT, 0]) + encode_address(host, port))
+    await writer.drain()
+    version, reply, _ = await reader.readexactly(3)
+    if version != SOCKS_VERSION:
+        raise Socks5Error(f"Неверная версия SOCKS в ответе: {version}")
+    if reply != 0:
+        raise Socks5Error(REPLY_MESSAGES.get(reply, f"код ответа {reply}"))
+    await _read_bound_address(reader)
+
+
+async def open_socks5_connection(proxy_host, proxy_port, host, port):
+    """Открывает туннель к host:port через SOCKS5.
+
+    Возвращает (reader, writer, Socks5Timings). Таймаут задает вызывающий
+    код через asyncio.wait_for.
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(proxy_host, proxy_port)
+    try:
+        tcp_done = time.perf_counter()
+        await socks5_handshake(reader, writer)
+        handshake_done = time.perf_counter()
+        await socks5_connect(reader, writer, host, port)
+        connect_done = time.perf_counter()
+    except BaseException:
+        writer.close()
+        raise
+    timings = Socks5Timings(tcp_done - start, handshake_done - tcp_done, connect_done - handshake_done)
+    return reader, writer, timings
@@ -0,0 +1,107 @@
+"""Трассировка запуска: интервалы фаз от старта процесса до первой отрисовки.
+
+Модуль импортируется первым в скрипте GUI, поэтому момент его загрузки
+считается началом отсчета. Фазы (импорты, QApplication, initUI,
+загрузка настроек, первая отрисовка) отмечаются start/stop или блоком
+with TRACER.span(...); вложенные фазы выводятся в отчете с отступом.
+finish() закрывает незавершенные фазы, фиксирует время до первой
+отрисовки и вызывает подписчиков (запись отчета, выход в бенчмарке).
+
+Если задана переменная окружения ANONLINE_STARTUP_TRACE, GUI пишет
+отчет: "-" - текстом в stderr, иначе JSON в указанный файл.
+"""
+
+import json
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+STARTUP_TRACE_ENV = "ANONLINE_STARTUP_TRACE"
+
+# start/end - миллисекунды от начала отсчета, depth - вложенность
+Span = namedtuple("Span", ["name", "start", "end", "depth"])
+
+
+class StartupTracer:
+    """Интервалы фаз запуска (на одном потоке - потоке GUI)"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.origin = clock()
+        self.spans = []
+        self.total = None
+        self._open = {}
+        self._listeners = []
+
+    @property
+    def finished(self):
+        return self.total is not None
+
+    def _now(self):
+        return (self.clock() - self.origin) * 1000
+
+    def start(self, name):
+        self._open[name] = (self._now(), len(self._open))
+
+    def stop(self, name):
+        start, depth = self._open.pop(name)
+        self.spans.append(Span(name, start, self._now(), depth))
+
+    @contextmanager
+    def span(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def on_finish(self, callback):
+        """callback() вызывается один раз, когда запуск завершен"""
+        self._listeners.append(callback)
+
+    def finish(self):
+        """Закрывает открытые фазы и фиксирует общее время; повторный вызов ничего не делает"""
+        if self.finished:
+            return
+        for name in sorted(self._open, key=lambda name: self._open[name][1], reverse=True):
+            self.stop(name)
+        self.total = self._now()
+        for callback in self._listeners:
+            callback()
+
+    def duration(self, name):
+        """Длительность фазы в мс (None, если фаза не записана)"""
+        for span in self.spans:
+            if span.name == name:
+                return span.end - span.start
+        return None
+
+    def report(self):
+        """Текстовый отчет: фазы в порядке начала с длительностью и интервалом"""
+        width = max([len(span.name) + 2 * span.depth for span in self.spans] + [10])
+        total = f"{self.total:.1f} мс" if self.finished else "не завершен"
+        lines = [f"Запуск до первой отрисовки: {total}"]
+        for span in sorted(self.spans, key=lambda span: (span.start, span.depth)):
+            title = "  " * span.depth + span.name
+            lines.append(f"  {title:<{width}} {span.end - span.start:8.1f} мс"
+                         f"  [{span.start:7.1f} .. {span.end:7.1f}]")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            "total_ms": self.total,
+            "spans": [span._asdict() for span in sorted(self.spans, key=lambda span: (span.start, span.depth))],
+        }
+
+    def dump(self, target):
+        """Пишет отчет: "-" - текстом в stderr, иначе JSON в файл target"""
+        if target == "-":
+            print(self.report(), file=sys.stderr)
+            return
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+# Общий трассировщик процесса: отсчет идет с первого импорта модуля
+TRACER = StartupTracer()
@@ -0,0 +1,162 @@
+"""Параллельное выполнение шагов настройки с зависимостями и откатом.
+
+Шаги (отключение IPv6, правила брандмауэра, запуск Xray, DNS...) образуют
+граф: шаг запускается в пуле потоков, как только успешно завершены все
+шаги из его after. Независимые шаги идут одновременно.
+
+Неудача обычного шага - только предупреждение: зависящие от него шаги
+пропускаются, остальные продолжаются. Неудача обязательного шага
+(required) останавливает запуск новых шагов и, когда текущие завершатся,
+откатывает в обратном порядке все выполненные шаги, а также неудавшиеся:
+шаг мог выполниться частично (Xray запущен, но не дождался готовности).
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# run() -> False означает неудачу (как у методов настройки), исключение - тоже.
+# Шаги из after, которых нет в списке, игнорируются: так проще выключать опции.
+Step = namedtuple("Step", ["name", "run", "rollback", "after", "required"], defaults=(None, (), False))
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+ROLLED_BACK = "rolled_back"
+
+# started - смещение от начала выполнения, elapsed - длительность шага, секунды
+StepResult = namedtuple("StepResult", ["name", "status", "started", "elapsed", "error"])
+
+
+class StepReport:
+    """Итог выполнения: результаты по шагам и общее время"""
+
+    def __init__(self, results, elapsed, aborted):
+        self.results = results
+        self.elapsed = elapsed
+        self.aborted = aborted
+
+    @property
+    def ok(self):
+        return not self.aborted
+
+    @property
+    def sequential(self):
+        """Сколько заняли бы выполненные шаги, если бы шли по очереди"""
+        return sum(result.elapsed for result in self.results.values() if result.elapsed is not None)
+
+    def failed(self):
+        return [result for result in self.results.values() if result.status == FAILED]
+
+    def summary(self):
+        parts = []
+        for result in sorted(self.results.values(), key=lambda r: (r.started is None, r.started or 0)):
+            if result.elapsed is None:
+                parts.append(f"{result.name}: {result.status}")
+            else:
+                mark = "" if result.status == OK else f" ({result.status})"
+                parts.append(f"{result.name} {result.elapsed * 1000:.0f} мс{mark}")
+        return (f"{', '.join(parts)}; всего {self.elapsed * 1000:.0f} мс "
+                f"(по очереди было бы {self.sequential * 1000:.0f} мс)")
+
+
+def _check_graph(steps):
+    names = {}
+    for step in steps:
+        if step.name in names:
+            raise ValueError(f"Шаг {step.name!r} указан дважды")
+        names[step.name] = step
+    # Поиск цикла обходом в глубину
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 1:
+            raise ValueError(f"Циклическая зависимость шагов: {' -> '.join(path + [name])}")
+        if state.get(name) == 2:
+            return
+        state[name] = 1
+        for dep in names[name].after:
+            if dep in names:
+                visit(dep, path + [name])
+        state[name] = 2
+
+    for name in names:
+        visit(name, [])
+    return names
+
+
+def _call(step):
+    start = time.perf_counter()
+    try:
+        ok = step.run() is not False
+        error = "" if ok else "шаг вернул False"
+    except Exception as e:
+        ok = False
+        error = str(e) or type(e).__name__
+    return ok, time.perf_counter() - start, error
+
+
+def run_steps(steps, max_workers=4, on_step=None):
+    """Выполняет шаги по графу зависимостей, возвращает StepReport.
+
+    on_step(StepResult) вызывается в потоке вызывающего по мере завершения
+    шагов (и откатов).
+    """
+    steps = list(steps)
+    by_name = _check_graph(steps)
+    results = {}
+    finished = []
+    pending = {step.name: step for step in steps}
+    running = {}
+    aborted = False
+    origin = time.perf_counter()
+
+    def finish(result):
+        results[result.name] = result
+        if on_step is not None:
+            on_step(result)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="connect-step") as pool:
+        while pending or running:
+            if not aborted:
+                for name, step in list(pending.items()):
+                    deps = [dep for dep in step.after if dep in by_name]
+                    if any(dep in results and results[dep].status != OK for dep in deps):
+                        del pending[name]
+                        finish(StepResult(name, SKIPPED, None, None, "не выполнен шаг, от которого он зависит"))
+                    elif all(dep in results for dep in deps):
+                        del pending[name]
+                        started = time.perf_counter() - origin
+                        running[pool.submit(_call, step)] = (step, started)
+            else:
+                for name in list(pending):
+                    del pending[name]
+                    finish(StepResult(name, SKIPPED, None, None, "выполнение прервано"))
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step, started = running.pop(future)
+                ok, elapsed, error = future.result()
+                finish(StepResult(step.name, OK if ok else FAILED, started, elapsed, error))
+                finished.append(step)
+                if not ok and step.required:
+                    aborted = True
+
+    if aborted:
+        # Откат в обратном порядке завершения, в потоке вызывающего
+        for step in reversed(finished):
+            if step.rollback is None:
+                continue
+            try:
+                step.rollback()
+                error = ""
+            except Exception as e:
+                error = f"ошибка отката: {e}"
+            result = results[step.name]
+            if result.status == OK:
+                finish(result._replace(status=ROLLED_BACK, error=error))
+            elif error:
+                # Неудавшийся шаг остается FAILED, к причине добавляется ошибка отката
+                finish(result._replace(error=f"{result.error}; {error}"))
+    return StepReport(results, time.perf_counter() - origin, aborted)
@@ -0,0 +1,199 @@
+"""Импорт подписок: base64-блоб со списком vless:// ссылок.
+
+Ссылки извлекаются одним проходом скомпилированного регулярного выражения
+по всему декодированному тексту (или по кускам при потоковом чтении),
+дубликаты по (uuid, server, port, pbk, sid) отбрасываются. Результат -
+компактные записи VlessLink со __slots__, совместимые с parse_vless_url.
+"""
+
+import base64
+import binascii
+import re
+from urllib.parse import unquote_plus
+
+# uuid@host[:port][/path][?query][#fragment] до пробела или конца строки
+_LINK_RE = re.compile(
+    r"vless://([^@\s/?#]+)@([^:/?#\s]*)(?::([^/?#\s]*))?[^?#\s]*(?:\?([^#\s]*))?(?:#(\S*))?"
+)
+
+_PLAIN_MARKER = "://"
+_CHUNK_SIZE = 1 << 20
+
+
+class VlessLink:
+    """Разобранная vless:// ссылка"""
+
+    __slots__ = ("uuid", "server", "port", "type", "security", "fp", "pbk", "sni", "flow", "sid", "spx",
+                 "fragment")
+
+    def __init__(self, uuid, server, port, query, fragment):
+        # Значения по умолчанию как в parse_vless_url
+        self.uuid = uuid
+        self.server = server
+        self.port = port
+        self.type = query.get("type", "tcp")
+        self.security = query.get("security", "reality")
+        self.fp = query.get("fp", "chrome")
+        self.pbk = query.get("pbk", "")
+        self.sni = query.get("sni", "")
+        self.flow = query.get("flow", "")
+        self.sid = query.get("sid", "")
+        self.spx = query.get("spx", "/")
+        self.fragment = fragment
+
+    @property
+    def key(self):
+        """Ключ для поиска дубликатов"""
+        return self.uuid, self.server, self.port, self.pbk, self.sid
+
+    def to_params(self):
+        """Словарь в формате parse_vless_url"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"VlessLink({self.server}:{self.port}, {self.fragment!r})"
+
+
+class SubscriptionStats:
+    """Счетчики разбора подписки"""
+
+    __slots__ = ("total", "parsed", "duplicates", "invalid")
+
+    def __init__(self):
+        self.total = 0
+        self.parsed = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+    def __repr__(self):
+        return (f"SubscriptionStats(total={self.total}, parsed={self.parsed}, "
+                f"duplicates={self.duplicates}, invalid={self.invalid})")
+
+
+def _parse_query(raw):
+    # Как parse_qs: берется первое значение, пустые значения пропускаются
+    query = {}
+    if not raw:
+        return query
+    for pair in raw.split("&"):
+        name, _, value = pair.partition("=")
+        if not value or name in query:
+            continue
+        if "%" in value or "+" in value:
+            value = unquote_plus(value)
+        if "%" in name or "+" in name:
+            name = unquote_plus(name)
+        query[name] = value
+    return query
+
+
+def _b64decode(text):
+    text = "".join(text.split())
+    text += "=" * (-len(text) % 4)
+    try:
+        if "-" in text or "_" in text:
+            return base64.urlsafe_b64decode(text)
+        return base64.b64decode(text)
+    except (binascii.Error, ValueError):
+        raise ValueError("Подписка не является base64 и не содержит vless:// ссылок")
+
+
+def decode_subscription(blob):
+    """Текст подписки: base64 декодируется, обычный список ссылок возвращается как есть"""
+    if isinstance(blob, bytes):
+        blob = blob.decode("utf-8", errors="replace")
+    blob = blob.strip()
+    if _PLAIN_MARKER in blob:
+        return blob
+    return _b64decode(blob).decode("utf-8", errors="replace")
+
+
+def iter_links(text, stats=None, seen=None):
+    """Перебирает уникальные ссылки в тексте одним проходом регулярного выражения"""
+    if seen is None:
+        seen = set()
+    for match in _LINK_RE.finditer(text):
+        if stats is not None:
+            stats.total += 1
+        uuid, server, port, query, fragment = match.groups()
+        try:
+            port = int(port) if port is not None else 443
+        except ValueError:
+            if stats is not None:
+                stats.invalid += 1
+            continue
+        if not server:
+            if stats is not None:
+                stats.invalid += 1
+            continue
+        link = VlessLink(uuid, server, port, _parse_query(query), fragment or "")
+        key = link.key
+        if key in seen:
+            if stats is not None:
+                stats.duplicates += 1
+            continue
+        seen.add(key)
+        if stats is not None:
+            stats.parsed += 1
+        yield link
+
+
+def parse_subscription(blob, stats=None):
+    """Список уникальных VlessLink из подписки (base64 или обычный текст)"""
+    return list(iter_links(decode_subscription(blob), stats))
+
+
+def _iter_decoded_chunks(stream, chunk_size):
+    """Текст потока по кускам; base64 декодируется кратно 4 символам"""
+    first = stream.read(chunk_size)
+    if isinstance(first, bytes):
+        read = lambda: stream.read(chunk_size).decode("utf-8", errors="replace")  # noqa: E731
+        first = first.decode("utf-8", errors="replace")
+    else:
+        read = lambda: stream.read(chunk_size)  # noqa: E731
+
+    if _PLAIN_MARKER in first:
+        chunk = first
+        while chunk:
+            yield chunk
+            chunk = read()
+        return
+
+    # base64: переносы строк внутри блоба допускаются
+    pending = ""
+    raw = b""
+    chunk = first
+    while chunk:
+        pending += "".join(chunk.split())
+        usable = len(pending) - len(pending) % 4
+        if usable:
+            raw += _b64decode(pending[:usable])
+            pending = pending[usable:]
+            # Не режем многобайтный символ UTF-8 на границе куска
+            cut = raw.rfind(b"\n") + 1
+            if cut:
+                yield raw[:cut].decode("utf-8", errors="replace")
+                raw = raw[cut:]
+        chunk = read()
+    if pending:
+        raw += _b64decode(pending)
+    if raw:
+        yield raw.decode("utf-8", errors="replace")
+
+
+def iter_subscription_stream(stream, stats=None, chunk_size=_CHUNK_SIZE):
+    """Потоковый разбор подписки из файла (текстового или бинарного).
+
+    В памяти держится только текущий кусок и множество ключей дубликатов.
+    """
+    seen = set()
+    tail = ""
+    for chunk in _iter_decoded_chunks(stream, chunk_size):
+        text = tail + chunk
+        # Последняя строка может быть обрезана - переносим ее в следующий кусок
+        cut = text.rfind("\n") + 1
+        tail = text[cut:]
+        if cut:
+            yield from iter_links(text[:cut], stats, seen)
+    if tail:
+        yield from iter_links(tail, stats, seen)
@@ -0,0 +1,61 @@
+"""Разбор ссылок vless:// без зависимости от GUI"""
+
+import re
+import urllib.parse
+
+# Граница очередного ключа; запятые внутри ключа (alpn=h2,http/1.1) ее не образуют
+_KEY_START_RE = re.compile(r"(?=vless://)")
+
+
+def parse_vless_url(url):
+    """Парсит VLESS-ссылку.
+
+    Возвращает словарь параметров или None, если это не vless:// ссылка
+    с пользователем и сервером. Некорректный порт вызывает ValueError.
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme != "vless":
+        return None
+
+    # Извлечение основных параметров
+    netloc = parsed.netloc.split('@')
+    if len(netloc) < 2:
+        return None
+
+    uuid = netloc[0]
+    server_port = netloc[1].split(':')
+    server = server_port[0]
+    port = int(server_port[1]) if len(server_port) > 1 else 443
+
+    query = urllib.parse.parse_qs(parsed.query)
+
+    return {
+        "uuid": uuid,
+        "server": server,
+        "port": port,
+        "type": query.get('type', ['tcp'])[0],
+        "security": query.get('security', ['reality'])[0],
+        "fp": query.get('fp', ['chrome'])[0],
+        "pbk": query.get('pbk', [''])[0],
+        "sni": query.get('sni', [''])[0],
+        "flow": query.get('flow', [''])[0],
+        "sid": query.get('sid', [''])[0],
+        "spx": query.get('spx', ['/'])[0],
+        "fragment": parsed.fragment
+    }
+
+
+def split_keys(text):
+    """Делит ввод пользователя на отдельные vless:// ключи.
+
+    Ключи разделяются пробельными символами или идут подряд; запятая или
+    ';' перед следующим vless:// считается разделителем, а внутри ключа -
+    частью его параметров.
+    """
+    keys = []
+    for token in text.split():
+        for key in _KEY_START_RE.split(token):
+            key = key.rstrip(",;")
+            if key.startswith("vless://"):
+                keys.append(key)
+    return keys
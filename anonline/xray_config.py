@@ -0,0 +1,282 @@
+"""Сборка конфига Xray из параметров ключа и настроек анонимности.
+
+Конфиг собирается из независимых секций (inbounds, outbounds, routing,
+dns), перед записью проверяется validate_config: порты, обязательные
+параметры ключа, ссылки правил маршрутизации на существующие теги.
+
+Файл конфига адресуется по содержимому: write_config считает SHA-256
+сериализованного конфига и не переписывает файл, если он не изменился,
+так что mtime и зависящие от него кэши остаются прежними.
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+
+from .xray_stats import enable_stats
+
+# dns_port=None - без DNS-входа (локальный DNS выключен), stats_port=None - без счетчиков
+ConfigOptions = namedtuple(
+    "ConfigOptions",
+    ["local_port", "dns_port", "dns_upstream", "block_ipv6", "block_stun", "block_bittorrent", "stats_port",
+     "loglevel"],
+    defaults=(10808, 53, "1.1.1.1", True, True, True, None, "warning")
+)
+
+# Порты STUN/TURN (WebRTC): стандартные и Google
+STUN_PORTS = "3478,3479,5349,5350,5351,19302,19305,19307-19309"
+DNS_INBOUND_TAG = "dns-inbound"
+NETWORKS = {"tcp", "raw", "ws", "grpc", "http", "h2", "httpupgrade", "xhttp", "splithttp", "kcp", "quic"}
+SECURITIES = {"none", "tls", "reality"}
+
+_UUID_RE = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+# Поля правила, по которым Xray сопоставляет соединение
+_RULE_MATCHERS = ("domain", "ip", "port", "sourcePort", "network", "source", "user", "inboundTag", "protocol",
+                  "attrs")
+
+
+class ConfigError(ValueError):
+    """Конфиг не прошел проверку; problems - список найденных ошибок"""
+
+    def __init__(self, problems):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+# Результат write_config: путь, SHA-256 содержимого, был ли файл переписан
+WrittenConfig = namedtuple("WrittenConfig", ["path", "digest", "written"])
+
+
+def inbounds_section(options):
+    inbounds = [{
+        "port": options.local_port,
+        "protocol": "socks",
+        "settings": {
+            "auth": "noauth",
+            "udp": True,
+            "ip": "127.0.0.1"
+        },
+        "sniffing": {
+            "enabled": True,
+            "destOverride": ["http", "tls", "fakedns"],
+            "routeOnly": True
+        }
+    }]
+    if options.dns_port is not None:
+        inbounds.append({
+            "port": options.dns_port,
+            "protocol": "dokodemo-door",
+            "settings": {
+                "address": options.dns_upstream,
+                "port": 53,
+                "network": "tcp,udp"
+            },
+            "tag": DNS_INBOUND_TAG
+        })
+    return inbounds
+
+
+def stream_settings(params):
+    stream = {"network": params["type"], "security": params["security"]}
+    if params["security"] == "reality":
+        stream["realitySettings"] = {
+            "serverName": params["sni"],
+            "publicKey": params["pbk"],
+            "fingerprint": params["fp"],
+            "shortId": params["sid"],
+            "spiderX": params["spx"]
+        }
+    elif params["security"] == "tls":
+        stream["tlsSettings"] = {
+            "serverName": params["sni"] or params["server"],
+            "fingerprint": params["fp"]
+        }
+    return stream
+
+
+def outbounds_section(params):
+    return [
+        {
+            "protocol": "vless",
+            "settings": {
+                "vnext": [{
+                    "address": params["server"],
+                    "port": params["port"],
+                    "users": [{
+                        "id": params["uuid"],
+                        "flow": params["flow"],
+                        "encryption": "none"
+                    }]
+                }]
+            },
+            "streamSettings": stream_settings(params),
+            "tag": "proxy"
+        },
+        {
+            "protocol": "freedom",
+            "settings": {
+                "domainStrategy": "UseIPv4"
+            },
+            "tag": "direct"
+        },
+        {
+            "protocol": "blackhole",
+            "tag": "block"
+        }
+    ]
+
+
+def routing_section(options):
+    rules = []
+    if options.dns_port is not None:
+        rules.append({"type": "field", "inboundTag": [DNS_INBOUND_TAG], "outboundTag": "proxy"})
+    rules.append({"type": "field", "ip": ["geoip:private"], "outboundTag": "direct"})
+    rules.append({"type": "field", "ip": ["geoip:cn"], "outboundTag": "direct"})
+    if options.block_bittorrent:
+        rules.append({"type": "field", "protocol": ["bittorrent"], "outboundTag": "block"})
+    if options.block_ipv6:
+        rules.append({"type": "field", "ip": ["::/0"], "outboundTag": "block"})
+    if options.block_stun:
+        rules.append({"type": "field", "port": STUN_PORTS, "outboundTag": "block"})
+    rules.append({"type": "field", "port": "0-65535", "outboundTag": "proxy"})
+    return {"domainStrategy": "IPOnDemand", "rules": rules}
+
+
+def dns_section(options):
+    return {
+        "servers": [
+            options.dns_upstream,
+            "8.8.8.8",
+            {
+                "address": options.dns_upstream,
+                "domains": ["geosite:geolocation-!cn"]
+            },
+            {
+                "address": "223.5.5.5",
+                "domains": ["geosite:cn"]
+            },
+            "localhost"
+        ],
+        "queryStrategy": "UseIPv4"
+    }
+
+
+def build_config(params, options=ConfigOptions()):
+    """Собирает конфиг Xray (словарь) для ключа params"""
+    config = {
+        "log": {"loglevel": options.loglevel},
+        "inbounds": inbounds_section(options),
+        "outbounds": outbounds_section(params),
+        "routing": routing_section(options),
+        "dns": dns_section(options),
+    }
+    if options.stats_port is not None:
+        enable_stats(config, options.stats_port)
+    return config
+
+
+def _valid_port(port):
+    return isinstance(port, int) and not isinstance(port, bool) and 0 < port < 65536
+
+
+def validate_config(config):
+    """Проверяет конфиг перед запуском Xray; ConfigError со списком ошибок"""
+    problems = []
+    inbound_tags = set()
+    ports = set()
+    for inbound in config.get("inbounds", []):
+        port = inbound.get("port")
+        if not _valid_port(port):
+            problems.append(f"неверный порт входа: {port!r}")
+        elif port in ports:
+            problems.append(f"порт {port} указан у двух входов")
+        ports.add(port)
+        if "tag" in inbound:
+            if inbound["tag"] in inbound_tags:
+                problems.append(f"тег входа {inbound['tag']!r} повторяется")
+            inbound_tags.add(inbound["tag"])
+
+    outbound_tags = set()
+    for outbound in config.get("outbounds", []):
+        tag = outbound.get("tag")
+        if tag in outbound_tags:
+            problems.append(f"тег выхода {tag!r} повторяется")
+        outbound_tags.add(tag)
+        if outbound.get("protocol") == "vless":
+            problems.extend(_check_vless(outbound))
+    if not config.get("outbounds"):
+        problems.append("нет ни одного выхода")
+
+    # Тег metrics обслуживается самим Xray, выхода с таким тегом нет
+    targets = outbound_tags | ({config["metrics"].get("tag")} if "metrics" in config else set())
+    for index, rule in enumerate(config.get("routing", {}).get("rules", [])):
+        if rule.get("outboundTag") not in targets:
+            problems.append(f"правило {index}: нет выхода {rule.get('outboundTag')!r}")
+        missing = [tag for tag in rule.get("inboundTag", []) if tag not in inbound_tags]
+        if missing:
+            problems.append(f"правило {index}: нет входов {', '.join(missing)}")
+        if not any(field in rule for field in _RULE_MATCHERS):
+            problems.append(f"правило {index}: нет условий")
+    if problems:
+        raise ConfigError(problems)
+    return config
+
+
+def _check_vless(outbound):
+    problems = []
+    for server in outbound.get("settings", {}).get("vnext", []):
+        if not server.get("address"):
+            problems.append("не указан адрес сервера")
+        if not _valid_port(server.get("port")):
+            problems.append(f"неверный порт сервера: {server.get('port')!r}")
+        for user in server.get("users", []):
+            user_id = user.get("id") or ""
+            # Xray принимает UUID или произвольную строку до 30 байт (из нее выводится UUIDv5)
+            if not _UUID_RE.match(user_id) and not 0 < len(user_id.encode("utf-8")) <= 30:
+                problems.append(f"неверный id пользователя: {user_id!r}")
+    stream = outbound.get("streamSettings", {})
+    if stream.get("network") not in NETWORKS:
+        problems.append(f"неизвестный транспорт: {stream.get('network')!r}")
+    if stream.get("security") not in SECURITIES:
+        problems.append(f"неизвестный тип защиты: {stream.get('security')!r}")
+    if stream.get("security") == "reality":
+        reality = stream.get("realitySettings", {})
+        if not reality.get("publicKey"):
+            problems.append("для REALITY нужен открытый ключ (pbk)")
+        if not reality.get("serverName"):
+            problems.append("для REALITY нужно имя сервера (sni)")
+    return problems
+
+
+def serialize_config(config):
+    """Байты файла конфига; одинаковый конфиг - одинаковые байты.
+
+    JSON без отступов: с indent сериализация идет без C-ускорителя и
+    втрое медленнее, а Xray форматирование не нужно.
+    """
+    return json.dumps(config, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def config_digest(data):
+    # Загрузка OpenSSL заметна при импорте, а хэш нужен только при записи
+    import hashlib
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_config(config, path):
+    """Проверяет и записывает конфиг атомарно; не трогает файл, если содержимое то же"""
+    validate_config(config)
+    data = serialize_config(config)
+    digest = config_digest(data)
+    path = os.path.abspath(path)
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, "rb") as f:
+            if config_digest(f.read()) == digest:
+                return WrittenConfig(path, digest, False)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return WrittenConfig(path, digest, True)
@@ -0,0 +1,157 @@
+"""Разбор логов Xray и счетчики трафика по направлениям.
+
+Распознаются два формата stdout Xray:
+  журнал доступа  "2024/05/01 12:00:00 [from ]127.0.0.1:50000 accepted tcp:host:443 [socks -> proxy]"
+  журнал ошибок   "2024/05/01 12:00:00 [Warning] [123456] app/dispatcher: ..."
+
+XrayLogStats считает подключения по outbound (proxy/direct/block, отклоненные
+- под ключом "rejected"), по назначениям внутри outbound и строки по уровням. Окно скользящее из двух
+поколений: текущее и предыдущее, каждое длиной window секунд.
+"""
+
+import heapq
+import re
+import time
+from collections import namedtuple
+
+AccessEntry = namedtuple("AccessEntry", ["time", "source", "status", "network", "host", "port", "inbound",
+                                         "outbound"])
+ErrorEntry = namedtuple("ErrorEntry", ["time", "level", "session", "message"])
+
+_TIME = r"(\d{4}/\d\d/\d\d \d\d:\d\d:\d\d)(?:\.\d+)? "
+_ACCESS_RE = re.compile(
+    _TIME + r"(?:from )?(\S+) (accepted|rejected) +(?:(tcp|udp):)?(\[[^\]]+\]|[^\s:]+)(?::(\d+))?"
+    r"(?: \[(\S+) (?:->|>>) (\S+)\])?"
+)
+_ERROR_RE = re.compile(_TIME + r"\[(Debug|Info|Warning|Error)\] (?:\[(\d+)\] )?(.*)")
+# Для счетчиков: только назначение и outbound; до слова accepted - время и источник
+_ACCEPTED_RE = re.compile(_TIME + r"(?:from )?\S+ accepted *(?:tcp:|udp:)?(\[[^\]]+\]|[^ :\n]+)[^ \n]*"
+                          r"(?: \[[^ ]+ [->]> ([^\]]+)\])?")
+_ACCEPTED = " accepted "
+# Отклоненные inbound подключения (после слова - причина, а не назначение)
+REJECTED = "rejected"
+
+LEVELS = ("Debug", "Info", "Warning", "Error")
+
+
+def parse_line(line):
+    """AccessEntry, ErrorEntry или None для нераспознанной строки"""
+    match = _ACCESS_RE.match(line)
+    if match is not None:
+        if match[3] == REJECTED:
+            return AccessEntry(match[1], match[2], REJECTED, match[4] or "tcp", "", None, "", "")
+        port = match[6]
+        return AccessEntry(match[1], match[2], match[3], match[4] or "tcp", match[5],
+                           int(port) if port else None, match[7] or "", match[8] or "")
+    match = _ERROR_RE.match(line)
+    if match is not None:
+        return ErrorEntry(match[1], match[2], match[3] or "", match[4].rstrip())
+    return None
+
+
+class XrayLogStats:
+    """Скользящие счетчики по строкам лога Xray.
+
+    feed() вызывается из потока чтения лога, snapshot() и top() - из
+    любого другого: они работают с копиями словарей.
+    """
+
+    def __init__(self, window=300.0, max_destinations=4096, clock=time.monotonic):
+        self.window = window
+        self.max_destinations = max_destinations
+        self.clock = clock
+        self.lines = 0
+        self.unparsed = 0
+        self._started = clock()
+        self._current = self._new_generation()
+        self._previous = self._new_generation()
+
+    @staticmethod
+    def _new_generation():
+        # outbound -> {назначение: число подключений}, outbound -> число, уровень -> число
+        return {}, {}, dict.fromkeys(LEVELS, 0)
+
+    def _rotate(self, now):
+        self._previous = self._current
+        self._current = self._new_generation()
+        self._started = now
+
+    def feed(self, line, now=None):
+        """Учитывает строку лога; возвращает "access", "error" или None"""
+        self.lines += 1
+        now = self.clock() if now is None else now
+        if now - self._started >= self.window:
+            self._rotate(now)
+        destinations, outbounds, levels = self._current
+
+        # Поиск подстроки дешевле, чем регулярное выражение, на строках журнала ошибок
+        match = _ACCEPTED_RE.match(line) if _ACCEPTED in line else None
+        if match is not None:
+            outbound = match[3] or ""
+            outbounds[outbound] = outbounds.get(outbound, 0) + 1
+            hosts = destinations.get(outbound)
+            if hosts is None:
+                hosts = destinations[outbound] = {}
+            host = match[2]
+            hosts[host] = hosts.get(host, 0) + 1
+            if len(hosts) > self.max_destinations:
+                self._prune(hosts)
+            return "access"
+        if " rejected " in line and _ACCESS_RE.match(line):
+            outbounds[REJECTED] = outbounds.get(REJECTED, 0) + 1
+            return "access"
+        match = _ERROR_RE.match(line)
+        if match is not None:
+            levels[match[2]] += 1
+            return "error"
+        self.unparsed += 1
+        return None
+
+    def _prune(self, hosts):
+        # Оставляем половину самых частых назначений, редкие забываются
+        keep = heapq.nlargest(self.max_destinations // 2, hosts.items(), key=lambda item: item[1])
+        hosts.clear()
+        hosts.update(keep)
+
+    def snapshot(self):
+        """Суммы за окно: (назначения по outbound, подключения по outbound, строки по уровням)"""
+        destinations = {}
+        outbounds = {}
+        levels = dict.fromkeys(LEVELS, 0)
+        for generation in (self._previous, self._current):
+            gen_destinations, gen_outbounds, gen_levels = generation
+            for outbound, count in dict(gen_outbounds).items():
+                outbounds[outbound] = outbounds.get(outbound, 0) + count
+            for outbound, hosts in dict(gen_destinations).items():
+                merged = destinations.setdefault(outbound, {})
+                for host, count in dict(hosts).items():
+                    merged[host] = merged.get(host, 0) + count
+            for level, count in dict(gen_levels).items():
+                levels[level] += count
+        return destinations, outbounds, levels
+
+    def top(self, outbound=None, count=10):
+        """Самые частые назначения за окно: [(назначение, число)]"""
+        destinations, _, _ = self.snapshot()
+        if outbound is not None:
+            hosts = destinations.get(outbound, {})
+        else:
+            hosts = {}
+            for per_outbound in destinations.values():
+                for host, hits in per_outbound.items():
+                    hosts[host] = hosts.get(host, 0) + hits
+        return heapq.nlargest(count, hosts.items(), key=lambda item: item[1])
+
+    def summary(self, count=5):
+        """Однострочная сводка для консоли"""
+        _, outbounds, levels = self.snapshot()
+        if not outbounds and not any(levels.values()):
+            return "нет данных"
+        parts = [", ".join(f"{tag or '?'}: {hits}" for tag, hits in sorted(outbounds.items(),
+                                                                         key=lambda item: -item[1]))]
+        top = self.top(count=count)
+        if top:
+            parts.append("чаще всего: " + ", ".join(f"{host} ({hits})" for host, hits in top))
+        if levels["Warning"] or levels["Error"]:
+            parts.append(f"предупреждений {levels['Warning']}, ошибок {levels['Error']}")
+        return "; ".join(parts)
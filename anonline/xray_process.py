@@ -0,0 +1,268 @@
+"""Управление процессом Xray: запуск, ожидание готовности и остановка.
+
+Супервизор владеет своим Popen и завершает только его: сначала мягко
+с ограниченным ожиданием, затем принудительно (kill). Мягкая остановка -
+SIGTERM, на Windows - CTRL_BREAK_EVENT группе процессов Xray (terminate
+там то же, что kill). Консольное событие доходит, только если у
+приложения есть консоль, которую Xray с ним делит; у приложения без
+консоли (pythonw) остановка на Windows принудительная, без ожидания.
+Готовность определяется событием, а не фиксированной паузой: порты
+входящих подключений начали принимать соединения или в логе появилась
+строка "Xray ... started" (ошибка запуска или конец лога - отказ).
+Открытый порт засчитывается, только если процесс Xray жив и порт не был
+занят до его запуска: иначе его слушает чужой процесс.
+"""
+
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# На Windows скрываем консольное окно Xray, на других системах флага нет
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+CREATE_NEW_PROCESS_GROUP = getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
+
+
+def has_console():
+    """Есть ли у процесса приложения консоль (только для Windows)"""
+    import ctypes
+
+    return bool(ctypes.windll.kernel32.GetConsoleWindow())
+
+
+def stop_mode():
+    """(флаги создания процесса, можно ли остановить Xray мягко)
+
+    На Windows с консолью Xray запускается в своей группе процессов на
+    консоли приложения (окно не появляется) и получает CTRL_BREAK_EVENT.
+    Без консоли приложения Xray запускается со скрытой консолью, и
+    событие до него не доходит.
+    """
+    if sys.platform != "win32":
+        return 0, True
+    if has_console():
+        return CREATE_NEW_PROCESS_GROUP, True
+    return CREATE_NO_WINDOW, False
+
+
+def port_accepting(port, host="127.0.0.1", timeout=0.05):
+    """Проверяет, принимает ли порт TCP-подключения"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+# "[Warning] core: Xray 1.8.4 started" - все inbound уже слушают
+STARTED_RE = re.compile(r"\bXray \S+ started\b")
+# "Failed to start: main: failed to create server > ... failed to listen TCP on 10808"
+FAILED_RE = re.compile(r"\bFailed to start\b|failed to listen", re.IGNORECASE)
+
+
+class ReadinessGate:
+    """Однократное событие готовности Xray.
+
+    feed()/feed_eof() вызываются из потока чтения лога, watch_ports()
+    опрашивает порты в отдельном потоке; кто первый - тот и решает.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.ok = False
+        self.source = None
+        self.reason = ""
+        self.elapsed = None
+
+    @property
+    def resolved(self):
+        return self._event.is_set()
+
+    def resolve(self, ok, source, reason=""):
+        """Фиксирует результат; повторные вызовы игнорируются"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.ok = ok
+            self.source = source
+            self.reason = reason
+            self.elapsed = time.perf_counter() - self._start
+            self._event.set()
+        return True
+
+    def feed(self, line):
+        """Строка лога Xray"""
+        if self._event.is_set():
+            return
+        if STARTED_RE.search(line):
+            self.resolve(True, "лог")
+        elif FAILED_RE.search(line):
+            self.resolve(False, "лог", line.strip())
+
+    def feed_eof(self, code=None):
+        """Лог закончился - процесс завершился"""
+        reason = "процесс Xray завершился" if code is None else f"процесс Xray завершился (код {code})"
+        self.resolve(False, "процесс", reason)
+
+    def watch_ports(self, ports, process=None, interval=0.01, deadline=None):
+        """Опрашивает порты, пока все не начнут принимать подключения.
+
+        Порты засчитываются, только если процесс после их открытия еще жив.
+        Без портов только следит за завершением процесса.
+        """
+        pending = list(ports)
+        watching = bool(pending)
+        while not self._event.is_set():
+            if process is not None and process.poll() is not None:
+                self.feed_eof(process.returncode)
+                return
+            if watching:
+                pending = [port for port in pending if not port_accepting(port)]
+                if not pending:
+                    if process is not None and process.poll() is not None:
+                        self.feed_eof(process.returncode)
+                    else:
+                        self.resolve(True, "порт")
+                    return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            self._event.wait(interval)
+
+    def wait(self, timeout):
+        """Ждет результата; возвращает (True, время) или (False, причина)"""
+        if not self._event.wait(timeout):
+            self.resolve(False, "таймаут", f"Xray не сообщил о готовности за {timeout:.1f} с")
+        if self.ok:
+            return True, self.elapsed
+        return False, self.reason
+
+
+class XrayLogReader(threading.Thread):
+    """Поток чтения stdout Xray.
+
+    Строки передаются в ReadinessGate (если задан), счетчики XrayLogStats
+    и буфер вывода в консоль; поток GUI при этом не участвует.
+    """
+
+    def __init__(self, stdout, buffer, gate=None, stats=None):
+        super().__init__(name="xray-log", daemon=True)
+        self.stdout = stdout
+        self.buffer = buffer
+        self.gate = gate
+        self.stats = stats
+
+    def run(self):
+        for line in iter(self.stdout.readline, ""):
+            if self.gate is not None:
+                self.gate.feed(line)
+            if self.stats is not None:
+                self.stats.feed(line)
+            self.buffer.push(line)
+        if self.gate is not None:
+            self.gate.feed_eof()
+
+
+class XraySupervisor:
+    """Владелец процесса Xray"""
+
+    def __init__(self, command, env=None, cwd=None):
+        self.command = list(command)
+        self.env = env
+        self.cwd = cwd
+        self.process = None
+        self.gate = None
+        self.busy_ports = ()
+        # Можно ли остановить текущий процесс мягко (см. stop_mode)
+        self.graceful = True
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process is not None else None
+
+    def start(self, ports=()):
+        """Запускает процесс, stdout и stderr объединены в один текстовый поток.
+
+        ports - порты inbound из конфига; те, что уже заняты до запуска,
+        wait_ready не считает признаком готовности.
+        """
+        if self.running:
+            raise RuntimeError("Xray уже запущен этим супервизором")
+        self.busy_ports = tuple(port for port in ports if port_accepting(port))
+        self.gate = ReadinessGate()
+        creationflags, self.graceful = stop_mode()
+        self.process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            env=self.env,
+            cwd=self.cwd,
+            creationflags=creationflags
+        )
+        return self.process
+
+    def wait_ready(self, ports, timeout=5.0, interval=0.01):
+        """Ждет готовности: все порты открыты или в логе строка "started".
+
+        Строки лога передаются в self.gate потоком чтения stdout. Порты,
+        занятые до запуска, не опрашиваются: о готовности скажет только лог.
+        Возвращает (True, время от запуска) или (False, причина).
+        """
+        if self.process is None or self.gate is None:
+            return False, "Xray не запущен"
+        if isinstance(ports, int):
+            ports = (ports,)
+        ports = [port for port in ports if port not in self.busy_ports]
+        watcher = threading.Thread(
+            target=self.gate.watch_ports,
+            args=(ports, self.process, interval, time.perf_counter() + timeout),
+            daemon=True
+        )
+        watcher.start()
+        return self.gate.wait(timeout)
+
+    def _interrupt(self, process):
+        # Xray по сигналу закрывает подключения и дописывает лог
+        if sys.platform == "win32":
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            process.terminate()
+
+    def stop(self, timeout=3.0, kill_timeout=2.0):
+        """Останавливает процесс: сигнал остановки, ожидание, затем kill.
+
+        Если мягкая остановка недоступна (self.graceful), сразу kill.
+        Возвращает код завершения или None, если процесса не было.
+        """
+        process = self.process
+        if process is None:
+            return None
+        if process.poll() is None:
+            stopped = False
+            if self.graceful:
+                try:
+                    self._interrupt(process)
+                    process.wait(timeout)
+                    stopped = True
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            if not stopped:
+                process.kill()
+                try:
+                    process.wait(kill_timeout)
+                except subprocess.TimeoutExpired:
+                    pass
+        # stdout не закрываем: поток чтения логов сам дочитает его до EOF
+        self.process = None
+        return process.returncode
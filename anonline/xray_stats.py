@@ -0,0 +1,193 @@
+"""Счетчики трафика Xray: включение в конфиге и фоновый опрос.
+
+Xray публикует счетчики через metrics (expvar) по HTTP: GET /debug/vars
+на loopback-порту возвращает JSON вида
+{"stats": {"outbound": {"proxy": {"uplink": N, "downlink": N}}, "inbound": {...}}}.
+Счетчики накопительные: опросчик раз в interval секунд берет разность с
+прошлым опросом и хранит скользящий ряд скоростей (байт/с).
+"""
+
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+STATS_PORT = 10813
+STATS_PATH = "/debug/vars"
+METRICS_TAG = "metrics"
+METRICS_INBOUND_TAG = "metrics-in"
+
+# rates и totals: {(вид, тег): (uplink, downlink)}, вид - "inbound" или "outbound"
+ThroughputSample = namedtuple("ThroughputSample", ["timestamp", "interval", "rates", "totals"])
+
+
+def enable_stats(config, port=STATS_PORT):
+    """Добавляет в конфиг Xray stats, policy и metrics на 127.0.0.1:port"""
+    config["stats"] = {}
+    config["metrics"] = {"tag": METRICS_TAG}
+    system = config.setdefault("policy", {}).setdefault("system", {})
+    system.update({
+        "statsInboundUplink": True,
+        "statsInboundDownlink": True,
+        "statsOutboundUplink": True,
+        "statsOutboundDownlink": True
+    })
+    config.setdefault("inbounds", []).append({
+        "listen": "127.0.0.1",
+        "port": port,
+        "protocol": "dokodemo-door",
+        "settings": {"address": "127.0.0.1"},
+        "tag": METRICS_INBOUND_TAG
+    })
+    # Правило должно стоять первым, иначе запросы уйдут в proxy
+    rules = config.setdefault("routing", {}).setdefault("rules", [])
+    rules.insert(0, {"type": "field", "inboundTag": [METRICS_INBOUND_TAG], "outboundTag": METRICS_TAG})
+    return config
+
+
+def parse_counters(payload):
+    """Счетчики из ответа /debug/vars: {(вид, тег): (uplink, downlink)}"""
+    counters = {}
+    stats = payload.get("stats") or {}
+    for kind in ("inbound", "outbound"):
+        for tag, values in (stats.get(kind) or {}).items():
+            if tag == METRICS_INBOUND_TAG:
+                continue
+            counters[(kind, tag)] = (int(values.get("uplink", 0)), int(values.get("downlink", 0)))
+    return counters
+
+
+def format_rate(value):
+    """Скорость в байтах/с для консоли"""
+    for unit in ("Б/с", "КБ/с", "МБ/с"):
+        if value < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} ГБ/с"
+
+
+class _HttpFetch:
+    """GET /debug/vars по одному keep-alive соединению"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._conn = None
+
+    def __call__(self):
+        # http.client тянет за собой email и ssl (~30 мс): импорт только при первом опросе
+        import http.client
+
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self._conn.request("GET", STATS_PATH)
+            response = self._conn.getresponse()
+            body = response.read()
+            if response.status != 200:
+                raise OSError(f"HTTP {response.status}")
+            return json.loads(body)
+        except http.client.HTTPException as e:
+            # Для опроса ошибка протокола - такой же сбой связи, как OSError
+            self.close()
+            raise OSError(str(e) or type(e).__name__) from e
+        except (OSError, ValueError):
+            self.close()
+            raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class StatsPoller:
+    """Опрашивает счетчики Xray в фоновом потоке с фиксированным интервалом.
+
+    fetch() -> разобранный JSON /debug/vars, по умолчанию HTTP-запрос.
+    on_sample(sample) вызывается из фонового потока.
+    """
+
+    def __init__(self, port=STATS_PORT, host="127.0.0.1", interval=1.0, history=300, timeout=1.0,
+                 on_sample=None, fetch=None):
+        self.interval = interval
+        self.on_sample = on_sample
+        self.fetch = fetch or _HttpFetch(host, port, timeout)
+        self.samples = deque(maxlen=history)
+        self.errors = 0
+        self.last_error = ""
+        self._previous = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._previous = None
+        self._thread = threading.Thread(target=self._run, name="xray-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Останавливает поток, не дожидаясь дольше timeout"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        close = getattr(self.fetch, "close", None)
+        if close is not None:
+            close()
+
+    def _run(self):
+        # Опросы привязаны к сетке интервала, время самого запроса не накапливается
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            sample = self.poll_once()
+            if sample is not None and self.on_sample is not None:
+                self.on_sample(sample)
+            next_time += self.interval
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                next_time = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+
+    def poll_once(self, now=None):
+        """Один опрос; возвращает ThroughputSample или None (первый опрос или ошибка)"""
+        try:
+            counters = parse_counters(self.fetch())
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            self.last_error = str(e) or type(e).__name__
+            return None
+        now = time.monotonic() if now is None else now
+        previous = self._previous
+        self._previous = (now, counters)
+        if previous is None:
+            return None
+        elapsed = now - previous[0]
+        if elapsed <= 0:
+            return None
+        old = previous[1]
+        rates = {}
+        for key, (up, down) in counters.items():
+            old_up, old_down = old.get(key, (0, 0))
+            # Счетчик уменьшился - Xray перезапущен, считаем с нуля
+            up_delta = up - old_up if up >= old_up else up
+            down_delta = down - old_down if down >= old_down else down
+            rates[key] = (up_delta / elapsed, down_delta / elapsed)
+        sample = ThroughputSample(now, elapsed, rates, counters)
+        self.samples.append(sample)
+        return sample
+
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def series(self, tag="proxy", kind="outbound"):
+        """Ряд скоростей одного тега: [(время, uplink, downlink)]"""
+        return [(sample.timestamp,) + sample.rates.get((kind, tag), (0.0, 0.0)) for sample in list(self.samples)]
@@ -0,0 +1,108 @@
+"""Шаги подключения: по очереди (как раньше) и по графу зависимостей.
+
+Команды netsh/tzutil/w32tm заменены заглушкой, которая выдерживает
+типичное для Windows время запуска процесса. Набор команд каждого шага
+повторяет методы VlessVPNApp. Отдельно проверяется откат: Xray "не
+запускается", выполненные шаги отменяются в обратном порядке.
+
+Запуск: python benchmarks/bench_connect_steps.py [масштаб задержек]
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.steps import Step, run_steps  # noqa: E402
+
+# Время выполнения команды в секундах (замеры запуска на Windows 10)
+LATENCY = {"netsh": 0.15, "tzutil": 0.08, "w32tm": 0.12, "powershell": 0.6, "hosts": 0.002, "registry": 0.001,
+           "xray": 0.25}
+
+
+class FakeRunner:
+    """Выполняет "команды", засыпая на их время; считает параллельность"""
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.commands = []
+        self._lock = threading.Lock()
+        self._active = 0
+        self.max_active = 0
+
+    def run(self, *argv):
+        with self._lock:
+            self.commands.append(argv)
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+        try:
+            time.sleep(LATENCY[argv[0]] * self.scale)
+        finally:
+            with self._lock:
+                self._active -= 1
+        return True
+
+
+def make_steps(runner, xray_ok=True):
+    def step(*commands):
+        def run():
+            for command in commands:
+                runner.run(*command)
+            return True
+        return run
+
+    def xray():
+        runner.run("xray")
+        if not xray_ok:
+            raise RuntimeError("Xray не готов к работе: процесс Xray завершился (код 23)")
+        return True
+
+    return [
+        Step("xray", xray, step(("registry",)), required=True),
+        Step("proxy", step(("registry",), ("netsh", "winhttp", "import")), step(("registry",), ("netsh",)),
+             after=("xray",), required=True),
+        Step("ipv6", step(("netsh", "ipv6", "disabled")), step(("netsh", "ipv6", "enabled"))),
+        Step("webrtc", step(("hosts",)), step(("hosts",))),
+        Step("firewall", step(("netsh", "add", "kill"), ("netsh", "add", "allow")),
+             step(("netsh", "delete", "kill"), ("netsh", "delete", "allow"))),
+        Step("dns", step(("netsh", "show"), ("netsh", "dnsservers", "static")),
+             step(("netsh", "show"), ("netsh", "dnsservers", "dhcp")), after=("xray",)),
+        Step("time", step(("tzutil", "/g"), ("tzutil", "/s"), ("w32tm", "/config"), ("w32tm", "/resync")),
+             step(("tzutil", "/s"), ("powershell", "Set-Date"), ("w32tm", "/config"), ("w32tm", "/resync"))),
+    ]
+
+
+def run_sequential(steps):
+    # Прежний порядок start_xray + set_proxy из connect
+    order = ["ipv6", "webrtc", "firewall", "xray", "dns", "time", "proxy"]
+    by_name = {step.name: step for step in steps}
+    start = time.perf_counter()
+    for name in order:
+        by_name[name].run()
+    return time.perf_counter() - start
+
+
+def main(argv):
+    scale = float(argv[1]) if len(argv) > 1 else 1.0
+
+    runner = FakeRunner(scale)
+    sequential = run_sequential(make_steps(runner))
+    print(f"По очереди: {sequential * 1000:.0f} мс, команд {len(runner.commands)}")
+
+    runner = FakeRunner(scale)
+    report = run_steps(make_steps(runner), max_workers=7)
+    print(f"По графу: {report.elapsed * 1000:.0f} мс, одновременно до {runner.max_active} команд")
+    print(f"  {report.summary()}")
+
+    runner = FakeRunner(scale)
+    events = []
+    report = run_steps(make_steps(runner, xray_ok=False), max_workers=7,
+                       on_step=lambda result: events.append(f"{result.name}:{result.status}"))
+    print(f"Xray не запустился: прервано={report.aborted}, {report.elapsed * 1000:.0f} мс с откатом")
+    print(f"  события: {', '.join(events)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,103 @@
+"""Длительная нагрузка на консоль: RSS и задержка добавления за 1M строк.
+
+Строки добавляются пачками, как их сбрасывает таймер лога Xray, после
+каждой пачки обрабатываются события Qt (отрисовка на платформе offscreen).
+Каждые 100k строк печатаются RSS процесса и задержка добавления (p50/p99).
+Для сравнения тот же прогон на прежнем неограниченном QTextEdit (по
+умолчанию 200k строк - дальше он слишком медленный).
+
+Запуск: python benchmarks/bench_console_soak.py [строк] [макс. строк консоли] [строк для QTextEdit]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.log_pipeline import FRAME_INTERVAL_MS  # noqa: E402
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+try:
+    from PyQt5.QtWidgets import QApplication, QPlainTextEdit, QTextEdit
+except ImportError:
+    QApplication = None
+
+BATCH = 50
+REPORT_EVERY = 100_000
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss // 1024
+    except ImportError:
+        return None
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def soak(app, console, append, total):
+    console.resize(700, 300)
+    console.show()
+    latencies = []
+    line_no = 0
+    started = time.perf_counter()
+    while line_no < total:
+        text = "\n".join(
+            f"[12:00:00] 2024/05/01 12:00:00 127.0.0.1:{50000 + i % 10000} accepted "
+            f"tcp:host{i % 500}.example.com:443 [socks -> proxy]"
+            for i in range(line_no, line_no + BATCH)
+        )
+        start = time.perf_counter()
+        append(text)
+        console.ensureCursorVisible()
+        app.processEvents()
+        latencies.append(time.perf_counter() - start)
+        line_no += BATCH
+        if line_no % REPORT_EVERY == 0 or line_no >= total:
+            rss = rss_kb()
+            print(f"  {line_no:>9,} строк: RSS {rss / 1024 if rss else float('nan'):6.1f} МБ, "
+                  f"пачка из {BATCH}: p50 {percentile(latencies, 0.5) * 1000:.2f} мс, "
+                  f"p99 {percentile(latencies, 0.99) * 1000:.2f} мс, блоков {console.document().blockCount()}")
+            latencies = []
+    elapsed = time.perf_counter() - started
+    print(f"  итого {elapsed:.1f} с; бюджет кадра {FRAME_INTERVAL_MS} мс")
+    console.close()
+
+
+def main(argv):
+    if QApplication is None:
+        print("Нужен PyQt5 для замера консоли")
+        return
+    total = int(argv[1]) if len(argv) > 1 else 1_000_000
+    max_lines = int(argv[2]) if len(argv) > 2 else 5000
+    legacy_total = int(argv[3]) if len(argv) > 3 else 200_000
+    app = QApplication(sys.argv)
+
+    print(f"QPlainTextEdit, maximumBlockCount={max_lines}:")
+    console = QPlainTextEdit()
+    console.setReadOnly(True)
+    console.setUndoRedoEnabled(False)
+    console.setMaximumBlockCount(max_lines)
+    soak(app, console, console.appendPlainText, total)
+
+    if legacy_total:
+        print("QTextEdit без ограничения (прежняя консоль):")
+        console = QTextEdit()
+        console.setReadOnly(True)
+        soak(app, console, console.append, legacy_total)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,66 @@
+"""Сравнение скомпилированного DomainMatcher с линейным перебором geosite:cn.
+
+Запуск: python benchmarks/bench_domain_matcher.py [путь к geosite.dat]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.domain_matcher import DomainMatcher, naive_match  # noqa: E402
+from anonline.geosite import DOMAIN_DOMAIN, DOMAIN_FULL, GeoSiteFile  # noqa: E402
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geosite.dat")
+REFS = ["geosite:cn", "geosite:geolocation-!cn"]
+
+
+def make_hosts(domains, count, seed=1):
+    """Смесь поддоменов из списка и случайных имен, которые ни с чем не совпадают"""
+    rnd = random.Random(seed)
+    plain = [d.value for d in domains if d.type in (DOMAIN_DOMAIN, DOMAIN_FULL)]
+    hosts = []
+    for i in range(count):
+        if i % 2:
+            hosts.append(f"www{rnd.randrange(100)}.{rnd.choice(plain)}")
+        else:
+            hosts.append(f"host{rnd.randrange(10 ** 6)}.example{rnd.randrange(1000)}.org")
+    return hosts
+
+
+def main(argv):
+    path = argv[1] if len(argv) > 1 else DEFAULT_PATH
+    with GeoSiteFile(path) as geosite:
+        start = time.perf_counter()
+        matcher = DomainMatcher()
+        matcher.add_geosite(geosite, REFS)
+        matcher.compile()
+        print(f"Компиляция {', '.join(REFS)}: {(time.perf_counter() - start) * 1000:.1f} мс")
+        if matcher.invalid_regexes:
+            print(f"Пропущено несовместимых regex: {len(matcher.invalid_regexes)}")
+
+        cn = geosite.load_ref("geosite:cn")
+        hosts = make_hosts(cn, 20000)
+
+        start = time.perf_counter()
+        results = matcher.match_batch(hosts)
+        elapsed = time.perf_counter() - start
+        print(f"DomainMatcher: {len(hosts)} хостов за {elapsed * 1000:.1f} мс "
+              f"({elapsed / len(hosts) * 1e6:.2f} мкс/хост)")
+
+        sample = hosts[:500]
+        start = time.perf_counter()
+        naive = [naive_match(cn, host) for host in sample]
+        elapsed = time.perf_counter() - start
+        print(f"Линейный перебор geosite:cn: {len(sample)} хостов за {elapsed * 1000:.1f} мс "
+              f"({elapsed / len(sample) * 1e6:.2f} мкс/хост)")
+
+        mismatches = sum(1 for host, tags, expected in zip(sample, results, naive)
+                         if ("geosite:cn" in tags) != expected)
+        print(f"Расхождений с линейным перебором: {mismatches}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
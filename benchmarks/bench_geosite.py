@@ -0,0 +1,46 @@
+"""Замер построения индекса geosite.dat и загрузки отдельных категорий.
+
+Запуск: python benchmarks/bench_geosite.py [путь к geosite.dat] [категория ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.geosite import GeoSiteFile  # noqa: E402
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geosite.dat")
+DEFAULT_CATEGORIES = ["cn", "geolocation-!cn", "google", "category-ads-all"]
+
+
+def main(argv):
+    path = argv[1] if len(argv) > 1 else DEFAULT_PATH
+    categories = argv[2:] or DEFAULT_CATEGORIES
+
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        with GeoSiteFile(path) as geosite:
+            count = len(geosite)
+    index_ms = (time.perf_counter() - start) * 1000 / runs
+    print(f"{path}: {os.path.getsize(path)} байт, {count} категорий")
+    print(f"Построение индекса: {index_ms:.2f} мс")
+
+    with GeoSiteFile(path) as geosite:
+        for code in categories:
+            if code not in geosite:
+                print(f"  {code}: нет в файле")
+                continue
+            start = time.perf_counter()
+            domains = geosite.load(code)
+            cold_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            geosite.load(code)
+            warm_us = (time.perf_counter() - start) * 1e6
+            print(f"  {code}: {len(domains)} доменов, загрузка {cold_ms:.2f} мс, из кэша {warm_us:.1f} мкс")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,55 @@
+"""Холодный и теплый старт: загрузка geosite.dat с матчером без кэша и из кэша.
+
+Запуск: python benchmarks/bench_geosite_cache.py [путь к geosite.dat]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.geosite_cache import open_geosite  # noqa: E402
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geosite.dat")
+REFS = ["geosite:geolocation-!cn", "geosite:cn"]
+
+
+def timed_open(path):
+    start = time.perf_counter()
+    result = open_geosite(path, REFS)
+    elapsed = (time.perf_counter() - start) * 1000
+    result.geosite.close()
+    return result.cache_hit, elapsed
+
+
+def main(argv):
+    source = argv[1] if len(argv) > 1 else DEFAULT_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "geosite.dat")
+        shutil.copy(source, path)
+
+        hit, cold = timed_open(path)
+        print(f"Холодный старт (разбор + запись кэша): {cold:.1f} мс, кэш использован: {hit}")
+        print(f"Размер кэша: {os.path.getsize(path + '.cache')} байт")
+
+        warm = [timed_open(path)[1] for _ in range(10)]
+        print(f"Теплый старт (из кэша): мин {min(warm):.1f} мс, медиана {sorted(warm)[len(warm) // 2]:.1f} мс")
+
+        os.utime(path)
+        hit, touched = timed_open(path)
+        print(f"После смены mtime (проверка SHA-256): {touched:.1f} мс, кэш использован: {hit}")
+
+        with open(path, "r+b") as f:
+            f.seek(100)
+            byte = f.read(1)
+            f.seek(100)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        hit, changed = timed_open(path)
+        print(f"После изменения содержимого: {changed:.1f} мс, кэш использован: {hit}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,110 @@
+"""Размер урезанного geosite.dat и RSS процесса Xray с полным и урезанным файлом.
+
+Запуск: python benchmarks/bench_geosite_subset.py [--xray путь/к/xray] [путь к geosite.dat]
+
+Без --xray измеряются только размеры и время сборки. С --xray Xray
+запускается дважды с конфигом без сетевых портов и замеряется RSS
+(Linux: /proc/<pid>/status, иначе psutil, если установлен).
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.geosite import GeoSiteFile  # noqa: E402
+from anonline.geosite_subset import XRAY_ASSET_ENV, collect_geosite_refs, prepare_asset_dir  # noqa: E402
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geosite.dat")
+
+# Фрагменты конфига, ссылающиеся на geosite так же, как generate_xray_config
+CONFIG = {
+    "log": {"loglevel": "warning"},
+    "inbounds": [],
+    "outbounds": [{"protocol": "freedom", "tag": "direct"}],
+    "routing": {"rules": [
+        {"type": "field", "domain": ["geosite:cn"], "outboundTag": "direct"},
+    ]},
+    "dns": {"servers": [
+        {"address": "1.1.1.1", "domains": ["geosite:geolocation-!cn"]},
+        {"address": "223.5.5.5", "domains": ["geosite:cn"]},
+    ]},
+}
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss // 1024
+    except ImportError:
+        return None
+
+
+def xray_rss(xray, config_path, asset_dir, settle=2.0):
+    env = dict(os.environ)
+    env[XRAY_ASSET_ENV] = asset_dir
+    proc = subprocess.Popen([xray, "run", "-c", config_path], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(settle)
+        if proc.poll() is not None:
+            return None
+        return rss_kb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(5)
+
+
+def main(argv):
+    args = argv[1:]
+    xray = None
+    if "--xray" in args:
+        i = args.index("--xray")
+        xray = args[i + 1]
+        del args[i:i + 2]
+    source = args[0] if args else DEFAULT_PATH
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_dir = os.path.join(tmp, "full")
+        os.makedirs(full_dir)
+        shutil.copy(source, os.path.join(full_dir, "geosite.dat"))
+        subset_dir = os.path.join(tmp, "subset")
+
+        start = time.perf_counter()
+        codes = prepare_asset_dir(CONFIG, os.path.join(full_dir, "geosite.dat"), subset_dir)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        full_size = os.path.getsize(os.path.join(full_dir, "geosite.dat"))
+        subset_size = os.path.getsize(os.path.join(subset_dir, "geosite.dat"))
+        print(f"Категории из конфига: {', '.join(collect_geosite_refs(CONFIG))}")
+        print(f"Полный geosite.dat: {full_size} байт")
+        print(f"Урезанный geosite.dat ({len(codes)} категорий): {subset_size} байт "
+              f"({subset_size / full_size:.1%}), сборка {elapsed:.1f} мс")
+
+        with GeoSiteFile(os.path.join(full_dir, "geosite.dat")) as full, \
+                GeoSiteFile(os.path.join(subset_dir, "geosite.dat")) as subset:
+            same = all(bytes(full.raw(code)) == bytes(subset.raw(code)) for code in codes)
+        print(f"Категории совпадают байт в байт: {same}")
+
+        if xray:
+            config_path = os.path.join(tmp, "config.json")
+            with open(config_path, "w") as f:
+                json.dump(CONFIG, f)
+            print(f"RSS Xray с полным файлом: {xray_rss(xray, config_path, full_dir)} КБ")
+            print(f"RSS Xray с урезанным файлом: {xray_rss(xray, config_path, subset_dir)} КБ")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
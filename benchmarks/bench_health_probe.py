@@ -0,0 +1,130 @@
+"""Задержка главного цикла во время фоновых проверок, которые уходят в таймаут.
+
+Поднимаются два локальных TCP-слушателя: рабочий и "зависший" (очередь
+accept переполнена, новые подключения не завершаются). HealthProbeEngine
+опрашивает оба, а главный поток в это время крутит цикл с тиком 10 мс,
+как цикл событий GUI, и замеряет максимальное опоздание тика.
+Для сравнения то же делает блокирующий socket.connect в главном потоке.
+
+Запуск: python benchmarks/bench_health_probe.py [--budget-ms 50]
+Код возврата 1, если опоздание фонового варианта превысило бюджет.
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.health import HealthProbeEngine  # noqa: E402
+
+TICK = 0.010
+DURATION = 3.0
+PROBE_TIMEOUT = 0.5
+
+
+def responsive_listener():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(64)
+
+    def accept_loop():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            conn.close()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return server
+
+
+def hanging_listener():
+    """Слушатель без accept с заполненной очередью: новые SYN отбрасываются"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(0)
+    fillers = []
+    for _ in range(8):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setblocking(False)
+        try:
+            s.connect(server.getsockname())
+        except BlockingIOError:
+            pass
+        fillers.append(s)
+    time.sleep(0.05)
+    return server, fillers
+
+
+def tick_loop(duration, work=None):
+    """Имитация цикла событий: возвращает максимальное опоздание тика в мс"""
+    worst = 0.0
+    deadline = time.perf_counter() + duration
+    expected = time.perf_counter() + TICK
+    while time.perf_counter() < deadline:
+        delay = expected - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.perf_counter()
+        worst = max(worst, now - expected)
+        expected = now + TICK
+        # Работа внутри тика задерживает следующий тик
+        if work is not None:
+            work()
+    return worst * 1000
+
+
+def main(argv):
+    budget = 50.0
+    if "--budget-ms" in argv:
+        budget = float(argv[argv.index("--budget-ms") + 1])
+
+    good = responsive_listener()
+    bad, _fillers = hanging_listener()
+    targets = [good.getsockname(), bad.getsockname()]
+
+    cycles = []
+    engine = HealthProbeEngine(targets=targets, interval=0.1, timeout=PROBE_TIMEOUT,
+                               on_results=cycles.append)
+    engine.start()
+    background = tick_loop(DURATION)
+    start = time.perf_counter()
+    engine.stop()
+    stop_ms = (time.perf_counter() - start) * 1000
+
+    timeouts = sum(1 for results in cycles for r in results if not r.ok)
+    oks = sum(1 for results in cycles for r in results if r.ok)
+    print(f"Фоновые проверки: {len(cycles)} циклов, успешных {oks}, неудачных {timeouts}")
+    print(f"Макс. опоздание тика главного цикла: {background:.1f} мс (бюджет {budget:.0f} мс)")
+    print(f"Остановка движка: {stop_ms:.1f} мс")
+
+    state = {"next": 0.0}
+
+    def blocking_probe():
+        if time.perf_counter() < state["next"]:
+            return
+        for host, port in targets:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.settimeout(PROBE_TIMEOUT)
+            try:
+                s.connect((host, port))
+            except OSError:
+                pass
+            finally:
+                s.close()
+        state["next"] = time.perf_counter() + 0.1
+
+    blocking = tick_loop(DURATION, blocking_probe)
+    print(f"Для сравнения, блокирующий connect в главном потоке: {blocking:.1f} мс")
+
+    good.close()
+    bad.close()
+    return 0 if background <= budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,94 @@
+"""Файл hosts: прежние block_webrtc/unblock_webrtc и HostsBlock на большом файле.
+
+Генерируется hosts в стиле блок-листов рекламы (по умолчанию 500 тыс.
+строк) с парой пользовательских записей, содержащих "stun" - прежний
+unblock_webrtc удалял и их. Замеряются установка блока, повторная
+установка (файл не должен переписываться), удаление и перенос записей
+прежней версии в блок.
+
+Запуск: python benchmarks/bench_hosts_file.py [строк] [путь к каталогу]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.hosts import LEGACY_WEBRTC_LINES, WEBRTC_HOSTS, HostsBlock  # noqa: E402
+
+USER_LINES = ["192.168.1.10 stunnel.home.lan", "0.0.0.0 stunning-ads.example # WebRTC test"]
+
+
+def generate(path, count):
+    with open(path, "w", encoding="utf-8", newline="\r\n") as f:
+        f.write("# Copyright (c) 1993-2009 Microsoft Corp.\n#\n127.0.0.1 localhost\n")
+        f.write("\n".join(USER_LINES) + "\n")
+        for i in range(count):
+            f.write(f"0.0.0.0 ads{i}.tracker{i % 97}.example\n")
+
+
+def legacy_block(path):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(["\n# Блокировка WebRTC"] + LEGACY_WEBRTC_LINES[1:]))
+
+
+def legacy_unblock(path):
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    new_lines = [line for line in lines if "stun" not in line and "WebRTC" not in line]
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(new_lines)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def user_lines_kept(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    return sum(1 for line in USER_LINES if line in text)
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory(dir=argv[2] if len(argv) > 2 else None) as tmp:
+        path = os.path.join(tmp, "hosts")
+        generate(path, count)
+        size = os.path.getsize(path) / 1e6
+        print(f"hosts: {count} строк, {size:.1f} МБ")
+
+        _, block_ms = timed(legacy_block, path)
+        _, unblock_ms = timed(legacy_unblock, path)
+        print(f"Прежний код: блокировка {block_ms:.1f} мс, разблокировка {unblock_ms:.0f} мс, "
+              f"пользовательских записей осталось {user_lines_kept(path)} из {len(USER_LINES)}")
+
+        generate(path, count)
+        hosts = HostsBlock("WebRTC", path=path, legacy=LEGACY_WEBRTC_LINES)
+        written, apply_ms = timed(hosts.apply, WEBRTC_HOSTS)
+        again, noop_ms = timed(hosts.apply, WEBRTC_HOSTS)
+        removed, remove_ms = timed(hosts.remove)
+        missing, missing_ms = timed(hosts.remove)
+        print(f"HostsBlock: установка {apply_ms:.0f} мс (запись: {written}), повторно {noop_ms:.0f} мс "
+              f"(запись: {again}), удаление {remove_ms:.0f} мс (запись: {removed}), "
+              f"удаление без блока {missing_ms:.0f} мс (запись: {missing})")
+        print(f"  пользовательских записей осталось {user_lines_kept(path)} из {len(USER_LINES)}, "
+              f"записей файла {hosts.writes}")
+
+        # Файл после прежней версии: записи без маркеров переносятся в блок
+        legacy_block(path)
+        legacy_block(path)
+        _, migrate_ms = timed(hosts.apply, WEBRTC_HOSTS)
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        print(f"Перенос записей прежней версии: {migrate_ms:.0f} мс, "
+              f"строк stun.l.google.com в файле: {text.count('stun.l.google.com')}, "
+              f"блок: {hosts.read_block() == [f'0.0.0.0 {host}' for host in WEBRTC_HOSTS]}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
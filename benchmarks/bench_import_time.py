@@ -0,0 +1,73 @@
+"""Время импорта пакета anonline и GUI (python -X importtime).
+
+Для каждой цели запускается отдельный интерпретатор с -X importtime,
+из отчета берется суммарное время модулей верхнего уровня без тех, что
+загружает сам интерпретатор при старте (site, encodings...). Берется
+минимум из нескольких запусков. Отдельно проверяется, что ядро не
+загружает PyQt5, winreg и ctypes.
+
+Запуск: python benchmarks/bench_import_time.py [запусков]
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_SCRIPT = os.path.join(ROOT, "AnonLineVPN-0.5.py")
+
+TARGETS = [
+    ("import anonline", "import anonline"),
+    ("parse_vless_url", "from anonline import parse_vless_url"),
+    ("конфиг Xray", "from anonline import build_config, validate_config"),
+    ("XraySupervisor", "from anonline import XraySupervisor"),
+    ("NetworkSetup", "from anonline import NetworkSetup"),
+    ("PyQt5.QtWidgets", "import PyQt5.QtWidgets"),
+    ("GUI целиком", "import importlib.util as u; s = u.spec_from_file_location('gui', {!r}); "
+                    "u.module_from_spec(s); s.loader.exec_module(u.module_from_spec(s))".format(GUI_SCRIPT)),
+]
+PLATFORM_MODULES = ("PyQt5", "winreg", "ctypes", "asyncio")
+
+
+def top_level(code):
+    """{модуль верхнего уровня: суммарное время, мкс}"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def measure(code, baseline, runs):
+    best = None
+    for _ in range(runs):
+        modules = top_level(code)
+        total = sum(value for name, value in modules.items() if name not in baseline)
+        best = total if best is None else min(best, total)
+    return best / 1000
+
+
+def main(argv):
+    runs = int(argv[1]) if len(argv) > 1 else 5
+    baseline = set(top_level("pass"))
+    for title, code in TARGETS:
+        try:
+            print(f"{title:>18}: {measure(code, baseline, runs):7.1f} мс")
+        except RuntimeError as e:
+            print(f"{title:>18}: не импортируется ({e})")
+
+    code = ("import sys; from anonline import parse_vless_url, build_config, XraySupervisor, NetworkSetup; "
+            f"print(','.join(m for m in {PLATFORM_MODULES!r} if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", code], cwd=ROOT, stdout=subprocess.PIPE, text=True).stdout.strip()
+    print(f"Ядро загрузило платформенные модули: {loaded or 'нет'}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
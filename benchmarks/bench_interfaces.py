@@ -0,0 +1,78 @@
+"""Поиск активного интерфейса: прежний разбор netsh и InterfaceInventory.
+
+Образцы вывода "netsh interface show interface" (английская, русская и
+немецкая Windows) берутся из tests/netsh_samples.py. Для каждого образца печатается, что выбрал бы прежний цикл из set_dns
+(последнее слово строки с "Connected") и что выбирает новый разбор.
+Затем несколько циклов подключения/отключения с моделью задержек netsh
+сравнивают число запусков netsh с кэшем и без.
+
+Запуск: python benchmarks/bench_interfaces.py [циклов]
+Код возврата 1, если новый разбор ошибся хотя бы на одном образце.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.commands import CommandRunner, FakeBackend  # noqa: E402
+from anonline.interfaces import InterfaceInventory, parse_show_interface, pick_active  # noqa: E402
+from tests.netsh_samples import EXPECTED, SAMPLES  # noqa: E402
+
+NETSH_LATENCY = 0.12
+
+
+def legacy_active(text):
+    # Цикл из прежних set_dns/restore_dns
+    active_interface = "Ethernet"
+    for line in text.split("\n"):
+        if "Connected" in line and "Loopback" not in line:
+            parts = line.split()
+            if len(parts) > 3:
+                active_interface = parts[-1]
+                break
+    return active_interface
+
+
+def cycle(inventory, runner, cached):
+    # set_dns при подключении, restore_dns при отключении
+    for _ in range(2):
+        name = inventory.active() if cached else pick_active(parse_show_interface(
+            runner.netsh("interface", "show", "interface", capture=True).stdout))
+        runner.netsh("interface", "ipv4", "set", "dnsservers", f'name="{name}"', "source=dhcp")
+
+
+def main(argv):
+    cycles = int(argv[1]) if len(argv) > 1 else 5
+    mismatches = 0
+    for lang, text in SAMPLES.items():
+        parsed = pick_active(parse_show_interface(text))
+        mark = "ok" if parsed == EXPECTED[lang] else "ОШИБКА"
+        mismatches += parsed != EXPECTED[lang]
+        print(f"{lang}: прежний разбор {legacy_active(text)!r}, новый {parsed!r} ({mark})")
+
+    header, body = SAMPLES["en"].split("-\n")
+    text = header + "-\n" + "\n".join([body.strip("\n")] * 4)
+    start = time.perf_counter()
+    for _ in range(10000):
+        parse_show_interface(text)
+    print(f"Разбор вывода на {len(parse_show_interface(text))} интерфейсов: "
+          f"{(time.perf_counter() - start) * 100:.1f} мкс")
+
+    for cached in (False, True):
+        backend = FakeBackend({"netsh": NETSH_LATENCY}, outputs={("netsh", "interface", "show"): SAMPLES["ru"]})
+        runner = CommandRunner(backend)
+        inventory = InterfaceInventory(runner)
+        start = time.perf_counter()
+        for _ in range(cycles):
+            cycle(inventory, runner, cached)
+        elapsed = time.perf_counter() - start
+        queries = sum(1 for call in backend.calls if call[1:3] == ["interface", "show"])
+        title = "с кэшем" if cached else "без кэша"
+        print(f"{title}: {cycles} циклов за {elapsed * 1000:.0f} мс, запросов списка интерфейсов {queries}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,179 @@
+"""Поток логов Xray в консоль: сигнал на каждую строку против пакетов по кадрам.
+
+Поток-"читатель" выдает 100k строк в темпе "шторма подключений".
+Сравнивается время потока GUI на их вывод: по строке на событие (как
+раньше XrayLogThread.log_signal) и через LogBuffer со сбросом раз в кадр.
+Если установлен PyQt5, вывод идет в настоящую консоль (платформа
+offscreen), иначе консоль заменяется списком и замеряются только накладные
+расходы доставки.
+
+Запуск: python benchmarks/bench_log_pipeline.py [число строк]
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.log_pipeline import FRAME_INTERVAL_MS, LogBuffer  # noqa: E402
+
+try:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+    from PyQt5.QtWidgets import QApplication, QPlainTextEdit
+except ImportError:
+    QApplication = None
+
+
+def make_lines(count):
+    lines = []
+    for i in range(count):
+        if i % 1000 == 999:
+            lines.append(f"2024/05/01 12:00:{i % 60:02d} [Warning] [{i}] proxy/vless/outbound: connection ends")
+        elif i % 3:
+            lines.append(f"2024/05/01 12:00:{i % 60:02d} 127.0.0.1:{50000 + i % 10000} accepted "
+                         f"tcp:host{i % 500}.example.com:443 [socks -> proxy]")
+        else:
+            lines.append(f"2024/05/01 12:00:{i % 60:02d} [Info] [{i}] proxy/socks: TCP Connect request to "
+                         f"tcp:host{i % 500}.example.com:443")
+    return lines
+
+
+def format_batch(lines):
+    stamp = time.strftime("%H:%M:%S")
+    return "\n".join(f"[{stamp}] {line}" for line in lines)
+
+
+def run_plain(lines, batched, buffer=None):
+    """Без Qt: событийная очередь потока GUI и список вместо виджета"""
+    events = queue.SimpleQueue()
+    sink = []
+    done = threading.Event()
+
+    def reader():
+        if batched:
+            for line in lines:
+                buffer.push(line)
+        else:
+            for line in lines:
+                events.put(line)
+            events.put(None)
+        done.set()
+
+    thread = threading.Thread(target=reader)
+    cpu = time.thread_time()
+    start = time.perf_counter()
+    thread.start()
+    calls = 0
+    if batched:
+        while True:
+            finished = done.is_set()
+            batch = buffer.drain()
+            if batch:
+                sink.append(format_batch(batch))
+                calls += 1
+            if finished and not batch:
+                break
+            time.sleep(FRAME_INTERVAL_MS / 1000)
+    else:
+        while True:
+            line = events.get()
+            if line is None:
+                break
+            sink.append(format_batch([line]))
+            calls += 1
+    thread.join()
+    return time.thread_time() - cpu, time.perf_counter() - start, calls
+
+
+def run_qt(app, lines, batched, buffer=None):
+    """С Qt: консоль как в VlessVPNApp (QPlainTextEdit с ограничением строк)"""
+    console = QPlainTextEdit()
+    console.setReadOnly(True)
+    console.setUndoRedoEnabled(False)
+    console.setMaximumBlockCount(5000)
+    calls = [0]
+
+    def show(text):
+        console.appendPlainText(text)
+        console.ensureCursorVisible()
+        calls[0] += 1
+
+    class Bridge(QObject):
+        line_signal = pyqtSignal(object)
+
+    bridge = Bridge()
+    done = threading.Event()
+
+    def on_line(line):
+        if line is None:
+            app.quit()
+        else:
+            show(format_batch([line]))
+
+    def flush():
+        finished = done.is_set()
+        batch = buffer.drain()
+        if batch:
+            show(format_batch(batch))
+        elif finished:
+            app.quit()
+
+    def reader():
+        for line in lines:
+            if batched:
+                buffer.push(line)
+            else:
+                bridge.line_signal.emit(line)
+        if not batched:
+            bridge.line_signal.emit(None)
+        done.set()
+
+    timer = QTimer()
+    if batched:
+        timer.setInterval(FRAME_INTERVAL_MS)
+        timer.timeout.connect(flush)
+        timer.start()
+    else:
+        bridge.line_signal.connect(on_line)
+    thread = threading.Thread(target=reader)
+    cpu = time.thread_time()
+    start = time.perf_counter()
+    thread.start()
+    app.exec_()
+    thread.join()
+    timer.stop()
+    return time.thread_time() - cpu, time.perf_counter() - start, calls[0]
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100_000
+    lines = make_lines(count)
+    if QApplication is not None:
+        app = QApplication(sys.argv)
+        run = lambda *args, **kwargs: run_qt(app, *args, **kwargs)  # noqa: E731
+        print(f"{count} строк, вывод в QPlainTextEdit (offscreen)")
+    else:
+        run = run_plain
+        print(f"{count} строк, PyQt5 не установлен: консоль заменена списком")
+
+    cpu, wall, calls = run(lines, batched=False)
+    print(f"  сигнал на строку: GUI {cpu * 1000:.0f} мс CPU, {wall * 1000:.0f} мс всего, вызовов вывода {calls}")
+
+    buffer = LogBuffer(capacity=count, rate=float("inf"), burst=count)
+    cpu, wall, calls = run(lines, batched=True, buffer=buffer)
+    print(f"  пакеты раз в {FRAME_INTERVAL_MS} мс без ограничения темпа: GUI {cpu * 1000:.0f} мс CPU, "
+          f"{wall * 1000:.0f} мс всего, вызовов вывода {calls}, отброшено {buffer.dropped_total}")
+
+    buffer = LogBuffer()
+    cpu, wall, calls = run(lines, batched=True, buffer=buffer)
+    print(f"  пакеты + ограничение {buffer.rate:.0f} строк/с (всплеск {buffer.burst}, буфер {buffer.capacity}): "
+          f"GUI {cpu * 1000:.0f} мс CPU, {wall * 1000:.0f} мс всего, вызовов вывода {calls}, "
+          f"отброшено {buffer.dropped_total} из {buffer.received}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,117 @@
+"""Подключение и отключение: число процессов и время с пакетами netsh и без.
+
+Команды идут через CommandRunner с FakeBackend: запуск процесса стоит
+по модели задержек (netsh дорогой), каждая команда внутри скрипта
+netsh -f добавляет небольшую долю. Последовательности команд повторяют
+методы VlessVPNApp; подключение выполняется графом шагов, отключение -
+последовательно внутри одного блока batch(), как restore_network_settings.
+
+Запуск: python benchmarks/bench_netsh_batching.py [масштаб задержек]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.commands import CommandRunner, FakeBackend  # noqa: E402
+from anonline.steps import Step, run_steps  # noqa: E402
+
+# Запуск процесса, секунды (Windows 10, холодный кэш)
+LATENCY = {"netsh": 0.12, "tzutil": 0.06, "w32tm": 0.1, "powershell": 0.5}
+PER_COMMAND = 0.01
+INTERFACES = """
+Admin State    State          Type             Interface Name
+-------------------------------------------------------------------------
+Enabled        Connected      Dedicated        Ethernet
+Enabled        Disconnected   Dedicated        Wi-Fi
+"""
+
+
+def active_interface(runner):
+    result = runner.netsh("interface", "show", "interface", capture=True)
+    for line in result.stdout.split("\n"):
+        if "Connected" in line and "Loopback" not in line:
+            parts = line.split()
+            if len(parts) > 3:
+                return parts[-1]
+    return "Ethernet"
+
+
+def connect_steps(runner):
+    def ipv6():
+        runner.netsh("interface", "ipv6", "set", "global", "state=disabled")
+
+    def firewall():
+        with runner.batch():
+            runner.netsh("advfirewall", "firewall", "add", "rule", 'name="VPN Kill Switch"', "dir=out",
+                         "action=block", "enable=yes")
+            runner.netsh("advfirewall", "firewall", "add", "rule", 'name="Allow Xray"', "dir=out",
+                         "action=allow", 'program="C:\\AnonLine\\xray.exe"', "enable=yes")
+
+    def xray():
+        time.sleep(0.2)
+
+    def proxy():
+        runner.netsh("winhttp", "import", "proxy", "source=ie")
+
+    def dns():
+        name = active_interface(runner)
+        runner.netsh("interface", "ipv4", "set", "dnsservers", f'name="{name}"', "source=static",
+                     "address=127.0.0.1", "register=primary")
+
+    def hide_time():
+        runner.run(["tzutil", "/g"], capture=True)
+        runner.run(["tzutil", "/s", "UTC"])
+        runner.run(["w32tm", "/config", "/syncfromflags:manual", "/update"])
+        runner.run(["w32tm", "/resync", "/computer:time.nist.gov", "/nowait"])
+
+    return [Step("xray", xray, required=True), Step("proxy", proxy, after=("xray",), required=True),
+            Step("ipv6", ipv6), Step("firewall", firewall), Step("dns", dns, after=("xray",)),
+            Step("time", hide_time)]
+
+
+def disconnect(runner):
+    with runner.batch():
+        runner.netsh("winhttp", "import", "proxy", "source=ie")
+        name = active_interface(runner)
+        runner.netsh("interface", "ipv4", "set", "dnsservers", f'name="{name}"', "source=dhcp")
+        runner.netsh("interface", "ipv6", "set", "global", "state=enabled")
+        with runner.batch():
+            runner.netsh("advfirewall", "firewall", "delete", "rule", 'name="VPN Kill Switch"', "dir=out")
+            runner.netsh("advfirewall", "firewall", "delete", "rule", 'name="Allow Xray"', "dir=out")
+        runner.run(["tzutil", "/s", "Russian Standard Time"])
+        runner.run(["powershell", "-Command", 'Set-Date -Date "05-01-2024 12:00:00"'])
+        runner.run(["w32tm", "/config", "/syncfromflags:domhier", "/update"])
+        runner.run(["w32tm", "/resync"])
+
+
+def measure(batch_netsh, scale):
+    latency = {name: value * scale for name, value in LATENCY.items()}
+    backend = FakeBackend(latency, PER_COMMAND * scale, outputs={("netsh", "interface", "show"): INTERFACES})
+    runner = CommandRunner(backend, batch_netsh=batch_netsh)
+    report = run_steps(connect_steps(runner), max_workers=6)
+    connect_spawns = runner.spawns
+    netsh_connect = sum(1 for call in backend.calls if call[0] == "netsh")
+    start = time.perf_counter()
+    disconnect(runner)
+    disconnect_time = time.perf_counter() - start
+    netsh_disconnect = sum(1 for call in backend.calls if call[0] == "netsh") - netsh_connect
+    return (report.elapsed, connect_spawns, netsh_connect, disconnect_time, runner.spawns - connect_spawns,
+            netsh_disconnect, backend.scripts)
+
+
+def main(argv):
+    scale = float(argv[1]) if len(argv) > 1 else 1.0
+    for batch_netsh in (False, True):
+        connect, spawns, netsh_c, disc, disc_spawns, netsh_d, scripts = measure(batch_netsh, scale)
+        title = "с пакетами netsh" if batch_netsh else "без пакетов"
+        print(f"{title}: подключение {connect * 1000:.0f} мс, процессов {spawns} (netsh {netsh_c}); "
+              f"отключение {disc * 1000:.0f} мс, процессов {disc_spawns} (netsh {netsh_d})")
+        if scripts:
+            print(f"  скрипты netsh -f: {[len(lines) for lines in scripts]} команд")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,154 @@
+"""Журнал изменений сети: стоимость записи, скорость отката, сбой посреди сессии.
+
+Система заменена заглушками: FakeRegistry для прокси и FakeBackend с
+моделью задержек для netsh/tzutil/w32tm. Шаги записывают исходные
+значения в журнал так же, как методы VlessVPNApp.
+
+1. Запись: время одной записи с fsync.
+2. Откат: прежний порядок (все шаги по очереди, по флажкам) и откат по
+   журналу (только примененные шаги, независимые - параллельно).
+3. Сбой: сессия обрывается на середине записи, новый экземпляр журнала
+   находит изменения и откатывает их; проверяется, что прокси вернулся.
+
+Запуск: python benchmarks/bench_network_journal.py [масштаб задержек]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.commands import CommandRunner, FakeBackend  # noqa: E402
+from anonline.journal import NetworkJournal  # noqa: E402
+from anonline.registry import FakeRegistry, ProxySettings, read_proxy, write_proxy  # noqa: E402
+
+LATENCY = {"netsh": 0.12, "tzutil": 0.06, "w32tm": 0.1, "powershell": 0.5}
+ORIGINAL_PROXY = ProxySettings(1, "corp-proxy:3128", "*.corp;<local>")
+
+
+class FakeSystem:
+    """Шаги подключения и их откат поверх заглушек"""
+
+    def __init__(self, journal, scale):
+        self.journal = journal
+        self.registry = FakeRegistry()
+        write_proxy(self.registry, ORIGINAL_PROXY)
+        latency = {name: value * scale for name, value in LATENCY.items()}
+        self.commands = CommandRunner(FakeBackend(latency))
+
+    def set_proxy(self):
+        self.journal.record("proxy", read_proxy(self.registry)._asdict(), after=("xray",))
+        write_proxy(self.registry, ProxySettings(1, "socks=127.0.0.1:10808", "<local>"))
+        self.commands.netsh("winhttp", "import", "proxy", "source=ie")
+
+    def disable_ipv6(self):
+        self.journal.record("ipv6")
+        self.commands.netsh("interface", "ipv6", "set", "global", "state=disabled")
+
+    def create_firewall_rules(self):
+        self.journal.record("firewall")
+        with self.commands.batch():
+            self.commands.netsh("advfirewall", "firewall", "add", "rule", 'name="VPN Kill Switch"')
+            self.commands.netsh("advfirewall", "firewall", "add", "rule", 'name="Allow Xray"')
+
+    def set_dns(self):
+        self.journal.record("dns", {"interface": "Ethernet"}, after=("xray",))
+        self.commands.netsh("interface", "ipv4", "set", "dnsservers", 'name="Ethernet"', "source=static")
+
+    def hide_system_time(self):
+        self.journal.record("time", {"time_zone": "Russian Standard Time"})
+        self.commands.run(["tzutil", "/s", "UTC"])
+
+    def handlers(self):
+        commands = self.commands
+
+        def proxy(data):
+            write_proxy(self.registry, ProxySettings(**data))
+            commands.netsh("winhttp", "import", "proxy", "source=ie")
+
+        def firewall(data):
+            with commands.batch():
+                commands.netsh("advfirewall", "firewall", "delete", "rule", 'name="VPN Kill Switch"')
+                commands.netsh("advfirewall", "firewall", "delete", "rule", 'name="Allow Xray"')
+
+        def restore_time(data):
+            commands.run(["tzutil", "/s", data["time_zone"]])
+            commands.run(["powershell", "-Command", "Set-Date"])
+            commands.run(["w32tm", "/config", "/syncfromflags:domhier", "/update"])
+            commands.run(["w32tm", "/resync"])
+
+        return {
+            "proxy": proxy,
+            "ipv6": lambda data: commands.netsh("interface", "ipv6", "set", "global", "state=enabled"),
+            "firewall": firewall,
+            "dns": lambda data: commands.netsh("interface", "ipv4", "set", "dnsservers",
+                                               f'name="{data["interface"]}"', "source=dhcp"),
+            "time": restore_time,
+        }
+
+    def connect(self, failing_time=False):
+        self.journal.begin()
+        self.disable_ipv6()
+        self.create_firewall_rules()
+        self.set_proxy()
+        self.set_dns()
+        if not failing_time:
+            self.hide_system_time()
+
+
+def legacy_restore(system):
+    # Прежний restore_network_settings: все шаги по очереди, по состоянию флажков
+    handlers = system.handlers()
+    data = {"proxy": ORIGINAL_PROXY._asdict(), "dns": {"interface": "Ethernet"},
+            "time": {"time_zone": "Russian Standard Time"}}
+    for name in ("proxy", "dns", "ipv6", "firewall", "time"):
+        handlers[name](data.get(name, {}))
+
+
+def main(argv):
+    scale = float(argv[1]) if len(argv) > 1 else 1.0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "network_journal.jsonl")
+
+        journal = NetworkJournal(path)
+        start = time.perf_counter()
+        for i in range(200):
+            journal.record("bench", {"i": i})
+        per_record = (time.perf_counter() - start) / 200
+        journal.clear()
+        print(f"Запись в журнал с fsync: {per_record * 1000:.2f} мс на запись")
+
+        system = FakeSystem(NetworkJournal(path), scale)
+        system.connect()
+        start = time.perf_counter()
+        legacy_restore(system)
+        legacy = time.perf_counter() - start
+
+        journal.clear()
+        system = FakeSystem(NetworkJournal(path), scale)
+        system.connect()
+        start = time.perf_counter()
+        report = system.journal.rollback(system.handlers())
+        print(f"Откат: по очереди {legacy * 1000:.0f} мс, по журналу {(time.perf_counter() - start) * 1000:.0f} мс")
+        print(f"  {report.summary()}")
+        print(f"  журнал удален: {not os.path.exists(path)}")
+
+        # Подключение, в котором флажок времени не сработал: откатывается только примененное
+        system = FakeSystem(NetworkJournal(path), scale)
+        system.connect(failing_time=True)
+        # Сбой посреди записи: последняя строка оборвана
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"op": "apply", "step": "webrt')
+        recovered = NetworkJournal(path)
+        pending = recovered.pending()
+        print(f"После сбоя в журнале: {', '.join(pending)}")
+        report = recovered.rollback(system.handlers())
+        restored = read_proxy(system.registry) == ORIGINAL_PROXY
+        print(f"  откат за {report.elapsed * 1000:.0f} мс, прокси восстановлен: {restored}, "
+              f"журнал удален: {not os.path.exists(path)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,104 @@
+"""Симулятор маршрутизации: 1 млн соединений по правилам сгенерированного конфига.
+
+Конфиг собирается build_config (счетчики Xray включены, все блокировки
+включены), geoip.dat синтетический: PRIVATE и CN из 10 тыс. сетей.
+Соединения - смесь DNS-запросов через dns-inbound, частных и китайских
+адресов, IPv6, STUN, bittorrent и обычного TLS; адреса берутся из пула
+(как в реальном трафике, где адреса повторяются) и отдельно все разные.
+route_many (индексы полей и битовые маски) сравнивается с поштучным
+route (перебор правил по порядку), ответы сверяются.
+
+Запуск: python benchmarks/bench_routing_sim.py [соединений]
+"""
+
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.geoip import GeoIPFile, build_geoip  # noqa: E402
+from anonline.routing_sim import Flow, RoutingSimulator  # noqa: E402
+from anonline.vless import parse_vless_url  # noqa: E402
+from anonline.xray_config import DNS_INBOUND_TAG, ConfigOptions, build_config  # noqa: E402
+from anonline.xray_stats import STATS_PORT  # noqa: E402
+
+KEY = ("vless://3f1c1a4e-8a0b-4a3c-9d7e-2b6f1c0d9e8a@vpn.example.net:443?type=tcp&security=reality"
+       "&pbk=abc&sni=www.example.com&fp=chrome&sid=ab12&flow=xtls-rprx-vision#bench")
+SAMPLE = 100_000
+
+
+def make_geoip(path, rng):
+    cn = [f"{ipaddress.IPv4Address(rng.getrandbits(32))}/{rng.choice([16, 20, 22, 24])}" for _ in range(10_000)]
+    cn += ["2400:da00::/32", "240e::/20"]
+    private = ["10.0.0.0/8", "127.0.0.0/8", "169.254.0.0/16", "172.16.0.0/12", "192.168.0.0/16", "::1/128",
+               "fc00::/7", "fe80::/10"]
+    with open(path, "wb") as f:
+        f.write(build_geoip({"PRIVATE": private, "CN": cn}))
+
+
+def random_ip(rng):
+    kind = rng.random()
+    if kind < 0.1:
+        return f"192.168.{rng.randrange(256)}.{rng.randrange(256)}"
+    if kind < 0.2:
+        return f"240e:{rng.randrange(1 << 12):x}::{rng.randrange(1 << 16):x}"
+    if kind < 0.25:
+        return f"2001:db8::{rng.randrange(1 << 16):x}"
+    return str(ipaddress.IPv4Address(rng.getrandbits(32)))
+
+
+def make_flows(rng, count, pool):
+    ips = [random_ip(rng) for _ in range(pool)]
+    domains = [f"host{i}.example{i % 97}.com" for i in range(pool // 10)] + [None] * (pool // 10)
+    flows = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.1:
+            flows.append(Flow(ip="1.1.1.1", port=53, network="udp", inbound_tag=DNS_INBOUND_TAG))
+        elif kind < 0.15:
+            flows.append(Flow(ip=rng.choice(ips), port=rng.choice([3478, 19302, 5349]), network="udp"))
+        elif kind < 0.2:
+            flows.append(Flow(ip=rng.choice(ips), port=rng.randrange(6881, 6890), network="udp",
+                              protocol="bittorrent"))
+        else:
+            flows.append(Flow(domain=rng.choice(domains), ip=rng.choice(ips), port=rng.choice([443, 443, 80, 8443]),
+                              protocol=rng.choice(["tls", "tls", "http", None])))
+    return flows
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 1_000_000
+    rng = random.Random(1)
+    config = build_config(parse_vless_url(KEY), ConfigOptions(stats_port=STATS_PORT))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "geoip.dat")
+        make_geoip(path, rng)
+        with GeoIPFile(path) as geoip:
+            simulator, compile_time = timed(RoutingSimulator, config, geoip)
+            print(f"{len(simulator.rules)} правил, компиляция {compile_time * 1000:.0f} мс (с загрузкой geoip:cn)")
+            for title, pool in (("адреса из пула 50 тыс.", 50_000), ("все адреса разные", count)):
+                flows = make_flows(rng, count, pool)
+                simulator.hits.clear()
+                routes, batch = timed(simulator.route_many, flows)
+                sample = flows[:SAMPLE]
+                single, one = timed(lambda: [simulator.route(flow, count=False) for flow in sample])
+                mismatches = sum(a != b for a, b in zip(routes, single))
+                print(f"{count} соединений, {title}: route_many {batch:.2f} с ({count / batch / 1e6:.2f} млн/с), "
+                      f"поштучный route {one / len(sample) * 1e6:.1f} мкс/соединение "
+                      f"(в {one / len(sample) * count / batch:.1f} раз медленнее), расхождений {mismatches} "
+                      f"из {len(sample)}")
+            print("\n".join(simulator.hit_report()))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
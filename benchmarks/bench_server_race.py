@@ -0,0 +1,126 @@
+"""Гонка серверов против локальных слушателей с искусственной задержкой.
+
+Каждый "сервер" - TCP-прокси, который задерживает первые данные клиента
+(ClientHello) на заданное время и передает их локальному TLS-серверу.
+Сертификат для TLS-сервера создается через openssl во временном каталоге.
+
+Запуск: python benchmarks/bench_server_race.py [число серверов] [параллельность]
+"""
+
+import asyncio
+import os
+import random
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.race import LatencyRacer  # noqa: E402
+
+
+def make_tls_context(tmp):
+    cert = os.path.join(tmp, "cert.pem")
+    key = os.path.join(tmp, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-subj", "/CN=localhost",
+         "-days", "1", "-keyout", key, "-out", cert],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def pipe(reader, writer, delay=0.0):
+    try:
+        first = True
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            if first and delay:
+                await asyncio.sleep(delay)
+            first = False
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def delayed_proxy(tls_port, delay):
+    async def handle(reader, writer):
+        try:
+            up_reader, up_writer = await asyncio.open_connection("127.0.0.1", tls_port)
+        except OSError:
+            writer.close()
+            return
+        await asyncio.gather(pipe(reader, up_writer, delay), pipe(up_reader, writer))
+    return handle
+
+
+async def tls_standin(reader, writer):
+    try:
+        await reader.read(1)
+    except (ConnectionError, ssl.SSLError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main(count, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            context = make_tls_context(tmp)
+        except (OSError, subprocess.CalledProcessError):
+            print("Нужен openssl для создания тестового сертификата")
+            return
+
+    tls_server = await asyncio.start_server(tls_standin, "127.0.0.1", 0, ssl=context)
+    tls_port = tls_server.sockets[0].getsockname()[1]
+
+    rnd = random.Random(7)
+    delays = [rnd.uniform(0.02, 0.3) for _ in range(count)]
+    servers = []
+    params_list = []
+    for delay in delays:
+        server = await asyncio.start_server(delayed_proxy(tls_port, delay), "127.0.0.1", 0)
+        servers.append(server)
+        params_list.append({"server": "127.0.0.1", "port": server.sockets[0].getsockname()[1],
+                            "sni": "localhost", "security": "reality"})
+    # Один сервер "мертвый": никто не слушает порт
+    params_list.append({"server": "127.0.0.1", "port": 1, "sni": "", "security": "reality"})
+
+    racer = LatencyRacer(concurrency=concurrency, timeout=2.0, ttl=60.0)
+    start = time.perf_counter()
+    results = await racer.race(params_list)
+    cold = time.perf_counter() - start
+
+    best, best_params = results[0]
+    fastest = min(range(count), key=delays.__getitem__)
+    print(f"{count} серверов, параллельность {concurrency}: гонка за {cold * 1000:.0f} мс "
+          f"(последовательно было бы ~{sum(delays) * 1000:.0f} мс)")
+    print(f"Лучший: порт {best_params['port']}, TCP {best.tcp * 1000:.1f} мс, TLS {best.tls * 1000:.1f} мс; "
+          f"ожидался порт {params_list[fastest]['port']} (задержка {delays[fastest] * 1000:.0f} мс)")
+    failed = [r for r, _ in results if not r.ok]
+    print(f"Недоступных: {len(failed)} ({failed[0].error if failed else '-'})")
+
+    start = time.perf_counter()
+    results = await racer.race(params_list)
+    warm = time.perf_counter() - start
+    print(f"Повторная гонка из кэша: {warm * 1000:.2f} мс, из кэша {sum(r.cached for r, _ in results)} результатов")
+
+    for server in servers:
+        server.close()
+    tls_server.close()
+    await asyncio.sleep(0.05)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    asyncio.run(main(count, concurrency))
@@ -0,0 +1,119 @@
+"""Настройки: 1000 быстрых изменений - число записей файла и время потока GUI.
+
+Прежний save_settings переписывал vless_settings.json целиком (indent=2,
+без временного файла) на каждое сохранение; SettingsStore меняет словарь
+в памяти, а файл пишет фоновый поток одним разом за окно delay.
+Изменения идут пачкой без пауз и с паузой 1 мс (щелчки по чекбоксам).
+Параллельно поток-читатель разбирает файл: сколько раз он застал файл
+обрезанным или пустым.
+
+Запуск: python benchmarks/bench_settings_store.py [изменений] [каталог]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.settings_store import DEFAULTS, SettingsStore  # noqa: E402
+
+FLAGS = ["max_anonymity", "disable_ipv6", "block_webrtc", "firewall_killswitch", "use_local_dns", "hide_system_time"]
+
+
+class LegacySettings:
+    """Прежний save_settings: полная синхронная перезапись файла"""
+
+    def __init__(self, path):
+        self.path = path
+        self.values = dict(DEFAULTS, key="vless://" + "k" * 300)
+        self.writes = 0
+        self.bytes_written = 0
+
+    def update(self, values):
+        self.values.update(values)
+        data = json.dumps(self.values, indent=2)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(data)
+        self.writes += 1
+        self.bytes_written += len(data.encode("utf-8"))
+
+
+class Reader(threading.Thread):
+    """Постоянно читает файл настроек и считает неразбираемые состояния"""
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.reads = 0
+        self.broken = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.is_set():
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    json.load(f)
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                self.broken += 1
+            self.reads += 1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(store, path, count, pause, settle):
+    rng = random.Random(1)
+    reader = Reader(path)
+    reader.start()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        values = {flag: rng.random() < 0.5 for flag in rng.sample(FLAGS, 2)}
+        began = time.perf_counter()
+        store.update(values)
+        latencies.append(time.perf_counter() - began)
+        if pause:
+            time.sleep(pause)
+    elapsed = time.perf_counter() - start
+    settle()
+    reader.stop.set()
+    reader.join()
+    return latencies, elapsed, reader
+
+
+def report(title, store, path, count, latencies, elapsed, reader):
+    size = os.path.getsize(path)
+    print(f"  {title:<14} записей {store.writes:>4} на {count} изменений, записано {store.bytes_written / 1024:7.1f} КБ "
+          f"(x{store.bytes_written / size:.0f} от файла); поток GUI: всего {sum(latencies) * 1000:7.1f} мс, "
+          f"p50 {percentile(latencies, 0.5) * 1e6:6.1f} мкс, p99 {percentile(latencies, 0.99) * 1e6:7.1f} мкс, "
+          f"макс {max(latencies) * 1000:5.2f} мс; прогон {elapsed * 1000:.0f} мс; "
+          f"чтений {reader.reads}, битых {reader.broken}")
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 1000
+    with tempfile.TemporaryDirectory(dir=argv[2] if len(argv) > 2 else None) as tmp:
+        for pause, label in ((0, "без пауз"), (0.001, "пауза 1 мс")):
+            print(f"{count} изменений {label}:")
+            path = os.path.join(tmp, "vless_settings.json")
+            legacy = LegacySettings(path)
+            report("прежний", legacy, path, count, *run(legacy, path, count, pause, lambda: None))
+
+            path = os.path.join(tmp, f"settings-{pause}.json")
+            store = SettingsStore(path, delay=0.5)
+            store.load()
+            store.update({"key": "vless://" + "k" * 300})
+            report("SettingsStore", store, path, count, *run(store, path, count, pause, store.close))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,106 @@
+"""Проверка через SOCKS5 против локальных заглушек прокси и HTTP-сервера.
+
+Заглушка SOCKS5 принимает CONNECT (имя хоста не резолвит, а всегда
+направляет на локальный HTTP-сервер) и добавляет настраиваемые задержки
+на рукопожатие и CONNECT; HTTP-сервер отвечает на HEAD с задержкой.
+Печатаются этапы каждой проверки и видно, что повторные проверки идут
+по keep-alive соединению без нового рукопожатия.
+
+Запуск: python benchmarks/bench_socks_probe.py [число проверок]
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.health import Socks5Probe  # noqa: E402
+
+HANDSHAKE_DELAY = 0.010
+CONNECT_DELAY = 0.030
+RESPONSE_DELAY = 0.020
+
+
+async def http_standin(reader, writer):
+    try:
+        while True:
+            await reader.readuntil(b"\r\n\r\n")
+            await asyncio.sleep(RESPONSE_DELAY)
+            writer.write(b"HTTP/1.1 204 No Content\r\nConnection: keep-alive\r\n\r\n")
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def socks_standin(http_port, stats):
+    async def handle(reader, writer):
+        try:
+            version, nmethods = await reader.readexactly(2)
+            await reader.readexactly(nmethods)
+            await asyncio.sleep(HANDSHAKE_DELAY)
+            writer.write(b"\x05\x00")
+            stats["handshakes"] += 1
+            _, cmd, _, atyp = await reader.readexactly(4)
+            if atyp == 1:
+                await reader.readexactly(4)
+            elif atyp == 4:
+                await reader.readexactly(16)
+            else:
+                await reader.readexactly((await reader.readexactly(1))[0])
+            await reader.readexactly(2)
+            await asyncio.sleep(CONNECT_DELAY)
+            up_reader, up_writer = await asyncio.open_connection("127.0.0.1", http_port)
+            writer.write(b"\x05\x00\x00\x01\x7f\x00\x00\x01\x00\x00")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        await asyncio.gather(pipe(reader, up_writer), pipe(up_reader, writer))
+
+    return handle
+
+
+async def main(count):
+    http_server = await asyncio.start_server(http_standin, "127.0.0.1", 0)
+    http_port = http_server.sockets[0].getsockname()[1]
+    stats = {"handshakes": 0}
+    socks_server = await asyncio.start_server(socks_standin(http_port, stats), "127.0.0.1", 0)
+    socks_port = socks_server.sockets[0].getsockname()[1]
+
+    probe = Socks5Probe("127.0.0.1", socks_port)
+    for i in range(count):
+        result = await probe("www.google.com", 80, 3.0)
+        stages = ""
+        if result.handshake is not None:
+            stages = (f"рукопожатие {result.handshake * 1000:.1f} мс, "
+                      f"CONNECT {result.connect * 1000:.1f} мс, ")
+        print(f"#{i + 1}: ok={result.ok} {stages}первый байт {result.ttfb * 1000:.1f} мс, "
+              f"всего {result.latency * 1000:.1f} мс, повторно={result.reused}")
+    await probe.aclose()
+    print(f"Рукопожатий SOCKS на {count} проверок: {stats['handshakes']}")
+    # Даем заглушкам увидеть закрытие соединения до остановки цикла
+    await asyncio.sleep(0.05)
+
+    socks_server.close()
+    http_server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
@@ -0,0 +1,94 @@
+"""Холодный запуск GUI до первой отрисовки с бюджетом времени.
+
+Окно запускается в отдельном интерпретаторе на платформе Qt offscreen
+(по умолчанию 5 раз) в пустом временном каталоге, отчет трассировщика
+запуска (ANONLINE_STARTUP_TRACE) пишется в JSON, после первой отрисовки
+приложение завершается. Печатаются медианы фаз и время процесса целиком
+(с учетом старта интерпретатора). Код возврата 1, если медиана времени
+до первой отрисовки превышает бюджет.
+
+Запуск: python benchmarks/bench_startup.py [запусков] [--budget-ms 500]
+"""
+
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_SCRIPT = os.path.join(ROOT, "AnonLineVPN-0.5.py")
+
+sys.path.insert(0, ROOT)
+
+from anonline.startup_trace import STARTUP_TRACE_ENV  # noqa: E402
+
+# Выход из цикла событий сразу после первой отрисовки
+DRIVER = """
+import runpy, sys
+sys.path.insert(0, {root!r})
+from anonline.startup_trace import TRACER
+TRACER.on_finish(lambda: sys.modules["PyQt5.QtWidgets"].QApplication.quit())
+runpy.run_path({script!r}, run_name="__main__")
+"""
+
+
+def cold_start(workdir, timeout):
+    """Один запуск: (отчет трассировщика, время процесса в мс)"""
+    report_path = os.path.join(workdir, "startup.json")
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    env[STARTUP_TRACE_ENV] = report_path
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", DRIVER.format(root=ROOT, script=GUI_SCRIPT)], cwd=workdir,
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                            timeout=timeout)
+    wall = (time.perf_counter() - start) * 1000
+    if not os.path.exists(report_path):
+        raise RuntimeError(f"окно не отрисовано (код {result.returncode}): {result.stderr.strip()[-500:]}")
+    with open(report_path, encoding="utf-8") as f:
+        report = json.load(f)
+    os.remove(report_path)
+    return report, wall
+
+
+def main(argv):
+    args = list(argv[1:])
+    budget = 500.0
+    if "--budget-ms" in args:
+        index = args.index("--budget-ms")
+        budget = float(args[index + 1])
+        del args[index:index + 2]
+    runs = int(args[0]) if args else 5
+
+    # Без .pyc каждый запуск компилировал бы пакет заново
+    compileall.compile_dir(os.path.join(ROOT, "anonline"), quiet=1)
+
+    totals, walls, phases, depths = [], [], {}, {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(runs):
+            report, wall = cold_start(workdir, timeout=60)
+            totals.append(report["total_ms"])
+            walls.append(wall)
+            for span in report["spans"]:
+                phases.setdefault(span["name"], []).append(span["end"] - span["start"])
+                depths[span["name"]] = span["depth"]
+
+    print(f"Холодный запуск, {runs} запусков (offscreen), медианы фаз:")
+    for name, values in phases.items():
+        title = "  " * depths[name] + name
+        print(f"  {title:<26} {statistics.median(values):7.1f} мс")
+    median = statistics.median(totals)
+    print(f"До первой отрисовки: медиана {median:.1f} мс, мин. {min(totals):.1f}, макс. {max(totals):.1f} "
+          f"(бюджет {budget:.0f} мс)")
+    print(f"Процесс целиком (старт интерпретатора + выход): медиана {statistics.median(walls):.0f} мс")
+    if median > budget:
+        print("БЮДЖЕТ ПРЕВЫШЕН")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,91 @@
+"""Разбор синтетической подписки из 100k vless:// ссылок.
+
+Сравниваются: пакетный разбор всего блоба, потоковый разбор из файла
+и поштучный вызов parse_vless_url (как раньше в окне приложения).
+
+Запуск: python benchmarks/bench_subscription.py [число ссылок]
+"""
+
+import base64
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.subscription import (  # noqa: E402
+    SubscriptionStats, decode_subscription, iter_subscription_stream, parse_subscription
+)
+from anonline.vless import parse_vless_url  # noqa: E402
+
+
+def make_links(count, seed=3):
+    rnd = random.Random(seed)
+    links = []
+    for i in range(count):
+        if links and rnd.random() < 0.1:
+            # ~10% дубликатов
+            links.append(rnd.choice(links))
+            continue
+        user = uuid.UUID(int=rnd.getrandbits(128))
+        host = f"srv{i}.example{rnd.randrange(100)}.net"
+        pbk = base64.urlsafe_b64encode(rnd.randbytes(32)).decode().rstrip("=")
+        links.append(
+            f"vless://{user}@{host}:{rnd.choice([443, 8443, 2053])}?type=tcp&security=reality"
+            f"&fp=chrome&pbk={pbk}&sni=www.microsoft.com&flow=xtls-rprx-vision&sid={rnd.getrandbits(32):08x}"
+            f"&spx=%2F#%F0%9F%87%A9%F0%9F%87%AA%20Server%20{i}"
+        )
+    return links
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100_000
+    links = make_links(count)
+    blob = base64.b64encode("\n".join(links).encode()).decode()
+    print(f"{count} ссылок, блоб {len(blob) / 1e6:.1f} МБ base64")
+
+    stats = SubscriptionStats()
+    start = time.perf_counter()
+    parsed = parse_subscription(blob, stats)
+    elapsed = time.perf_counter() - start
+    print(f"Пакетный разбор: {elapsed * 1000:.0f} мс, {count / elapsed:,.0f} ссылок/с; {stats}")
+
+    start = time.perf_counter()
+    streamed = sum(1 for _ in iter_subscription_stream(io.StringIO(blob), chunk_size=256 * 1024))
+    elapsed = time.perf_counter() - start
+    # Пик памяти замеряется отдельным прогоном: tracemalloc сильно замедляет выделения
+    stream = io.BytesIO(blob.encode("ascii"))
+    tracemalloc.start()
+    for _ in iter_subscription_stream(stream, chunk_size=256 * 1024):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Потоковый разбор: {elapsed * 1000:.0f} мс, {count / elapsed:,.0f} ссылок/с, "
+          f"пик памяти {peak / 1e6:.1f} МБ (без исходного блоба), уникальных {streamed}")
+
+    text = decode_subscription(blob)
+    start = time.perf_counter()
+    seen = set()
+    for line in text.splitlines():
+        params = parse_vless_url(line)
+        if params:
+            seen.add((params["uuid"], params["server"], params["port"], params["pbk"], params["sid"]))
+    elapsed = time.perf_counter() - start
+    print(f"Поштучно parse_vless_url: {elapsed * 1000:.0f} мс, {count / elapsed:,.0f} ссылок/с, уникальных {len(seen)}")
+
+    sample = {link.key: link for link in parsed}
+    mismatches = 0
+    for line in links[:2000]:
+        expected = parse_vless_url(line)
+        got = sample[(expected["uuid"], expected["server"], expected["port"], expected["pbk"], expected["sid"])]
+        if got.to_params() != expected:
+            mismatches += 1
+    print(f"Расхождений с parse_vless_url на 2000 ссылках: {mismatches}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,80 @@
+"""Сборка конфига Xray: скорость build_config + проверка + сериализация.
+
+Для 10 тыс. разных ключей (сервер, порт, UUID, транспорт, флажки
+анонимности) замеряются отдельно сборка, validate_config и
+serialize_config с хэшем. Затем write_config пишет один и тот же конфиг
+повторно: считается, сколько раз файл действительно переписан.
+Отдельно проверяется, что неверные ключи отклоняются до запуска Xray.
+
+Запуск: python benchmarks/bench_xray_config.py [число наборов]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.vless import parse_vless_url  # noqa: E402
+from anonline.xray_config import (  # noqa: E402
+    ConfigError, ConfigOptions, build_config, config_digest, serialize_config, validate_config, write_config
+)
+
+
+def make_params(rng):
+    security = rng.choice(["reality", "reality", "tls", "none"])
+    url = (f"vless://{uuid.UUID(int=rng.getrandbits(128))}@srv{rng.randrange(10000)}.example.net:"
+           f"{rng.choice([443, 8443, 2053])}?type={rng.choice(['tcp', 'ws', 'grpc'])}&security={security}"
+           f"&pbk=pk{rng.randrange(1 << 30):x}&sni=www.example{rng.randrange(100)}.com&fp=chrome"
+           f"&sid={rng.randrange(1 << 16):x}&flow=xtls-rprx-vision#bench")
+    return parse_vless_url(url)
+
+
+def make_options(rng):
+    return ConfigOptions(dns_port=rng.choice([53, None]), block_ipv6=rng.random() < 0.8,
+                         block_stun=rng.random() < 0.8, stats_port=rng.choice([10813, None]))
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 10_000
+    rng = random.Random(1)
+    inputs = [(make_params(rng), make_options(rng)) for _ in range(count)]
+
+    start = time.perf_counter()
+    configs = [build_config(params, options) for params, options in inputs]
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for config in configs:
+        validate_config(config)
+    validate = time.perf_counter() - start
+    start = time.perf_counter()
+    digests = {config_digest(serialize_config(config)) for config in configs}
+    serialize = time.perf_counter() - start
+    total = build + validate + serialize
+    print(f"{count} конфигов: сборка {build * 1000:.0f} мс, проверка {validate * 1000:.0f} мс, "
+          f"сериализация+SHA-256 {serialize * 1000:.0f} мс; {count / total:.0f} конфигов/с, "
+          f"различных {len(digests)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "config.json")
+        params, options = inputs[0]
+        writes = 0
+        start = time.perf_counter()
+        for _ in range(1000):
+            writes += write_config(build_config(params, options), path).written
+        repeat = (time.perf_counter() - start) / 1000
+        print(f"Повторное подключение с тем же ключом: записей файла {writes} из 1000, "
+              f"{repeat * 1000:.2f} мс на вызов write_config")
+
+    bad = dict(inputs[0][0], port=70000, uuid="", pbk="", security="reality")
+    try:
+        validate_config(build_config(bad))
+    except ConfigError as e:
+        print(f"Неверный ключ отклонен: {len(e.problems)} ошибки: {e}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
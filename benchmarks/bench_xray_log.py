@@ -0,0 +1,85 @@
+"""Потоковый разбор синтетического лога Xray на несколько миллионов строк.
+
+Лог (журнал доступа вперемешку с журналом ошибок, ~2% мусорных строк)
+пишется во временный файл и читается построчно, как stdout Xray.
+Сравниваются: XrayLogStats.feed (только счетчики) и parse_line
+(запись на каждую строку).
+
+Запуск: python benchmarks/bench_xray_log.py [число строк, млн]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.xray_log import XrayLogStats, parse_line  # noqa: E402
+
+
+def write_log(path, count, seed=11):
+    rnd = random.Random(seed)
+    # Назначения распределены по Ципфу: немного популярных и длинный хвост
+    hosts = [f"host{i}.example{i % 97}.com" for i in range(50_000)]
+    weights = [1.0 / (i + 1) for i in range(len(hosts))]
+    picks = rnd.choices(range(len(hosts)), weights, k=count)
+    outbounds = ["proxy"] * 7 + ["direct"] * 2 + ["block"]
+    with open(path, "w", encoding="utf-8") as f:
+        for i, pick in enumerate(picks):
+            stamp = f"2024/05/01 12:{i // 60000 % 60:02d}:{i // 1000 % 60:02d}"
+            roll = i % 50
+            if roll == 0:
+                f.write(f"{stamp} [Warning] [{i}] app/dispatcher: default route for tcp:{hosts[pick]}:443\n")
+            elif roll == 1:
+                f.write(f"{stamp} [Info] [{i}] proxy/socks: TCP Connect request to tcp:{hosts[pick]}:443\n")
+            elif roll == 2:
+                f.write("Xray 1.8.4 (Xray, Penetrates Everything.) Custom (go1.21.1 windows/amd64)\n")
+            else:
+                f.write(f"{stamp}.{i % 1000000:06d} from 127.0.0.1:{50000 + i % 10000} accepted "
+                        f"tcp:{hosts[pick]}:{443 if i % 5 else 80} [socks -> {outbounds[i % 10]}]\n")
+
+
+def main(argv):
+    millions = float(argv[1]) if len(argv) > 1 else 2.0
+    count = int(millions * 1_000_000)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "xray.log")
+        start = time.perf_counter()
+        write_log(path, count)
+        size = os.path.getsize(path)
+        print(f"{count:,} строк, {size / 1e6:.0f} МБ, создан за {time.perf_counter() - start:.1f} с")
+
+        stats = XrayLogStats(window=3600.0)
+        with open(path, encoding="utf-8") as f:
+            start = time.perf_counter()
+            for line in f:
+                stats.feed(line)
+            elapsed = time.perf_counter() - start
+        print(f"XrayLogStats.feed: {elapsed:.2f} с, {count / elapsed:,.0f} строк/с, {size / elapsed / 1e6:.0f} МБ/с; "
+              f"нераспознано {stats.unparsed}")
+        destinations, outbounds, levels = stats.snapshot()
+        print(f"  подключения по outbound: {outbounds}")
+        print(f"  строки по уровням: {levels}")
+        print(f"  назначений в счетчиках: {sum(len(h) for h in destinations.values())} "
+              f"(лимит {stats.max_destinations} на outbound)")
+        print(f"  топ proxy: {stats.top('proxy', 3)}")
+        print(f"  сводка: {stats.summary(3)}")
+
+        with open(path, encoding="utf-8") as f:
+            start = time.perf_counter()
+            parsed = sum(1 for line in f if parse_line(line) is not None)
+            elapsed = time.perf_counter() - start
+        print(f"parse_line (запись на строку): {elapsed:.2f} с, {count / elapsed:,.0f} строк/с, распознано {parsed}")
+
+        with open(path, encoding="utf-8") as f:
+            start = time.perf_counter()
+            for line in f:
+                line.strip()
+            elapsed = time.perf_counter() - start
+        print(f"Только чтение и strip (прежний XrayLogThread): {elapsed:.2f} с")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,116 @@
+"""Задержка от запуска Xray до готовности: событие лога и опрос портов.
+
+Заглушка xray открывает два порта (SOCKS и DNS) через заданное время,
+печатает момент открытия и строку "Xray ... started". Замеряется, на
+сколько готовность обнаруживается позже фактического открытия портов:
+только по портам, по логу и портам вместе, а также скорость обнаружения
+ошибки запуска ("Failed to start") по сравнению с таймаутом.
+
+Запуск: python benchmarks/bench_xray_readiness.py [задержка старта, мс] [повторов]
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.xray_process import XraySupervisor  # noqa: E402
+
+FAKE_XRAY = r"""
+import socket, sys, time
+ports, delay, mode = [int(p) for p in sys.argv[1].split(",")], float(sys.argv[2]), sys.argv[3]
+print("Xray 0.0.0 (fake) Custom (go1.21 windows/amd64)", flush=True)
+time.sleep(delay)
+if mode == "fail":
+    print("Failed to start: main: failed to create server > app/proxyman/inbound: failed to listen TCP on "
+          + str(ports[0]) + " > bind: address already in use", flush=True)
+    sys.exit(23)
+servers = []
+for port in ports:
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", port))
+    server.listen(16)
+    servers.append(server)
+print("BOUND", time.time(), flush=True)
+if mode != "quiet":
+    print("[Warning] core: Xray 0.0.0 started", flush=True)
+while True:
+    time.sleep(1)
+"""
+
+
+def free_ports(count):
+    socks = [socket.socket() for _ in range(count)]
+    for sock in socks:
+        sock.bind(("127.0.0.1", 0))
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+def read_log(stdout, gate, bound):
+    # Как XrayLogThread: строки передаются в gate в потоке чтения
+    for line in iter(stdout.readline, ""):
+        if line.startswith("BOUND"):
+            bound.append(float(line.split()[1]))
+        if gate is not None:
+            gate.feed(line)
+    if gate is not None:
+        gate.feed_eof()
+
+
+def run_once(delay, mode, use_log, timeout=5.0):
+    ports = free_ports(2)
+    supervisor = XraySupervisor([sys.executable, "-c", FAKE_XRAY, ",".join(map(str, ports)), str(delay), mode])
+    process = supervisor.start()
+    bound = []
+    reader = threading.Thread(target=read_log, args=(process.stdout, supervisor.gate if use_log else None, bound),
+                              daemon=True)
+    reader.start()
+    start = time.perf_counter()
+    ready, info = supervisor.wait_ready(ports, timeout=timeout)
+    resolved_wall = time.time()
+    waited = time.perf_counter() - start
+    source = supervisor.gate.source
+    supervisor.stop(timeout=1.0)
+    reader.join(1.0)
+    process.stdout.close()
+    lag = (resolved_wall - bound[0]) if bound and ready else None
+    return ready, waited, lag, source, info
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(argv):
+    delay = (int(argv[1]) if len(argv) > 1 else 200) / 1000
+    repeats = int(argv[2]) if len(argv) > 2 else 7
+    print(f"Заглушка открывает порты через {delay * 1000:.0f} мс, медиана из {repeats}")
+
+    for title, mode, use_log in (("только порты (лог не читается)", "ok", False),
+                                 ("лог + порты", "ok", True),
+                                 ("лог без строки started", "quiet", True)):
+        runs = [run_once(delay, mode, use_log) for _ in range(repeats)]
+        if not all(run[0] for run in runs):
+            print(f"  {title}: не готов - {runs[0][4]}")
+            continue
+        sources = sorted({run[3] for run in runs})
+        print(f"  {title}: готов через {median(r[1] for r in runs) * 1000:.0f} мс, "
+              f"отставание от открытия портов {median(r[2] for r in runs) * 1000:.1f} мс "
+              f"(по событию: {', '.join(sources)})")
+    print("  прежняя схема: sleep(1) + таймер 100 мс = ~1100 мс без проверки готовности")
+
+    ready, waited, _, source, info = run_once(delay, "fail", True)
+    print(f"Ошибка запуска: обнаружена через {waited * 1000:.0f} мс (таймаут 5000 мс), "
+          f"источник {source}: {info[:60]}...")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,77 @@
+"""Жизненный цикл процесса Xray: запуск до готовности порта и остановка.
+
+Вместо xray.exe запускается заглушка на Python, которая открывает порт
+через заданную задержку. Сравнивается ожидание готовности по порту с
+прежней схемой taskkill + time.sleep(1); отдельно проверяется процесс,
+игнорирующий SIGTERM (остановка доходит до kill).
+
+Запуск: python benchmarks/bench_xray_supervisor.py [задержка старта, мс] [повторов]
+"""
+
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anonline.xray_process import XraySupervisor  # noqa: E402
+
+FAKE_XRAY = r"""
+import signal, socket, sys, time
+port, delay, stubborn = int(sys.argv[1]), float(sys.argv[2]), sys.argv[3] == "1"
+if stubborn and hasattr(signal, "SIGTERM"):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+print("Xray 0.0.0 (fake) started", flush=True)
+time.sleep(delay)
+server = socket.socket()
+server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+server.bind(("127.0.0.1", port))
+server.listen(16)
+print("[Warning] core: Xray 0.0.0 started", flush=True)
+while True:
+    conn, _ = server.accept()
+    conn.close()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_cycle(delay, stubborn=False):
+    port = free_port()
+    supervisor = XraySupervisor([sys.executable, "-c", FAKE_XRAY, str(port), str(delay), "1" if stubborn else "0"])
+    start = time.perf_counter()
+    process = supervisor.start()
+    ready, info = supervisor.wait_ready(port, timeout=5.0)
+    started = time.perf_counter() - start
+    if not ready:
+        raise RuntimeError(info)
+    start = time.perf_counter()
+    supervisor.stop(timeout=0.5 if stubborn else 3.0)
+    stopped = time.perf_counter() - start
+    process.stdout.close()
+    return started, stopped
+
+
+def main(argv):
+    delay = (int(argv[1]) if len(argv) > 1 else 150) / 1000
+    repeats = int(argv[2]) if len(argv) > 2 else 5
+
+    cycles = [run_cycle(delay) for _ in range(repeats)]
+    started = sorted(c[0] for c in cycles)[len(cycles) // 2]
+    stopped = sorted(c[1] for c in cycles)[len(cycles) // 2]
+    print(f"Заглушка открывает порт через {delay * 1000:.0f} мс, медиана из {repeats}:")
+    print(f"  старт до готовности порта: {started * 1000:.0f} мс (раньше: 100 мс таймер без проверки порта)")
+    print(f"  остановка сигналом + wait: {stopped * 1000:.1f} мс (раньше: taskkill + sleep(1) = 1000+ мс)")
+    print(f"  переподключение: {(started + stopped) * 1000:.0f} мс против ~{(1 + delay) * 1000:.0f} мс")
+
+    started, stopped = run_cycle(delay, stubborn=True)
+    print(f"Процесс, игнорирующий SIGTERM: остановка через kill за {stopped * 1000:.0f} мс (таймаут terminate 500 мс)")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,62 @@
+"""Windows на заглушках для NetworkSetup: netsh/tzutil, реестр прокси, файл hosts.
+
+Состояние системы (реестр, hosts, выполненные команды) общее для всех
+экземпляров NetworkSetup, созданных через setup(), поэтому перезапуск
+приложения после сбоя - это новый NetworkSetup с новым журналом на том
+же файле.
+"""
+
+import os
+
+from anonline.commands import CommandRunner, FakeBackend
+from anonline.hosts import LEGACY_WEBRTC_LINES, HostsBlock
+from anonline.network_setup import NetworkSetup
+from anonline.registry import FakeRegistry, ProxySettings, read_proxy, write_proxy
+
+from .netsh_samples import DNS_SAMPLES, IPV6_GLOBAL, SAMPLES
+
+ORIGINAL_PROXY = ProxySettings(1, "corp-proxy:3128", "*.corp;<local>")
+ORIGINAL_HOSTS = b"127.0.0.1 localhost\n# stun.example.org - user line\n"
+TIME_ZONE = "Russian Standard Time"
+# Шаги подключения NetworkSetup в порядке вызова (Xray не запускается)
+CONNECT_STEPS = ("set_proxy", "disable_ipv6", "set_dns", "block_webrtc", "create_firewall_rules", "hide_system_time")
+
+
+class FakeSystem:
+    """dns - ключ DNS_SAMPLES, ipv6 - ключ IPV6_GLOBAL: исходное состояние системы"""
+
+    def __init__(self, directory, dns="en-static", ipv6="disabled"):
+        self.backend = FakeBackend(outputs={
+            ("netsh", "interface", "show", "interface"): SAMPLES["en"],
+            ("netsh", "interface", "ipv4", "show", "dnsservers"): DNS_SAMPLES[dns][0],
+            ("netsh", "interface", "ipv6", "show", "global"): IPV6_GLOBAL[ipv6],
+            ("tzutil", "/g"): TIME_ZONE + "\r\n",
+        })
+        self.registry = FakeRegistry()
+        write_proxy(self.registry, ORIGINAL_PROXY)
+        self.hosts_path = os.path.join(str(directory), "hosts")
+        with open(self.hosts_path, "wb") as f:
+            f.write(ORIGINAL_HOSTS)
+        self.messages = []
+
+    def setup(self, journal, log=None):
+        return NetworkSetup(journal, CommandRunner(self.backend), self.registry,
+                            HostsBlock("WebRTC", path=self.hosts_path, legacy=LEGACY_WEBRTC_LINES),
+                            log=log or self.messages.append)
+
+    def connect(self, network, steps=CONNECT_STEPS):
+        """Начало сессии и шаги подключения по очереди; False, если шаг не удался"""
+        network.journal.begin()
+        network.save_network_settings()
+        return all([getattr(network, step)() for step in steps])
+
+    def proxy(self):
+        return read_proxy(self.registry)
+
+    def hosts(self):
+        with open(self.hosts_path, "rb") as f:
+            return f.read()
+
+    def netsh(self, *words):
+        """Выполненные команды netsh, начинающиеся со слов words (без "netsh")"""
+        return [argv[1:] for argv in self.backend.executed if tuple(argv[1:1 + len(words)]) == words]
@@ -0,0 +1,47 @@
+"""Заглушка xray для тестов: python fake_xray.py ПОРТЫ ЗАДЕРЖКА РЕЖИМ.
+
+Через ЗАДЕРЖКУ секунд открывает порты (через запятую, можно пусто) и
+печатает строку "Xray ... started". Режимы: ok, quiet (без строки
+started), fail (строка "Failed to start" и выход с кодом 23),
+exit (молча выходит с кодом 1, не открывая портов). По SIGTERM
+(CTRL_BREAK_EVENT на Windows) печатает "stopped" и выходит с кодом 0.
+"""
+
+import signal
+import socket
+import sys
+import time
+
+
+def stopped(signum, frame):
+    print("[Info] core: Xray 0.0.0 stopped", flush=True)
+    sys.exit(0)
+
+
+def main(argv):
+    ports = [int(port) for port in argv[1].split(",") if port]
+    delay, mode = float(argv[2]), argv[3]
+    signal.signal(getattr(signal, "SIGBREAK", signal.SIGTERM), stopped)
+    print("Xray 0.0.0 (fake) Custom (go1.21 linux/amd64)", flush=True)
+    time.sleep(delay)
+    if mode == "fail":
+        print(f"Failed to start: main: failed to create server > app/proxyman/inbound: failed to listen TCP on "
+              f"{ports[0] if ports else 0} > bind: address already in use", flush=True)
+        return 23
+    if mode == "exit":
+        return 1
+    servers = []
+    for port in ports:
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(("127.0.0.1", port))
+        server.listen(16)
+        servers.append(server)
+    if mode != "quiet":
+        print("[Warning] core: Xray 0.0.0 started", flush=True)
+    while True:
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
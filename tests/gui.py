@@ -0,0 +1,126 @@
+"""Запуск окна приложения в отдельном интерпретаторе на платформе Qt offscreen.
+
+Окно работает в пустом временном каталоге (журнал сети, geosite) с
+отдельным каталогом настроек. После первой отрисовки в процессе окна
+вызывается функция-сценарий из этого модуля, ее результат пишется в
+JSON, и приложение завершается.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_SCRIPT = os.path.join(ROOT, "AnonLineVPN-0.5.py")
+RESULT_ENV = "ANONLINE_TEST_RESULT"
+
+DRIVER = """
+import runpy, sys
+sys.path.insert(0, {root!r})
+from anonline.startup_trace import TRACER
+from tests import gui
+
+TRACER.on_finish(lambda: gui.after_first_paint({scenario!r}))
+runpy.run_path({script!r}, run_name="__main__")
+"""
+
+
+def after_first_paint(scenario):
+    """Выполняется в процессе окна: сценарий, запись результата, выход"""
+    from PyQt5.QtWidgets import QApplication
+
+    window = next(widget for widget in QApplication.topLevelWidgets() if hasattr(widget, "log_lines"))
+    result = globals()[scenario](window) if scenario else {}
+    with open(os.environ[RESULT_ENV], "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    QApplication.quit()
+
+
+def run_gui(workdir, scenario=None, env=None, timeout=300):
+    """Запускает окно и возвращает результат сценария"""
+    workdir = str(workdir)
+    result_path = os.path.join(workdir, "result.json")
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", XDG_CONFIG_HOME=os.path.join(workdir, "config"),
+               **(env or {}))
+    env[RESULT_ENV] = result_path
+    process = subprocess.run([sys.executable, "-c", DRIVER.format(root=ROOT, script=GUI_SCRIPT, scenario=scenario)],
+                             cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                             timeout=timeout)
+    if not os.path.exists(result_path):
+        raise RuntimeError(f"окно не отрисовано (код {process.returncode}): {process.stderr.strip()[-500:]}")
+    with open(result_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def startup_report(window):
+    """Отчет трассировщика запуска (фазы и время до первой отрисовки)"""
+    from anonline.startup_trace import TRACER
+
+    return TRACER.to_dict()
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return None
+
+
+def recover_journal(window):
+    """Сбой посреди подключения на FakeSystem, затем recover_stale_journal окна"""
+    from PyQt5.QtWidgets import QApplication
+
+    from anonline.journal import NetworkJournal
+    from tests.fake_network import FakeSystem
+
+    system = FakeSystem(os.getcwd())
+    # Прошлый запуск: три шага применены, четвертая запись журнала оборвана
+    crashed = system.setup(NetworkJournal(window.journal.path))
+    system.connect(crashed, ("set_proxy", "disable_ipv6", "set_dns"))
+    with open(window.journal.path, "a", encoding="utf-8") as f:
+        f.write('{"op": "apply", "step": "webr')
+    window.network = system.setup(window.journal, log=window.log)
+    window.recover_stale_journal()
+    QApplication.processEvents()
+    return {"proxy": list(system.proxy()), "dns": system.netsh("interface", "ipv4"),
+            "ipv6": system.netsh("interface", "ipv6", "set"), "journal": os.path.exists(window.journal.path),
+            "console": window.console.toPlainText()}
+
+
+SOAK_LINES = 1_000_000
+# Буфер лога Xray отдает в консоль до 2000 строк за кадр
+SOAK_BATCH = 1000
+SOAK_WINDOW = 100_000
+
+
+def soak_console(window):
+    """1 млн строк через window.log_lines пачками, как их сбрасывает таймер лога Xray.
+
+    После каждой пачки обрабатываются события Qt (отрисовка окна).
+
+    Каждые SOAK_WINDOW строк фиксируются RSS и задержки добавления пачки.
+    """
+    import time
+
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance()
+    windows = []
+    latencies = []
+    for line_no in range(0, SOAK_LINES, SOAK_BATCH):
+        lines = [f"2024/05/01 12:00:00 127.0.0.1:{50000 + i % 10000} accepted "
+                 f"tcp:host{i % 500}.example.com:443 [socks -> proxy]"
+                 for i in range(line_no, line_no + SOAK_BATCH)]
+        start = time.perf_counter()
+        window.log_lines(lines)
+        app.processEvents()
+        latencies.append(time.perf_counter() - start)
+        if (line_no + SOAK_BATCH) % SOAK_WINDOW == 0:
+            latencies.sort()
+            windows.append({"rss_kb": rss_kb(), "p50": latencies[len(latencies) // 2],
+                            "p99": latencies[int(len(latencies) * 0.99)]})
+            latencies = []
+    return {"windows": windows, "blocks": window.console.document().blockCount(),
+            "max_blocks": window.console.maximumBlockCount()}
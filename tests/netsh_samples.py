@@ -0,0 +1,106 @@
+"""Образцы вывода "netsh interface show interface" для тестов разбора.
+
+Сняты с английской, русской и немецкой Windows, в том числе с именами из
+нескольких слов; EXPECTED - какой интерфейс должен быть выбран активным.
+DNS_SAMPLES и IPV6_GLOBAL - исходные DNS-серверы интерфейса и состояние
+IPv6, которые NetworkSetup записывает в журнал перед изменением.
+"""
+
+SAMPLES = {
+    "en": """
+Admin State    State          Type             Interface Name
+-------------------------------------------------------------------------
+Disabled       Disconnected   Dedicated        Ethernet 2
+Enabled        Disconnected   Dedicated        Ethernet
+Enabled        Connected      Dedicated        Wi-Fi
+Enabled        Connected      Dedicated        vEthernet (Default Switch)
+""",
+    "ru": """
+Состояние адм.  Состояние     Тип              Имя интерфейса
+-------------------------------------------------------------------------
+Разрешен        Отключен      Выделенный       Ethernet
+Разрешен        Подключен     Выделенный       Беспроводная сеть
+Разрешен        Подключен     Выделенный       Подключение по локальной сети* 2
+""",
+    "de": """
+Administratorstatus Status         Typ              Schnittstellenname
+-------------------------------------------------------------------------
+Aktiviert      Verbunden      Dediziert        Ethernet
+Aktiviert      Getrennt       Dediziert        WLAN
+""",
+    "en-vpn": """
+Admin State    State          Type             Interface Name
+-------------------------------------------------------------------------
+Enabled        Disconnected   Dedicated        Wi-Fi
+Enabled        Connected      Loopback         Loopback Pseudo-Interface 1
+Enabled        Connected      Dedicated        Local Area Connection
+""",
+}
+EXPECTED = {"en": "Wi-Fi", "ru": "Беспроводная сеть", "de": "Ethernet", "en-vpn": "Local Area Connection"}
+
+# "netsh interface ipv4 show dnsservers name=...": (вывод, ожидаемый источник и серверы)
+DNS_SAMPLES = {
+    "en-dhcp": ("""
+Configuration for interface "Ethernet"
+    DNS servers configured through DHCP:  192.168.1.1
+                                          192.168.1.2
+    Register with which suffix:           Primary only
+
+""", ("dhcp", ["192.168.1.1", "192.168.1.2"])),
+    "en-static": ("""
+Configuration for interface "Wi-Fi"
+    Statically Configured DNS Servers:    1.1.1.1
+                                          8.8.4.4
+                                          9.9.9.9
+    Register with which suffix:           Primary only
+
+""", ("static", ["1.1.1.1", "8.8.4.4", "9.9.9.9"])),
+    "en-static-none": ("""
+Configuration for interface "Ethernet"
+    Statically Configured DNS Servers:    None
+    Register with which suffix:           Primary only
+
+""", ("static", [])),
+    "ru-dhcp": ("""
+Настройка интерфейса "Беспроводная сеть"
+    DNS-серверы, настроенные через DHCP:  10.0.0.1
+    Регистрировать с суффиксом:           Только основной
+
+""", ("dhcp", ["10.0.0.1"])),
+    "ru-static": ("""
+Настройка интерфейса "Ethernet"
+    Статически настроенные DNS-серверы:   77.88.8.8
+                                          77.88.8.1
+    Регистрировать с суффиксом:           Только основной
+
+""", ("static", ["77.88.8.8", "77.88.8.1"])),
+    "de-dhcp": ("""
+Konfiguration für Schnittstelle "Ethernet"
+    Über DHCP konfigurierte DNS-Server:   192.168.178.1
+    Mit folgendem Suffix registrieren:    Nur primär
+
+""", ("dhcp", ["192.168.178.1"])),
+}
+
+# "netsh interface ipv6 show global": строка состояния (остальные параметры сокращены)
+IPV6_GLOBAL = {
+    "enabled": """
+Querying active state...
+
+General Global Parameters
+---------------------------------------------
+State                               : enabled
+Default Hop Limit                   : 128 hops
+Source Routing Behavior             : dontforward
+Randomize Identifiers               : enabled
+""",
+    "disabled": """
+Запрос активного состояния...
+
+Общие глобальные параметры
+---------------------------------------------
+Состояние                           : отключен
+Ограничение на число прыжков        : 128 прыжков
+Случайные идентификаторы            : включен
+""",
+}
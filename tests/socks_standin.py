@@ -0,0 +1,116 @@
+"""Заглушки для тестов: SOCKS5-прокси без аутентификации и HTTP-сервер.
+
+Прокси не резолвит имена: любой CONNECT направляется на локальный
+HTTP-сервер. Задержки этапов настраиваются, счетчики позволяют
+проверить, сколько было рукопожатий и запросов.
+"""
+
+import asyncio
+
+
+class HttpStandin:
+    """Отвечает 204 на каждый запрос; hang_after - после стольких ответов в
+    одном соединении перестает отвечать, не закрывая его (мертвый keep-alive)"""
+
+    def __init__(self, delay=0.0, hang_after=None, keep_alive=True):
+        self.delay = delay
+        self.hang_after = hang_after
+        self.keep_alive = keep_alive
+        self.requests = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def handle(self, reader, writer):
+        answered = 0
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                self.requests += 1
+                if self.hang_after is not None and answered >= self.hang_after:
+                    await reader.read()
+                    break
+                await asyncio.sleep(self.delay)
+                connection = b"keep-alive" if self.keep_alive else b"close"
+                writer.write(b"HTTP/1.1 204 No Content\r\nConnection: " + connection + b"\r\n\r\n")
+                await writer.drain()
+                answered += 1
+                if not self.keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.server.close()
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+class Socks5Standin:
+    """SOCKS5-прокси; reply - код ответа на CONNECT (0 - успех)"""
+
+    def __init__(self, upstream_port, handshake_delay=0.0, connect_delay=0.0, reply=0):
+        self.upstream_port = upstream_port
+        self.handshake_delay = handshake_delay
+        self.connect_delay = connect_delay
+        self.reply = reply
+        self.handshakes = 0
+        self.targets = []
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def handle(self, reader, writer):
+        try:
+            _, nmethods = await reader.readexactly(2)
+            await reader.readexactly(nmethods)
+            await asyncio.sleep(self.handshake_delay)
+            writer.write(b"\x05\x00")
+            self.handshakes += 1
+            _, _, _, atyp = await reader.readexactly(4)
+            if atyp == 1:
+                host = ".".join(str(b) for b in await reader.readexactly(4))
+            elif atyp == 4:
+                host = (await reader.readexactly(16)).hex()
+            else:
+                host = (await reader.readexactly((await reader.readexactly(1))[0])).decode("idna")
+            port = int.from_bytes(await reader.readexactly(2), "big")
+            self.targets.append((host, port))
+            await asyncio.sleep(self.connect_delay)
+            if self.reply:
+                writer.write(bytes([5, self.reply, 0, 1, 0, 0, 0, 0, 0, 0]))
+                await writer.drain()
+                writer.close()
+                return
+            up_reader, up_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+            writer.write(b"\x05\x00\x00\x01\x7f\x00\x00\x01\x00\x00")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        await asyncio.gather(_pipe(reader, up_writer), _pipe(up_reader, writer))
+
+    def close(self):
+        self.server.close()
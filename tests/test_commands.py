@@ -0,0 +1,166 @@
+"""CommandRunner: пакетирование netsh в один "netsh -f" на FakeBackend"""
+
+import subprocess
+import threading
+
+import pytest
+
+from anonline import commands
+from anonline.commands import BatchError, CommandRunner, FakeBackend
+
+FIREWALL_ADD = ("advfirewall", "firewall", "add", "rule", 'name="VPN Kill Switch"', "dir=out", "action=block")
+FIREWALL_ALLOW = ("advfirewall", "firewall", "add", "rule", 'name="Allow Xray"', "dir=out", "action=allow")
+IPV6_OFF = ("interface", "ipv6", "set", "global", "state=disabled")
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend(outputs={("netsh", "interface", "show"): "Enabled Connected Dedicated Ethernet\n"})
+
+
+def test_batch_spawns_one_process_with_script_in_order(backend):
+    runner = CommandRunner(backend)
+    with runner.batch():
+        assert runner.netsh(*FIREWALL_ADD) is None
+        runner.netsh(*FIREWALL_ALLOW)
+        runner.netsh(*IPV6_OFF)
+        # Команды, до конца блока еще не выполнены
+        assert backend.calls == []
+    assert runner.spawns == 1
+    assert backend.calls[0][:2] == ["netsh", "-f"]
+    assert backend.scripts == [[" ".join(FIREWALL_ADD), " ".join(FIREWALL_ALLOW), " ".join(IPV6_OFF)]]
+    assert backend.executed == [["netsh", *FIREWALL_ADD], ["netsh", *FIREWALL_ALLOW], ["netsh", *IPV6_OFF]]
+    assert runner.timings[-1].commands == 3
+
+
+def test_batching_off_spawns_per_command(backend):
+    runner = CommandRunner(backend, batch_netsh=False)
+    with runner.batch():
+        runner.netsh(*FIREWALL_ADD)
+        runner.netsh(*IPV6_OFF)
+    assert runner.spawns == 2
+    assert backend.calls == [["netsh", *FIREWALL_ADD], ["netsh", *IPV6_OFF]]
+    assert backend.scripts == []
+
+
+def test_single_command_and_capture_are_not_scripted(backend):
+    runner = CommandRunner(backend)
+    with runner.batch():
+        runner.netsh(*IPV6_OFF)
+        # Вывод нужен сразу - команда выполняется до конца блока
+        result = runner.netsh("interface", "show", "interface", capture=True)
+        assert "Ethernet" in result.stdout
+        assert backend.calls == [["netsh", "interface", "show", "interface"]]
+    assert backend.calls[-1] == ["netsh", *IPV6_OFF]
+    assert backend.scripts == []
+
+
+def test_nested_batches_join_outer(backend):
+    runner = CommandRunner(backend)
+    with runner.batch():
+        runner.netsh(*FIREWALL_ADD)
+        with runner.batch():
+            runner.netsh(*FIREWALL_ALLOW)
+        assert backend.calls == []
+        runner.netsh(*IPV6_OFF)
+    assert runner.spawns == 1
+    assert len(backend.scripts[0]) == 3
+
+
+def test_other_threads_are_not_batched(backend):
+    runner = CommandRunner(backend)
+    results = []
+    with runner.batch():
+        runner.netsh(*FIREWALL_ADD)
+        thread = threading.Thread(target=lambda: results.append(runner.netsh(*IPV6_OFF)))
+        thread.start()
+        thread.join()
+        # Команда другого потока выполнена сразу и отдельным процессом
+        assert backend.calls == [["netsh", *IPV6_OFF]]
+        assert results[0].returncode == 0
+        runner.netsh(*FIREWALL_ALLOW)
+    assert runner.spawns == 2
+    assert backend.scripts == [[" ".join(FIREWALL_ADD), " ".join(FIREWALL_ALLOW)]]
+
+
+def test_failed_batch_is_reported():
+    backend = FakeBackend(failures={("netsh", *FIREWALL_ALLOW): 1})
+    runner = CommandRunner(backend)
+    with pytest.raises(BatchError) as info:
+        with runner.batch():
+            runner.netsh(*FIREWALL_ADD, check=True)
+            runner.netsh(*FIREWALL_ALLOW, check=True)
+            runner.netsh(*IPV6_OFF)
+    error = info.value
+    assert error.returncode == 1
+    assert error.commands == [" ".join(FIREWALL_ADD), " ".join(FIREWALL_ALLOW), " ".join(IPV6_OFF)]
+    assert "код 1" in str(error) and "Ошибка" in str(error)
+    # Скрипт прервался на второй строке
+    assert backend.executed == [["netsh", *FIREWALL_ADD], ["netsh", *FIREWALL_ALLOW]]
+    assert runner.timings[-1].returncode == 1
+
+
+def test_failed_batch_without_check_is_only_recorded():
+    backend = FakeBackend(failures={("netsh", *IPV6_OFF): 1})
+    runner = CommandRunner(backend)
+    with runner.batch():
+        runner.netsh(*FIREWALL_ADD)
+        runner.netsh(*IPV6_OFF)
+    assert runner.timings[-1].returncode == 1
+
+
+def test_failed_command_is_reported_without_batching():
+    backend = FakeBackend(failures={("netsh", *FIREWALL_ALLOW): 1})
+    runner = CommandRunner(backend, batch_netsh=False)
+    with pytest.raises(subprocess.CalledProcessError) as info:
+        with runner.batch():
+            runner.netsh(*FIREWALL_ADD, check=True)
+            runner.netsh(*FIREWALL_ALLOW, check=True)
+            runner.netsh(*IPV6_OFF)
+    assert info.value.cmd == ["netsh", *FIREWALL_ALLOW]
+    assert runner.spawns == 3
+
+
+def test_exception_in_block_is_not_masked():
+    backend = FakeBackend(failures={("netsh", *FIREWALL_ADD): 1})
+    runner = CommandRunner(backend)
+    with pytest.raises(KeyError):
+        with runner.batch():
+            runner.netsh(*FIREWALL_ADD, check=True)
+            runner.netsh(*IPV6_OFF)
+            raise KeyError("сбой в блоке")
+    # Накопленные команды выполнены
+    assert runner.spawns == 1
+
+
+def test_unencodable_script_falls_back_to_separate_commands(monkeypatch, backend):
+    # Кодировка ANSI без кириллицы (например, cp1252 на английской Windows)
+    monkeypatch.setattr(commands, "script_encoding", lambda: "cp1252")
+    runner = CommandRunner(backend)
+    dns = ("interface", "ipv4", "set", "dnsservers", 'name="Подключение по локальной сети"', "source=dhcp")
+    with runner.batch():
+        runner.netsh(*dns)
+        runner.netsh(*IPV6_OFF)
+    assert backend.scripts == []
+    assert backend.calls == [["netsh", *dns], ["netsh", *IPV6_OFF]]
+    assert runner.spawns == 2
+
+
+def test_script_in_ansi_encoding(monkeypatch, backend):
+    monkeypatch.setattr(commands, "script_encoding", lambda: "cp1251")
+    runner = CommandRunner(backend)
+    dns = ("interface", "ipv4", "set", "dnsservers", 'name="Ethernet 2"', "source=dhcp")
+    name = ("interface", "set", "interface", 'name="Беспроводная сеть"', "admin=enabled")
+    with runner.batch():
+        runner.netsh(*dns)
+        runner.netsh(*name)
+    assert backend.scripts == [[" ".join(dns), " ".join(name)]]
+
+
+def test_summary_counts_commands(backend):
+    runner = CommandRunner(backend)
+    with runner.batch():
+        runner.netsh(*FIREWALL_ADD)
+        runner.netsh(*FIREWALL_ALLOW)
+    runner.run(["tzutil", "/g"], capture=True)
+    assert runner.summary().startswith("процессов 2, команд 3,")
@@ -0,0 +1,27 @@
+"""Длительная нагрузка на консоль окна: 1 млн строк, память и задержка добавления не растут"""
+
+import sys
+
+import pytest
+
+from .gui import SOAK_LINES, SOAK_WINDOW, run_gui
+
+pytest.importorskip("PyQt5.QtWidgets")
+
+# Рост RSS после первых SOAK_WINDOW строк (консоль к этому времени уже заполнена)
+RSS_GROWTH_LIMIT_KB = 16 * 1024
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RSS читается из /proc")
+def test_console_soak(tmp_path):
+    result = run_gui(tmp_path, "soak_console")
+    windows = result["windows"]
+    assert len(windows) == SOAK_LINES // SOAK_WINDOW
+    # Консоль хранит только последние строки
+    assert result["blocks"] == result["max_blocks"]
+
+    first, last = windows[0], windows[-1]
+    assert last["rss_kb"] - first["rss_kb"] < RSS_GROWTH_LIMIT_KB
+    # Добавление не замедляется с ростом числа выведенных строк
+    assert last["p50"] < first["p50"] * 2 + 0.001
+    assert last["p99"] < first["p99"] * 3 + 0.005
@@ -0,0 +1,141 @@
+"""geoip.dat: чтение синтетического файла и поиск адресов по сравнению с ipaddress"""
+
+import ipaddress
+import random
+from array import array
+
+import pytest
+
+from anonline.geoip import GeoIPFile, IPRangeSet, build_geoip, parse_address
+
+ENTRIES = {
+    "RU": ["10.0.0.0/8", "10.1.0.0/16", "11.0.0.0/8", "192.168.1.0/24", "2001:db8::/32", "2001:db9::/48"],
+    "PRIVATE": ["127.0.0.0/8", "172.16.0.0/12", "fc00::/7"],
+}
+
+
+def random_networks(rng, count):
+    """Случайные сети IPv4, в том числе вложенные и соседние"""
+    networks = []
+    for _ in range(count):
+        prefix = rng.randint(8, 28)
+        address = ipaddress.IPv4Address(rng.getrandbits(32))
+        networks.append(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+    return networks
+
+
+def expected(networks, addresses):
+    return [any(address in network for network in networks if network.version == address.version)
+            for address in addresses]
+
+
+@pytest.fixture
+def geoip_path(tmp_path):
+    rng = random.Random(24)
+    entries = dict(ENTRIES, BIG=[str(network) for network in random_networks(rng, 500)])
+    path = tmp_path / "geoip.dat"
+    path.write_bytes(build_geoip(entries))
+    return str(path)
+
+
+@pytest.fixture
+def geoip(geoip_path):
+    with GeoIPFile(geoip_path) as geoip:
+        yield geoip
+
+
+def test_categories(geoip):
+    assert geoip.categories() == ["RU", "PRIVATE", "BIG"]
+    assert len(geoip) == 3
+    assert "geoip:ru" in geoip
+    assert "CN" not in geoip
+    with pytest.raises(KeyError):
+        geoip.load("geoip:cn")
+
+
+def test_iter_cidrs(geoip):
+    cidrs = [str(ipaddress.ip_network((ip, prefix))) for ip, prefix in geoip.iter_cidrs("ru")]
+    assert cidrs == ENTRIES["RU"]
+
+
+def test_nested_and_adjacent_networks_are_merged(geoip):
+    ranges = geoip.load("RU")
+    # 10/8 поглощает 10.1/16, 11/8 и 2001:db9::/48 примыкают к 10/8 и 2001:db8::/32
+    assert list(ranges.v4_starts) == [int(ipaddress.ip_address("10.0.0.0")), int(ipaddress.ip_address("192.168.1.0"))]
+    assert list(ranges.v4_ends) == [int(ipaddress.ip_address("11.255.255.255")),
+                                    int(ipaddress.ip_address("192.168.1.255"))]
+    assert ranges.v6_ends == [int(ipaddress.ip_address("2001:db9:0:ffff:ffff:ffff:ffff:ffff"))]
+    assert len(ranges) == 3
+    assert geoip.load("geoip:ru") is ranges
+
+
+def test_contains(geoip):
+    ranges = geoip.load("RU")
+    for address, found in [("10.200.1.1", True), ("11.255.255.255", True), ("12.0.0.0", False),
+                           ("9.255.255.255", False), ("192.168.1.7", True), ("192.168.2.1", False),
+                           ("::ffff:10.0.0.1", True), ("2001:db8:ffff::1", True), ("2001:db9::1", True),
+                           ("2001:db9:1::1", False), ("::1", False)]:
+        assert (address in ranges) is found, address
+    assert ipaddress.ip_address("10.0.0.1") in ranges
+    assert b"\x0a\x00\x00\x01" in ranges
+    with pytest.raises(ValueError):
+        "10.0.0.256" in ranges
+
+
+def test_batch_lookup_matches_ipaddress(geoip_path):
+    rng = random.Random(240)
+    networks = [ipaddress.ip_network(cidr) for cidr in ENTRIES["RU"]]
+    with GeoIPFile(geoip_path) as geoip:
+        big = [ipaddress.ip_network((ip, prefix)) for ip, prefix in geoip.iter_cidrs("BIG")]
+        cases = [(geoip.load("RU"), networks), (geoip.load("BIG"), big)]
+    for ranges, nets in cases:
+        # Адреса на границах сетей и случайные
+        v4 = [ipaddress.IPv4Address(rng.getrandbits(32)) for _ in range(2000)]
+        for network in nets:
+            if network.version == 4:
+                v4 += [network.network_address, network.broadcast_address]
+                v4 += [network.network_address - 1] if int(network.network_address) else []
+                v4 += [network.broadcast_address + 1] if int(network.broadcast_address) < 2 ** 32 - 1 else []
+        v6 = [ipaddress.IPv6Address((0x2001_0DB8 << 96) + rng.getrandbits(112)) for _ in range(500)]
+        want = expected(nets, v4)
+        assert ranges.contains_many([str(address) for address in v4]) == want
+        assert ranges.contains_ints(array("I", map(int, v4))) == want
+        assert [ranges.contains_int(int(address)) for address in v4] == want
+        assert ranges.contains_many(v6) == expected(nets, v6)
+        assert ranges.contains_ints([int(address) for address in v6], 6) == expected(nets, v6)
+
+
+def test_bucket_table_is_used_for_large_lists(geoip):
+    assert geoip.load("BIG")._v4_lo is not None
+    assert geoip.load("RU")._v4_lo is None
+
+
+def test_negated_ref(geoip):
+    ranges = geoip.load_ref("geoip:private")
+    negated = geoip.load_ref("geoip:!private")
+    assert not ranges.inverse and negated.inverse
+    addresses = ["127.0.0.1", "172.20.1.1", "8.8.8.8", "fd00::1", "2001:db8::1"]
+    assert ranges.contains_many(addresses) == [True, True, False, True, False]
+    assert negated.contains_many(addresses) == [False, False, True, False, True]
+    assert negated.contains_ints([int(ipaddress.ip_address("8.8.8.8"))]) == [True]
+    assert negated.negated().contains_many(addresses) == ranges.contains_many(addresses)
+    # Отрицание не меняет закэшированное множество
+    assert geoip.load("private") is ranges and not ranges.inverse
+
+
+def test_from_cidrs_and_inverse_set():
+    ranges = IPRangeSet.from_cidrs([(bytes([10, 0, 0, 7]), 8), (bytes(16), 200)], inverse=True)
+    assert "10.9.9.9" not in ranges
+    assert "11.0.0.0" in ranges
+    # Префикс длиннее адреса ограничивается 128: только ::
+    assert "::" not in ranges and "::1" in ranges
+    with pytest.raises(ValueError):
+        IPRangeSet.from_cidrs([(b"\x01\x02\x03", 8)])
+
+
+def test_parse_address():
+    assert parse_address("::ffff:1.2.3.4") == (4, 0x01020304)
+    assert parse_address("fe80::1%eth0") == (6, int(ipaddress.ip_address("fe80::1")))
+    assert parse_address(ipaddress.ip_address("1.2.3.4")) == (4, 0x01020304)
+    with pytest.raises(ValueError):
+        parse_address(b"\x00" * 5)
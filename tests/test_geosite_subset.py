@@ -0,0 +1,132 @@
+"""Урезанный geosite.dat: сборка и пересборка при смене категорий или исходного файла"""
+
+import os
+import shutil
+
+import pytest
+
+from anonline import geosite_subset
+from anonline.geosite import DOMAIN_DOMAIN, GeoSiteFile
+from anonline.geosite_cache import open_geosite
+from anonline.geosite_subset import build_subset, collect_geosite_refs, prepare_asset_dir, subset_is_current
+from anonline.protobuf import WIRE_BYTES, WIRE_VARINT, encode_key, encode_varint
+
+GEOSITE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geosite.dat")
+CONFIG = {"routing": {"rules": [{"domain": ["geosite:cn"], "outboundTag": "direct"},
+                                {"domain": ["geosite:google", "domain:example.com"], "outboundTag": "proxy"}]}}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "full" / "geosite.dat"
+    path.parent.mkdir()
+    shutil.copy(GEOSITE, path)
+    return str(path)
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+
+    def counting_build(geosite, codes):
+        calls.append(list(codes))
+        return build_subset(geosite, codes)
+
+    monkeypatch.setattr(geosite_subset, "build_subset", counting_build)
+    return calls
+
+
+def read_categories(path):
+    with GeoSiteFile(path) as geosite:
+        return {code: bytes(geosite.raw(code)) for code in geosite.categories()}
+
+
+def message_field(field_no, payload):
+    return encode_key(field_no, WIRE_BYTES) + encode_varint(len(payload)) + payload
+
+
+def geosite_entry(code, domains):
+    """Сообщение GeoSite в обертке GeoSiteList: код категории и домены типа domain"""
+    body = message_field(1, code.encode("ascii"))
+    for domain in domains:
+        body += message_field(2, encode_key(1, WIRE_VARINT) + encode_varint(DOMAIN_DOMAIN)
+                              + message_field(2, domain.encode("ascii")))
+    return message_field(1, body)
+
+
+def test_collect_geosite_refs():
+    assert collect_geosite_refs(CONFIG) == ["CN", "GOOGLE"]
+
+
+def test_subset_contains_only_referenced_categories(tmp_path, source, builds):
+    asset_dir = str(tmp_path / "assets")
+    assert prepare_asset_dir(CONFIG, source, asset_dir) == ["CN", "GOOGLE"]
+    subset = read_categories(os.path.join(asset_dir, "geosite.dat"))
+    full = read_categories(source)
+    assert subset == {code: full[code] for code in ("CN", "GOOGLE")}
+    assert subset_is_current(CONFIG, source, asset_dir)
+
+
+def test_open_file_with_cached_index(tmp_path, source):
+    """Окно передает файл, открытый с индексом из кэша: результат тот же, что и с полным разбором"""
+    open_geosite(source).geosite.close()
+    result = open_geosite(source)
+    assert result.cache_hit
+    asset_dir = str(tmp_path / "assets")
+    with result.geosite as geosite:
+        assert prepare_asset_dir(CONFIG, source, asset_dir, geosite=geosite) == ["CN", "GOOGLE"]
+    full = read_categories(source)
+    assert read_categories(os.path.join(asset_dir, "geosite.dat")) == {code: full[code] for code in ("CN", "GOOGLE")}
+
+
+def test_unchanged_source_is_not_rebuilt(tmp_path, source, builds):
+    asset_dir = str(tmp_path / "assets")
+    prepare_asset_dir(CONFIG, source, asset_dir)
+    prepare_asset_dir(CONFIG, source, asset_dir)
+    assert len(builds) == 1
+
+
+def test_changed_categories_rebuild(tmp_path, source, builds):
+    asset_dir = str(tmp_path / "assets")
+    prepare_asset_dir(CONFIG, source, asset_dir)
+    config = {"routing": {"rules": [{"domain": ["geosite:cn"]}]}}
+    assert not subset_is_current(config, source, asset_dir)
+    prepare_asset_dir(config, source, asset_dir)
+    assert builds == [["CN", "GOOGLE"], ["CN"]]
+
+
+def test_updated_source_with_same_config_rebuilds(tmp_path, source, builds):
+    asset_dir = str(tmp_path / "assets")
+    prepare_asset_dir(CONFIG, source, asset_dir)
+
+    # Новый geosite.dat: категории те же, содержимое CN другое
+    with GeoSiteFile(source) as geosite:
+        google = build_subset(geosite, ["GOOGLE"])
+    replacement = str(tmp_path / "geosite.new")
+    with open(replacement, "wb") as f:
+        f.write(google + geosite_entry("CN", ["example.cn", "example.com.cn"]))
+    os.replace(replacement, source)
+
+    assert not subset_is_current(CONFIG, source, asset_dir)
+    prepare_asset_dir(CONFIG, source, asset_dir)
+    assert len(builds) == 2
+    assert read_categories(os.path.join(asset_dir, "geosite.dat")) == read_categories(source)
+
+
+def test_touched_source_rebuilds(tmp_path, source, builds):
+    asset_dir = str(tmp_path / "assets")
+    prepare_asset_dir(CONFIG, source, asset_dir)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert not subset_is_current(CONFIG, source, asset_dir)
+    prepare_asset_dir(CONFIG, source, asset_dir)
+    assert len(builds) == 2
+
+
+def test_missing_subset_file_rebuilds(tmp_path, source, builds):
+    asset_dir = str(tmp_path / "assets")
+    prepare_asset_dir(CONFIG, source, asset_dir)
+    os.remove(os.path.join(asset_dir, "geosite.dat"))
+    assert not subset_is_current(CONFIG, source, asset_dir)
+    prepare_asset_dir(CONFIG, source, asset_dir)
+    assert len(builds) == 2
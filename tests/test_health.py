@@ -0,0 +1,100 @@
+"""HealthProbeEngine: проверки идут в своем потоке и не задерживают цикл событий GUI"""
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from anonline.health import HealthProbeEngine, tcp_probe
+
+PROBE_TIMEOUT = 0.3
+TICK_MS = 10
+LATENCY_BUDGET_MS = 100
+
+
+@pytest.fixture
+def responsive_listener():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(64)
+
+    def accept_loop():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            conn.close()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    yield server.getsockname()
+    server.close()
+
+
+@pytest.fixture
+def hanging_listener():
+    """Слушатель без accept с заполненной очередью: подключения уходят в таймаут"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(0)
+    fillers = []
+    for _ in range(8):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setblocking(False)
+        try:
+            s.connect(server.getsockname())
+        except BlockingIOError:
+            pass
+        fillers.append(s)
+    time.sleep(0.05)
+    yield server.getsockname()
+    for s in fillers:
+        s.close()
+    server.close()
+
+
+def test_tcp_probe_reports_timeout(responsive_listener, hanging_listener):
+    async def probe_both():
+        return await asyncio.gather(tcp_probe(*responsive_listener, PROBE_TIMEOUT),
+                                    tcp_probe(*hanging_listener, PROBE_TIMEOUT))
+
+    good, bad = asyncio.run(probe_both())
+    assert good.ok and good.latency < PROBE_TIMEOUT
+    assert not bad.ok and bad.error == "таймаут"
+
+
+def test_gui_event_loop_latency_while_probes_time_out(responsive_listener, hanging_listener):
+    QtCore = pytest.importorskip("PyQt5.QtCore")
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+    cycles = []
+    engine = HealthProbeEngine(targets=[responsive_listener, hanging_listener], interval=0.05,
+                               timeout=PROBE_TIMEOUT, on_results=cycles.append)
+    state = {"expected": None, "worst": 0.0}
+
+    def tick():
+        now = time.perf_counter()
+        if state["expected"] is not None:
+            state["worst"] = max(state["worst"], now - state["expected"])
+        state["expected"] = now + TICK_MS / 1000
+
+    timer = QtCore.QTimer()
+    timer.setTimerType(QtCore.Qt.PreciseTimer)
+    timer.timeout.connect(tick)
+    timer.start(TICK_MS)
+    engine.start()
+    QtCore.QTimer.singleShot(int(PROBE_TIMEOUT * 5 * 1000), app.quit)
+    app.exec_()
+    timer.stop()
+
+    start = time.perf_counter()
+    engine.stop()
+    stop_elapsed = time.perf_counter() - start
+
+    results = [result for results in cycles for result in results]
+    assert any(result.ok for result in results)
+    assert any(not result.ok for result in results), "зависший слушатель должен давать таймауты"
+    assert state["worst"] * 1000 < LATENCY_BUDGET_MS
+    assert stop_elapsed < 1.0
@@ -0,0 +1,147 @@
+"""HostsBlock: блок между маркерами, старые записи без маркеров, замена файла"""
+
+import os
+
+import pytest
+
+from anonline import hosts as hosts_module
+from anonline.hosts import LEGACY_WEBRTC_LINES, WEBRTC_HOSTS, HostsBlock
+
+USER = b"127.0.0.1 localhost\n# my stun.example.org mirror\n10.0.0.5 stun.corp.local\n"
+HOSTS = ["stun.l.google.com", "stun1.l.google.com"]
+BLOCK = b"# BEGIN AnonLine WebRTC\n0.0.0.0 stun.l.google.com\n0.0.0.0 stun1.l.google.com\n# END AnonLine WebRTC\n"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "hosts"
+
+
+def block(path):
+    return HostsBlock("WebRTC", path=str(path), legacy=LEGACY_WEBRTC_LINES)
+
+
+def test_apply_and_remove_keep_user_lines(path):
+    path.write_bytes(USER)
+    hosts = block(path)
+    assert hosts.apply(HOSTS) is True
+    assert path.read_bytes() == USER + BLOCK
+    assert hosts.read_block() == ["0.0.0.0 stun.l.google.com", "0.0.0.0 stun1.l.google.com"]
+
+    assert hosts.remove() is True
+    # Строки пользователя со "stun" в имени и в комментарии остаются
+    assert path.read_bytes() == USER
+    assert hosts.read_block() is None
+    assert hosts.remove() is False
+    assert hosts.writes == 2
+
+
+def test_apply_without_changes_does_not_write(path):
+    path.write_bytes(USER)
+    hosts = block(path)
+    hosts.apply(HOSTS)
+    mtime = os.stat(path).st_mtime_ns
+    assert hosts.apply(HOSTS) is False
+    assert hosts.writes == 1
+    assert os.stat(path).st_mtime_ns == mtime
+    # Другие записи - блок заменяется на месте
+    assert hosts.apply(HOSTS[:1]) is True
+    assert path.read_bytes() == USER + BLOCK.replace(b"0.0.0.0 stun1.l.google.com\n", b"")
+
+
+def test_block_in_the_middle_and_without_trailing_newline(path):
+    path.write_bytes(b"127.0.0.1 localhost")
+    hosts = block(path)
+    hosts.apply(HOSTS)
+    assert path.read_bytes() == b"127.0.0.1 localhost\n" + BLOCK
+    with open(path, "ab") as f:
+        f.write(b"192.168.1.10 nas\n")
+    hosts.remove()
+    assert path.read_bytes() == b"127.0.0.1 localhost\n192.168.1.10 nas\n"
+
+
+def test_legacy_lines_are_removed_only_on_exact_match(path):
+    legacy = "\n".join(LEGACY_WEBRTC_LINES).encode("utf-8") + b"\n"
+    similar = b"0.0.0.0 stun.l.google.com.example\n#0.0.0.0 stun1.l.google.com\n 0.0.0.0 stun2.l.google.com x\n"
+    path.write_bytes(USER + legacy + similar)
+    hosts = block(path)
+    assert hosts.remove() is True
+    assert path.read_bytes() == USER + similar
+
+    # Установка блока тоже убирает старые записи
+    path.write_bytes(legacy + USER)
+    hosts.apply(WEBRTC_HOSTS)
+    data = path.read_bytes()
+    assert data.startswith(USER) and data.count(b"0.0.0.0 stun.l.google.com\n") == 1
+    assert "# Блокировка WebRTC".encode("utf-8") not in data
+
+
+def test_crlf_is_preserved(path):
+    user = USER.replace(b"\n", b"\r\n")
+    path.write_bytes(user)
+    hosts = block(path)
+    hosts.apply(HOSTS)
+    assert path.read_bytes() == user + BLOCK.replace(b"\n", b"\r\n")
+    assert hosts.apply(HOSTS) is False
+    hosts.remove()
+    assert path.read_bytes() == user
+
+    path.write_bytes(user + "\r\n".join(LEGACY_WEBRTC_LINES).encode("utf-8") + b"\r\n")
+    hosts.remove()
+    assert path.read_bytes() == user
+
+
+def test_begin_marker_without_end(path):
+    # Маркер конца удален вручную, за записями блока - строки пользователя
+    path.write_bytes(USER + BLOCK.replace(b"# END AnonLine WebRTC\n", b"") + b"192.168.1.10 nas\n# tail\n")
+    hosts = block(path)
+    assert hosts.read_block() == ["0.0.0.0 stun.l.google.com", "0.0.0.0 stun1.l.google.com"]
+    assert hosts.apply(HOSTS) is True
+    assert path.read_bytes() == USER + BLOCK + b"192.168.1.10 nas\n# tail\n"
+
+    path.write_bytes(USER + b"# BEGIN AnonLine WebRTC\n0.0.0.0 stun.l.google.com\n127.0.0.1 dev.local")
+    hosts.remove()
+    assert path.read_bytes() == USER + b"127.0.0.1 dev.local"
+
+
+def test_marker_inside_a_line_is_not_a_block(path):
+    data = USER + b"# see # BEGIN AnonLine WebRTC\n"
+    path.write_bytes(data)
+    hosts = block(path)
+    assert hosts.read_block() is None
+    assert hosts.remove() is False
+    assert path.read_bytes() == data
+
+
+def test_in_place_fallback_when_replace_is_denied(path, monkeypatch):
+    path.write_bytes(USER)
+
+    def denied(src, dst):
+        raise PermissionError(13, "used by another process", dst)
+
+    monkeypatch.setattr(hosts_module.os, "replace", denied)
+    hosts = block(path)
+    assert hosts.apply(HOSTS) is True
+    assert path.read_bytes() == USER + BLOCK
+    # Временный файл рядом с hosts удален
+    assert os.listdir(path.parent) == ["hosts"]
+
+
+def test_failed_replace_keeps_hosts_intact(path, monkeypatch):
+    path.write_bytes(USER)
+
+    def failed(src, dst):
+        raise OSError(28, "No space left on device", dst)
+
+    monkeypatch.setattr(hosts_module.os, "replace", failed)
+    with pytest.raises(OSError):
+        block(path).apply(HOSTS)
+    assert path.read_bytes() == USER
+    assert os.listdir(path.parent) == ["hosts"]
+
+
+def test_missing_file(path):
+    hosts = block(path)
+    assert hosts.remove() is False
+    assert hosts.apply(HOSTS) is True
+    assert hosts.read_block() == ["0.0.0.0 stun.l.google.com", "0.0.0.0 stun1.l.google.com"]
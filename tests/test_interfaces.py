@@ -0,0 +1,102 @@
+"""Разбор вывода netsh (en/ru/de): интерфейсы, DNS-серверы, состояние IPv6; кэш InterfaceInventory"""
+
+import pytest
+
+from anonline.commands import CommandRunner, FakeBackend
+from anonline.interfaces import DEFAULT_INTERFACE, Interface, InterfaceInventory, parse_show_interface, pick_active
+from anonline.interfaces import parse_dns_servers, parse_ipv6_state
+
+from .netsh_samples import DNS_SAMPLES, EXPECTED, IPV6_GLOBAL, SAMPLES
+
+
+@pytest.mark.parametrize("lang", sorted(SAMPLES))
+def test_active_interface(lang):
+    assert pick_active(parse_show_interface(SAMPLES[lang])) == EXPECTED[lang]
+
+
+@pytest.mark.parametrize("lang", sorted(SAMPLES))
+def test_crlf_output(lang):
+    assert parse_show_interface(SAMPLES[lang].replace("\n", "\r\n")) == parse_show_interface(SAMPLES[lang])
+
+
+def test_multiword_names_and_states():
+    assert parse_show_interface(SAMPLES["ru"]) == [
+        Interface("Ethernet", True, False, "Выделенный"),
+        Interface("Беспроводная сеть", True, True, "Выделенный"),
+        Interface("Подключение по локальной сети* 2", True, True, "Выделенный"),
+    ]
+    interfaces = parse_show_interface(SAMPLES["en"])
+    assert interfaces[0] == Interface("Ethernet 2", False, False, "Dedicated")
+    assert interfaces[-1].name == "vEthernet (Default Switch)"
+
+
+def test_loopback_is_skipped():
+    interfaces = parse_show_interface(SAMPLES["en-vpn"])
+    assert interfaces[1].name == "Loopback Pseudo-Interface 1" and interfaces[1].connected
+    assert pick_active(interfaces) == "Local Area Connection"
+
+
+def test_nothing_connected_gives_default():
+    # Замена той же длины сохраняет выравнивание колонок
+    interfaces = parse_show_interface(SAMPLES["en"].replace("Connected   ", "Disconnected"))
+    assert [interface.connected for interface in interfaces] == [False] * 4
+    assert pick_active(interfaces) == DEFAULT_INTERFACE
+    assert pick_active(parse_show_interface("")) == DEFAULT_INTERFACE
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_inventory(ttl=30.0):
+    backend = FakeBackend(outputs={("netsh", "interface", "show"): SAMPLES["ru"]})
+    clock = Clock()
+    return InterfaceInventory(CommandRunner(backend), ttl=ttl, clock=clock), backend, clock
+
+
+def queries(backend):
+    return sum(1 for call in backend.calls if call[1:3] == ["interface", "show"])
+
+
+def test_inventory_caches_until_ttl():
+    inventory, backend, clock = make_inventory(ttl=30.0)
+    assert inventory.active() == "Беспроводная сеть"
+    assert inventory.active() == "Беспроводная сеть"
+    assert queries(backend) == 1
+    clock.now = 31.0
+    inventory.active()
+    assert queries(backend) == 2
+
+
+def test_inventory_invalidate_and_refresh():
+    inventory, backend, _ = make_inventory()
+    inventory.interfaces()
+    inventory.invalidate()
+    inventory.interfaces()
+    inventory.interfaces(refresh=True)
+    assert queries(backend) == 3
+    assert inventory.refreshes == 3
+
+
+@pytest.mark.parametrize("name", sorted(DNS_SAMPLES))
+def test_parse_dns_servers(name):
+    text, expected = DNS_SAMPLES[name]
+    assert parse_dns_servers(text) == expected
+    assert parse_dns_servers(text.replace("\n", "\r\n")) == expected
+
+
+def test_parse_dns_servers_unknown_output():
+    assert parse_dns_servers("") is None
+    assert parse_dns_servers("The filename, directory name, or volume label syntax is incorrect.") is None
+
+
+def test_parse_ipv6_state():
+    assert parse_ipv6_state(IPV6_GLOBAL["enabled"]) == "enabled"
+    assert parse_ipv6_state(IPV6_GLOBAL["disabled"].replace("\n", "\r\n")) == "disabled"
+    # Строки состояния нет: прочие "enabled" не принимаются за состояние IPv6
+    assert parse_ipv6_state(IPV6_GLOBAL["enabled"].replace("State    ", "Forwarding")) is None
+    assert parse_ipv6_state("") is None
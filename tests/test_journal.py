@@ -0,0 +1,179 @@
+"""NetworkJournal и NetworkSetup: сбой посреди подключения и откат по журналу на FakeSystem"""
+
+import json
+import threading
+
+import pytest
+
+from anonline.journal import NetworkJournal
+
+from .fake_network import ORIGINAL_HOSTS, ORIGINAL_PROXY, TIME_ZONE, FakeSystem
+from .gui import run_gui
+from .netsh_samples import DNS_SAMPLES
+
+TORN = '{"op": "apply", "step": "firew'
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "network_journal.jsonl")
+
+
+def records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_originals_are_recorded_before_changes(tmp_path, journal_path):
+    system = FakeSystem(tmp_path)
+    assert system.connect(system.setup(NetworkJournal(journal_path)))
+    pending = NetworkJournal(journal_path).pending()
+    assert list(pending) == ["proxy", "ipv6", "dns", "webrtc", "firewall", "time"]
+    assert pending["proxy"].data == ORIGINAL_PROXY._asdict()
+    assert pending["dns"].data == {"interface": "Wi-Fi", "source": "static",
+                                   "servers": ["1.1.1.1", "8.8.4.4", "9.9.9.9"]}
+    assert pending["dns"].after == ("xray",)
+    assert pending["ipv6"].data == {"state": "disabled"}
+    assert pending["time"].data == {"time_zone": TIME_ZONE}
+    # Исходное состояние запрошено до изменения
+    executed = [argv[1:4] for argv in system.backend.executed]
+    assert executed.index(["interface", "ipv4", "show"]) < executed.index(["interface", "ipv4", "set"])
+    assert executed.index(["interface", "ipv6", "show"]) < executed.index(["interface", "ipv6", "set"])
+
+
+def test_crash_mid_apply_then_rollback_restores_originals(tmp_path, journal_path):
+    system = FakeSystem(tmp_path)
+    crashed = system.setup(NetworkJournal(journal_path))
+    assert system.connect(crashed, ("set_proxy", "disable_ipv6", "set_dns", "block_webrtc"))
+    assert system.proxy() != ORIGINAL_PROXY
+    assert system.hosts() != ORIGINAL_HOSTS
+
+    # Следующий запуск: новый журнал на том же файле, исходные значения - только из него
+    journal = NetworkJournal(journal_path)
+    recovered = system.setup(journal)
+    report = journal.rollback(recovered.undo_handlers())
+    assert not report.failed()
+    assert system.proxy() == ORIGINAL_PROXY
+    assert system.hosts() == ORIGINAL_HOSTS
+    # Статические DNS возвращаются в прежнем порядке, отключенный до подключения IPv6 не включается
+    assert system.netsh("interface", "ipv4", "set")[-1] == [
+        "interface", "ipv4", "set", "dnsservers", 'name="Wi-Fi"', "source=static", "address=1.1.1.1",
+        "register=primary"]
+    assert system.netsh("interface", "ipv4", "add") == [
+        ["interface", "ipv4", "add", "dnsservers", 'name="Wi-Fi"', "address=8.8.4.4", "index=2"],
+        ["interface", "ipv4", "add", "dnsservers", 'name="Wi-Fi"', "address=9.9.9.9", "index=3"]]
+    assert system.netsh("interface", "ipv6", "set")[-1][-1] == "state=disabled"
+    assert journal.pending() == {}
+    assert not (tmp_path / "network_journal.jsonl").exists()
+
+
+@pytest.mark.parametrize("dns, expected", [
+    ("en-dhcp", ["source=dhcp"]),
+    ("ru-dhcp", ["source=dhcp"]),
+    ("en-static-none", ["source=static", "address=none", "register=primary"]),
+])
+def test_dns_source_is_restored(tmp_path, journal_path, dns, expected):
+    system = FakeSystem(tmp_path, dns=dns, ipv6="enabled")
+    network = system.setup(NetworkJournal(journal_path))
+    assert system.connect(network, ("disable_ipv6", "set_dns"))
+    name = network.journal.pending()["dns"].data["interface"]
+    assert network.journal.pending()["dns"].data["servers"] == DNS_SAMPLES[dns][1][1]
+    network.journal.rollback(network.undo_handlers())
+    assert system.netsh("interface", "ipv4", "set")[-1] == ["interface", "ipv4", "set", "dnsservers",
+                                                            f'name="{name}"', *expected]
+    assert system.netsh("interface", "ipv4", "add") == []
+    assert system.netsh("interface", "ipv6", "set")[-1][-1] == "state=enabled"
+
+
+def test_unknown_originals_fall_back_to_defaults(tmp_path, journal_path):
+    # Журнал прежней версии: без источника DNS и состояния IPv6
+    journal = NetworkJournal(journal_path)
+    journal.record("dns", {"interface": "Ethernet"})
+    journal.record("ipv6")
+    system = FakeSystem(tmp_path)
+    journal.rollback(system.setup(journal).undo_handlers())
+    assert system.netsh("interface", "ipv4", "set") == [
+        ["interface", "ipv4", "set", "dnsservers", 'name="Ethernet"', "source=dhcp"]]
+    assert system.netsh("interface", "ipv6", "set") == [["interface", "ipv6", "set", "global", "state=enabled"]]
+
+
+def test_torn_last_line_is_ignored_and_not_glued(journal_path):
+    journal = NetworkJournal(journal_path)
+    journal.record("proxy", {"enabled": 0, "server": "", "override": ""})
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write(TORN)
+
+    reopened = NetworkJournal(journal_path)
+    assert list(reopened.pending()) == ["proxy"]
+    # Следующая запись начинается с новой строки и читается
+    reopened.record("ipv6", {"state": "enabled"})
+    with open(journal_path, encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    assert lines[1] == TORN and json.loads(lines[2])["step"] == "ipv6"
+    assert list(NetworkJournal(journal_path).pending()) == ["proxy", "ipv6"]
+
+
+def test_apply_undo_pairing(journal_path):
+    journal = NetworkJournal(journal_path)
+    journal.record("dns", {"interface": "Ethernet", "source": "dhcp", "servers": []})
+    # Повторное применение без отката: исходные значения - из первой записи
+    journal.record("dns", {"interface": "Ethernet", "source": "static", "servers": ["127.0.0.1"]})
+    journal.record("ipv6", {"state": "enabled"})
+    assert journal.pending()["dns"].data["source"] == "dhcp"
+
+    journal.mark_undone("dns")
+    assert list(journal.pending()) == ["ipv6"]
+    # Применение после отката - новая пара со своими исходными значениями
+    journal.record("dns", {"interface": "Wi-Fi", "source": "static", "servers": ["1.1.1.1"]})
+    assert journal.pending()["dns"].data["interface"] == "Wi-Fi"
+
+    assert journal.undo("dns", lambda data: False) is False
+    assert "dns" in journal.pending()
+    assert journal.undo("dns", lambda data: True) is True
+    assert journal.undo("dns", lambda data: pytest.fail("шаг уже откачен")) is True
+    assert [record["op"] for record in records(journal_path)] == ["apply", "apply", "apply", "undo", "apply",
+                                                                  "undo"]
+
+
+def test_rollback_runs_in_reverse_dependency_order(journal_path):
+    journal = NetworkJournal(journal_path)
+    journal.begin()
+    for step, after in [("xray", ()), ("proxy", ("xray",)), ("ipv6", ()), ("dns", ("xray",))]:
+        journal.record(step, after=after)
+    order = []
+    lock = threading.Lock()
+
+    def handler(step):
+        def undo(data):
+            with lock:
+                order.append(step)
+        return undo
+
+    report = journal.rollback({step: handler(step) for step in ("xray", "proxy", "ipv6", "dns")})
+    assert not report.failed()
+    # Xray останавливается только после отката зависевших от него DNS и прокси
+    assert order.index("xray") > max(order.index("proxy"), order.index("dns"))
+    assert sorted(order) == ["dns", "ipv6", "proxy", "xray"]
+
+
+def test_failed_undo_stays_in_journal(tmp_path, journal_path):
+    journal = NetworkJournal(journal_path)
+    journal.record("proxy", ORIGINAL_PROXY._asdict(), after=("xray",))
+    journal.record("xray")
+    report = journal.rollback({"proxy": lambda data: False, "xray": lambda data: True})
+    assert report.failed()
+    # Xray ждал прокси и не откатывался; запись прокси ждет следующей попытки
+    assert list(journal.pending()) == ["proxy", "xray"]
+    assert (tmp_path / "network_journal.jsonl").exists()
+
+
+def test_recover_stale_journal_in_window(tmp_path):
+    pytest.importorskip("PyQt5.QtWidgets")
+    result = run_gui(tmp_path, "recover_journal")
+    assert result["proxy"] == list(ORIGINAL_PROXY)
+    assert ["interface", "ipv4", "set", "dnsservers", 'name="Wi-Fi"', "source=static", "address=1.1.1.1",
+            "register=primary"] in result["dns"]
+    assert ["interface", "ipv4", "add", "dnsservers", 'name="Wi-Fi"', "address=9.9.9.9", "index=3"] in result["dns"]
+    assert result["ipv6"][-1][-1] == "state=disabled"
+    assert result["journal"] is False
+    assert "Найдены несохраненные изменения сети после сбоя: proxy, ipv6, dns" in result["console"]
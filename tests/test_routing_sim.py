@@ -0,0 +1,92 @@
+"""RoutingSimulator: поштучный route и пакетный route_many дают одинаковые ответы"""
+
+import random
+
+import pytest
+
+from anonline.geoip import GeoIPFile, build_geoip
+from anonline.routing_sim import Flow, Route, RoutingSimulator
+from anonline.xray_config import ConfigError
+
+OUTBOUNDS = [{"tag": "proxy"}, {"tag": "direct"}, {"tag": "block"}]
+DOMAINS = ["a.example.com", "example.com", "b.example.org", "ads.tracker.net", "cdn.video.example.com",
+           "login.bank.ru", "localhost", "10.1.2.3", "", None]
+IPS = ["192.168.1.5", "10.1.2.3", "8.8.8.8", "1.1.1.1", "2001:db8::1", "fd00::5", "::ffff:192.168.0.7", None]
+CONDITIONS = {
+    "domain": [["domain:example.com"], ["full:example.com", "keyword:tracker"], ["regexp:^cdn\\."],
+               ["video", "domain:bank.ru"], ["domain:example.org"]],
+    "ip": [["192.168.0.0/16"], ["geoip:private"], ["geoip:!private"], ["8.8.8.8", "2001:db8::/32"]],
+    "port": ["443", "80,8000-9000", "53"],
+    "network": ["tcp", "udp", "tcp,udp"],
+    "protocol": [["tls"], ["http", "bittorrent"]],
+    "inboundTag": [["socks"], ["dns-in"]],
+}
+
+
+@pytest.fixture(scope="module")
+def geoip(tmp_path_factory):
+    path = tmp_path_factory.mktemp("geoip") / "geoip.dat"
+    path.write_bytes(build_geoip({"PRIVATE": ["10.0.0.0/8", "192.168.0.0/16", "fc00::/7"]}))
+    with GeoIPFile(str(path)) as geoip:
+        yield geoip
+
+
+def config(rules, strategy="AsIs"):
+    return {"routing": {"domainStrategy": strategy, "rules": rules}, "outbounds": OUTBOUNDS}
+
+
+def resolve(domain):
+    # Детерминированный "DNS": часть имен не разрешается
+    return {"a.example.com": "192.168.5.5", "b.example.org": "8.8.8.8", "login.bank.ru": "fd00::1"}.get(domain)
+
+
+def random_rule(rng):
+    fields = rng.sample(sorted(CONDITIONS), rng.randint(1, 3))
+    rule = {field: rng.choice(CONDITIONS[field]) for field in fields}
+    rule["outboundTag"] = rng.choice(OUTBOUNDS)["tag"]
+    return rule
+
+
+def random_flows(rng, count):
+    return [Flow(domain=rng.choice(DOMAINS), ip=rng.choice(IPS), port=rng.choice([443, 80, 53, 8080, 8443]),
+                 network=rng.choice(["tcp", "udp"]), protocol=rng.choice(["tls", "http", "bittorrent", None]),
+                 inbound_tag=rng.choice(["socks", "dns-in", None]))
+            for _ in range(count)]
+
+
+def test_domain_rule_after_other_rules():
+    """Правило с доменом не первое: бит матчера не совпадает с номером правила"""
+    simulator = RoutingSimulator(config([{"ip": ["192.168.0.0/16"], "outboundTag": "direct"},
+                                         {"domain": ["domain:example.com"], "outboundTag": "block"}]))
+    flow = Flow("a.example.com")
+    assert simulator.route(flow) == Route(1, "block")
+    assert simulator.route_many([flow]) == [Route(1, "block")]
+
+
+def test_several_domain_rules_keep_their_order():
+    simulator = RoutingSimulator(config([{"port": "53", "outboundTag": "direct"},
+                                         {"domain": ["keyword:tracker"], "outboundTag": "block"},
+                                         {"network": "udp", "outboundTag": "direct"},
+                                         {"domain": ["domain:net"], "outboundTag": "proxy"}]))
+    flows = [Flow("ads.tracker.net"), Flow("cdn.example.net"), Flow("cdn.example.net", network="udp"),
+             Flow("example.com"), Flow("ads.tracker.net", port=53)]
+    expected = [Route(1, "block"), Route(3, "proxy"), Route(2, "direct"), Route(None, "proxy"), Route(0, "direct")]
+    assert [simulator.route(flow) for flow in flows] == expected
+    assert simulator.route_many(flows) == expected
+
+
+@pytest.mark.parametrize("strategy", ["AsIs", "IPOnDemand", "IPIfNonMatch"])
+def test_route_matches_route_many_on_random_configs(geoip, strategy):
+    rng = random.Random(25)
+    for _ in range(200):
+        rules = [random_rule(rng) for _ in range(rng.randint(1, 8))]
+        flows = random_flows(rng, 50)
+        batch = RoutingSimulator(config(rules, strategy), geoip=geoip, resolve=resolve)
+        single = RoutingSimulator(config(rules, strategy), geoip=geoip, resolve=resolve)
+        assert batch.route_many(flows) == [single.route(flow) for flow in flows], rules
+        assert batch.hits == single.hits
+
+
+def test_unsupported_condition_is_rejected():
+    with pytest.raises(ConfigError):
+        RoutingSimulator(config([{"source": ["10.0.0.1"], "outboundTag": "direct"}]))
@@ -0,0 +1,146 @@
+"""SettingsStore: перенос старых файлов, отложенная запись и защита от потери настроек"""
+
+import json
+import os
+import time
+
+import pytest
+
+from anonline import settings_store
+from anonline.settings_store import (DEFAULTS, LEGACY_KEY, LEGACY_SETTINGS, SCHEMA_VERSION, NewerSchemaError,
+                                     SettingsStore, migrate)
+
+KEY = "vless://3f1c1a4e-8a0b-4a3c-9d7e-2b6f1c0d9e8a@vpn.example.net:443?security=reality&pbk=abc&sni=a.b"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "config" / "settings.json")
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write(path, document):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(document if isinstance(document, str) else json.dumps(document))
+
+
+def test_defaults_without_file(path):
+    store = SettingsStore(path, delay=0.01)
+    assert store.load() == DEFAULTS
+    assert not os.path.exists(path)
+
+
+def test_legacy_files_are_migrated(tmp_path, path):
+    write(str(tmp_path / LEGACY_SETTINGS), {"block_webrtc": False, "key": "старый"})
+    write(str(tmp_path / LEGACY_KEY), KEY + "\n")
+    store = SettingsStore(path, legacy_dir=str(tmp_path), delay=0.01)
+    settings = store.load()
+    assert store.migrated
+    assert settings["block_webrtc"] is False
+    assert settings["key"] == KEY
+    assert read(path) == {"version": SCHEMA_VERSION, "settings": settings}
+    # Старые файлы не удаляются
+    assert os.path.exists(tmp_path / LEGACY_SETTINGS)
+
+
+def test_changes_are_coalesced_into_one_write(path):
+    store = SettingsStore(path, delay=0.2)
+    store.load()
+    for i in range(100):
+        store.set("console_max_lines", 1000 + i)
+    assert store.pending
+    assert store.close()
+    assert store.writes == 1
+    assert read(path)["settings"]["console_max_lines"] == 1099
+
+
+def test_unchanged_value_does_not_schedule_write(path):
+    store = SettingsStore(path, delay=0.01)
+    store.load()
+    assert not store.set("block_webrtc", DEFAULTS["block_webrtc"])
+    assert not store.pending
+    store.close()
+    assert store.writes == 0
+
+
+@pytest.mark.parametrize("content", ["{\"version\": 2, \"settings\": {", "[1, 2]", "\"text\"",
+                                     "{\"version\": 2, \"settings\": [1]}"])
+def test_unreadable_file_is_moved_aside(path, content):
+    write(path, content)
+    store = SettingsStore(path, delay=0.01)
+    with pytest.raises(ValueError):
+        store.load()
+    assert not os.path.exists(path)
+    with open(path + ".bad", encoding="utf-8") as f:
+        assert f.read() == content
+    assert store.snapshot() == DEFAULTS
+
+
+def test_newer_schema_is_left_untouched(path):
+    document = {"version": SCHEMA_VERSION + 1, "settings": {"key": KEY, "theme": "dark"}}
+    write(path, document)
+    before = os.stat(path).st_mtime_ns
+    store = SettingsStore(path, delay=0.01)
+    with pytest.raises(NewerSchemaError):
+        store.load()
+    assert store.read_only
+    assert not os.path.exists(path + ".bad")
+
+    # Изменения в этом запуске остаются в памяти, файл не перезаписывается
+    store.set("block_webrtc", False)
+    assert store.get("block_webrtc") is False
+    assert not store.close()
+    assert read(path) == document
+    assert os.stat(path).st_mtime_ns == before
+    assert store.writes == 0
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_failed_write_keeps_pending_and_is_not_retried_in_a_loop(path, monkeypatch):
+    attempts = []
+
+    def failing(target, data):
+        attempts.append(data)
+        raise PermissionError(13, "Отказано в доступе", target)
+
+    monkeypatch.setattr(settings_store, "write_atomic", failing)
+    store = SettingsStore(path, delay=0.01)
+    store.load()
+    store.set("block_webrtc", False)
+    assert wait_for(lambda: store.last_error)
+    assert "Отказано в доступе" in store.last_error
+    assert store.pending
+    # Поток ждет новых изменений, а не повторяет запись каждые delay секунд
+    time.sleep(0.2)
+    assert len(attempts) == 1
+
+    # Следующее изменение - новая попытка
+    store.set("use_local_dns", False)
+    assert wait_for(lambda: len(attempts) == 2)
+    time.sleep(0.1)
+    assert len(attempts) == 2 and store.pending
+
+    # Запись снова возможна: close() дописывает накопленное
+    monkeypatch.undo()
+    assert store.close()
+    assert not store.pending
+    assert store.writes == 1
+    assert read(path)["settings"]["block_webrtc"] is False
+    assert read(path)["settings"]["use_local_dns"] is False
+
+
+def test_migrate():
+    assert migrate({"key": KEY}) == {"version": 2, "settings": {"key": KEY}}
+    with pytest.raises(NewerSchemaError):
+        migrate({"version": SCHEMA_VERSION + 1, "settings": {}})
@@ -0,0 +1,120 @@
+"""Socks5Probe и клиент SOCKS5 против локальных заглушек прокси и HTTP-сервера"""
+
+import asyncio
+
+import pytest
+
+from anonline.health import Socks5Probe
+from anonline.socks5 import Socks5Error, encode_address, open_socks5_connection
+
+from .socks_standin import HttpStandin, Socks5Standin
+
+
+def run_with_standins(scenario, http=None, **socks_options):
+    """Поднимает заглушки, выполняет scenario(http, socks) и останавливает их"""
+
+    async def main():
+        http_server = await (http or HttpStandin()).start()
+        socks = await Socks5Standin(http_server.port, **socks_options).start()
+        try:
+            return await scenario(http_server, socks)
+        finally:
+            socks.close()
+            http_server.close()
+
+    return asyncio.run(main())
+
+
+def test_encode_address():
+    assert encode_address("1.2.3.4", 80) == b"\x01\x01\x02\x03\x04\x00\x50"
+    assert encode_address("::1", 443)[0] == 4
+    assert encode_address("www.google.com", 80) == b"\x03\x0ewww.google.com\x00\x50"
+    with pytest.raises(Socks5Error):
+        encode_address(".".join(["a" * 60] * 5), 80)
+
+
+def test_probe_reports_stages():
+    async def scenario(http, socks):
+        return await Socks5Probe("127.0.0.1", socks.port)("www.google.com", 80, 3.0)
+
+    result = run_with_standins(scenario, http=HttpStandin(delay=0.03), handshake_delay=0.02, connect_delay=0.04)
+    assert result.ok and not result.reused
+    assert result.handshake >= 0.015
+    assert result.connect >= 0.035
+    assert result.ttfb >= 0.025
+    assert result.latency >= result.handshake + result.connect + result.ttfb
+
+
+def test_hostname_is_resolved_by_proxy():
+    async def scenario(http, socks):
+        await Socks5Probe("127.0.0.1", socks.port)("www.google.com", 80, 3.0)
+        return socks.targets
+
+    assert run_with_standins(scenario) == [("www.google.com", 80)]
+
+
+def test_keep_alive_connection_is_reused():
+    async def scenario(http, socks):
+        probe = Socks5Probe("127.0.0.1", socks.port)
+        results = [await probe("www.google.com", 80, 3.0) for _ in range(5)]
+        await probe.aclose()
+        return results, socks.handshakes
+
+    results, handshakes = run_with_standins(scenario)
+    assert all(result.ok for result in results)
+    assert [result.reused for result in results] == [False, True, True, True, True]
+    assert handshakes == 1
+
+
+def test_connection_close_is_not_reused():
+    async def scenario(http, socks):
+        probe = Socks5Probe("127.0.0.1", socks.port)
+        results = [await probe("www.google.com", 80, 3.0) for _ in range(3)]
+        return results, socks.handshakes
+
+    results, handshakes = run_with_standins(scenario, http=HttpStandin(keep_alive=False))
+    assert all(result.ok and not result.reused for result in results)
+    assert handshakes == 3
+
+
+def test_proxy_refusal():
+    async def scenario(http, socks):
+        return await Socks5Probe("127.0.0.1", socks.port)("www.google.com", 80, 3.0)
+
+    result = run_with_standins(scenario, reply=5)
+    assert not result.ok
+    assert result.error == "в соединении отказано"
+
+
+def test_open_connection_refusal_raises():
+    async def scenario(http, socks):
+        with pytest.raises(Socks5Error):
+            await open_socks5_connection("127.0.0.1", socks.port, "www.google.com", 80)
+
+    run_with_standins(scenario, reply=2)
+
+
+def test_timeout_waiting_for_response():
+    async def scenario(http, socks):
+        return await Socks5Probe("127.0.0.1", socks.port)("www.google.com", 80, 0.2)
+
+    result = run_with_standins(scenario, http=HttpStandin(delay=1.0))
+    assert not result.ok
+    assert result.error == "таймаут ответа через туннель"
+    assert result.handshake is not None
+
+
+def test_dead_keep_alive_connection_does_not_use_up_timeout():
+    async def scenario(http, socks):
+        probe = Socks5Probe("127.0.0.1", socks.port, reuse_timeout=0.2)
+        first = await probe("www.google.com", 80, 2.0)
+        second = await probe("www.google.com", 80, 2.0)
+        await probe.aclose()
+        return first, second, socks.handshakes
+
+    # Сохраненное соединение больше не отвечает, но и не закрывается
+    first, second, handshakes = run_with_standins(scenario, http=HttpStandin(hang_after=1))
+    assert first.ok
+    assert second.ok and not second.reused
+    assert second.latency < 1.0
+    assert handshakes == 2
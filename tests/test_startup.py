@@ -0,0 +1,58 @@
+"""Бюджет холодного запуска окна до первой отрисовки (платформа Qt offscreen).
+
+Каждый запуск идет в новом каталоге с копиями geosite.dat и geoip.dat из
+корня репозитория, как рядом с установленным приложением, но без кэша
+индекса geosite и без урезанного каталога ресурсов Xray (холодный кэш).
+
+Бюджет можно поменять переменной ANONLINE_STARTUP_BUDGET_MS, например
+для медленной машины сборки.
+"""
+
+import compileall
+import os
+import shutil
+import statistics
+
+import pytest
+
+from .gui import ROOT, run_gui
+
+pytest.importorskip("PyQt5.QtWidgets")
+
+BUDGET_MS = float(os.environ.get("ANONLINE_STARTUP_BUDGET_MS", 500))
+RUNS = 3
+PHASES = ("imports", "QApplication", "VlessVPNApp", "initUI", "load_settings", "first paint")
+ASSETS = [name for name in ("geosite.dat", "geoip.dat") if os.path.exists(os.path.join(ROOT, name))]
+
+
+def cold_workdir(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("startup")
+    for name in ASSETS:
+        shutil.copy2(os.path.join(ROOT, name), workdir / name)
+    return workdir
+
+
+@pytest.fixture(scope="module")
+def reports(tmp_path_factory):
+    # Без .pyc первый запуск компилировал бы пакет и вышел бы за бюджет
+    compileall.compile_dir(os.path.join(ROOT, "anonline"), quiet=1)
+    workdirs = [cold_workdir(tmp_path_factory) for _ in range(RUNS)]
+    return [dict(run_gui(workdir, "startup_report"), files=sorted(os.listdir(workdir))) for workdir in workdirs]
+
+
+def test_startup_phases_are_traced(reports):
+    for report in reports:
+        names = {span["name"] for span in report["spans"]}
+        assert names.issuperset(PHASES)
+        assert all(span["end"] is not None and span["end"] >= span["start"] for span in report["spans"])
+
+
+def test_cold_start_budget(reports):
+    median = statistics.median(report["total_ms"] for report in reports)
+    assert median < BUDGET_MS, f"до первой отрисовки {median:.0f} мс, бюджет {BUDGET_MS:.0f} мс"
+
+
+def test_assets_are_not_processed_before_connect(reports):
+    # Кэш индекса geosite и урезанный geosite.dat собираются только при подключении
+    for report in reports:
+        assert [name for name in report["files"] if name not in ASSETS] == ["result.json"]
@@ -0,0 +1,114 @@
+"""run_steps: граф зависимостей, параллельность и откат при неудаче обязательного шага"""
+
+import threading
+import time
+
+import pytest
+
+from anonline.steps import FAILED, OK, ROLLED_BACK, SKIPPED, Step, run_steps
+
+from .test_xray_process import fake_xray, free_ports, start
+
+
+class FakeRunner:
+    """Заглушка команд: каждая выдерживает задержку, журнал вызовов потокобезопасен"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def step(self, name, ok=True):
+        def run():
+            time.sleep(self.latency)
+            with self._lock:
+                self.calls.append(name)
+            if ok is not True:
+                raise RuntimeError(f"{name}: сбой")
+            return True
+        return run
+
+
+def test_independent_steps_run_concurrently():
+    runner = FakeRunner(latency=0.1)
+    steps = [Step(name, runner.step(name), runner.step(f"undo {name}")) for name in ("ipv6", "webrtc", "time")]
+    report = run_steps(steps, max_workers=3)
+    assert report.ok
+    assert {result.status for result in report.results.values()} == {OK}
+    assert report.elapsed < report.sequential * 0.7
+
+
+def test_dependencies_order_and_skip():
+    runner = FakeRunner(latency=0.01)
+    steps = [
+        Step("xray", runner.step("xray")),
+        Step("dns", runner.step("dns", ok=False), after=("xray",)),
+        Step("proxy", runner.step("proxy"), after=("dns", "missing")),
+    ]
+    report = run_steps(steps)
+    assert report.ok
+    assert runner.calls == ["xray", "dns"]
+    assert report.results["dns"].status == FAILED
+    assert report.results["proxy"].status == SKIPPED
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError):
+        run_steps([Step("a", None, after=("b",)), Step("b", None, after=("a",))])
+
+
+def test_required_failure_rolls_back_in_reverse_order():
+    runner = FakeRunner(latency=0.01)
+    steps = [
+        Step("ipv6", runner.step("ipv6"), runner.step("undo ipv6")),
+        Step("xray", runner.step("xray", ok=False), runner.step("undo xray"), after=("ipv6",), required=True),
+        Step("proxy", runner.step("proxy"), runner.step("undo proxy"), after=("xray",), required=True),
+    ]
+    report = run_steps(steps)
+    assert not report.ok
+    # Неудавшийся шаг откатывается первым: он мог выполниться частично
+    assert runner.calls == ["ipv6", "xray", "undo xray", "undo ipv6"]
+    assert report.results["ipv6"].status == ROLLED_BACK
+    assert report.results["xray"].status == FAILED
+    assert report.results["proxy"].status == SKIPPED
+
+
+def test_failed_rollback_is_reported():
+    def broken_rollback():
+        raise OSError("нет доступа")
+
+    report = run_steps([Step("xray", lambda: False, broken_rollback, required=True)])
+    assert report.results["xray"].status == FAILED
+    assert "ошибка отката: нет доступа" in report.results["xray"].error
+
+
+@pytest.mark.parametrize("mode, timeout", [("fail", 5.0), ("ok", 0.3)])
+def test_xray_not_ready_is_stopped(mode, timeout):
+    """Xray запустился, но готовности не дождались: процесс не должен остаться"""
+    ports = free_ports(1)
+    # В режиме ok порт откроется только через 10 с - ожидание уйдет в таймаут
+    supervisor = fake_xray(ports, delay=0.1 if mode == "fail" else 10.0, mode=mode)
+    launched = []
+
+    def launch_xray():
+        launched.append(start(supervisor, ports))
+        ready, info = supervisor.wait_ready(ports, timeout=timeout)
+        if not ready:
+            raise RuntimeError(f"Xray не готов к работе: {info}")
+        return True
+
+    runner = FakeRunner(latency=0.01)
+    steps = [
+        Step("xray", launch_xray, lambda: supervisor.stop(timeout=1.0), required=True),
+        Step("proxy", runner.step("proxy"), runner.step("undo proxy"), after=("xray",), required=True),
+        Step("ipv6", runner.step("ipv6"), runner.step("undo ipv6")),
+    ]
+    try:
+        report = run_steps(steps)
+        assert not report.ok
+        assert report.results["xray"].status == FAILED
+        assert launched[0].poll() is not None
+        assert not supervisor.running
+        assert runner.calls == ["ipv6", "undo ipv6"]
+    finally:
+        supervisor.stop(timeout=1.0)
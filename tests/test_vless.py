@@ -0,0 +1,37 @@
+"""Разбор vless:// ключей и деление пользовательского ввода на ключи"""
+
+from anonline.vless import parse_vless_url, split_keys
+from anonline.xray_config import build_config, validate_config
+
+UUID = "3f1c1a4e-8a0b-4a3c-9d7e-2b6f1c0d9e8a"
+ALPN_KEY = (f"vless://{UUID}@vpn.example.net:443?type=tcp&security=reality&alpn=h2,http/1.1"
+            f"&pbk=abc&sni=www.example.com&fp=chrome&sid=ab12#alpn")
+PLAIN_KEY = f"vless://{UUID}@second.example.net:8443?security=reality&pbk=def&sni=www.example.org"
+
+
+def test_parse_vless_url():
+    params = parse_vless_url(PLAIN_KEY)
+    assert params["server"] == "second.example.net"
+    assert params["port"] == 8443
+    assert params["pbk"] == "def"
+    assert params["type"] == "tcp"
+    assert parse_vless_url("https://example.com") is None
+
+
+def test_comma_inside_key_does_not_split_it():
+    assert split_keys(ALPN_KEY) == [ALPN_KEY]
+    params = parse_vless_url(split_keys(ALPN_KEY)[0])
+    assert params["pbk"] == "abc"
+    assert params["sni"] == "www.example.com"
+    validate_config(build_config(params))
+
+
+def test_split_keys_separators():
+    for text in (f"{ALPN_KEY}\n{PLAIN_KEY}", f"{ALPN_KEY}, {PLAIN_KEY}", f"{ALPN_KEY},{PLAIN_KEY}",
+                 f"{ALPN_KEY};{PLAIN_KEY};", f" {ALPN_KEY}\t\r\n{PLAIN_KEY} "):
+        assert split_keys(text) == [ALPN_KEY, PLAIN_KEY], text
+
+
+def test_split_keys_ignores_other_text():
+    assert split_keys(f"сервер 1: {PLAIN_KEY} (основной)") == [PLAIN_KEY]
+    assert split_keys("") == []
@@ -0,0 +1,128 @@
+"""Разбор строк лога Xray и скользящее окно счетчиков XrayLogStats"""
+
+import pytest
+
+from anonline.xray_log import REJECTED, AccessEntry, ErrorEntry, XrayLogStats, parse_line
+
+ACCESS = [
+    ("2024/05/01 12:00:00 127.0.0.1:50000 accepted tcp:www.example.com:443 [socks -> proxy]",
+     AccessEntry("2024/05/01 12:00:00", "127.0.0.1:50000", "accepted", "tcp", "www.example.com", 443, "socks",
+                 "proxy")),
+    # Новые версии: "from", доли секунды, ">>" вместо "->", email пользователя в конце
+    ("2024/05/01 12:00:00.123456 from 127.0.0.1:50001 accepted udp:1.1.1.1:53 [dns-in >> direct] email: a@b.c",
+     AccessEntry("2024/05/01 12:00:00", "127.0.0.1:50001", "accepted", "udp", "1.1.1.1", 53, "dns-in", "direct")),
+    ("2024/05/01 12:00:00 [::1]:50002 accepted tcp:[2001:db8::1]:443 [socks -> block]",
+     AccessEntry("2024/05/01 12:00:00", "[::1]:50002", "accepted", "tcp", "[2001:db8::1]", 443, "socks", "block")),
+    # Без сети и без маршрута (старые версии)
+    ("2024/05/01 12:00:00 127.0.0.1:50003 accepted example.org:80",
+     AccessEntry("2024/05/01 12:00:00", "127.0.0.1:50003", "accepted", "tcp", "example.org", 80, "", "")),
+    ("2024/05/01 12:00:00 127.0.0.1:50004 rejected  proxy/socks: unknown Socks version: 22",
+     AccessEntry("2024/05/01 12:00:00", "127.0.0.1:50004", REJECTED, "tcp", "", None, "", "")),
+]
+ERRORS = [
+    ("2024/05/01 12:00:00 [Warning] [1234567] app/dispatcher: default route for tcp:example.com:443\n",
+     ErrorEntry("2024/05/01 12:00:00", "Warning", "1234567", "app/dispatcher: default route for tcp:example.com:443")),
+    ("2024/05/01 12:00:00.5 [Info] core: Xray 1.8.4 started",
+     ErrorEntry("2024/05/01 12:00:00", "Info", "", "core: Xray 1.8.4 started")),
+    # Слово accepted в сообщении журнала ошибок не делает строку журналом доступа
+    ("2024/05/01 12:00:00 [Debug] [42] proxy/socks: connection accepted from 127.0.0.1",
+     ErrorEntry("2024/05/01 12:00:00", "Debug", "42", "proxy/socks: connection accepted from 127.0.0.1")),
+]
+GARBAGE = [
+    "",
+    "Xray 1.8.4 (Xray, Penetrates Everything.) 8f8ea4a (go1.21.1 windows/amd64)",
+    "A unified platform for anti-censorship.",
+    "connection accepted by peer",
+    "2024/05/01 12:00:00 [Trace] unknown level",
+    "12:00:00 127.0.0.1:1 accepted tcp:example.com:443 [socks -> proxy]",
+]
+
+
+@pytest.mark.parametrize("line, entry", ACCESS + ERRORS)
+def test_parse_line(line, entry):
+    assert parse_line(line) == entry
+
+
+@pytest.mark.parametrize("line", GARBAGE)
+def test_garbage_is_not_parsed(line):
+    assert parse_line(line) is None
+
+
+@pytest.mark.parametrize("line, entry", ACCESS + ERRORS + [(line, None) for line in GARBAGE])
+def test_feed_agrees_with_parse_line(line, entry):
+    stats = XrayLogStats(clock=lambda: 0.0)
+    kind = stats.feed(line)
+    expected = {AccessEntry: "access", ErrorEntry: "error", type(None): None}[type(entry)]
+    assert kind == expected
+    assert stats.unparsed == (entry is None)
+
+
+def test_counters():
+    stats = XrayLogStats(clock=lambda: 0.0)
+    for line, _ in ACCESS + ERRORS:
+        stats.feed(line)
+    for line in GARBAGE:
+        stats.feed(line)
+    destinations, outbounds, levels = stats.snapshot()
+    assert outbounds == {"proxy": 1, "direct": 1, "block": 1, "": 1, REJECTED: 1}
+    assert destinations == {"proxy": {"www.example.com": 1}, "direct": {"1.1.1.1": 1},
+                            "block": {"[2001:db8::1]": 1}, "": {"example.org": 1}}
+    assert levels == {"Debug": 1, "Info": 1, "Warning": 1, "Error": 0}
+    assert stats.lines == len(ACCESS) + len(ERRORS) + len(GARBAGE)
+    assert stats.unparsed == len(GARBAGE)
+
+
+def access(host, outbound="proxy"):
+    return f"2024/05/01 12:00:00 127.0.0.1:50000 accepted tcp:{host}:443 [socks -> {outbound}]"
+
+
+def test_window_rolls_over_two_generations():
+    now = [0.0]
+    stats = XrayLogStats(window=10.0, clock=lambda: now[0])
+    stats.feed(access("a.com"))
+    now[0] = 9.9
+    stats.feed(access("b.com"))
+    assert stats.snapshot()[1] == {"proxy": 2}
+
+    # Первое поколение стало предыдущим и еще учитывается
+    now[0] = 10.0
+    stats.feed(access("c.com", "direct"))
+    destinations, outbounds, _ = stats.snapshot()
+    assert outbounds == {"proxy": 2, "direct": 1}
+    assert destinations["proxy"] == {"a.com": 1, "b.com": 1}
+
+    # Еще одно окно: первое поколение забыто
+    now[0] = 20.0
+    stats.feed(access("d.com"))
+    destinations, outbounds, _ = stats.snapshot()
+    assert outbounds == {"direct": 1, "proxy": 1}
+    assert destinations == {"direct": {"c.com": 1}, "proxy": {"d.com": 1}}
+
+    # Долгая тишина: поворот при следующей строке отбрасывает все старое, кроме последнего поколения
+    now[0] = 100.0
+    stats.feed(access("e.com"))
+    assert stats.snapshot()[1] == {"proxy": 2}
+    assert stats.top() == [("d.com", 1), ("e.com", 1)]
+
+
+def test_rare_destinations_are_pruned():
+    stats = XrayLogStats(max_destinations=4, clock=lambda: 0.0)
+    for _ in range(3):
+        stats.feed(access("popular.com"))
+    for i in range(4):
+        stats.feed(access(f"rare{i}.com"))
+    hosts = stats.snapshot()[0]["proxy"]
+    assert len(hosts) <= 4
+    assert hosts["popular.com"] == 3
+    assert stats.top("proxy", count=1) == [("popular.com", 3)]
+
+
+def test_summary():
+    stats = XrayLogStats(clock=lambda: 0.0)
+    assert stats.summary() == "нет данных"
+    stats.feed(access("a.com"))
+    stats.feed(access("a.com"))
+    stats.feed(access("b.com", "direct"))
+    stats.feed(ERRORS[0][0])
+    assert stats.summary() == ("proxy: 2, direct: 1; чаще всего: a.com (2), b.com (1); "
+                               "предупреждений 1, ошибок 0")
@@ -0,0 +1,157 @@
+"""XraySupervisor и ReadinessGate на заглушке xray (tests/fake_xray.py)"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from anonline import xray_process
+from anonline.log_pipeline import LogBuffer
+from anonline.xray_process import ReadinessGate, XrayLogReader, XraySupervisor
+
+FAKE_XRAY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xray.py")
+
+
+def free_ports(count):
+    socks = [socket.socket() for _ in range(count)]
+    for sock in socks:
+        sock.bind(("127.0.0.1", 0))
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+def fake_xray(ports, delay=0.0, mode="ok"):
+    return XraySupervisor([sys.executable, FAKE_XRAY, ",".join(map(str, ports)), str(delay), mode])
+
+
+def start(supervisor, ports, read_log=True):
+    """Запускает заглушку; как в приложении, лог читает XrayLogReader"""
+    process = supervisor.start(ports)
+    if read_log:
+        XrayLogReader(process.stdout, LogBuffer(), supervisor.gate).start()
+    return process
+
+
+@pytest.fixture
+def supervisors():
+    started = []
+    yield started
+    for supervisor in started:
+        supervisor.stop(timeout=1.0)
+
+
+@pytest.fixture
+def foreign_listener():
+    """Порт, который до запуска Xray уже слушает другой процесс"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(16)
+    yield server.getsockname()[1]
+    server.close()
+
+
+def test_ready_by_log(supervisors):
+    ports = free_ports(2)
+    supervisor = fake_xray(ports, delay=0.1)
+    supervisors.append(supervisor)
+    start(supervisor, ports)
+    ready, elapsed = supervisor.wait_ready(ports, timeout=5.0)
+    assert ready and elapsed >= 0.1
+
+
+def test_ready_by_ports_without_log_line(supervisors):
+    ports = free_ports(2)
+    supervisor = fake_xray(ports, delay=0.1, mode="quiet")
+    supervisors.append(supervisor)
+    start(supervisor, ports)
+    assert supervisor.wait_ready(ports, timeout=5.0)[0]
+    assert supervisor.gate.source == "порт"
+
+
+def test_start_failure_from_log(supervisors):
+    ports = free_ports(1)
+    supervisor = fake_xray(ports, mode="fail")
+    supervisors.append(supervisor)
+    start(supervisor, ports)
+    started = time.perf_counter()
+    ready, reason = supervisor.wait_ready(ports, timeout=5.0)
+    assert not ready and "failed to listen" in reason
+    assert time.perf_counter() - started < 2.0
+
+
+def test_port_taken_by_another_process_is_not_readiness(supervisors, foreign_listener):
+    supervisor = fake_xray([foreign_listener], delay=0.2, mode="fail")
+    supervisors.append(supervisor)
+    start(supervisor, [foreign_listener])
+    assert supervisor.busy_ports == (foreign_listener,)
+    ready, reason = supervisor.wait_ready([foreign_listener], timeout=5.0)
+    assert not ready
+    assert "failed to listen" in reason
+
+
+def test_silent_exit_with_foreign_port_is_not_readiness(supervisors, foreign_listener):
+    supervisor = fake_xray([], delay=0.2, mode="exit")
+    supervisors.append(supervisor)
+    start(supervisor, [foreign_listener], read_log=False)
+    ready, reason = supervisor.wait_ready([foreign_listener], timeout=5.0)
+    assert not ready and "код 1" in reason
+
+
+def test_open_port_does_not_count_after_process_exit(foreign_listener):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    gate = ReadinessGate()
+    gate.watch_ports([foreign_listener], process, deadline=time.perf_counter() + 1.0)
+    assert gate.resolved and not gate.ok
+
+
+def test_timeout(supervisors):
+    ports = free_ports(1)
+    supervisor = fake_xray(ports, delay=10.0)
+    supervisors.append(supervisor)
+    start(supervisor, ports)
+    ready, reason = supervisor.wait_ready(ports, timeout=0.3)
+    assert not ready and supervisor.gate.source == "таймаут"
+
+
+def test_stop_terminates_process(supervisors):
+    ports = free_ports(1)
+    supervisor = fake_xray(ports)
+    process = start(supervisor, ports)
+    assert supervisor.wait_ready(ports, timeout=5.0)[0]
+    supervisor.stop(timeout=1.0)
+    assert process.poll() is not None
+    assert not supervisor.running
+
+
+def test_graceful_stop_lets_xray_finish():
+    ports = free_ports(1)
+    supervisor = fake_xray(ports)
+    buffer = LogBuffer()
+    process = supervisor.start(ports)
+    reader = XrayLogReader(process.stdout, buffer, supervisor.gate)
+    reader.start()
+    assert supervisor.wait_ready(ports, timeout=5.0)[0]
+    assert supervisor.graceful
+    assert supervisor.stop(timeout=5.0) == 0
+    reader.join(5.0)
+    assert any("stopped" in line for line in buffer.drain())
+
+
+def test_stop_without_graceful_mode_kills_at_once(monkeypatch):
+    """Windows без консоли: ждать сигнала бессмысленно, процесс сразу завершается"""
+    monkeypatch.setattr(xray_process, "stop_mode", lambda: (0, False))
+    ports = free_ports(1)
+    supervisor = fake_xray(ports)
+    process = start(supervisor, ports)
+    assert supervisor.wait_ready(ports, timeout=5.0)[0]
+    assert not supervisor.graceful
+    begin = time.perf_counter()
+    code = supervisor.stop(timeout=10.0)
+    assert time.perf_counter() - begin < 5.0
+    assert code != 0 and process.poll() is not None
@@ -0,0 +1,193 @@
+"""StatsPoller против локальной заглушки /debug/vars со сценарием ответов"""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from anonline.xray_stats import METRICS_INBOUND_TAG, STATS_PATH, StatsPoller, enable_stats, parse_counters
+
+
+def payload(outbound, inbound=None):
+    """Ответ metrics Xray: {тег: (uplink, downlink)} по outbound и inbound"""
+    def section(counters):
+        return {tag: {"uplink": up, "downlink": down} for tag, (up, down) in counters.items()}
+
+    inbound = dict(inbound or {}, **{METRICS_INBOUND_TAG: (7, 7)})
+    return {"cmdline": ["xray"], "stats": {"outbound": section(outbound), "inbound": section(inbound)}}
+
+
+class StatsStandin:
+    """HTTP-заглушка metrics: ответы берутся по очереди из script.
+
+    Элемент сценария - dict (JSON с кодом 200), bytes (тело как есть) или
+    int (код ошибки). Последний ответ повторяется.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = 0
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                standin.requests += 1
+                if self.path != STATS_PATH:
+                    self.send_error(404)
+                    return
+                answer = standin.script.pop(0) if len(standin.script) > 1 else standin.script[0]
+                if isinstance(answer, int):
+                    self.send_error(answer)
+                    return
+                body = answer if isinstance(answer, bytes) else json.dumps(answer).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def standin():
+    created = []
+
+    def make(script):
+        created.append(StatsStandin(script))
+        return created[-1]
+
+    yield make
+    for server in created:
+        server.close()
+
+
+def closed_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_deltas_per_interval(standin):
+    server = standin([payload({"proxy": (1000, 5000), "direct": (0, 0)}),
+                      payload({"proxy": (3000, 15000), "direct": (500, 100)}),
+                      payload({"proxy": (3000, 20000), "direct": (500, 100)})])
+    poller = StatsPoller(port=server.port)
+    try:
+        # Первый опрос - только точка отсчета
+        assert poller.poll_once(now=10.0) is None
+        sample = poller.poll_once(now=12.0)
+        assert sample.interval == 2.0
+        assert sample.rates[("outbound", "proxy")] == (1000.0, 5000.0)
+        assert sample.rates[("outbound", "direct")] == (250.0, 50.0)
+        assert sample.totals[("outbound", "proxy")] == (3000, 15000)
+        # Служебный inbound metrics в счетчики не попадает
+        assert ("inbound", METRICS_INBOUND_TAG) not in sample.totals
+
+        sample = poller.poll_once(now=13.0)
+        assert sample.rates[("outbound", "proxy")] == (0.0, 5000.0)
+        assert poller.series("proxy") == [(12.0, 1000.0, 5000.0), (13.0, 0.0, 5000.0)]
+        assert poller.latest() is sample
+        assert poller.errors == 0
+        # Все опросы - по одному keep-alive соединению
+        assert server.requests == 3
+    finally:
+        poller.stop()
+
+
+def test_counter_reset_after_restart_gives_no_negative_rate(standin):
+    server = standin([payload({"proxy": (50_000, 900_000)}),
+                      payload({"proxy": (60_000, 1_000_000)}),
+                      # Xray перезапущен: счетчики начались с нуля
+                      payload({"proxy": (4_000, 30_000)}),
+                      payload({"proxy": (8_000, 60_000)})])
+    poller = StatsPoller(port=server.port)
+    try:
+        poller.poll_once(now=0.0)
+        rates = [poller.poll_once(now=float(second)).rates[("outbound", "proxy")] for second in (1, 2, 3)]
+    finally:
+        poller.stop()
+    assert rates == [(10_000.0, 100_000.0), (4_000.0, 30_000.0), (4_000.0, 30_000.0)]
+    assert all(value >= 0 for rate in rates for value in rate)
+
+
+@pytest.mark.parametrize("answer", [b"{\"stats\": {", b"not json", 500])
+def test_bad_response_is_recorded_not_raised(standin, answer):
+    server = standin([payload({"proxy": (0, 0)}), answer, payload({"proxy": (100, 200)})])
+    poller = StatsPoller(port=server.port)
+    try:
+        assert poller.poll_once(now=0.0) is None
+        assert poller.poll_once(now=1.0) is None
+        assert poller.errors == 1
+        assert poller.last_error
+        # После сбоя опрос продолжается, разность - с последним удачным опросом
+        sample = poller.poll_once(now=2.0)
+        assert sample.rates[("outbound", "proxy")] == (50.0, 100.0)
+    finally:
+        poller.stop()
+
+
+def test_connection_refused_is_recorded_not_raised():
+    poller = StatsPoller(port=closed_port(), timeout=0.5)
+    assert poller.poll_once() is None
+    assert poller.poll_once() is None
+    assert poller.errors == 2
+    assert poller.last_error
+    assert not poller.samples
+
+
+def test_background_thread_survives_errors():
+    poller = StatsPoller(port=closed_port(), interval=0.02, timeout=0.2)
+    poller.start()
+    try:
+        deadline = time.monotonic() + 5.0
+        while poller.errors < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert poller.errors >= 3
+        assert poller.running
+    finally:
+        poller.stop()
+    assert not poller.running
+
+
+def test_background_samples(standin):
+    # Каждый следующий ответ на 1000 байт больше предыдущего
+    server = standin([payload({"proxy": (1000 * i, 0)}) for i in range(500)])
+    samples = []
+    poller = StatsPoller(port=server.port, interval=0.02, on_sample=samples.append)
+    poller.start()
+    try:
+        deadline = time.monotonic() + 5.0
+        while len(samples) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        poller.stop()
+    assert len(samples) >= 3
+    assert all(sample.rates[("outbound", "proxy")][0] > 0 for sample in samples)
+
+
+def test_parse_counters_and_enable_stats():
+    assert parse_counters({"memstats": {}}) == {}
+    assert parse_counters(payload({"proxy": (1, 2)}, {"socks": (3, 4)})) == {
+        ("outbound", "proxy"): (1, 2), ("inbound", "socks"): (3, 4)}
+    config = enable_stats({"routing": {"rules": [{"outboundTag": "proxy"}]}}, port=12345)
+    assert config["routing"]["rules"][0]["inboundTag"] == [METRICS_INBOUND_TAG]
+    assert config["inbounds"][-1]["port"] == 12345
+    assert config["policy"]["system"]["statsOutboundDownlink"] is True